@@ -0,0 +1,435 @@
+"""
+=============================================================================
+ARCHIVO DE AUDITORÍA EN PARQUET - ZaintzaBus
+=============================================================================
+Saca de Firestore las entradas de `auditoria` anteriores a una fecha y las
+guarda en archivos Parquet comprimidos, particionados por tenant y mes:
+
+    archivo_auditoria/
+      manifiesto.json
+      tenant=ekialdebus/mes=2024-03/auditoria-20250101.parquet
+      tenant=_global/mes=2024-03/auditoria-20250101.parquet
+
+  1. Las entradas se leen por páginas ordenadas por `timestamp`, así que cada
+     mes se completa antes de pasar al siguiente: basta un writer abierto por
+     tenant del mes en curso y la memoria no crece con el volumen.
+  2. Al cerrar cada partición se relee el archivo y se comparan el número de
+     filas y el SHA-256 con lo calculado durante la escritura.
+  3. Sólo entonces se borran de Firestore los IDs que contiene el archivo, en
+     batches con ritmo limitado.
+  4. Repetir un rango es seguro (tras --sin-borrar, un borrado a medias o en
+     modo snapshot): las entradas cuyo ID ya está en una partición del
+     manifiesto no se vuelven a archivar, sólo se borran si quedan en
+     Firestore. consultar() descarta además los IDs repetidos.
+
+`consultar()` busca en el archivo por entidadId, usuarioId y rango de fechas
+leyendo sólo las particiones (tenant, mes) que pueden contener resultados.
+
+Requiere pyarrow (pip install pyarrow).
+
+USO:
+    python scripts/archivar_auditoria.py archivar --antes 2025-01-01
+    python scripts/archivar_auditoria.py archivar --antes 2025-01-01 --sin-borrar --ritmo 200
+    python scripts/archivar_auditoria.py consultar --entidad-id BUS-321 --desde 2024-01-01 --hasta 2024-07-01
+=============================================================================
+"""
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from escritor import EscritorLotes
+from sla_motor import ZONA_HORARIA
+from snapshot import Documento, a_epoch, cargar_coleccion, leer_paginado, serializar_valor
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+COLECCION = 'auditoria'
+DESTINO_DEFAULT = Path('archivo_auditoria')
+MANIFIESTO = 'manifiesto.json'
+
+# Tenant de las entradas sin tenantId
+TENANT_GLOBAL = '_global'
+
+# Filas por row group de Parquet (y por escritura a disco)
+FILAS_POR_GRUPO = 20000
+
+# Borrados por segundo en Firestore
+RITMO_BORRADO = 500
+
+COMPRESION = 'zstd'
+
+# Columnas propias; el resto de campos va a 'extra' como JSON
+COLUMNAS_TEXTO = (
+    'tenantId', 'entidad', 'entidadId', 'accion',
+    'usuarioId', 'usuarioEmail', 'usuarioRol', 'ip', 'userAgent', 'motivoCambio',
+)
+
+
+def _pyarrow():
+    """pyarrow se importa aquí para que el resto de scripts no lo necesite."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    return pa, pq
+
+
+def _esquema():
+    pa, _ = _pyarrow()
+    return pa.schema(
+        [('id', pa.string()), ('timestamp', pa.timestamp('us', tz='UTC'))]
+        + [(c, pa.string()) for c in COLUMNAS_TEXTO]
+        + [('cambios', pa.string()), ('extra', pa.string())]
+    )
+
+
+# =============================================================================
+# CONVERSIÓN
+# =============================================================================
+
+def a_fila(doc_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Entrada de auditoría -> fila del archivo (cambios y extra como JSON)."""
+    epoch = a_epoch(data.get('timestamp'))
+    fila = {
+        'id': doc_id,
+        'timestamp': datetime.fromtimestamp(epoch, timezone.utc),
+    }
+    for columna in COLUMNAS_TEXTO:
+        valor = data.get(columna)
+        fila[columna] = None if valor is None else str(valor)
+    fila['cambios'] = json.dumps(serializar_valor(data.get('cambios') or []), ensure_ascii=False, sort_keys=True)
+    extra = {k: v for k, v in data.items() if k not in COLUMNAS_TEXTO and k not in ('timestamp', 'cambios')}
+    fila['extra'] = json.dumps(serializar_valor(extra), ensure_ascii=False, sort_keys=True) if extra else None
+    return fila
+
+
+def _linea_checksum(fila: Dict[str, Any]) -> bytes:
+    """Forma canónica de una fila para el checksum (igual al escribir y al releer)."""
+    canonica = dict(fila, timestamp=fila['timestamp'].astimezone(timezone.utc).isoformat())
+    return json.dumps(canonica, ensure_ascii=False, sort_keys=True).encode('utf-8') + b'\n'
+
+
+def particion_de(fila: Dict[str, Any]) -> Tuple[str, str]:
+    """(tenant, mes local 'YYYY-MM') de una fila."""
+    local = fila['timestamp'].astimezone(ZONA_HORARIA)
+    return fila['tenantId'] or TENANT_GLOBAL, f"{local.year}-{local.month:02d}"
+
+
+# =============================================================================
+# LECTURA ORDENADA
+# =============================================================================
+
+def leer_entradas(antes: datetime, snapshot: Optional[Path] = None, db=None) -> Iterator[Documento]:
+    """Entradas con timestamp < antes, ordenadas por (timestamp, id)."""
+    if snapshot is not None:
+        corte = antes.timestamp()
+        docs = [(i, d) for i, d in cargar_coleccion(snapshot, COLECCION) if a_epoch(d.get('timestamp')) < corte]
+        yield from sorted(docs, key=lambda doc: (a_epoch(doc[1].get('timestamp')), doc[0]))
+        return
+    consulta = (
+        db.collection(COLECCION)
+        .where('timestamp', '<', antes)
+        .order_by('timestamp')
+        .order_by('__name__')
+    )
+    yield from leer_paginado(consulta)
+
+
+# =============================================================================
+# ESCRITURA DE PARTICIONES
+# =============================================================================
+
+class Particion:
+    """Archivo Parquet de un (tenant, mes) que se escribe por row groups."""
+
+    def __init__(self, destino: Path, tenant_id: str, mes: str, etiqueta: str):
+        self.tenant = tenant_id
+        self.mes = mes
+        carpeta = destino / f"tenant={tenant_id}" / f"mes={mes}"
+        self.ruta = carpeta / f"auditoria-{etiqueta}.parquet"
+        sufijo = 1
+        while self.ruta.exists():
+            sufijo += 1
+            self.ruta = carpeta / f"auditoria-{etiqueta}-{sufijo}.parquet"
+        self.filas: List[Dict[str, Any]] = []
+        self.registros = 0
+        self.hash = hashlib.sha256()
+        self.desde: Optional[datetime] = None
+        self.hasta: Optional[datetime] = None
+        self._writer = None
+
+    def agregar(self, fila: Dict[str, Any]) -> None:
+        self.filas.append(fila)
+        self.hash.update(_linea_checksum(fila))
+        self.registros += 1
+        self.desde = self.desde or fila['timestamp']
+        self.hasta = fila['timestamp']
+        if len(self.filas) >= FILAS_POR_GRUPO:
+            self._volcar()
+
+    def _volcar(self) -> None:
+        if not self.filas:
+            return
+        pa, pq = _pyarrow()
+        if self._writer is None:
+            self.ruta.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = pq.ParquetWriter(str(self.ruta), _esquema(), compression=COMPRESION)
+        self._writer.write_table(pa.Table.from_pylist(self.filas, schema=_esquema()))
+        self.filas = []
+
+    def cerrar(self) -> Dict[str, Any]:
+        """Cierra el archivo y devuelve su entrada de manifiesto."""
+        self._volcar()
+        if self._writer is not None:
+            self._writer.close()
+        return {
+            'tenant': self.tenant,
+            'mes': self.mes,
+            'archivo': self.ruta.relative_to(self.ruta.parents[2]).as_posix(),
+            'registros': self.registros,
+            'sha256': self.hash.hexdigest(),
+            'desde': self.desde.isoformat(),
+            'hasta': self.hasta.isoformat(),
+        }
+
+
+def verificar(destino: Path, entrada: Dict[str, Any]) -> None:
+    """
+    Relee un archivo, row group a row group, y comprueba filas y checksum
+    contra el manifiesto.
+
+    Raises:
+        ValueError: si el archivo no coincide con lo escrito.
+    """
+    _, pq = _pyarrow()
+    hash_archivo = hashlib.sha256()
+    filas = 0
+    for lote in pq.ParquetFile(str(destino / entrada['archivo'])).iter_batches(batch_size=FILAS_POR_GRUPO):
+        for fila in lote.to_pylist():
+            hash_archivo.update(_linea_checksum(fila))
+        filas += lote.num_rows
+    if filas != entrada['registros'] or hash_archivo.hexdigest() != entrada['sha256']:
+        raise ValueError(
+            f"{entrada['archivo']}: {filas} filas (esperadas {entrada['registros']}), "
+            f"checksum {'correcto' if hash_archivo.hexdigest() == entrada['sha256'] else 'distinto'}"
+        )
+
+
+def ids_de(destino: Path, entrada: Dict[str, Any]) -> Iterator[str]:
+    """IDs de un archivo, leyendo sólo la columna `id` lote a lote."""
+    _, pq = _pyarrow()
+    for lote in pq.ParquetFile(str(destino / entrada['archivo'])).iter_batches(
+        batch_size=FILAS_POR_GRUPO, columns=['id']
+    ):
+        yield from lote.column(0).to_pylist()
+
+
+def cargar_manifiesto(destino: Path) -> Dict[str, Any]:
+    archivo = destino / MANIFIESTO
+    if archivo.exists():
+        return json.loads(archivo.read_text(encoding='utf-8'))
+    return {'particiones': []}
+
+
+def guardar_manifiesto(destino: Path, manifiesto: Dict[str, Any]) -> None:
+    destino.mkdir(parents=True, exist_ok=True)
+    (destino / MANIFIESTO).write_text(json.dumps(manifiesto, ensure_ascii=False, indent=2), encoding='utf-8')
+
+
+# =============================================================================
+# ARCHIVADO
+# =============================================================================
+
+def ids_archivados(destino: Path, manifiesto: Dict[str, Any], tenant_id: str, mes: str) -> set:
+    """IDs ya archivados en un (tenant, mes), verificando cada archivo contra el manifiesto."""
+    ids = set()
+    for entrada in manifiesto['particiones']:
+        if entrada['tenant'] == tenant_id and entrada['mes'] == mes:
+            verificar(destino, entrada)
+            ids.update(ids_de(destino, entrada))
+    return ids
+
+
+def archivar(
+    antes: datetime,
+    destino: Path = DESTINO_DEFAULT,
+    snapshot: Optional[Path] = None,
+    db=None,
+    borrar: bool = True,
+    ritmo: float = RITMO_BORRADO,
+) -> Dict[str, int]:
+    """
+    Archiva las entradas anteriores a `antes` y, si `borrar`, las elimina de
+    Firestore partición a partición una vez verificado cada archivo.
+    """
+    etiqueta = antes.astimezone(ZONA_HORARIA).strftime('%Y%m%d')
+    manifiesto = cargar_manifiesto(destino)
+    abiertas: Dict[Tuple[str, str], Particion] = {}
+    archivados: Dict[Tuple[str, str], set] = {}
+    stats = {'archivadas': 0, 'ya_archivadas': 0, 'particiones': 0, 'borradas': 0}
+    escritor = EscritorLotes(db, max_por_segundo=ritmo) if borrar and db is not None else None
+
+    def cerrar(clave: Tuple[str, str]) -> None:
+        entrada = abiertas.pop(clave).cerrar()
+        verificar(destino, entrada)
+        manifiesto['particiones'].append(entrada)
+        guardar_manifiesto(destino, manifiesto)
+        stats['particiones'] += 1
+        print(f"   📦 {entrada['archivo']}: {entrada['registros']} entradas verificadas")
+        if escritor is not None:
+            for doc_id in ids_de(destino, entrada):
+                escritor.delete(f"{COLECCION}/{doc_id}")
+            escritor.commit()
+            stats['borradas'] += entrada['registros']
+
+    mes_actual = None
+    for doc_id, data in leer_entradas(antes, snapshot, db):
+        fila = a_fila(doc_id, data)
+        clave = particion_de(fila)
+        if clave not in archivados:
+            archivados[clave] = ids_archivados(destino, manifiesto, *clave)
+        if doc_id in archivados[clave]:
+            # De una ejecución anterior: ya está verificado en el archivo
+            stats['ya_archivadas'] += 1
+            if escritor is not None:
+                escritor.delete(f"{COLECCION}/{doc_id}")
+                stats['borradas'] += 1
+            continue
+        # Orden por timestamp: al empezar un mes nuevo los anteriores ya están completos
+        if clave[1] != mes_actual:
+            for anterior in [c for c in abiertas if c[1] < clave[1]]:
+                cerrar(anterior)
+            for anterior in [c for c in archivados if c[1] < clave[1]]:
+                del archivados[anterior]
+            mes_actual = clave[1]
+        if clave not in abiertas:
+            abiertas[clave] = Particion(destino, clave[0], clave[1], etiqueta)
+        abiertas[clave].agregar(fila)
+        stats['archivadas'] += 1
+
+    for clave in list(abiertas):
+        cerrar(clave)
+    if escritor is not None:
+        escritor.commit()
+    return stats
+
+
+# =============================================================================
+# CONSULTA
+# =============================================================================
+
+def _mes_de(instante: datetime) -> str:
+    local = instante.astimezone(ZONA_HORARIA)
+    return f"{local.year}-{local.month:02d}"
+
+
+def consultar(
+    destino: Path = DESTINO_DEFAULT,
+    tenant_id: Optional[str] = None,
+    entidad_id: Optional[str] = None,
+    usuario_id: Optional[str] = None,
+    desde: Optional[datetime] = None,
+    hasta: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Entradas archivadas que cumplen los filtros, ordenadas por timestamp.
+
+    Con el manifiesto se descartan las particiones de otros tenants o cuyo
+    rango [desde, hasta] no se solapa con el pedido; en las restantes el
+    filtro se aplica al leer (pyarrow salta los row groups que no encajan).
+    Un ID archivado en más de un archivo (archivos anteriores a la
+    comprobación de repetidos) se devuelve una sola vez.
+    """
+    _, pq = _pyarrow()
+    filtros = []
+    if entidad_id is not None:
+        filtros.append(('entidadId', '=', entidad_id))
+    if usuario_id is not None:
+        filtros.append(('usuarioId', '=', usuario_id))
+    if desde is not None:
+        filtros.append(('timestamp', '>=', desde))
+    if hasta is not None:
+        filtros.append(('timestamp', '<', hasta))
+
+    resultados = []
+    vistos = set()
+    for entrada in cargar_manifiesto(destino)['particiones']:
+        if tenant_id is not None and entrada['tenant'] != tenant_id:
+            continue
+        if desde is not None and datetime.fromisoformat(entrada['hasta']) < desde:
+            continue
+        if hasta is not None and datetime.fromisoformat(entrada['desde']) >= hasta:
+            continue
+        tabla = pq.read_table(str(destino / entrada['archivo']), filters=filtros or None)
+        for fila in tabla.to_pylist():
+            if fila['id'] in vistos:
+                continue
+            vistos.add(fila['id'])
+            fila['cambios'] = json.loads(fila['cambios']) if fila['cambios'] else []
+            fila['extra'] = json.loads(fila['extra']) if fila['extra'] else {}
+            resultados.append(fila)
+    resultados.sort(key=lambda f: (f['timestamp'], f['id']))
+    return resultados
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def _fecha_utc(texto: str) -> datetime:
+    """'YYYY-MM-DD' como medianoche local de Madrid."""
+    dia = date.fromisoformat(texto)
+    return datetime(dia.year, dia.month, dia.day, tzinfo=ZONA_HORARIA).astimezone(timezone.utc)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Archivo de auditoria en Parquet por tenant y mes.")
+    parser.add_argument('--destino', type=Path, default=DESTINO_DEFAULT, help="Directorio del archivo")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_arc = sub.add_parser('archivar', help="Archivar (y borrar) entradas anteriores a una fecha")
+    p_arc.add_argument('--antes', required=True, type=_fecha_utc, help="Fecha de corte (YYYY-MM-DD, excluida)")
+    p_arc.add_argument('--snapshot', type=Path, help="Leer de un snapshot (no borra nada)")
+    p_arc.add_argument('--sin-borrar', action='store_true', help="Archivar sin borrar de Firestore")
+    p_arc.add_argument('--ritmo', type=float, default=RITMO_BORRADO, help="Borrados por segundo")
+
+    p_con = sub.add_parser('consultar', help="Buscar en el archivo")
+    p_con.add_argument('--tenant')
+    p_con.add_argument('--entidad-id')
+    p_con.add_argument('--usuario-id')
+    p_con.add_argument('--desde', type=_fecha_utc)
+    p_con.add_argument('--hasta', type=_fecha_utc)
+
+    args = parser.parse_args(argv)
+    try:
+        _pyarrow()
+    except ImportError:
+        print("❌ Falta pyarrow: pip install pyarrow")
+        return 1
+
+    inicio = time.perf_counter()
+    if args.comando == 'archivar':
+        db = None
+        if args.snapshot is None:
+            from cliente_firestore import conectar_firestore
+            db = conectar_firestore()
+        print(f"🗄  Archivando auditoria anterior a {args.antes.astimezone(ZONA_HORARIA).date()} en {args.destino}/")
+        stats = archivar(args.antes, args.destino, args.snapshot, db, not args.sin_borrar, args.ritmo)
+        print(f"✅ {stats['archivadas']} entradas en {stats['particiones']} particiones "
+              f"({stats['ya_archivadas']} ya archivadas), {stats['borradas']} borradas de Firestore ({time.perf_counter() - inicio:.1f} s)")
+    else:
+        filas = consultar(args.destino, args.tenant, args.entidad_id, args.usuario_id, args.desde, args.hasta)
+        for fila in filas:
+            print(json.dumps(serializar_valor(fila), ensure_ascii=False))
+        print(f"⏱  {len(filas)} entradas en {time.perf_counter() - inicio:.2f} s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
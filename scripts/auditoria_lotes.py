@@ -0,0 +1,262 @@
+"""
+=============================================================================
+AUDITORÍA EN LOTE PARA IMPORTACIONES Y MIGRACIONES - ZaintzaBus
+=============================================================================
+Trazabilidad de las escrituras masivas (importar_equipos, importar_flota,
+migrar_activos_a_autobuses) sin duplicar el volumen de escrituras:
+
+  1. `diferencias()` compara el documento anterior y el nuevo campo a campo
+     y devuelve sólo las rutas que cambian ('ubicacionActual.id', 'red.ip',
+     'sim.msisdn', 'instalacion.fase'...). Los subárboles iguales se
+     descartan con una sola comparación de dict, sin recorrerlos.
+  2. `ManifiestoAuditoria` agrupa los cambios de una ejecución en unos pocos
+     documentos de `auditoria` (partes de hasta ~900 KB) más un resumen, en
+     lugar de un documento por entidad.
+
+Cada parte es una entrada AuditLog normal (entidad, entidadId = ID de la
+ejecución, timestamp, tenantId...) con la lista de entradas en `lote`, así
+que el archivado de auditoría la trata como a cualquier otra.
+
+USO:
+    manifiesto = ManifiestoAuditoria(db, 'importar_equipos', 'inventario', tenant_id='ekialdebus')
+    manifiesto.registrar('ROUTER-321-001', anterior, nuevo)
+    manifiesto.cerrar()
+=============================================================================
+"""
+
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from escritor import EscritorLotes
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+COLECCION = 'auditoria'
+
+# Igual que camposIgnorados de calcularCambios (audit.service.ts), más el
+# bloque de metadatos 'auditoria' que escriben los scripts de importación.
+CAMPOS_IGNORADOS = frozenset({
+    'id',
+    'createdAt',
+    'updatedAt',
+    'creado_por',
+    'actualizado_por',
+    'eliminado',
+    'fecha_eliminacion',
+    'eliminado_por',
+    'searchTerms',
+    'auditoria',
+})
+
+# Tamaño máximo aproximado de una parte (el límite de Firestore es 1 MiB)
+BYTES_POR_PARTE = 900_000
+
+_AUSENTE = object()
+
+Cambio = Dict[str, Any]
+
+
+# =============================================================================
+# DIFERENCIAS ESTRUCTURALES
+# =============================================================================
+
+def _es_centinela(valor: Any) -> bool:
+    """SERVER_TIMESTAMP, DELETE_FIELD...: no son valores comparables."""
+    return type(valor).__name__ == 'Sentinel'
+
+
+def _iguales(a: Any, b: Any) -> bool:
+    """
+    Igualdad de valores hoja. Las fechas sin zona se toman como UTC (así las
+    guarda firebase_admin), para que un datetime naive recién generado sea
+    igual al que devuelve Firestore.
+    """
+    if isinstance(a, datetime) and isinstance(b, datetime):
+        if a.tzinfo is None:
+            a = a.replace(tzinfo=timezone.utc)
+        if b.tzinfo is None:
+            b = b.replace(tzinfo=timezone.utc)
+    return a == b
+
+
+def diferencias(
+    anterior: Optional[Dict[str, Any]],
+    nuevo: Optional[Dict[str, Any]],
+    ignorar: Iterable[str] = CAMPOS_IGNORADOS,
+) -> List[Cambio]:
+    """
+    Cambios entre dos documentos anidados, en formato CambioAuditoria.
+
+    Los mapas se recorren recursivamente y cada cambio se emite con su ruta
+    de puntos; las listas y demás valores se comparan enteros. `ignorar`
+    admite nombres de primer nivel ('auditoria') y rutas ('fechas.alta').
+    """
+    cambios: List[Cambio] = []
+    _comparar(anterior or {}, nuevo or {}, '', frozenset(ignorar), cambios)
+    return cambios
+
+
+def _comparar(anterior: Dict[str, Any], nuevo: Dict[str, Any], prefijo: str, ignorar, cambios: List[Cambio]) -> None:
+    for campo in sorted(anterior.keys() | nuevo.keys()):
+        ruta = prefijo + campo
+        if ruta in ignorar:
+            continue
+        a = anterior.get(campo, _AUSENTE)
+        b = nuevo.get(campo, _AUSENTE)
+        if a is b or _es_centinela(b):
+            continue
+        if isinstance(a, dict) or isinstance(b, dict):
+            a_map = {} if a is _AUSENTE else a
+            b_map = {} if b is _AUSENTE else b
+            if isinstance(a_map, dict) and isinstance(b_map, dict):
+                # Un subárbol igual se descarta sin recorrerlo
+                if a_map != b_map:
+                    _comparar(a_map, b_map, ruta + '.', ignorar, cambios)
+                continue
+        if _iguales(a, b):
+            continue
+        cambios.append({
+            'campo': ruta,
+            'valorAnterior': None if a is _AUSENTE else a,
+            'valorNuevo': None if b is _AUSENTE else b,
+        })
+
+
+# =============================================================================
+# MANIFIESTO POR EJECUCIÓN
+# =============================================================================
+
+class ManifiestoAuditoria:
+    """
+    Acumula las entradas de una ejecución y las guarda por partes.
+
+    Las partes se escriben con el EscritorLotes que se pase (el mismo que usa
+    la importación, para que viajen en sus batches) o con uno propio.
+    """
+
+    def __init__(
+        self,
+        db,
+        script: str,
+        entidad: str,
+        tenant_id: Optional[str] = None,
+        usuario_id: str = 'importacion',
+        motivo: Optional[str] = None,
+        escritor: Optional[EscritorLotes] = None,
+        ignorar: Iterable[str] = CAMPOS_IGNORADOS,
+    ):
+        self.db = db
+        self.script = script
+        self.entidad = entidad
+        self.tenant_id = tenant_id
+        self.usuario_id = usuario_id
+        self.motivo = motivo
+        self.ignorar = frozenset(ignorar)
+        self.inicio = datetime.now(timezone.utc)
+        # Con el tenant: dos tenants migrados a la vez no comparten manifiesto
+        alcance = f"{entidad}-{tenant_id}" if tenant_id else entidad
+        self.ejecucion_id = f"{script}-{alcance}-{self.inicio:%Y%m%dT%H%M%S}"
+        self._escritor = escritor
+        self._propio = escritor is None
+        self._entradas: List[Dict[str, Any]] = []
+        self._bytes = 0
+        self.partes = 0
+        self.totales = {'crear': 0, 'actualizar': 0, 'eliminar': 0, 'sinCambios': 0}
+
+    @property
+    def escritor(self) -> EscritorLotes:
+        if self._escritor is None:
+            self._escritor = EscritorLotes(self.db)
+        return self._escritor
+
+    def registrar(
+        self,
+        entidad_id: str,
+        anterior: Optional[Dict[str, Any]],
+        nuevo: Optional[Dict[str, Any]],
+    ) -> List[Cambio]:
+        """
+        Registra el cambio de una entidad. Las creaciones y eliminaciones no
+        guardan el documento (ya está en su colección o en la auditoría previa).
+
+        Returns:
+            Los cambios detectados (vacío si el documento no cambia).
+        """
+        if anterior is None and nuevo is None:
+            return []
+        if anterior is None:
+            accion, cambios = 'crear', []
+        elif nuevo is None:
+            accion, cambios = 'eliminar', []
+        else:
+            cambios = diferencias(anterior, nuevo, self.ignorar)
+            if not cambios:
+                self.totales['sinCambios'] += 1
+                return []
+            accion = 'actualizar'
+
+        entrada = {'entidadId': entidad_id, 'accion': accion, 'cambios': cambios}
+        tamano = len(json.dumps(entrada, ensure_ascii=False, default=str))
+        if self._entradas and self._bytes + tamano > BYTES_POR_PARTE:
+            self._guardar_parte()
+        self._entradas.append(entrada)
+        self._bytes += tamano
+        self.totales[accion] += 1
+        return cambios
+
+    def _base(self) -> Dict[str, Any]:
+        return {
+            'entidad': self.entidad,
+            'entidadId': self.ejecucion_id,
+            'accion': 'actualizar',
+            'usuarioId': self.usuario_id,
+            'usuarioEmail': '',
+            'usuarioRol': 'sistema',
+            'timestamp': datetime.now(timezone.utc),
+            'tenantId': self.tenant_id,
+            'cambios': [],
+            'motivoCambio': self.motivo or f"Ejecución de {self.script}",
+        }
+
+    def _guardar_parte(self) -> None:
+        if not self._entradas:
+            return
+        self.partes += 1
+        doc = self._base()
+        doc['lote'] = {
+            'ejecucionId': self.ejecucion_id,
+            'script': self.script,
+            'parte': self.partes,
+            'entradas': self._entradas,
+        }
+        self.escritor.set(f"{COLECCION}/{self.ejecucion_id}-{self.partes:03d}", doc)
+        self._entradas = []
+        self._bytes = 0
+
+    def cerrar(self) -> Dict[str, Any]:
+        """Guarda la última parte y el resumen de la ejecución; devuelve el resumen."""
+        self._guardar_parte()
+        resumen = self._base()
+        resumen['lote'] = {
+            'ejecucionId': self.ejecucion_id,
+            'script': self.script,
+            'inicio': self.inicio,
+            'partes': self.partes,
+            'totales': dict(self.totales),
+        }
+        self.escritor.set(f"{COLECCION}/{self.ejecucion_id}", resumen)
+        if self._propio:
+            self.escritor.commit()
+        return resumen['lote']
+
+
+def expandir(parte: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Convierte una parte de manifiesto en entradas AuditLog individuales."""
+    base = {k: v for k, v in parte.items() if k not in ('lote', 'entidadId', 'accion', 'cambios')}
+    return [
+        {**base, 'entidadId': e['entidadId'], 'accion': e['accion'], 'cambios': e['cambios']}
+        for e in (parte.get('lote') or {}).get('entradas', [])
+    ]
@@ -0,0 +1,354 @@
+"""
+=============================================================================
+BACKFILL HISTÓRICO DE sla_metrics - ZaintzaBus
+=============================================================================
+Recalcula en bloque los sla_metrics (diarios, semanales y mensuales) de
+varios años cuando cambian los límites de sla_config.
+
+  1. El histórico se parte en particiones (tenant, mes) que se calculan en
+     paralelo en un pool de procesos, leyendo del snapshot o en vivo por
+     páginas (sólo las incidencias que pueden afectar a ese mes).
+  2. Cada incidencia se evalúa con la versión de sla_config vigente en su
+     recepción (sla_config/{tenantId}/versiones, ver docs/SLA_STRATEGY.md).
+  3. Con los parciales diarios de todas las particiones se montan los
+     documentos diarios, semanales y mensuales (sla_rollups), se comparan con
+     los existentes y sólo se escriben los que han cambiado.
+
+USO:
+    python scripts/backfill_sla.py --desde 2022-01 --hasta 2025-12
+    python scripts/backfill_sla.py --desde 2024-01 --hasta 2024-12 --tenant ekialdebus --simular
+    python scripts/backfill_sla.py --snapshot snapshot/ --salida metricas/ --desde 2023-01 --hasta 2025-12 --procesos 8
+=============================================================================
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from cliente_firestore import conectar_firestore
+from disponibilidad import cargar_autobuses
+from sla_motor import (
+    SLA_CONFIG_DEFAULT,
+    ResultadoSLA,
+    TablaIncidencias,
+    calcular_sla,
+    cargar_configs,
+    cargar_incidencias,
+    inicio_dia,
+    limites_periodo,
+    limites_por_fila,
+)
+from sla_rollups import (
+    COLECCION_METRICAS,
+    COLECCION_PARCIALES,
+    AlmacenFirestore,
+    AlmacenLocal,
+    calcular_parciales,
+    cargar_incidencias_ventana,
+    combinar_parciales,
+    dias_de_periodo,
+    finalizar,
+    periodos_padre,
+)
+from snapshot import a_epoch, documentos, listar_tenants
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+# Documentos por lectura al comparar con lo ya guardado
+TAM_LECTURA = 300
+
+# Decimales al comparar valores calculados con los guardados
+DECIMALES_COMPARACION = 6
+
+# Campos que no forman parte del valor de una métrica
+CAMPOS_IGNORADOS = ('calculadoAt',)
+
+Version = Tuple[float, Dict[str, Any]]
+
+
+# =============================================================================
+# VERSIONES DE sla_config
+# =============================================================================
+
+def cargar_versiones(
+    tenants: Sequence[str],
+    snapshot: Optional[Path] = None,
+    db=None,
+) -> Dict[str, List[Version]]:
+    """
+    Versiones de sla_config de cada tenant como [(vigenciaDesde, config)],
+    ordenadas. Un tenant sin versiones usa su sla_config actual para todo el
+    histórico; una versión sin vigenciaDesde cuenta desde el principio.
+    """
+    actuales = cargar_configs(tenants, snapshot, db)
+    versiones = {}
+    for tenant_id in tenants:
+        lista = []
+        for _doc_id, data in documentos(f"sla_config/{tenant_id}/versiones", snapshot, db):
+            desde = a_epoch(data.get('vigenciaDesde'))
+            lista.append((-np.inf if np.isnan(desde) else desde, data.get('version', 0), data.get('config') or {}))
+        lista.sort(key=lambda v: (v[0], v[1]))
+        versiones[tenant_id] = [(desde, config) for desde, _v, config in lista] or [(-np.inf, actuales[tenant_id])]
+    return versiones
+
+
+def config_vigente(versiones: List[Version], instante: float) -> Dict[str, Any]:
+    """Config vigente en un instante (la primera versión para instantes anteriores)."""
+    desdes = [desde for desde, _ in versiones]
+    indice = max(int(np.searchsorted(desdes, instante, side='right')) - 1, 0)
+    return versiones[indice][1]
+
+
+def calcular_sla_versionado(
+    tabla: TablaIncidencias,
+    versiones: Dict[str, List[Version]],
+    horario_servicio: bool = False,
+) -> ResultadoSLA:
+    """
+    calcular_sla con los límites (y el horario) de la versión vigente en la
+    recepción de cada incidencia. Las filas se agrupan por (tenant, versión)
+    para resolver límites y duraciones por lotes.
+
+    Cada versión sustituye a la anterior desde su vigenciaDesde; vigenciaHasta
+    no se usa, así que un hueco entre versiones lo cubre la anterior.
+    """
+    n = len(tabla)
+    lim_atencion, lim_resolucion = np.empty(n), np.empty(n)
+    duracion_atencion = np.full(n, np.nan) if horario_servicio else None
+    duracion_resolucion = np.full(n, np.nan) if horario_servicio else None
+    if horario_servicio:
+        from calendario_servicio import duraciones_en_horario
+
+    tenants = tabla.tenant.astype(str)
+    for tenant_id in np.unique(tenants):
+        lista = versiones.get(tenant_id) or [(-np.inf, SLA_CONFIG_DEFAULT)]
+        desdes = np.asarray([desde for desde, _ in lista])
+        indice = np.clip(np.searchsorted(desdes, tabla.recepcion, side='right') - 1, 0, len(lista) - 1)
+        del_tenant = tenants == tenant_id
+        for v, (_desde, config) in enumerate(lista):
+            filas = del_tenant & (indice == v)
+            if not filas.any():
+                continue
+            parte = tabla.filtrar(filas)
+            configs = {tenant_id: config}
+            lim_atencion[filas], lim_resolucion[filas] = limites_por_fila(parte, configs)
+            if horario_servicio:
+                duracion_atencion[filas], duracion_resolucion[filas] = duraciones_en_horario(parte, configs)
+
+    return calcular_sla(tabla, {}, duracion_atencion, duracion_resolucion, limites=(lim_atencion, lim_resolucion))
+
+
+# =============================================================================
+# PARTICIONES
+# =============================================================================
+
+def meses(desde: str, hasta: str) -> List[date]:
+    """Primer día de cada mes entre dos 'YYYY-MM' (ambos incluidos)."""
+    anio, mes = map(int, desde.split('-'))
+    fin = tuple(map(int, hasta.split('-')))
+    resultado = []
+    while (anio, mes) <= fin:
+        resultado.append(date(anio, mes, 1))
+        anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    return resultado
+
+
+def _mes_siguiente(dia: date) -> date:
+    return date(dia.year + 1, 1, 1) if dia.month == 12 else date(dia.year, dia.month + 1, 1)
+
+
+@lru_cache(maxsize=4)
+def _tabla_snapshot(snapshot: str, tenant_id: str) -> TablaIncidencias:
+    """Incidencias del tenant en el snapshot; cada proceso las lee una sola vez."""
+    return cargar_incidencias([tenant_id], Path(snapshot))
+
+
+def procesar_particion(tarea: Dict[str, Any]) -> Tuple[str, Dict[str, Dict[str, Any]]]:
+    """
+    Parciales diarios de una partición (tenant, mes).
+
+    Se ejecuta en un proceso del pool: recibe sólo datos serializables y lee
+    sus incidencias del snapshot o de Firestore. La ventana y la flota del
+    mes usan la versión de sla_config vigente al inicio del mes.
+    """
+    tenant_id = tarea['tenant']
+    desde = date.fromisoformat(tarea['mes'])
+    hasta = _mes_siguiente(desde)
+    t_desde, t_hasta = inicio_dia(desde), inicio_dia(hasta)
+
+    if tarea['snapshot'] is not None:
+        tabla = _tabla_snapshot(tarea['snapshot'], tenant_id)
+    else:
+        tabla = cargar_incidencias_ventana(conectar_firestore(), tenant_id, t_desde, t_hasta)
+    # Fuera quedan las recibidas después del mes y las resueltas antes de él
+    tabla = tabla.filtrar(~(tabla.recepcion >= t_hasta) & ~(tabla.fin_reparacion < t_desde))
+
+    versiones = {tenant_id: tarea['versiones']}
+    resultado = calcular_sla_versionado(tabla, versiones, tarea['horario_servicio'])
+    parciales = calcular_parciales(
+        tabla,
+        {tenant_id: config_vigente(tarea['versiones'], t_desde)},
+        {tenant_id: tarea['autobuses']},
+        desde,
+        hasta,
+        tarea['horario_servicio'],
+        tarea['ahora'],
+        resultado=resultado,
+    )
+    return tenant_id, parciales.get(tenant_id, {})
+
+
+def ejecutar_particiones(tareas: List[Dict[str, Any]], procesos: int) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Reparte las particiones en un pool de procesos y junta los parciales por tenant."""
+    parciales: Dict[str, Dict[str, Dict[str, Any]]] = {}
+    if procesos <= 1:
+        for tarea in tareas:
+            tenant_id, por_dia = procesar_particion(tarea)
+            parciales.setdefault(tenant_id, {}).update(por_dia)
+        return parciales
+
+    # spawn: los clientes gRPC de Firestore no sobreviven a un fork
+    contexto = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+        futuros = [pool.submit(procesar_particion, tarea) for tarea in tareas]
+        for hechos, futuro in enumerate(as_completed(futuros), 1):
+            tenant_id, por_dia = futuro.result()
+            parciales.setdefault(tenant_id, {}).update(por_dia)
+            if hechos % 12 == 0 or hechos == len(futuros):
+                print(f"   {hechos}/{len(futuros)} particiones", file=sys.stderr)
+    return parciales
+
+
+# =============================================================================
+# DOCUMENTOS Y ESCRITURA DE CAMBIOS
+# =============================================================================
+
+def construir_documentos(almacen, tenant_id: str, parciales: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Parciales, sla_metrics diarios y rollups de un tenant. Las semanas que
+    cruzan el borde del rango completan sus días con los parciales ya
+    guardados.
+    """
+    diarios = {dia: finalizar(p, dia, 'diario') for dia, p in parciales.items()}
+    periodos = sorted({p for dia in parciales for p in periodos_padre(date.fromisoformat(dia))})
+    rollups = {}
+    for periodo in periodos:
+        dias = dias_de_periodo(periodo)
+        faltan = [d for d in dias if d.isoformat() not in parciales]
+        del_periodo = [parciales[d.isoformat()] for d in dias if d.isoformat() in parciales]
+        if faltan:
+            del_periodo += almacen.leer_parciales(tenant_id, faltan)
+        _desde, _hasta, tipo = limites_periodo(periodo)
+        rollups[periodo] = finalizar(combinar_parciales(del_periodo), periodo, tipo)
+    return {COLECCION_PARCIALES: parciales, COLECCION_METRICAS: {**diarios, **rollups}}
+
+
+def _normalizar(valor: Any) -> Any:
+    """Forma comparable de un documento: sin campos de control y con floats redondeados."""
+    if isinstance(valor, dict):
+        return {k: _normalizar(v) for k, v in valor.items() if k not in CAMPOS_IGNORADOS}
+    if isinstance(valor, (list, tuple)):
+        return [_normalizar(v) for v in valor]
+    if isinstance(valor, bool) or valor is None or isinstance(valor, str):
+        return valor
+    if isinstance(valor, (int, float)):
+        return round(float(valor), DECIMALES_COMPARACION)
+    return valor
+
+
+def escribir_cambios(almacen, tenant_id: str, coleccion: str, docs: Dict[str, Dict[str, Any]], simular: bool = False) -> int:
+    """Escribe sólo los documentos cuyo valor difiere del guardado. Devuelve cuántos."""
+    ids = sorted(docs)
+    cambiados = {}
+    for i in range(0, len(ids), TAM_LECTURA):
+        lote = ids[i:i + TAM_LECTURA]
+        existentes = almacen.leer(tenant_id, coleccion, lote)
+        for doc_id in lote:
+            actual = existentes.get(doc_id)
+            if actual is None or _normalizar(actual) != _normalizar(docs[doc_id]):
+                cambiados[doc_id] = docs[doc_id]
+    if cambiados and not simular:
+        almacen.escribir(tenant_id, coleccion, cambiados)
+    return len(cambiados)
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Backfill paralelo de sla_metrics con sla_config versionado.")
+    parser.add_argument('--desde', required=True, help="Primer mes a recalcular (YYYY-MM)")
+    parser.add_argument('--hasta', required=True, help="Último mes a recalcular (YYYY-MM, incluido)")
+    parser.add_argument('--snapshot', type=Path, help="Leer de un snapshot (por defecto, en vivo por páginas)")
+    parser.add_argument('--salida', type=Path,
+                        help="Guardar parciales y métricas en este directorio en lugar de Firestore")
+    parser.add_argument('--tenant', action='append', dest='tenants', help="Tenant a procesar (repetible)")
+    parser.add_argument('--horario-servicio', action='store_true',
+                        help="Medir tiempos y disponibilidad en horario de servicio")
+    parser.add_argument('--procesos', type=int, default=os.cpu_count() or 1,
+                        help="Procesos del pool (por defecto, uno por CPU)")
+    parser.add_argument('--simular', action='store_true', help="Contar cambios sin escribir nada")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    db = None
+    if args.snapshot is None or args.salida is None:
+        db = conectar_firestore()
+    almacen = AlmacenLocal(args.salida) if args.salida else AlmacenFirestore(db)
+
+    tenants = args.tenants or listar_tenants(args.snapshot, db)
+    versiones = cargar_versiones(tenants, args.snapshot, db)
+    autobuses = cargar_autobuses(tenants, args.snapshot, db)
+    ahora = time.time()
+    tareas = [
+        {
+            'tenant': tenant_id,
+            'mes': mes.isoformat(),
+            'snapshot': str(args.snapshot) if args.snapshot is not None else None,
+            'versiones': versiones[tenant_id],
+            'autobuses': autobuses[tenant_id],
+            'horario_servicio': args.horario_servicio,
+            'ahora': ahora,
+        }
+        for tenant_id in tenants
+        for mes in meses(args.desde, args.hasta)
+    ]
+    print(f"🔄 {len(tareas)} particiones (tenant, mes) en {args.procesos} procesos", file=sys.stderr)
+    parciales = ejecutar_particiones(tareas, args.procesos)
+    calculo = time.perf_counter() - inicio
+
+    resumen = {}
+    for tenant_id in tenants:
+        docs = construir_documentos(almacen, tenant_id, parciales.get(tenant_id, {}))
+        resumen[tenant_id] = {
+            coleccion: {
+                'calculados': len(por_id),
+                'cambiados': escribir_cambios(almacen, tenant_id, coleccion, por_id, args.simular),
+            }
+            for coleccion, por_id in docs.items()
+        }
+
+    print(json.dumps(resumen, ensure_ascii=False, indent=2))
+    accion = "sin escribir (simulación)" if args.simular else "escritos"
+    print(
+        f"⏱  cálculo {calculo:.2f} s, total {time.perf_counter() - inicio:.2f} s, cambios {accion}",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
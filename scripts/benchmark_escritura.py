@@ -0,0 +1,141 @@
+"""
+=============================================================================
+BENCHMARK DE ESCRITURA MASIVA - ZaintzaBus
+=============================================================================
+Mide el ritmo sostenido de escritura de documentos tipo `equipos` con cada
+combinación de orden de escritura y esquema de ID (ver orden_escritura.py).
+
+Se generan N equipos sintéticos con la misma forma de IDs que
+importar_equipos (AMP-321-001...), se escriben en batches de 500 con varios
+hilos en paralelo (como una importación grande) sobre una colección de
+pruebas y se mide:
+
+  - documentos/s global y del último tercio (ritmo sostenido, cuando ya se
+    han abierto los rangos calientes)
+  - latencia p50/p95 de commit por batch
+  - concentración de claves (indicador de hotspot, sin red)
+
+La colección de pruebas se borra al terminar cada caso. Con --sin-red sólo
+se calcula la concentración (útil para comparar órdenes sin Firestore).
+
+USO:
+    python scripts/benchmark_escritura.py --sin-red --docs 50000
+    python scripts/benchmark_escritura.py --docs 20000 --hilos 8
+    python scripts/benchmark_escritura.py --ordenes secuencial,intercalado --esquemas codigo,hash
+=============================================================================
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from escritor import EscritorLotes, LIMITE_BATCH
+from importar_equipos import TIPOS_EQUIPO
+from orden_escritura import ESQUEMAS_ID, ORDENES, concentracion, id_documento, ordenar
+
+COLECCION_PRUEBAS = 'bench_equipos'
+
+# Tipo -> prefijo de codigoInterno, los mismos que genera importar_equipos, y equipos por bus
+PREFIJOS = {tipo: config['codigo'] for tipo, config in TIPOS_EQUIPO.items()}
+EQUIPOS_POR_TIPO = 3
+
+
+def generar_equipos(total: int) -> List[Tuple[str, Dict[str, Any]]]:
+    """(codigoInterno, datos) en el orden de importar_equipos: bus a bus."""
+    equipos = []
+    bus = 100
+    while len(equipos) < total:
+        for tipo, prefijo in PREFIJOS.items():
+            for indice in range(1, EQUIPOS_POR_TIPO + 1):
+                codigo = f"{prefijo}-{bus}-{indice:03d}"
+                equipos.append((codigo, {
+                    'codigoInterno': codigo,
+                    'tipoEquipoId': tipo,
+                    'ubicacionActual': {'tipo': 'autobus', 'id': f"BUS-{bus}", 'nombre': f"BUS-{bus}"},
+                    'estado': 'en_servicio',
+                    'searchTerms': [codigo.lower()],
+                }))
+        bus += 1
+    return equipos[:total]
+
+
+def _escribir_batch(db, coleccion: str, lote: List[Tuple[str, Dict[str, Any]]]) -> Tuple[float, float]:
+    inicio = time.perf_counter()
+    batch = db.batch()
+    for doc_id, data in lote:
+        batch.set(db.collection(coleccion).document(doc_id), data)
+    batch.commit()
+    return inicio, time.perf_counter()
+
+
+def medir(db, docs: List[Tuple[str, Dict[str, Any]]], coleccion: str, hilos: int) -> Dict[str, float]:
+    """Escribe los documentos en batches concurrentes y devuelve las métricas."""
+    lotes = [docs[i:i + LIMITE_BATCH] for i in range(0, len(docs), LIMITE_BATCH)]
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        tiempos = list(pool.map(lambda lote: _escribir_batch(db, coleccion, lote), lotes))
+    total = time.perf_counter() - inicio
+
+    latencias = sorted(fin - ini for ini, fin in tiempos)
+    # Ritmo sostenido: documentos confirmados en el último tercio del tiempo
+    corte = inicio + total * 2 / 3
+    ultimos = sum(len(lote) for lote, (_ini, fin) in zip(lotes, tiempos) if fin >= corte)
+    return {
+        'docs_s': len(docs) / total,
+        'docs_s_sostenido': ultimos / (total / 3),
+        'p50_ms': statistics.median(latencias) * 1000,
+        'p95_ms': latencias[int(len(latencias) * 0.95) - 1 if len(latencias) > 1 else 0] * 1000,
+        'segundos': total,
+    }
+
+
+def limpiar(db, coleccion: str) -> None:
+    with EscritorLotes(db) as escritor:
+        for ref in db.collection(coleccion).list_documents():
+            escritor.delete(ref)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Ritmo de escritura según orden y esquema de ID.")
+    parser.add_argument('--docs', type=int, default=20000, help="Equipos sintéticos por caso")
+    parser.add_argument('--ordenes', default=','.join(ORDENES), help="Órdenes a probar (separados por comas)")
+    parser.add_argument('--esquemas', default=','.join(ESQUEMAS_ID), help="Esquemas de ID a probar")
+    parser.add_argument('--hilos', type=int, default=8, help="Batches en paralelo")
+    parser.add_argument('--coleccion', default=COLECCION_PRUEBAS, help="Colección de pruebas (se vacía)")
+    parser.add_argument('--sin-red', action='store_true', help="Sólo calcular la concentración de claves")
+    args = parser.parse_args(argv)
+
+    equipos = generar_equipos(args.docs)
+    db = None
+    if not args.sin_red:
+        from cliente_firestore import conectar_firestore
+        db = conectar_firestore()
+
+    print(f"📊 {len(equipos)} equipos por caso, {args.hilos} hilos, colección '{args.coleccion}'")
+    cabecera = f"{'orden':<12} {'esquema':<8} {'concentr.':>9}"
+    if db is not None:
+        cabecera += f" {'docs/s':>8} {'sostenido':>9} {'p50 ms':>7} {'p95 ms':>7}"
+    print(cabecera)
+    print("-" * len(cabecera))
+
+    for esquema in args.esquemas.split(','):
+        con_id = [(id_documento(codigo, esquema), data) for codigo, data in equipos]
+        for modo in args.ordenes.split(','):
+            docs = ordenar(con_id, clave=lambda d: d[0], modo=modo)
+            linea = f"{modo:<12} {esquema:<8} {concentracion([d[0] for d in docs]):>9.3f}"
+            if db is not None:
+                limpiar(db, args.coleccion)
+                m = medir(db, docs, args.coleccion, args.hilos)
+                linea += f" {m['docs_s']:>8.0f} {m['docs_s_sostenido']:>9.0f} {m['p50_ms']:>7.0f} {m['p95_ms']:>7.0f}"
+            print(linea)
+
+    if db is not None:
+        limpiar(db, args.coleccion)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+=============================================================================
+CALENDARIO DE HORARIO DE SERVICIO - ZaintzaBus
+=============================================================================
+Aritmética de "minutos en horario de servicio" según sla_config.horarioServicio
+({inicio: "06:00", fin: "23:00", diasLaborables: [1..7]}).
+
+Para cada configuración se precalcula una tabla por día local (Europe/Madrid)
+con el inicio/fin de servicio en epoch y el acumulado de segundos de servicio
+hasta ese día. Con ella, los segundos de servicio hasta un instante t son:
+
+    S(t) = acumulado[d] + clip(t - inicio[d], 0, duracion[d])
+
+y el tiempo de servicio entre T0 y T1 es S(T1) - S(T0): dos consultas O(1)
+por incidencia, sin recorrer días. Como las ventanas se calculan con la zona
+horaria, los días de cambio de hora (23 h / 25 h) quedan bien medidos.
+
+Convenciones (las mismas que src/lib/logic/sla.ts):
+  - diasLaborables usa getDay() de JavaScript: 0 = domingo, 1 = lunes...
+    (se acepta también 7 como domingo, tal y como aparece en DATA_MODEL.md).
+  - Si fin <= inicio el servicio cruza la medianoche: el tramo de madrugada
+    pertenece al día laborable anterior.
+=============================================================================
+"""
+
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+ZONA_HORARIA = ZoneInfo('Europe/Madrid')
+
+# Igual que HORARIO_SERVICIO_DEFAULT en src/lib/logic/sla.ts
+HORARIO_SERVICIO_DEFAULT = {
+    'inicio': '08:00',
+    'fin': '20:00',
+    'diasLaborables': [1, 2, 3, 4, 5],
+}
+
+_SEGUNDOS_DIA = 86400
+# Desfase máximo de Madrid respecto a UTC (CEST); ver CalendarioServicio._dia_local
+_DESFASE_MAXIMO = 7200
+
+
+def hora_a_minutos(hora: str) -> int:
+    """Parsea "HH:MM" a minutos desde medianoche ("24:00" = 1440)."""
+    h, m = hora.split(':')
+    return int(h) * 60 + int(m)
+
+
+def _clave_horario(horario: Optional[Dict[str, Any]]) -> Tuple[int, int, Tuple[int, ...]]:
+    horario = horario or HORARIO_SERVICIO_DEFAULT
+    dias = tuple(sorted({d % 7 for d in horario.get('diasLaborables', HORARIO_SERVICIO_DEFAULT['diasLaborables'])}))
+    return (
+        hora_a_minutos(horario.get('inicio', HORARIO_SERVICIO_DEFAULT['inicio'])),
+        hora_a_minutos(horario.get('fin', HORARIO_SERVICIO_DEFAULT['fin'])),
+        dias,
+    )
+
+
+def _horario_desde_clave(clave: Tuple[int, int, Tuple[int, ...]]) -> Dict[str, Any]:
+    inicio, fin, dias = clave
+    return {
+        'inicio': f"{inicio // 60:02d}:{inicio % 60:02d}",
+        'fin': f"{fin // 60:02d}:{fin % 60:02d}",
+        'diasLaborables': list(dias),
+    }
+
+
+def _epoch_local(dia: date, minutos: int) -> float:
+    """Epoch del instante 'dia + minutos' en hora local (minutos puede ser 1440)."""
+    dia = dia + timedelta(days=minutos // 1440)
+    minutos %= 1440
+    return datetime(dia.year, dia.month, dia.day, minutos // 60, minutos % 60, tzinfo=ZONA_HORARIA).timestamp()
+
+
+class CalendarioServicio:
+    """
+    Tabla de servicio precalculada para un horario y un rango de días.
+
+    Cada día local tiene hasta dos tramos de servicio: el de madrugada
+    (continuación del día anterior cuando el horario cruza la medianoche) y
+    el propio del día. Los instantes fuera de [desde, hasta) lanzan ValueError.
+    """
+
+    def __init__(self, horario: Optional[Dict[str, Any]], desde: date, hasta: date):
+        inicio, fin, dias_laborables = _clave_horario(horario)
+        nocturno = fin <= inicio
+        n = (hasta - desde).days
+        if n <= 0:
+            raise ValueError("El rango del calendario debe contener al menos un día")
+
+        self.desde = desde
+        self.hasta = hasta
+        self.medianoche = np.empty(n + 1, dtype=np.float64)
+        tramos = np.zeros((n, 2, 2), dtype=np.float64)  # [día, tramo, (inicio, fin)]
+
+        for i in range(n + 1):
+            dia = desde + timedelta(days=i)
+            self.medianoche[i] = _epoch_local(dia, 0)
+            if i == n:
+                break
+            laborable = (dia.weekday() + 1) % 7 in dias_laborables
+            # getDay() del día anterior = weekday() del día actual
+            anterior_laborable = dia.weekday() in dias_laborables
+            if nocturno:
+                if anterior_laborable and fin > 0:
+                    tramos[i, 0] = (self.medianoche[i], _epoch_local(dia, fin))
+                if laborable:
+                    tramos[i, 1] = (_epoch_local(dia, inicio), _epoch_local(dia, 1440))
+            elif laborable:
+                tramos[i, 1] = (_epoch_local(dia, inicio), _epoch_local(dia, fin))
+
+        self._inicio = tramos[:, :, 0]
+        self._duracion = tramos[:, :, 1] - tramos[:, :, 0]
+        self.acumulado = np.concatenate(([0.0], np.cumsum(self._duracion.sum(axis=1))))
+        self._base = int(np.floor((self.medianoche[0] + _DESFASE_MAXIMO) / _SEGUNDOS_DIA))
+
+    def _dia_local(self, t: np.ndarray) -> np.ndarray:
+        """
+        Índice del día local que contiene cada instante, en O(1).
+
+        Sumando el desfase máximo, la división entera da el día correcto o el
+        siguiente; una comparación con la medianoche corrige el segundo caso.
+        """
+        d = np.floor((t + _DESFASE_MAXIMO) / _SEGUNDOS_DIA).astype(np.int64) - self._base
+        d = np.clip(d, 0, len(self.medianoche) - 1)
+        return np.clip(d - (t < self.medianoche[d]), 0, len(self._duracion) - 1)
+
+    def segundos_hasta(self, t) -> np.ndarray:
+        """Segundos de servicio desde el inicio del calendario hasta cada t (NaN se conserva)."""
+        t = np.asarray(t, dtype=np.float64)
+        nulos = np.isnan(t)
+        valores = np.where(nulos, self.medianoche[0], t)
+        if np.any(valores < self.medianoche[0]) or np.any(valores >= self.medianoche[-1]):
+            raise ValueError(f"Instantes fuera del calendario [{self.desde}, {self.hasta})")
+        d = self._dia_local(valores)
+        dentro = np.clip(valores[..., None] - self._inicio[d], 0.0, self._duracion[d]).sum(axis=-1)
+        return np.where(nulos, np.nan, self.acumulado[d] + dentro)
+
+    def minutos_entre(self, inicios, fines) -> np.ndarray:
+        """Minutos de servicio entre pares (inicio, fin) en epoch. NaN si falta alguno."""
+        return (self.segundos_hasta(fines) - self.segundos_hasta(inicios)) / 60.0
+
+    def en_servicio(self, t) -> np.ndarray:
+        """True para los instantes que caen dentro del horario de servicio."""
+        t = np.asarray(t, dtype=np.float64)
+        d = self._dia_local(t)
+        desplazamiento = t[..., None] - self._inicio[d]
+        return ((desplazamiento >= 0) & (desplazamiento < self._duracion[d])).any(axis=-1)
+
+
+@lru_cache(maxsize=64)
+def _calendario_cacheado(clave: Tuple[int, int, Tuple[int, ...]], anio_desde: int, anio_hasta: int) -> CalendarioServicio:
+    return CalendarioServicio(_horario_desde_clave(clave), date(anio_desde, 1, 1), date(anio_hasta + 1, 1, 1))
+
+
+def obtener_calendario(horario: Optional[Dict[str, Any]], t_min: float, t_max: float) -> CalendarioServicio:
+    """
+    Calendario (cacheado por configuración) que cubre los años de [t_min, t_max].
+
+    Se construye por años naturales completos para que consultas sucesivas
+    sobre periodos distintos reutilicen la misma tabla.
+    """
+    anio_desde = datetime.fromtimestamp(t_min, ZONA_HORARIA).year
+    anio_hasta = datetime.fromtimestamp(t_max, ZONA_HORARIA).year
+    return _calendario_cacheado(_clave_horario(horario), anio_desde, anio_hasta)
+
+
+def minutos_servicio(inicios, fines, horario: Optional[Dict[str, Any]] = None) -> np.ndarray:
+    """API por lotes: minutos de servicio entre arrays de inicios y fines (epoch)."""
+    inicios = np.asarray(inicios, dtype=np.float64)
+    fines = np.asarray(fines, dtype=np.float64)
+    validos = np.concatenate([inicios[~np.isnan(inicios)], fines[~np.isnan(fines)]])
+    if len(validos) == 0:
+        return np.full(np.broadcast(inicios, fines).shape, np.nan)
+    calendario = obtener_calendario(horario, float(validos.min()), float(validos.max()))
+    return calendario.minutos_entre(inicios, fines)
+
+
+def minutos_servicio_por_tenant(
+    tenants: np.ndarray,
+    inicios: np.ndarray,
+    fines: np.ndarray,
+    configs: Dict[str, Dict[str, Any]],
+) -> np.ndarray:
+    """
+    Minutos de servicio fila a fila usando el horarioServicio de cada tenant.
+
+    Las filas se agrupan por configuración (no por tenant), así que tenants
+    con el mismo horario comparten calendario y una sola llamada por lotes.
+    """
+    resultado = np.full(len(tenants), np.nan)
+    tenants_str = tenants.astype(str)
+    por_clave: Dict[Tuple[int, int, Tuple[int, ...]], list] = {}
+    for tenant_id in np.unique(tenants_str):
+        horario = configs.get(tenant_id, {}).get('horarioServicio')
+        por_clave.setdefault(_clave_horario(horario), []).append(tenant_id)
+
+    for clave, grupo in por_clave.items():
+        filas = np.isin(tenants_str, grupo)
+        resultado[filas] = minutos_servicio(inicios[filas], fines[filas], _horario_desde_clave(clave))
+    return resultado
+
+
+def duraciones_en_horario(tabla, configs: Dict[str, Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Duraciones de atención y resolución en minutos de servicio para una
+    TablaIncidencias de sla_motor (para pasarlas a calcular_sla).
+    """
+    atencion = minutos_servicio_por_tenant(tabla.tenant, tabla.recepcion, tabla.inicio_analisis, configs)
+    resolucion = minutos_servicio_por_tenant(tabla.tenant, tabla.recepcion, tabla.fin_reparacion, configs)
+    return atencion, resolucion
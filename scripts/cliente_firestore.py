@@ -0,0 +1,185 @@
+"""
+=============================================================================
+CLIENTE DE FIRESTORE COMPARTIDO - ZaintzaBus
+=============================================================================
+Punto único de conexión para todos los scripts:
+
+  - un solo cliente por proceso: la primera llamada a conectar_firestore()
+    inicializa Firebase Admin y las siguientes (desde cualquier hilo)
+    devuelven el mismo cliente, que comparte su canal gRPC
+  - un proceso hijo creado con fork no hereda el cliente del padre (el
+    canal gRPC no sobrevive al fork): se crea otro, una vez, en el hijo
+  - la clave de servicio se busca junto a este archivo, no en el
+    directorio de trabajo (ZAINTZABUS_CREDENCIALES la sustituye)
+  - conectar_firestore_async() da el cliente asíncrono (AsyncClient) con
+    la misma app y credenciales, uno por event loop (el canal gRPC asyncio
+    está ligado al loop en el que se crea); ver pipeline_async.py
+  - con FIRESTORE_EMULATOR_HOST definido (firebase emulators:start) se
+    conecta al emulador: sin clave de servicio y con el proyecto de
+    GCLOUD_PROJECT (por defecto demo-zaintzabus)
+  - firebase_admin, google.cloud y pandas se importan en el primer uso
+    (ModuloDiferido), así que --help, los errores de argumentos y los
+    comandos que sólo leen snapshots no pagan su importación
+
+USO:
+    from cliente_firestore import conectar_firestore, firestore
+    db = conectar_firestore()
+    escritor.set(ruta, {'actualizadoEn': firestore.SERVER_TIMESTAMP}, merge=True)
+
+    python scripts/cliente_firestore.py                 # comprobar credenciales y conexión
+    python scripts/cliente_firestore.py tenants/dbus    # además, leer un documento
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python scripts/cliente_firestore.py
+=============================================================================
+"""
+
+import asyncio
+import importlib
+import os
+import sys
+import threading
+import time
+import weakref
+from pathlib import Path
+from typing import Any, List, Optional
+
+SCRIPT_DIR = Path(__file__).parent
+SERVICE_ACCOUNT_PATH = Path(os.environ.get('ZAINTZABUS_CREDENCIALES') or SCRIPT_DIR / 'serviceAccountKey.json')
+PROYECTO_EMULADOR = 'demo-zaintzabus'
+
+
+# =============================================================================
+# IMPORTACIÓN DIFERIDA
+# =============================================================================
+
+class ModuloDiferido:
+    """
+    Módulo que se importa al acceder al primer atributo.
+
+        pd = ModuloDiferido('pandas')
+        pd.isna(valor)      # aquí se importa pandas
+    """
+
+    def __init__(self, nombre: str):
+        self._nombre = nombre
+        self._modulo = None
+
+    def _cargar(self):
+        if self._modulo is None:
+            self._modulo = importlib.import_module(self._nombre)
+        return self._modulo
+
+    def __getattr__(self, atributo: str) -> Any:
+        return getattr(self._cargar(), atributo)
+
+    def __repr__(self) -> str:
+        estado = 'cargado' if self._modulo is not None else 'sin cargar'
+        return f"<ModuloDiferido {self._nombre} ({estado})>"
+
+
+firestore = ModuloDiferido('firebase_admin.firestore')
+
+
+# =============================================================================
+# CONEXIÓN
+# =============================================================================
+
+_cerrojo = threading.Lock()
+_app = None
+_cliente = None
+_pid: Optional[int] = None
+_clientes_async: 'weakref.WeakKeyDictionary' = weakref.WeakKeyDictionary()
+
+
+def emulador() -> Optional[str]:
+    """host:puerto del emulador de Firestore, si se usa."""
+    return os.environ.get('FIRESTORE_EMULATOR_HOST') or None
+
+
+def _credencial():
+    """Clave de servicio o, contra el emulador sin clave, credenciales anónimas."""
+    from firebase_admin import credentials
+
+    if SERVICE_ACCOUNT_PATH.exists() or not emulador():
+        return credentials.Certificate(str(SERVICE_ACCOUNT_PATH)), None
+
+    class CredencialEmulador(credentials.Base):
+        def get_credential(self):
+            from google.auth.credentials import AnonymousCredentials
+            return AnonymousCredentials()
+
+    return CredencialEmulador(), {'projectId': os.environ.get('GCLOUD_PROJECT') or PROYECTO_EMULADOR}
+
+
+def conectar_firestore():
+    """
+    Cliente de Firestore del proceso (se crea en la primera llamada).
+
+    Raises:
+        FileNotFoundError: si no existe la clave de servicio (y no se usa el emulador).
+    """
+    global _app, _cliente, _pid
+    if _cliente is not None and _pid == os.getpid():
+        return _cliente
+    with _cerrojo:
+        if _cliente is not None and _pid == os.getpid():
+            return _cliente
+        if not SERVICE_ACCOUNT_PATH.exists() and not emulador():
+            raise FileNotFoundError(
+                f"❌ No se encontró el archivo de credenciales: {SERVICE_ACCOUNT_PATH}\n"
+                "   Copia serviceAccountKey.json en scripts/ o indica su ruta en ZAINTZABUS_CREDENCIALES"
+            )
+        import firebase_admin
+
+        # Tras un fork, la app por defecto (copiada del padre) guarda un
+        # cliente con el canal del padre: el hijo usa una app propia
+        nombre = firebase_admin._DEFAULT_APP_NAME if _pid is None else f"zaintzabus-{os.getpid()}"
+        try:
+            app = firebase_admin.get_app(nombre)
+        except ValueError:
+            credencial, opciones = _credencial()
+            app = firebase_admin.initialize_app(credencial, opciones, name=nombre)
+        _app, _cliente = app, firestore.client(app)
+        _pid = os.getpid()
+        return _cliente
+
+
+def conectar_firestore_async():
+    """
+    AsyncClient de Firestore para el event loop en curso (se crea la primera
+    vez en cada loop). Hay que llamarlo desde una corrutina.
+    """
+    loop = asyncio.get_running_loop()
+    cliente = _clientes_async.get(loop)
+    if cliente is None:
+        from google.cloud.firestore import AsyncClient
+
+        conectar_firestore()
+        cliente = AsyncClient(project=_app.project_id, credentials=_app.credential.get_credential())
+        _clientes_async[loop] = cliente
+    return cliente
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    print(f"🔑 Credenciales: {SERVICE_ACCOUNT_PATH}" + (f" (emulador en {emulador()})" if emulador() else ""))
+    inicio = time.perf_counter()
+    try:
+        db = conectar_firestore()
+    except FileNotFoundError as e:
+        print(e)
+        return 1
+    print(f"✅ Cliente de Firestore para '{db.project}' ({time.perf_counter() - inicio:.2f} s)")
+    for ruta in argv:
+        inicio = time.perf_counter()
+        snap = db.document(ruta).get()
+        estado = f"{len(snap.to_dict())} campos" if snap.exists else "no existe"
+        print(f"   {ruta}: {estado} ({(time.perf_counter() - inicio) * 1000:.0f} ms)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+=============================================================================
+CODIFICACIÓN COMPACTA DE EQUIPOS - ZaintzaBus
+=============================================================================
+Cada documento de `equipos` repite la misma plantilla: propietario "DFG",
+estadísticas iniciales, cuatro fechas de auditoría iguales, el nombre del tipo
+copiado del catálogo y unos searchTerms que sólo repiten otros campos.
+
+La forma compacta omite todo lo que es valor por defecto o se puede derivar:
+
+    propiedad.propietario       "DFG"
+    estadisticas                {totalAverias: 0, totalMovimientos: 1, diasEnServicio: 0}
+    fechas.instalacionActual    = fechas.alta
+    auditoria.creadoPor         "importacion_excel"
+    auditoria.creadoEn          = fechas.alta
+    auditoria.modificadoPor     = auditoria.creadoPor
+    auditoria.modificadoEn      = auditoria.creadoEn
+    tipoEquipoNombre            nombre del tipo en `tipos_equipo`
+    searchTerms                 los que genera agregar_datos_especificos
+
+Los documentos compactados llevan la marca `_c: 1`; si un documento no se
+recupera exactamente al expandirlo se guarda completo, sin marca, así que
+`expandir_equipo(compactar_equipo(doc)) == doc` para cualquier documento.
+
+Se usa en los snapshots (`snapshot.py exportar --compacto`): el snapshot
+guarda `codificacion.json` con las colecciones compactadas y el catálogo, y
+cargar_coleccion las expande al leer, así que los motores no notan nada.
+Los documentos en vivo mantienen la forma completa porque la aplicación
+web lee tipoEquipoNombre y consulta searchTerms directamente.
+
+El informe mide bytes por documento y por colección con la fórmula de
+tamaño de almacenamiento de Firestore y como JSON (lo que viaja por la red
+o se guarda en el snapshot).
+
+USO:
+    python scripts/codificacion_compacta.py medir
+    python scripts/codificacion_compacta.py medir --snapshot snapshot/
+=============================================================================
+"""
+
+import argparse
+import copy
+import json
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+ARCHIVO_CODIFICACION = 'codificacion.json'
+MARCA = '_c'
+
+PROPIETARIO = 'DFG'
+CREADOR = 'importacion_excel'
+ESTADISTICAS_INICIALES = {'totalAverias': 0, 'totalMovimientos': 1, 'diasEnServicio': 0}
+
+# Catálogo mínimo para derivar campos: {tipoEquipoId: nombre}
+Catalogo = Dict[str, str]
+
+_AUSENTE = object()
+
+
+# =============================================================================
+# DERIVADOS
+# =============================================================================
+
+def terminos_busqueda(doc: Dict[str, Any]) -> List[str]:
+    """searchTerms tal como los genera agregar_datos_especificos (importar_equipos)."""
+    terminos = [doc['codigoInterno'].lower(), (doc.get('tipoEquipoNombre') or '').lower()]
+    red = doc.get('red') or {}
+    if doc.get('numeroSerieFabricante'):
+        terminos.append(doc['numeroSerieFabricante'].lower())
+    if red.get('ip'):
+        terminos.append(red['ip'])
+    if red.get('mac'):
+        terminos.append(red['mac'].lower())
+    if (doc.get('sim') or {}).get('msisdn'):
+        terminos.append(doc['sim']['msisdn'])
+    return terminos
+
+
+def _omitir(mapa: Dict[str, Any], campo: str, defecto: Any) -> None:
+    if campo in mapa and mapa[campo] == defecto:
+        del mapa[campo]
+
+
+def _rellenar(mapa: Dict[str, Any], campo: str, defecto: Any) -> None:
+    if campo not in mapa and defecto is not _AUSENTE:
+        mapa[campo] = copy.deepcopy(defecto)
+
+
+def _sin_vacio(doc: Dict[str, Any], campo: str) -> None:
+    if doc.get(campo) == {}:
+        del doc[campo]
+
+
+# =============================================================================
+# COMPACTAR / EXPANDIR
+# =============================================================================
+
+def compactar_equipo(data: Dict[str, Any], catalogo: Catalogo) -> Dict[str, Any]:
+    """Forma compacta de un documento de `equipos` (no modifica el original)."""
+    doc = copy.deepcopy(data)
+    alta = (doc.get('fechas') or {}).get('alta', _AUSENTE)
+
+    if isinstance(doc.get('propiedad'), dict):
+        _omitir(doc['propiedad'], 'propietario', PROPIETARIO)
+        _sin_vacio(doc, 'propiedad')
+    _omitir(doc, 'estadisticas', ESTADISTICAS_INICIALES)
+    if isinstance(doc.get('fechas'), dict):
+        _omitir(doc['fechas'], 'instalacionActual', alta)
+
+    auditoria = doc.get('auditoria')
+    if isinstance(auditoria, dict):
+        # Los defectos de modificado* dependen de creado*: se calculan antes de omitir
+        creado_por = auditoria.get('creadoPor', _AUSENTE)
+        creado_en = auditoria.get('creadoEn', _AUSENTE)
+        _omitir(auditoria, 'modificadoPor', creado_por)
+        _omitir(auditoria, 'modificadoEn', creado_en)
+        _omitir(auditoria, 'creadoPor', CREADOR)
+        _omitir(auditoria, 'creadoEn', alta)
+        _sin_vacio(doc, 'auditoria')
+
+    if 'searchTerms' in doc and 'codigoInterno' in doc and doc['searchTerms'] == terminos_busqueda(data):
+        del doc['searchTerms']
+    tipo = doc.get('tipoEquipoId')
+    if tipo in catalogo:
+        _omitir(doc, 'tipoEquipoNombre', catalogo[tipo])
+
+    doc[MARCA] = 1
+    if expandir_equipo(doc, catalogo) != data:
+        return copy.deepcopy(data)
+    return doc
+
+
+def expandir_equipo(data: Dict[str, Any], catalogo: Catalogo) -> Dict[str, Any]:
+    """Inversa de compactar_equipo (los documentos sin marca se devuelven tal cual)."""
+    if not data.get(MARCA):
+        return data
+    doc = copy.deepcopy(data)
+    del doc[MARCA]
+    alta = (doc.get('fechas') or {}).get('alta', _AUSENTE)
+
+    if doc.get('tipoEquipoId') in catalogo:
+        _rellenar(doc, 'tipoEquipoNombre', catalogo[doc['tipoEquipoId']])
+    if 'codigoInterno' in doc:
+        _rellenar(doc, 'searchTerms', terminos_busqueda(doc))
+
+    auditoria = doc.setdefault('auditoria', {})
+    _rellenar(auditoria, 'creadoEn', alta)
+    _rellenar(auditoria, 'creadoPor', CREADOR)
+    _rellenar(auditoria, 'modificadoEn', auditoria.get('creadoEn', _AUSENTE))
+    _rellenar(auditoria, 'modificadoPor', auditoria['creadoPor'])
+
+    if 'fechas' in doc:
+        _rellenar(doc['fechas'], 'instalacionActual', alta)
+    _rellenar(doc, 'estadisticas', ESTADISTICAS_INICIALES)
+    _rellenar(doc.setdefault('propiedad', {}), 'propietario', PROPIETARIO)
+    return doc
+
+
+# Colecciones con codificación compacta: ruta -> (compactar, expandir)
+COMPACTABLES: Dict[str, Tuple[Callable, Callable]] = {
+    'equipos': (compactar_equipo, expandir_equipo),
+}
+
+
+def catalogo_de(tipos: Iterable[Tuple[str, Dict[str, Any]]]) -> Catalogo:
+    """{tipoEquipoId: nombre} a partir de los documentos de `tipos_equipo`."""
+    return {tipo_id: data['nombre'] for tipo_id, data in tipos if data.get('nombre')}
+
+
+def leer_codificacion(raiz: Path) -> Optional[Dict[str, Any]]:
+    """Contenido de codificacion.json de un snapshot, o None si no es compacto."""
+    archivo = Path(raiz) / ARCHIVO_CODIFICACION
+    if not archivo.exists():
+        return None
+    return json.loads(archivo.read_text(encoding='utf-8'))
+
+
+# =============================================================================
+# MEDIDA
+# =============================================================================
+
+def bytes_valor(valor: Any) -> int:
+    """Tamaño de un valor según la fórmula de almacenamiento de Firestore."""
+    if valor is None or isinstance(valor, bool):
+        return 1
+    if isinstance(valor, (int, float)):
+        return 8
+    if isinstance(valor, str):
+        return len(valor.encode('utf-8')) + 1
+    if isinstance(valor, dict):
+        return sum(len(str(k).encode('utf-8')) + 1 + bytes_valor(v) for k, v in valor.items())
+    if isinstance(valor, (list, tuple)):
+        return sum(bytes_valor(v) for v in valor)
+    # datetime / Timestamp / GeoPoint / referencias: 8-16 bytes; se cuentan como 8
+    return 8
+
+
+def bytes_documento(ruta: str, doc_id: str, data: Dict[str, Any]) -> int:
+    """Tamaño de almacenamiento de un documento (nombre + campos + 32)."""
+    nombre = sum(len(parte.encode('utf-8')) + 1 for parte in f"{ruta}/{doc_id}".split('/')) + 16
+    return nombre + bytes_valor(data) + 32
+
+
+def bytes_json(data: Dict[str, Any]) -> int:
+    """Bytes del documento serializado (red / snapshot)."""
+    from snapshot import serializar_valor
+    return len(json.dumps(serializar_valor(data), ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def medir(ruta: str, docs: Iterable[Tuple[str, Dict[str, Any]]], catalogo: Catalogo) -> Dict[str, float]:
+    """Bytes completos y compactos (almacenamiento y JSON) de una colección."""
+    compactar = COMPACTABLES[ruta][0]
+    m = {'documentos': 0, 'almacen': 0, 'almacen_compacto': 0, 'json': 0, 'json_compacto': 0}
+    for doc_id, data in docs:
+        compacto = compactar(data, catalogo)
+        m['documentos'] += 1
+        m['almacen'] += bytes_documento(ruta, doc_id, data)
+        m['almacen_compacto'] += bytes_documento(ruta, doc_id, compacto)
+        m['json'] += bytes_json(data)
+        m['json_compacto'] += bytes_json(compacto)
+    return m
+
+
+def _informe(ruta: str, m: Dict[str, float]) -> None:
+    n = max(m['documentos'], 1)
+    print(f"\n📏 {ruta}: {m['documentos']} documentos")
+    for etiqueta, clave in (('Almacenamiento', 'almacen'), ('JSON (red)', 'json')):
+        completo, compacto = m[clave], m[f"{clave}_compacto"]
+        ahorro = 100 * (1 - compacto / completo) if completo else 0
+        print(f"   {etiqueta:<15} {completo / n:>7.0f} → {compacto / n:>6.0f} B/doc   "
+              f"{completo / 1e6:>8.2f} → {compacto / 1e6:>7.2f} MB   (-{ahorro:.1f} %)")
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Codificación compacta de documentos de equipos.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_med = sub.add_parser('medir', help="Medir bytes por documento y colección, y el ahorro")
+    p_med.add_argument('--snapshot', type=Path, help="Leer de un snapshot (por defecto, en vivo)")
+    p_med.add_argument('--verificar', action='store_true', help="Comprobar además que expandir(compactar(d)) == d")
+    args = parser.parse_args(argv)
+
+    from snapshot import documentos
+    db = None
+    if args.snapshot is None:
+        from cliente_firestore import conectar_firestore
+        db = conectar_firestore()
+
+    catalogo = catalogo_de(documentos('tipos_equipo', args.snapshot, db))
+    print(f"📚 Catálogo: {len(catalogo)} tipos de equipo")
+    for ruta, (compactar, expandir) in COMPACTABLES.items():
+        docs = list(documentos(ruta, args.snapshot, db))
+        _informe(ruta, medir(ruta, docs, catalogo))
+        if args.verificar:
+            distintos = [d for d, data in docs if expandir(compactar(data, catalogo), catalogo) != data]
+            if distintos:
+                print(f"   ❌ {len(distintos)} documentos no se recuperan igual (p. ej. {distintos[0]})")
+                return 1
+            print("   ✅ expandir(compactar(d)) == d para todos los documentos")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
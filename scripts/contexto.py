@@ -0,0 +1,153 @@
+"""
+=============================================================================
+CONTEXTO DE EJECUCIÓN - ZaintzaBus
+=============================================================================
+Estado que comparten las etapas de una ejecución de zaintzabus.py, para que
+una cadena (import-flota + migrate + verify) corra en un solo proceso:
+
+  - db: el cliente de Firestore del proceso (cliente_firestore.py)
+  - escritor: un único EscritorLotes, con el ritmo máximo común a todas las
+    etapas; cada etapa hace commit al terminar con código 0 y descarta lo
+    pendiente si falla, así que nunca queda nada entre una y otra
+  - cache: datos ya leídos o parseados (libros Excel abiertos, hojas
+    leídas...) que la etapa siguiente no vuelve a leer
+  - instrumentación: duración, escrituras, commits y escrituras fusionadas
+    (ahorradas por el buffer del escritor) de cada etapa
+
+Los scripts reciben el contexto como segundo argumento de main(); llamados
+sueltos crean uno propio, así que funcionan igual que antes.
+
+USO:
+    contexto = Contexto(ritmo=500)
+    with contexto.etapa('import-flota') as registro:
+        registro['codigo'] = importador_zaintzabus.main(['--excel', 'Flota Ekialdebus.xlsx'], contexto)
+    contexto.imprimir_informe()
+=============================================================================
+"""
+
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from cliente_firestore import ModuloDiferido, conectar_firestore
+from escritor import EscritorLotes, LimitadorRitmo
+
+pd = ModuloDiferido('pandas')
+
+
+class Contexto:
+    """Cliente, escritor, cache e instrumentación compartidos entre etapas."""
+
+    def __init__(self, ritmo: Optional[float] = None, verbose: bool = False):
+        self.limitador = LimitadorRitmo(ritmo) if ritmo else None
+        self.verbose = verbose
+        self.cache: Dict[Any, Any] = {}
+        self.etapas: List[Dict[str, Any]] = []
+        self._escritor: Optional[EscritorLotes] = None
+        self._adjuntos: List[Any] = []
+        self._aciertos = 0
+
+    # -------------------------------------------------------------------------
+    # Recursos compartidos
+    # -------------------------------------------------------------------------
+
+    @property
+    def db(self):
+        return conectar_firestore()
+
+    @property
+    def escritor(self) -> EscritorLotes:
+        if self._escritor is None:
+            self._escritor = EscritorLotes(self.db, verbose=self.verbose, limitador=self.limitador)
+        return self._escritor
+
+    def adjuntar(self, escritor) -> None:
+        """Suma a la instrumentación las escrituras de otro escritor (EscritorAsync en modo --async)."""
+        self._adjuntos.append(escritor)
+
+    def memo(self, clave: Any, calcular: Callable[[], Any]) -> Any:
+        """Valor cacheado para `clave`; se calcula la primera vez."""
+        if clave in self.cache:
+            self._aciertos += 1
+            return self.cache[clave]
+        valor = self.cache[clave] = calcular()
+        return valor
+
+    def libro(self, archivo):
+        """pd.ExcelFile abierto una sola vez por (archivo, fecha de modificación)."""
+        ruta = Path(archivo).resolve()
+        return self.memo(('libro', str(ruta), ruta.stat().st_mtime), lambda: pd.ExcelFile(ruta))
+
+    def leer_excel(self, archivo, hoja: Any = 0, cabecera: Optional[int] = 0, **opciones: Any):
+        """
+        Hoja de un libro (pd.read_excel) cacheada por libro, hoja, cabecera y
+        opciones; la hoja por posición y por nombre comparten entrada.
+        Devuelve una copia superficial (un dict de copias con hoja=None):
+        renombrar columnas en una etapa no afecta a la siguiente.
+        """
+        libro = self.libro(archivo)
+        if isinstance(hoja, int):
+            hoja = libro.sheet_names[hoja]
+        clave = ('hoja', id(libro), hoja, cabecera, tuple(sorted(opciones.items())))
+        leido = self.memo(clave, lambda: libro.parse(sheet_name=hoja, header=cabecera, **opciones))
+        if isinstance(leido, dict):
+            return {nombre: df.copy(deep=False) for nombre, df in leido.items()}
+        return leido.copy(deep=False)
+
+    # -------------------------------------------------------------------------
+    # Instrumentación
+    # -------------------------------------------------------------------------
+
+    def _contadores(self) -> Tuple[int, int, int]:
+        escritores = ([self._escritor] if self._escritor else []) + self._adjuntos
+        return (sum(e.operaciones for e in escritores), sum(e.commits for e in escritores),
+                sum(getattr(e, 'ahorradas', 0) for e in escritores))
+
+    @contextmanager
+    def etapa(self, nombre: str) -> Iterator[Dict[str, Any]]:
+        """
+        Mide una etapa; las escrituras se cuentan en el escritor compartido (y los adjuntos).
+
+        La etapa deja su código de salida en registro['codigo']: con 0 (o sin
+        código) se confirma lo pendiente del escritor compartido; con otro
+        código (también el de SystemExit), o si la etapa lanza otra
+        excepción, se descarta.
+        """
+        operaciones, commits, ahorradas = self._contadores()
+        aciertos = self._aciertos
+        registro: Dict[str, Any] = {'etapa': nombre, 'ok': False, 'codigo': None}
+        self.etapas.append(registro)
+        inicio = time.perf_counter()
+        try:
+            yield registro
+            registro['ok'] = not registro['codigo']
+        except SystemExit as e:
+            registro['codigo'] = e.code if isinstance(e.code, int) else 1
+            registro['ok'] = not registro['codigo']
+            raise
+        finally:
+            # Nada pendiente para la etapa siguiente: se confirma sólo si acabó bien
+            if self._escritor is not None:
+                if registro['ok']:
+                    self._escritor.commit()
+                else:
+                    registro['descartadas'] = self._escritor.descartar()
+            operaciones_fin, commits_fin, ahorradas_fin = self._contadores()
+            registro.update({
+                'segundos': round(time.perf_counter() - inicio, 3),
+                'escrituras': operaciones_fin - operaciones,
+                'commits': commits_fin - commits,
+                'ahorradas': ahorradas_fin - ahorradas,
+                'aciertosCache': self._aciertos - aciertos,
+            })
+
+    def imprimir_informe(self, salida=sys.stderr) -> None:
+        print("\n⏱  Etapas:", file=salida)
+        for r in self.etapas:
+            estado = '✅' if r['ok'] else '❌'
+            print(f"   {estado} {r['etapa']:16} {r['segundos']:8.2f} s  {r['escrituras']:6} escrituras "
+                  f"en {r['commits']} commits ({r['ahorradas']} fusionadas), {r['aciertosCache']} aciertos de cache", file=salida)
+            if not r['ok']:
+                print(f"      código {r['codigo']}, {r.get('descartadas', 0)} escrituras pendientes descartadas", file=salida)
@@ -0,0 +1,314 @@
+"""
+=============================================================================
+CACHE DE DATOS DE REFERENCIA - ZaintzaBus
+=============================================================================
+Colecciones pequeñas que casi nunca cambian (tipos_equipo, tenants,
+sla_config) se leen de una cache en memoria y en disco en lugar de
+Firestore en cada ejecución:
+
+  - TTL: dentro de él la copia se usa sin ninguna lectura
+  - sello de versión: pasado el TTL se lee un solo documento
+    (referencia/versiones); si el sello de la colección no ha cambiado, la
+    copia se renueva sin releerla
+  - vida máxima: pasada, la colección se relee entera aunque el sello no
+    haya cambiado (la app web no actualiza los sellos al editar)
+  - escritura: escribir() sólo guarda los documentos cuya definición
+    difiere de la copia (la auditoría no cuenta) y entonces cambia el sello,
+    así que las demás máquinas releen en su siguiente validación
+
+snapshot.documentos() y listar_tenants() en vivo pasan por aquí para estas
+colecciones. Los valores se guardan ya serializados (fechas como texto
+ISO, igual que en un snapshot). Para forzar la lectura:
+ZAINTZABUS_SIN_CACHE=1 o `python scripts/datos_referencia.py limpiar`.
+
+USO:
+    from datos_referencia import referencia
+    tipos = referencia().documentos('tipos_equipo')     # {id: datos}
+    escritos = referencia().escribir('tipos_equipo', nuevos, escritor, usuario='importacion_excel')
+
+    python scripts/datos_referencia.py estado
+    python scripts/datos_referencia.py refrescar [tipos_equipo ...]
+    python scripts/datos_referencia.py limpiar
+=============================================================================
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from cliente_firestore import SCRIPT_DIR, conectar_firestore
+from snapshot import leer_coleccion, serializar_valor
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+DIRECTORIO_CACHE = Path(os.environ.get('ZAINTZABUS_CACHE') or SCRIPT_DIR / '.cache' / 'referencia')
+SIN_CACHE = os.environ.get('ZAINTZABUS_SIN_CACHE') == '1'
+
+RUTA_VERSIONES = 'referencia/versiones'
+
+# Segundos: uso sin lecturas / relectura completa
+TTL = 10 * 60
+VIDA_MAXIMA = 60 * 60
+
+# Colección -> (TTL, vida máxima)
+COLECCIONES = {
+    'tipos_equipo': (TTL, VIDA_MAXIMA),
+    'tenants': (TTL, VIDA_MAXIMA),
+    'sla_config': (TTL, VIDA_MAXIMA),
+}
+
+# Campos que no forman parte de la definición de un documento
+CAMPOS_AUDITORIA = frozenset({'auditoria', 'actualizadoEn'})
+
+# Estados de incidencia que cuentan como abiertas (ni resueltas ni cerradas)
+ESTADOS_ABIERTOS = ['nueva', 'en_analisis', 'en_intervencion', 'reabierta']
+
+
+def huella(docs: Dict[str, Dict[str, Any]]) -> str:
+    """Sello de versión de un conjunto de documentos (estable entre máquinas)."""
+    texto = json.dumps(serializar_valor(docs), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(texto.encode('utf-8')).hexdigest()[:16]
+
+
+def difiere(nuevo: Dict[str, Any], actual: Optional[Dict[str, Any]], ignorar: Iterable[str] = CAMPOS_AUDITORIA) -> bool:
+    """True si algún campo de `nuevo` (salvo los ignorados) no coincide con `actual`."""
+    if actual is None:
+        return True
+    ignorar = frozenset(ignorar)
+    return any(
+        serializar_valor(v) != serializar_valor(actual.get(k))
+        for k, v in nuevo.items() if k not in ignorar
+    )
+
+
+def _fusionar(destino: Dict[str, Any], origen: Dict[str, Any]) -> None:
+    """set(merge=True) sobre la copia local."""
+    for clave, valor in origen.items():
+        if isinstance(valor, dict) and isinstance(destino.get(clave), dict):
+            _fusionar(destino[clave], valor)
+        else:
+            destino[clave] = valor
+
+
+# =============================================================================
+# CACHE
+# =============================================================================
+
+class CacheReferencia:
+    """Copias de las colecciones de referencia, en memoria y en disco."""
+
+    def __init__(
+        self,
+        db=None,
+        directorio: Path = DIRECTORIO_CACHE,
+        colecciones: Optional[Dict[str, tuple]] = None,
+        reloj: Callable[[], float] = time.time,
+    ):
+        self._db = db
+        self.directorio = Path(directorio)
+        self.colecciones = dict(COLECCIONES if colecciones is None else colecciones)
+        self.reloj = reloj
+        self._memoria: Dict[str, Dict[str, Any]] = {}
+        self._cerrojo = threading.RLock()
+        self.lecturas = 0
+        self.escrituras = 0
+        self.aciertos = 0
+
+    @property
+    def db(self):
+        return self._db if self._db is not None else conectar_firestore()
+
+    # -------------------------------------------------------------------------
+    # Almacenamiento local
+    # -------------------------------------------------------------------------
+
+    def _archivo(self, coleccion: str) -> Path:
+        return self.directorio / f"{coleccion}.json"
+
+    def _entrada(self, coleccion: str) -> Optional[Dict[str, Any]]:
+        if coleccion not in self._memoria:
+            archivo = self._archivo(coleccion)
+            try:
+                self._memoria[coleccion] = json.loads(archivo.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                return None
+        return self._memoria[coleccion]
+
+    def _guardar(self, coleccion: str, entrada: Dict[str, Any]) -> None:
+        self._memoria[coleccion] = entrada
+        try:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            temporal = self._archivo(coleccion).with_suffix('.tmp')
+            temporal.write_text(json.dumps(entrada, ensure_ascii=False, default=str), encoding='utf-8')
+            temporal.replace(self._archivo(coleccion))
+        except OSError as e:
+            # Sin disco la cache sigue funcionando en memoria
+            print(f"⚠️  No se pudo guardar la cache de '{coleccion}': {e}", file=sys.stderr)
+
+    # -------------------------------------------------------------------------
+    # Lectura
+    # -------------------------------------------------------------------------
+
+    def _sellos(self) -> Dict[str, Any]:
+        self.lecturas += 1
+        snap = self.db.document(RUTA_VERSIONES).get()
+        return serializar_valor(snap.to_dict() or {}) if snap.exists else {}
+
+    def _recargar(self, coleccion: str) -> Dict[str, Any]:
+        sello = self._sellos().get(coleccion)
+        docs = {doc_id: serializar_valor(data) for doc_id, data in leer_coleccion(self.db, coleccion)}
+        self.lecturas += max(len(docs), 1)
+        ahora = self.reloj()
+        entrada = {'docs': docs, 'sello': sello, 'huella': huella(docs), 'leidoEn': ahora, 'validadoEn': ahora}
+        self._guardar(coleccion, entrada)
+        return entrada
+
+    def _vigente(self, coleccion: str) -> Dict[str, Any]:
+        ttl, vida_maxima = self.colecciones.get(coleccion, (TTL, VIDA_MAXIMA))
+        entrada = None if SIN_CACHE else self._entrada(coleccion)
+        ahora = self.reloj()
+        if entrada is not None and ahora - entrada['validadoEn'] < ttl:
+            self.aciertos += 1
+            return entrada
+        if entrada is not None and ahora - entrada['leidoEn'] < vida_maxima:
+            if self._sellos().get(coleccion) == entrada['sello']:
+                entrada['validadoEn'] = ahora
+                self._guardar(coleccion, entrada)
+                return entrada
+        return self._recargar(coleccion)
+
+    def documentos(self, coleccion: str) -> Dict[str, Dict[str, Any]]:
+        """{id: datos} de la colección (copia: se puede modificar)."""
+        with self._cerrojo:
+            return copy.deepcopy(self._vigente(coleccion)['docs'])
+
+    def tenants(self) -> List[str]:
+        with self._cerrojo:
+            return sorted(self._vigente('tenants')['docs'])
+
+    def version(self, coleccion: str) -> str:
+        """Huella del contenido en cache de la colección."""
+        with self._cerrojo:
+            return self._vigente(coleccion)['huella']
+
+    def invalidar(self, coleccion: Optional[str] = None) -> None:
+        """Olvida una colección (o todas): la siguiente lectura va a Firestore."""
+        with self._cerrojo:
+            for nombre in [coleccion] if coleccion else list(self.colecciones):
+                self._memoria.pop(nombre, None)
+                self._archivo(nombre).unlink(missing_ok=True)
+
+    # -------------------------------------------------------------------------
+    # Escritura
+    # -------------------------------------------------------------------------
+
+    def escribir(
+        self,
+        coleccion: str,
+        docs: Dict[str, Dict[str, Any]],
+        escritor,
+        usuario: Optional[str] = None,
+    ) -> int:
+        """
+        Encola con merge sólo los documentos que no coinciden con la copia y,
+        si hay alguno, el nuevo sello de la colección. Con `usuario` añade
+        auditoria (creado* sólo en los documentos nuevos). Devuelve cuántos
+        documentos se escriben.
+        """
+        with self._cerrojo:
+            entrada = self._vigente(coleccion)
+            cambiados = {doc_id: doc for doc_id, doc in docs.items() if difiere(doc, entrada['docs'].get(doc_id))}
+            if not cambiados:
+                return 0
+
+            ahora = datetime.now(timezone.utc)
+            for doc_id, doc in cambiados.items():
+                doc = dict(doc)
+                if usuario:
+                    auditoria = {'modificadoPor': usuario, 'modificadoEn': ahora}
+                    if doc_id not in entrada['docs']:
+                        auditoria.update({'creadoPor': usuario, 'creadoEn': ahora})
+                    doc['auditoria'] = auditoria
+                escritor.set(f"{coleccion}/{doc_id}", doc, merge=True)
+                _fusionar(entrada['docs'].setdefault(doc_id, {}), serializar_valor(doc))
+
+            entrada['huella'] = huella(entrada['docs'])
+            entrada['sello'] = {'version': entrada['huella'], 'actualizadoEn': ahora.isoformat()}
+            escritor.set(RUTA_VERSIONES, {coleccion: entrada['sello']}, merge=True)
+            entrada['validadoEn'] = self.reloj()
+            self._guardar(coleccion, entrada)
+            self.escrituras += len(cambiados) + 1
+            return len(cambiados)
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {'lecturas': self.lecturas, 'escrituras': self.escrituras, 'aciertos': self.aciertos}
+
+
+_cache: Optional[CacheReferencia] = None
+_cerrojo = threading.Lock()
+
+
+def referencia(db=None) -> CacheReferencia:
+    """Cache de referencia del proceso (se crea en la primera llamada)."""
+    global _cache
+    with _cerrojo:
+        if _cache is None:
+            _cache = CacheReferencia(db)
+        return _cache
+
+
+def es_referencia(ruta: str) -> bool:
+    return ruta in COLECCIONES
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Cache local de tipos_equipo, tenants y sla_config.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    sub.add_parser('estado', help="Antigüedad y versión de cada colección en cache")
+    p_ref = sub.add_parser('refrescar', help="Releer de Firestore")
+    p_ref.add_argument('colecciones', nargs='*', metavar='COLECCION',
+                       help=f"Por defecto todas: {', '.join(COLECCIONES)}")
+    sub.add_parser('limpiar', help="Borrar la cache local")
+    args = parser.parse_args(argv)
+
+    cache = referencia()
+    if args.comando == 'limpiar':
+        cache.invalidar()
+        print(f"🧹 Cache borrada ({cache.directorio})")
+        return 0
+    if args.comando == 'refrescar':
+        for coleccion in args.colecciones or COLECCIONES:
+            cache.invalidar(coleccion)
+            print(f"🔄 {coleccion}: {len(cache.documentos(coleccion))} documentos, versión {cache.version(coleccion)}")
+        return 0
+
+    ahora = time.time()
+    print(f"📁 {cache.directorio}")
+    for coleccion, (ttl, vida_maxima) in COLECCIONES.items():
+        entrada = cache._entrada(coleccion)
+        if entrada is None:
+            print(f"   {coleccion:14} sin cache")
+            continue
+        edad = ahora - entrada['leidoEn']
+        estado = 'vigente' if ahora - entrada['validadoEn'] < ttl else ('a validar' if edad < vida_maxima else 'caducada')
+        print(f"   {coleccion:14} {len(entrada['docs']):4} docs  versión {entrada['huella']}  "
+              f"leída hace {edad / 60:.0f} min  ({estado})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
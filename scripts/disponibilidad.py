@@ -0,0 +1,242 @@
+"""
+=============================================================================
+CÁLCULO DE DISPONIBILIDAD POR AUTOBÚS - ZaintzaBus
+=============================================================================
+Calcula sla_metrics.disponibilidadGlobal y disponibilidadPorActivo sin contar
+dos veces el tiempo en que un mismo autobús tiene varias incidencias abiertas.
+
+Sumar sla.fueraDeServicio incidencia a incidencia (como hace
+calcularDisponibilidad en docs/SLA_STRATEGY.md) cuenta los solapes tantas
+veces como incidencias haya. Aquí, para cada autobús:
+
+  1. se toman los intervalos [T0, T4) de sus incidencias (las abiertas
+     llegan hasta "ahora"), recortados a la ventana del informe,
+  2. se ordenan y se fusionan los solapes con un barrido (sweep line),
+  3. se mide la unión, en tiempo de reloj o en horario de servicio.
+
+Todo se hace a la vez para toda la flota: un único ordenamiento O(n log n)
+y operaciones vectorizadas para el barrido.
+
+USO:
+    python scripts/disponibilidad.py --snapshot snapshot/ --periodo 2025-11
+    python scripts/disponibilidad.py --tenant ekialdebus --periodo 2025-W45 --horario-servicio
+=============================================================================
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from sla_motor import TablaIncidencias, cargar_configs, cargar_incidencias, codificar_grupos, limites_periodo
+from snapshot import documentos, listar_tenants
+
+Intervalos = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+# =============================================================================
+# BARRIDO
+# =============================================================================
+
+def fusionar_intervalos(grupos: np.ndarray, inicios: np.ndarray, fines: np.ndarray) -> Intervalos:
+    """
+    Fusiona los intervalos solapados dentro de cada grupo.
+
+    Tras ordenar por (grupo, inicio), un intervalo abre un tramo nuevo si
+    cambia el grupo o si empieza después del máximo fin acumulado hasta la
+    fila anterior. El máximo acumulado por grupo se obtiene con un único
+    np.maximum.accumulate desplazando cada grupo a su propia franja de valores.
+
+    Returns:
+        (grupo, inicio, fin) de los intervalos fusionados, ordenados.
+    """
+    if len(inicios) == 0:
+        vacio = np.zeros(0)
+        return grupos[:0], vacio, vacio
+
+    orden = np.lexsort((inicios, grupos))
+    g, ini, fin = grupos[orden], inicios[orden], fines[orden]
+
+    base = ini.min()
+    franja = fin.max() - base + 1.0
+    desplazado = (fin - base) + g * franja
+    max_previo = np.maximum.accumulate(desplazado)
+
+    nuevo = np.ones(len(g), dtype=bool)
+    nuevo[1:] = (g[1:] != g[:-1]) | ((ini[1:] - base) + g[1:] * franja > max_previo[:-1])
+
+    cortes = np.flatnonzero(nuevo)
+    return g[cortes], ini[cortes], np.maximum.reduceat(fin, cortes)
+
+
+def intervalos_fuera_servicio(
+    tabla: TablaIncidencias,
+    desde: float,
+    hasta: float,
+    ahora: Optional[float] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Intervalos [T0, T4) recortados a [desde, hasta), listos para fusionar.
+
+    Returns:
+        (tenant, activo, inicio, fin) de las incidencias que solapan la ventana.
+    """
+    ahora = time.time() if ahora is None else ahora
+    fin = np.where(np.isnan(tabla.fin_reparacion), min(ahora, hasta), tabla.fin_reparacion)
+    inicio = np.clip(tabla.recepcion, desde, hasta)
+    fin = np.clip(fin, desde, hasta)
+    validos = ~np.isnan(tabla.recepcion) & (fin > inicio) & tabla.activo.astype(bool)
+    return tabla.tenant[validos], tabla.activo[validos], inicio[validos], fin[validos]
+
+
+# =============================================================================
+# DISPONIBILIDAD
+# =============================================================================
+
+def calcular_disponibilidad(
+    tabla: TablaIncidencias,
+    autobuses: Dict[str, List[Tuple[str, Optional[str]]]],
+    desde: float,
+    hasta: float,
+    configs: Optional[Dict[str, Dict[str, Any]]] = None,
+    horario_servicio: bool = False,
+    ahora: Optional[float] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Disponibilidad por autobús y global de cada tenant en [desde, hasta).
+
+    Args:
+        autobuses: {tenantId: [(activoId, codigo), ...]} flota en servicio; los
+            autobuses sin incidencias cuentan como 100% disponibles. Las
+            incidencias de otros activos (autobuses de baja, equipos sueltos)
+            van a 'fueraDeFlota' y no cuentan en la disponibilidad global.
+        horario_servicio: medir sólo el tiempo dentro de horarioServicio.
+
+    Returns:
+        {tenantId: {'disponibilidadGlobal': float, 'disponibilidadPorActivo': [...],
+                    'fueraDeFlota': [{'activoId', 'horasFueraServicio'}, ...]}}
+    """
+    t_tenant, t_activo, ini, fin = intervalos_fuera_servicio(tabla, desde, hasta, ahora)
+
+    # Unir flota conocida y autobuses con incidencias en una sola codificación
+    flota_tenant = [t for t, buses in autobuses.items() for _ in buses]
+    flota_activo = [a for buses in autobuses.values() for a, _ in buses]
+    todos_tenant = np.asarray(flota_tenant + list(t_tenant), dtype=object)
+    todos_activo = np.asarray(flota_activo + list(t_activo), dtype=object)
+    codigo, claves = codificar_grupos([todos_tenant, todos_activo])
+    codigo_incidencia = codigo[len(flota_tenant):]
+
+    g, m_ini, m_fin = fusionar_intervalos(codigo_incidencia, ini, fin)
+
+    tenant_grupo = np.asarray([c[0] for c in claves], dtype=object)
+    if horario_servicio:
+        from calendario_servicio import minutos_servicio_por_tenant
+        configs = configs or {}
+        fuera = minutos_servicio_por_tenant(tenant_grupo[g], m_ini, m_fin, configs)
+        ventana = minutos_servicio_por_tenant(
+            tenant_grupo, np.full(len(claves), desde), np.full(len(claves), hasta), configs
+        )
+    else:
+        fuera = (m_fin - m_ini) / 60.0
+        ventana = np.full(len(claves), (hasta - desde) / 60.0)
+
+    minutos_fuera = np.bincount(g, weights=fuera, minlength=len(claves))
+
+    codigos_bus = {
+        (t, a): c for t, buses in autobuses.items() for a, c in buses
+    }
+    resultado: Dict[str, Dict[str, Any]] = {}
+    for i, (tenant_id, activo_id) in enumerate(claves):
+        entrada = resultado.setdefault(tenant_id, {
+            'disponibilidadPorActivo': [], 'fueraDeFlota': [], '_fuera': 0.0, '_total': 0.0,
+        })
+        if (tenant_id, activo_id) not in codigos_bus:
+            # Autobús de baja u otro activo: se informa aparte, sin ventana en la flota
+            entrada['fueraDeFlota'].append({
+                'activoId': activo_id,
+                'horasFueraServicio': round(float(minutos_fuera[i]) / 60.0, 2),
+            })
+            continue
+        total = ventana[i]
+        entrada['_fuera'] += minutos_fuera[i]
+        entrada['_total'] += total
+        entrada['disponibilidadPorActivo'].append({
+            'activoId': activo_id,
+            'codigo': codigos_bus[(tenant_id, activo_id)],
+            'disponibilidad': _porcentaje(total - minutos_fuera[i], total),
+            'horasFueraServicio': round(float(minutos_fuera[i]) / 60.0, 2),
+        })
+
+    for entrada in resultado.values():
+        entrada['disponibilidadGlobal'] = _porcentaje(
+            entrada['_total'] - entrada.pop('_fuera'), entrada.pop('_total')
+        )
+    return resultado
+
+
+def _porcentaje(disponible: float, total: float) -> float:
+    """Como calcularDisponibilidad: 100 si no hay tiempo que medir, 2 decimales."""
+    if total <= 0:
+        return 100.0
+    return round(float(disponible) / float(total) * 100, 2)
+
+
+def cargar_autobuses(
+    tenants: Sequence[str],
+    snapshot: Optional[Path] = None,
+    db=None,
+) -> Dict[str, List[Tuple[str, Optional[str]]]]:
+    """Autobuses de cada tenant que no están de baja: {tenant: [(id, codigo)]}."""
+    flota = {}
+    for tenant_id in tenants:
+        flota[tenant_id] = [
+            (doc_id, data.get('codigo'))
+            for doc_id, data in documentos(f"tenants/{tenant_id}/autobuses", snapshot, db)
+            if data.get('estado') != 'baja'
+        ]
+    return flota
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Disponibilidad por autobús sin doble conteo de solapes.")
+    parser.add_argument('--snapshot', type=Path, help="Directorio de snapshot (por defecto, Firestore en vivo)")
+    parser.add_argument('--tenant', action='append', dest='tenants', help="Tenant a procesar (repetible)")
+    parser.add_argument('--periodo', required=True, help="Periodo del informe (2024-01, 2024-W01, 2024-01-15)")
+    parser.add_argument('--horario-servicio', action='store_true',
+                        help="Contar sólo el tiempo dentro de sla_config.horarioServicio")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    db = None
+    if args.snapshot is None:
+        from cliente_firestore import conectar_firestore
+        db = conectar_firestore()
+
+    tenants = args.tenants or listar_tenants(args.snapshot, db)
+    tabla = cargar_incidencias(tenants, args.snapshot, db)
+    autobuses = cargar_autobuses(tenants, args.snapshot, db)
+    configs = cargar_configs(tenants, args.snapshot, db) if args.horario_servicio else None
+    carga = time.perf_counter() - inicio
+
+    desde, hasta, _tipo = limites_periodo(args.periodo)
+    resultado = calcular_disponibilidad(tabla, autobuses, desde, hasta, configs, args.horario_servicio)
+    calculo = time.perf_counter() - inicio - carga
+
+    print(json.dumps(resultado, ensure_ascii=False, indent=2))
+    print(
+        f"⏱  {len(tabla)} incidencias: carga {carga:.2f} s, cálculo {calculo * 1000:.1f} ms",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,327 @@
+"""
+=============================================================================
+ESCRITOR EN LOTES PARA FIRESTORE - ZaintzaBus
+=============================================================================
+Agrupa set/update/delete en batches de hasta 500 operaciones (el límite de
+Firestore) y hace commit automáticamente, para no repetir en cada script el
+patrón "batch_count >= 500 -> commit -> nuevo batch".
+
+Con `max_por_segundo` los commits se espacian para no superar ese ritmo de
+operaciones (borrados masivos, backfills sobre colecciones en uso). Varios
+escritores en hilos distintos pueden compartir un mismo `LimitadorRitmo`
+para que el límite sea global y no por escritor.
+
+Las operaciones esperan en un buffer (BufferEscrituras) hasta el commit o
+hasta llenarlo (`capacidad`, por defecto 20 batches); varias operaciones
+sobre el mismo documento se fusionan en una sola (set + update de
+contadores, filas repetidas, varias fases de un mismo trabajo). Sólo se
+mantienen por separado cuando el resultado dependería del valor guardado
+(Increment, ArrayUnion... sobre un campo ya escrito) o cambiaría la
+semántica (update tras delete, que debe fallar). `ahorradas` cuenta las
+escrituras que no llegan a Firestore.
+
+USO:
+    with EscritorLotes(db) as escritor:
+        escritor.set("tenants/ekialdebus/autobuses/BUS-321", datos)
+        escritor.update(doc.reference, {"contadores.totalEquipos": 12})
+    print(escritor.estadisticas())     # 1 escritura, 1 ahorrada
+=============================================================================
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+LIMITE_BATCH = 500
+
+# Operaciones en el buffer, en batches
+BATCHES_EN_BUFFER = 20
+
+# (tipo, datos, merge): ('set', {...}, False) / ('update', {...}, None) / ('delete', None, None)
+Operacion = Tuple[str, Optional[Dict[str, Any]], Optional[bool]]
+
+_PLANOS = (str, int, float, bool, bytes, type(None), date)
+
+
+class LimitadorRitmo:
+    """
+    Reparte un ritmo máximo de operaciones por segundo entre varios hilos.
+
+    Cada llamada a `esperar(n)` reserva el hueco de n operaciones a
+    continuación del último reservado y duerme hasta que llega su turno.
+    """
+
+    def __init__(self, max_por_segundo: float):
+        self.max_por_segundo = max_por_segundo
+        self._lock = threading.Lock()
+        self._siguiente: Optional[float] = None
+
+    def esperar(self, operaciones: int) -> None:
+        with self._lock:
+            ahora = time.monotonic()
+            turno = ahora if self._siguiente is None else max(ahora, self._siguiente)
+            self._siguiente = turno + operaciones / self.max_por_segundo
+        if turno > ahora:
+            time.sleep(turno - ahora)
+
+
+# =============================================================================
+# BUFFER Y FUSIÓN DE OPERACIONES
+# =============================================================================
+
+def _copiar(valor: Any) -> Any:
+    """Copia de mapas y listas; los centinelas de Firestore se comparan por identidad y no se copian."""
+    if isinstance(valor, dict):
+        return {k: _copiar(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_copiar(v) for v in valor]
+    return valor
+
+
+def _es_borrado(valor: Any) -> bool:
+    if isinstance(valor, _PLANOS + (dict, list)):
+        return False
+    from cliente_firestore import firestore
+    return valor is firestore.DELETE_FIELD
+
+
+def _depende(valor: Any) -> bool:
+    """Transformación que parte del valor guardado (Increment, ArrayUnion, Maximum...)."""
+    return not isinstance(valor, _PLANOS + (dict, list)) and (hasattr(valor, 'value') or hasattr(valor, 'values'))
+
+
+def _contiene(datos: Dict[str, Any], condicion) -> bool:
+    return any(_contiene(v, condicion) if isinstance(v, dict) else condicion(v) for v in datos.values())
+
+
+def _fusionar_merge(previo: Dict[str, Any], nuevo: Dict[str, Any], merge: bool) -> bool:
+    """
+    set(merge=True) de `nuevo` sobre los datos de un set previo (in situ).
+    False si no se puede fusionar.
+    """
+    for clave, valor in nuevo.items():
+        if isinstance(valor, dict) and isinstance(previo.get(clave), dict):
+            if not _fusionar_merge(previo[clave], valor, merge):
+                return False
+        elif clave in previo and (_depende(valor) or (merge and isinstance(valor, dict))):
+            # Un mapa que sustituye a otro valor se fusionaría con lo guardado
+            return False
+        else:
+            previo[clave] = _copiar(valor)
+    return True
+
+
+def _aplicar_update(previo: Dict[str, Any], cambios: Dict[str, Any], merge: bool) -> bool:
+    """update() con rutas 'a.b' sobre los datos de un set previo (in situ)."""
+    for ruta, valor in cambios.items():
+        *padres, campo = ruta.split('.')
+        destino = previo
+        for parte in padres:
+            if not isinstance(destino.get(parte), dict):
+                if parte in destino and merge:
+                    return False
+                destino[parte] = {}
+            destino = destino[parte]
+        if _depende(valor) and campo in destino:
+            return False
+        if isinstance(valor, dict) and (merge or _contiene(valor, lambda v: _depende(v) or _es_borrado(v))):
+            # update sustituye el mapa; un set con merge lo fusionaría
+            return False
+        if _es_borrado(valor) and not merge:
+            destino.pop(campo, None)
+        else:
+            destino[campo] = _copiar(valor)
+    return True
+
+
+def fusionar(previa: Operacion, nueva: Operacion) -> Optional[Operacion]:
+    """
+    Operación equivalente a `previa` seguida de `nueva` sobre el mismo
+    documento, o None si hay que mantener las dos.
+    """
+    tipo_previo, datos_previos, merge_previo = previa
+    tipo, datos, merge = nueva
+    if tipo == 'delete' or (tipo == 'set' and not merge):
+        return nueva
+    if tipo_previo == 'delete':
+        # set con merge tras borrar: como un set completo; update fallaría
+        if tipo == 'set' and not _contiene(datos, lambda v: _depende(v) or _es_borrado(v)):
+            return ('set', datos, False)
+        return None
+    if tipo == 'set':
+        if tipo_previo == 'update':
+            return None
+        if not merge_previo and _contiene(datos, lambda v: _depende(v) or _es_borrado(v)):
+            return None
+        resultado = _copiar(datos_previos)
+        return ('set', resultado, merge_previo) if _fusionar_merge(resultado, datos, merge_previo) else None
+    # update
+    if tipo_previo == 'set':
+        resultado = _copiar(datos_previos)
+        return ('set', resultado, merge_previo) if _aplicar_update(resultado, datos, merge_previo) else None
+    resultado = dict(datos_previos)
+    for ruta, valor in datos.items():
+        conflicto = any(
+            otra != ruta and (otra.startswith(ruta + '.') or ruta.startswith(otra + '.')) for otra in resultado
+        )
+        if conflicto or (_depende(valor) and ruta in resultado):
+            return None
+        resultado[ruta] = _copiar(valor)
+    return ('update', resultado, None)
+
+
+class BufferEscrituras:
+    """Operaciones pendientes por documento, en orden de llegada, fusionadas."""
+
+    def __init__(self):
+        self._rutas: 'OrderedDict[str, Tuple[Any, List[Operacion]]]' = OrderedDict()
+        self.pendientes = 0
+        self.ahorradas = 0
+
+    def __len__(self) -> int:
+        return self.pendientes
+
+    def agregar(self, ruta: str, ref: Any, operacion: Operacion) -> None:
+        tipo, datos, merge = operacion
+        operacion = (tipo, _copiar(datos), merge)
+        if ruta not in self._rutas:
+            self._rutas[ruta] = (ref, [operacion])
+            self.pendientes += 1
+            return
+        operaciones = self._rutas[ruta][1]
+        fusionada = fusionar(operaciones[-1], operacion)
+        if fusionada is None:
+            operaciones.append(operacion)
+            self.pendientes += 1
+        else:
+            operaciones[-1] = fusionada
+            self.ahorradas += 1
+
+    def ultimas(self, coleccion: str) -> Iterator[Tuple[str, Operacion]]:
+        """(id, última operación) de los documentos pendientes de una colección."""
+        prefijo = coleccion.strip('/') + '/'
+        for ruta, (_ref, operaciones) in self._rutas.items():
+            if ruta.startswith(prefijo) and '/' not in ruta[len(prefijo):]:
+                yield ruta[len(prefijo):], operaciones[-1]
+
+    def extraer(self, limite: int) -> List[Tuple[Any, Operacion]]:
+        """Hasta `limite` operaciones, de los documentos más antiguos (cada uno entero si cabe)."""
+        salida: List[Tuple[Any, Operacion]] = []
+        while self._rutas and len(salida) < limite:
+            ruta, (ref, operaciones) = next(iter(self._rutas.items()))
+            if salida and len(salida) + len(operaciones) > limite:
+                break
+            tomadas, resto = operaciones[:limite - len(salida)], operaciones[limite - len(salida):]
+            salida.extend((ref, op) for op in tomadas)
+            if resto:
+                self._rutas[ruta] = (ref, resto)
+            else:
+                del self._rutas[ruta]
+        self.pendientes -= len(salida)
+        return salida
+
+    def descartar(self) -> int:
+        """Vacía el buffer sin escribir nada; devuelve las operaciones descartadas."""
+        descartadas = self.pendientes
+        self._rutas.clear()
+        self.pendientes = 0
+        return descartadas
+
+
+def aplicar(batch, ref, operacion: Operacion) -> None:
+    tipo, datos, merge = operacion
+    if tipo == 'set':
+        batch.set(ref, datos, merge=merge)
+    elif tipo == 'update':
+        batch.update(ref, datos)
+    else:
+        batch.delete(ref)
+
+
+# =============================================================================
+# ESCRITOR
+# =============================================================================
+
+class EscritorLotes:
+    """Escritor con buffer de operaciones fusionadas y batches de hasta `limite`."""
+
+    def __init__(self, db, limite: int = LIMITE_BATCH, verbose: bool = False,
+                 max_por_segundo: Optional[float] = None, limitador: Optional[LimitadorRitmo] = None,
+                 capacidad: Optional[int] = None):
+        self.db = db
+        self.limite = limite
+        self.capacidad = capacidad or limite * BATCHES_EN_BUFFER
+        self.verbose = verbose
+        if limitador is None and max_por_segundo:
+            limitador = LimitadorRitmo(max_por_segundo)
+        self.limitador = limitador
+        self._buffer = BufferEscrituras()
+        self.operaciones = 0
+        self.commits = 0
+
+    @property
+    def ahorradas(self) -> int:
+        return self._buffer.ahorradas
+
+    # -------------------------------------------------------------------------
+    # Operaciones
+    # -------------------------------------------------------------------------
+
+    def _ref(self, ref: Union[str, Any]):
+        return self.db.document(ref) if isinstance(ref, str) else ref
+
+    def _agregar(self, ref, operacion: Operacion) -> None:
+        ref = self._ref(ref)
+        self._buffer.agregar(ref.path, ref, operacion)
+        self.operaciones += 1
+        if len(self._buffer) >= self.capacidad:
+            self._confirmar(self._buffer.extraer(self.limite))
+
+    def set(self, ref, data: Dict[str, Any], merge: bool = False) -> None:
+        self._agregar(ref, ('set', data, merge))
+
+    def pendientes(self, coleccion: str) -> Iterator[Tuple[str, Operacion]]:
+        """Documentos de `coleccion` escritos y aún sin confirmar, con su operación final."""
+        return self._buffer.ultimas(coleccion)
+
+    def update(self, ref, data: Dict[str, Any]) -> None:
+        self._agregar(ref, ('update', data, None))
+
+    def delete(self, ref) -> None:
+        self._agregar(ref, ('delete', None, None))
+
+    # -------------------------------------------------------------------------
+    # Commit
+    # -------------------------------------------------------------------------
+
+    def _confirmar(self, operaciones: List[Tuple[Any, Operacion]]) -> None:
+        if self.limitador is not None:
+            self.limitador.esperar(len(operaciones))
+        if self.verbose:
+            print(f"      Guardando batch ({len(operaciones)} operaciones)...")
+        batch = self.db.batch()
+        for ref, operacion in operaciones:
+            aplicar(batch, ref, operacion)
+        batch.commit()
+        self.commits += 1
+
+    def commit(self) -> None:
+        """Confirma todo lo pendiente, en batches de hasta `limite` operaciones."""
+        while len(self._buffer):
+            self._confirmar(self._buffer.extraer(self.limite))
+
+    def descartar(self) -> int:
+        """Olvida lo pendiente sin confirmarlo (etapa fallida); devuelve cuántas operaciones."""
+        return self._buffer.descartar()
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {'operaciones': self.operaciones, 'commits': self.commits, 'ahorradas': self.ahorradas}
+
+    def __enter__(self) -> 'EscritorLotes':
+        return self
+
+    def __exit__(self, tipo_exc, exc, tb) -> None:
+        if tipo_exc is None:
+            self.commit()
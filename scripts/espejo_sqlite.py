@@ -0,0 +1,409 @@
+"""
+=============================================================================
+ESPEJO SQLITE POR OPERADOR (USO SIN CONEXIÓN) - ZaintzaBus
+=============================================================================
+Genera un único archivo SQLite por tenant con sus autobuses, equipos,
+inventario e incidencias abiertas, para consultar en cocheras con mala
+cobertura sin ir a Firestore:
+
+    autobuses    (id, codigo, matricula, estado, marca, modelo, fase)
+    equipos      (id, codigo_interno, tipo, numero_serie, ip, mac, msisdn,
+                  icc, estado, bus_id, bus_codigo, posicion)
+    inventario   (id, sku, descripcion, numero_serie, estado, ubicacion...)
+    incidencias  (id, codigo, estado, criticidad, activo_id, recepcion,
+                  descripcion)   -- sólo no resueltas ni cerradas
+    busqueda     FTS5 sobre series, MACs, matrículas y descripciones
+
+Cada fila guarda el documento completo (columna `datos`, JSON), una huella
+del contenido y el rowid de su texto en `busqueda` (fts_rowid): las
+columnas UNINDEXED de FTS5 no tienen índice, así que los cambios y bajas
+borran el texto por rowid en vez de recorrer toda la tabla de búsqueda.
+Al reconstruir sobre un archivo existente sólo se escriben las filas cuya
+huella cambia y se borran las que ya no están, en una única transacción.
+
+USO:
+    python scripts/espejo_sqlite.py construir --tenant ekialdebus --salida ekialdebus.sqlite
+    python scripts/espejo_sqlite.py construir --tenant ekialdebus --snapshot snapshot/ --salida ekialdebus.sqlite
+    python scripts/espejo_sqlite.py buscar --bd ekialdebus.sqlite "aa:bb:cc"
+=============================================================================
+"""
+
+import argparse
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from datos_referencia import ESTADOS_ABIERTOS
+from migrar_activos_a_autobuses import codigo_bus_equipo
+from snapshot import Documento, a_epoch, documentos, obtener_campo, serializar_valor
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT);
+
+CREATE TABLE IF NOT EXISTS autobuses (
+    id TEXT PRIMARY KEY, codigo TEXT, matricula TEXT, estado TEXT,
+    marca TEXT, modelo TEXT, fase TEXT, huella TEXT NOT NULL, datos TEXT NOT NULL,
+    fts_rowid INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_autobuses_codigo ON autobuses(codigo);
+CREATE INDEX IF NOT EXISTS ix_autobuses_matricula ON autobuses(matricula);
+
+CREATE TABLE IF NOT EXISTS equipos (
+    id TEXT PRIMARY KEY, codigo_interno TEXT, tipo TEXT, tipo_nombre TEXT,
+    numero_serie TEXT, ip TEXT, mac TEXT, msisdn TEXT, icc TEXT, estado TEXT,
+    bus_id TEXT, bus_codigo TEXT, posicion TEXT, huella TEXT NOT NULL, datos TEXT NOT NULL,
+    fts_rowid INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_equipos_bus ON equipos(bus_id);
+CREATE INDEX IF NOT EXISTS ix_equipos_serie ON equipos(numero_serie);
+CREATE INDEX IF NOT EXISTS ix_equipos_mac ON equipos(mac);
+CREATE INDEX IF NOT EXISTS ix_equipos_codigo ON equipos(codigo_interno);
+
+CREATE TABLE IF NOT EXISTS inventario (
+    id TEXT PRIMARY KEY, sku TEXT, descripcion TEXT, numero_serie TEXT, estado TEXT,
+    ubicacion_tipo TEXT, ubicacion_id TEXT, huella TEXT NOT NULL, datos TEXT NOT NULL,
+    fts_rowid INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_inventario_serie ON inventario(numero_serie);
+CREATE INDEX IF NOT EXISTS ix_inventario_ubicacion ON inventario(ubicacion_id);
+
+CREATE TABLE IF NOT EXISTS incidencias (
+    id TEXT PRIMARY KEY, codigo TEXT, estado TEXT, criticidad TEXT, activo_id TEXT,
+    activo_codigo TEXT, recepcion REAL, descripcion TEXT, huella TEXT NOT NULL, datos TEXT NOT NULL,
+    fts_rowid INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_incidencias_activo ON incidencias(activo_id);
+CREATE INDEX IF NOT EXISTS ix_incidencias_estado ON incidencias(estado, recepcion);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS busqueda USING fts5(
+    tabla UNINDEXED, doc_id UNINDEXED, texto, prefix='2 3 4'
+);
+"""
+
+Fila = Dict[str, Any]
+
+
+# =============================================================================
+# FILAS
+# =============================================================================
+
+def _texto(*valores: Any) -> str:
+    return ' '.join(str(v) for v in valores if v not in (None, ''))
+
+
+def _mac_compacta(mac: Optional[str]) -> Optional[str]:
+    return re.sub(r'[:\-.]', '', mac) if mac else None
+
+
+def fila_autobus(doc_id: str, data: Dict[str, Any]) -> Tuple[Fila, str]:
+    fila = {
+        'id': doc_id,
+        'codigo': data.get('codigo'),
+        'matricula': data.get('matricula'),
+        'estado': data.get('estado'),
+        'marca': data.get('marca'),
+        'modelo': data.get('modelo'),
+        'fase': obtener_campo(data, 'instalacion.fase'),
+    }
+    return fila, _texto(doc_id, fila['codigo'], fila['matricula'], fila['marca'], fila['modelo'],
+                        data.get('numeroChasis'))
+
+
+def fila_equipo(doc_id: str, data: Dict[str, Any]) -> Tuple[Fila, str]:
+    fila = {
+        'id': doc_id,
+        'codigo_interno': data.get('codigoInterno'),
+        'tipo': data.get('tipoEquipoId'),
+        'tipo_nombre': data.get('tipoEquipoNombre'),
+        'numero_serie': data.get('numeroSerieFabricante'),
+        'ip': obtener_campo(data, 'red.ip'),
+        'mac': obtener_campo(data, 'red.mac'),
+        'msisdn': obtener_campo(data, 'sim.msisdn'),
+        'icc': obtener_campo(data, 'sim.icc'),
+        'estado': data.get('estado'),
+        'bus_id': obtener_campo(data, 'ubicacionActual.id') if obtener_campo(data, 'ubicacionActual.tipo') == 'autobus' else None,
+        'posicion': obtener_campo(data, 'ubicacionActual.posicionEnBus'),
+    }
+    # ubicacionActual.id y .nombre son 'BUS-321'; el autobús se encuentra por su codigo '321'
+    fila['bus_codigo'] = codigo_bus_equipo(data)
+    return fila, _texto(fila['codigo_interno'], fila['tipo_nombre'], fila['numero_serie'], fila['ip'],
+                        fila['mac'], _mac_compacta(fila['mac']), fila['msisdn'], fila['icc'])
+
+
+def fila_inventario(doc_id: str, data: Dict[str, Any]) -> Tuple[Fila, str]:
+    fila = {
+        'id': doc_id,
+        'sku': data.get('sku'),
+        'descripcion': data.get('descripcion'),
+        'numero_serie': data.get('numeroSerie'),
+        'estado': data.get('estado'),
+        'ubicacion_tipo': obtener_campo(data, 'ubicacion.tipo'),
+        'ubicacion_id': obtener_campo(data, 'ubicacion.referenciaId'),
+    }
+    return fila, _texto(fila['sku'], fila['descripcion'], fila['numero_serie'], data.get('fabricante'),
+                        data.get('modelo'), obtener_campo(data, 'ubicacion.descripcion'))
+
+
+def fila_incidencia(doc_id: str, data: Dict[str, Any]) -> Tuple[Fila, str]:
+    recepcion = obtener_campo(data, 'timestamps.recepcion')
+    descripcion = _texto(data.get('categoriaFallo'), data.get('naturalezaFallo'), data.get('diagnostico'),
+                         data.get('observaciones'))
+    fila = {
+        'id': doc_id,
+        'codigo': data.get('codigo'),
+        'estado': data.get('estado'),
+        'criticidad': data.get('criticidad'),
+        'activo_id': data.get('activoPrincipalId'),
+        'activo_codigo': data.get('activoPrincipalCodigo'),
+        'recepcion': a_epoch(recepcion) if recepcion is not None else None,
+        'descripcion': descripcion or None,
+    }
+    afectados = [e.get('descripcion') for e in data.get('equiposAfectados') or [] if isinstance(e, dict)]
+    return fila, _texto(fila['codigo'], fila['activo_codigo'], descripcion, *afectados)
+
+
+# tabla -> (función de fila, ruta de la colección bajo el tenant)
+TABLAS: Dict[str, Tuple[Callable[[str, Dict[str, Any]], Tuple[Fila, str]], str]] = {
+    'autobuses': (fila_autobus, 'autobuses'),
+    'equipos': (fila_equipo, 'equipos'),
+    'inventario': (fila_inventario, 'inventario'),
+    'incidencias': (fila_incidencia, 'incidencias'),
+}
+
+
+# =============================================================================
+# LECTURA
+# =============================================================================
+
+def leer_fuentes(tenant_id: str, snapshot: Optional[Path] = None, db=None) -> Dict[str, Iterable[Documento]]:
+    """
+    Documentos de cada tabla: equipos filtrados por operador e incidencias
+    sólo abiertas. En vivo, con consultas paginadas filtradas en servidor.
+    """
+    if snapshot is not None:
+        equipos = (
+            (d, data) for d, data in documentos('equipos', snapshot)
+            if obtener_campo(data, 'propiedad.operadorAsignadoId') == tenant_id
+        )
+        incidencias = (
+            (d, data) for d, data in documentos(f"tenants/{tenant_id}/incidencias", snapshot)
+            if data.get('estado') in ESTADOS_ABIERTOS
+        )
+    else:
+        from snapshot import leer_paginado
+        equipos = leer_paginado(
+            db.collection('equipos').where('propiedad.operadorAsignadoId', '==', tenant_id).order_by('__name__')
+        )
+        incidencias = leer_paginado(
+            db.collection(f"tenants/{tenant_id}/incidencias")
+            .where('estado', 'in', ESTADOS_ABIERTOS)
+            .order_by('__name__')
+        )
+    return {
+        'autobuses': documentos(f"tenants/{tenant_id}/autobuses", snapshot, db),
+        'equipos': equipos,
+        'inventario': documentos(f"tenants/{tenant_id}/inventario", snapshot, db),
+        'incidencias': incidencias,
+    }
+
+
+# =============================================================================
+# CONSTRUCCIÓN INCREMENTAL
+# =============================================================================
+
+def abrir(archivo: Path) -> sqlite3.Connection:
+    con = sqlite3.connect(str(archivo))
+    con.executescript(ESQUEMA)
+    _migrar_fts_rowid(con)
+    _migrar_bus_codigo(con)
+    return con
+
+
+def _migrar_bus_codigo(con: sqlite3.Connection) -> None:
+    """Espejos que guardaban bus_codigo como 'BUS-321': lo dejan en '321' (la huella no cambia)."""
+    with con:
+        con.execute("UPDATE equipos SET bus_codigo = substr(bus_codigo, 5) WHERE bus_codigo LIKE 'BUS-%'")
+
+
+def _migrar_fts_rowid(con: sqlite3.Connection) -> None:
+    """Espejos anteriores a fts_rowid: añade la columna y la rellena con un solo recorrido de `busqueda`."""
+    faltan = [t for t in TABLAS if 'fts_rowid' not in {c[1] for c in con.execute(f"PRAGMA table_info({t})")}]
+    if not faltan:
+        return
+    with con:
+        for tabla in faltan:
+            con.execute(f"ALTER TABLE {tabla} ADD COLUMN fts_rowid INTEGER")
+        for tabla in faltan:
+            con.executemany(
+                f"UPDATE {tabla} SET fts_rowid = ? WHERE id = ?",
+                con.execute("SELECT rowid, doc_id FROM busqueda WHERE tabla = ?", (tabla,)).fetchall(),
+            )
+
+
+def sincronizar_tabla(con: sqlite3.Connection, tabla: str, docs: Iterable[Documento]) -> Dict[str, int]:
+    """Aplica a la tabla sólo las altas, cambios y bajas respecto a `docs`."""
+    construir_fila = TABLAS[tabla][0]
+    huellas = {doc_id: (huella, fts_rowid) for doc_id, huella, fts_rowid
+               in con.execute(f"SELECT id, huella, fts_rowid FROM {tabla}")}
+    vistos = set()
+    stats = {'altas': 0, 'cambios': 0, 'bajas': 0, 'iguales': 0}
+
+    for doc_id, data in docs:
+        vistos.add(doc_id)
+        datos = json.dumps(serializar_valor(data), ensure_ascii=False, sort_keys=True)
+        huella = hashlib.sha1(datos.encode('utf-8')).hexdigest()
+        anterior = huellas.get(doc_id)
+        if anterior is not None and anterior[0] == huella:
+            stats['iguales'] += 1
+            continue
+        fila, texto = construir_fila(doc_id, data)
+        if anterior is not None and anterior[1] is not None:
+            con.execute("DELETE FROM busqueda WHERE rowid = ?", (anterior[1],))
+        cursor = con.execute("INSERT INTO busqueda (tabla, doc_id, texto) VALUES (?, ?, ?)", (tabla, doc_id, texto))
+        fila.update(huella=huella, datos=datos, fts_rowid=cursor.lastrowid)
+        columnas = ', '.join(fila)
+        con.execute(
+            f"INSERT OR REPLACE INTO {tabla} ({columnas}) VALUES ({', '.join('?' * len(fila))})",
+            list(fila.values()),
+        )
+        stats['cambios' if anterior is not None else 'altas'] += 1
+
+    for doc_id in huellas.keys() - vistos:
+        con.execute(f"DELETE FROM {tabla} WHERE id = ?", (doc_id,))
+        if huellas[doc_id][1] is not None:
+            con.execute("DELETE FROM busqueda WHERE rowid = ?", (huellas[doc_id][1],))
+        stats['bajas'] += 1
+    return stats
+
+
+def construir(archivo: Path, tenant_id: str, fuentes: Dict[str, Iterable[Documento]]) -> Dict[str, Dict[str, int]]:
+    """Crea o actualiza el espejo del tenant en una sola transacción."""
+    con = abrir(archivo)
+    try:
+        with con:
+            guardado = con.execute("SELECT valor FROM meta WHERE clave = 'tenant'").fetchone()
+            if guardado and guardado[0] != tenant_id:
+                raise ValueError(f"{archivo} es el espejo de '{guardado[0]}', no de '{tenant_id}'")
+            stats = {tabla: sincronizar_tabla(con, tabla, fuentes[tabla]) for tabla in TABLAS}
+            con.executemany("INSERT OR REPLACE INTO meta (clave, valor) VALUES (?, ?)", [
+                ('tenant', tenant_id),
+                ('actualizadoEn', datetime.now(timezone.utc).isoformat()),
+            ])
+        if any(s['bajas'] or s['cambios'] for s in stats.values()):
+            con.execute("INSERT INTO busqueda(busqueda) VALUES ('optimize')")
+            con.commit()
+    finally:
+        con.close()
+    return stats
+
+
+# =============================================================================
+# CONSULTAS
+# =============================================================================
+
+def consulta_fts(texto: str) -> str:
+    """
+    Texto libre -> consulta FTS5: cada palabra como frase de sus partes
+    (una MAC 'aa:bb:cc' son tres tokens seguidos) con prefijo en la última.
+    """
+    terminos = []
+    for palabra in texto.lower().split():
+        partes = [p for p in re.split(r'[^\w]+', palabra) if p]
+        if partes:
+            terminos.append('"' + ' '.join(partes) + '"*')
+    return ' AND '.join(terminos)
+
+
+def buscar(con: sqlite3.Connection, texto: str, limite: int = 20) -> List[Dict[str, Any]]:
+    """
+    Resultados de todas las tablas. Para equipos incluye el autobús donde
+    está instalado ("¿en qué bus está esta cámara?").
+    """
+    consulta = consulta_fts(texto)
+    if not consulta:
+        return []
+    resultados = []
+    # Sin ORDER BY rank: ordenar por relevancia obliga a puntuar todas las
+    # coincidencias (decenas de ms con un prefijo de MAC común) y LIMIT ya no corta
+    filas = con.execute(
+        "SELECT tabla, doc_id FROM busqueda WHERE busqueda MATCH ? LIMIT ?", (consulta, limite)
+    ).fetchall()
+    for tabla, doc_id in filas:
+        if tabla == 'equipos':
+            fila = con.execute(
+                "SELECT e.codigo_interno, e.tipo_nombre, e.numero_serie, e.mac, e.bus_id, e.posicion, a.matricula "
+                "FROM equipos e LEFT JOIN autobuses a ON a.codigo = e.bus_codigo OR a.id = e.bus_id WHERE e.id = ?",
+                (doc_id,),
+            ).fetchone()
+            claves = ('codigo', 'tipo', 'serie', 'mac', 'bus', 'posicion', 'matricula')
+        elif tabla == 'autobuses':
+            fila = con.execute("SELECT codigo, matricula, estado, fase FROM autobuses WHERE id = ?", (doc_id,)).fetchone()
+            claves = ('codigo', 'matricula', 'estado', 'fase')
+        elif tabla == 'inventario':
+            fila = con.execute("SELECT sku, descripcion, numero_serie, estado, ubicacion_id FROM inventario WHERE id = ?",
+                               (doc_id,)).fetchone()
+            claves = ('sku', 'descripcion', 'serie', 'estado', 'ubicacion')
+        else:
+            fila = con.execute("SELECT codigo, estado, criticidad, activo_id, descripcion FROM incidencias WHERE id = ?",
+                               (doc_id,)).fetchone()
+            claves = ('codigo', 'estado', 'criticidad', 'activo', 'descripcion')
+        resultados.append({'tabla': tabla, 'id': doc_id, **dict(zip(claves, fila or ()))})
+    return resultados
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Espejo SQLite de un operador para uso sin conexión.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_con = sub.add_parser('construir', help="Crear o actualizar (incremental) el espejo de un tenant")
+    p_con.add_argument('--tenant', required=True)
+    p_con.add_argument('--salida', type=Path, required=True, help="Archivo SQLite")
+    p_con.add_argument('--snapshot', type=Path, help="Leer de un snapshot (por defecto, en vivo)")
+
+    p_bus = sub.add_parser('buscar', help="Búsqueda de texto en el espejo")
+    p_bus.add_argument('texto')
+    p_bus.add_argument('--bd', type=Path, required=True, help="Archivo SQLite")
+    p_bus.add_argument('--limite', type=int, default=20)
+
+    args = parser.parse_args(argv)
+    inicio = time.perf_counter()
+
+    if args.comando == 'buscar':
+        con = sqlite3.connect(str(args.bd))
+        resultados = buscar(con, args.texto, args.limite)
+        duracion = time.perf_counter() - inicio
+        for r in resultados:
+            detalle = ', '.join(f"{k}={v}" for k, v in r.items() if k not in ('tabla', 'id') and v is not None)
+            print(f"   [{r['tabla']}] {r['id']}: {detalle}")
+        print(f"✅ {len(resultados)} resultados en {duracion * 1000:.2f} ms")
+        return 0
+
+    db = None
+    if args.snapshot is None:
+        from cliente_firestore import conectar_firestore
+        db = conectar_firestore()
+
+    print(f"🗄️  Espejo SQLite de {args.tenant} -> {args.salida}")
+    stats = construir(args.salida, args.tenant, leer_fuentes(args.tenant, args.snapshot, db))
+    for tabla, s in stats.items():
+        print(f"   {tabla:<12} +{s['altas']} ~{s['cambios']} -{s['bajas']} ({s['iguales']} sin cambios)")
+    print(f"✅ Listo en {time.perf_counter() - inicio:.2f} s ({args.salida.stat().st_size / 1e6:.2f} MB)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,579 @@
+"""
+=============================================================================
+HISTORIAL DE UBICACIONES DE EQUIPOS - ZaintzaBus
+=============================================================================
+Reconstruye dónde ha estado cada equipo a partir de los movimientos y
+responde consultas en un instante o en un periodo sin recorrer movimientos:
+
+  - ¿Dónde estaba el equipo X el día T?
+  - ¿Por qué autobuses ha pasado esta SIM (ICC / MSISDN / nº de serie)?
+  - ¿Qué había instalado en el BUS-321 el 14 de marzo?
+  - Configuración de la flota en la fecha T
+  - Tiempo que cada equipo ha estado en un bus durante un periodo (facturación)
+
+Fuentes:
+  - `movimientos_equipos` (MovimientoEquipo: origen / destino / fecha)
+  - `tenants/{t}/inventario/{id}/movimientos` (MovimientoInventario); en un
+    snapshot, los archivos tenants/{t}/inventario/{id}/movimientos.jsonl
+  - el estado actual (`ubicacionActual` + fechas.instalacionActual en
+    equipos, `ubicacion` + ultimoMovimiento en inventario), que cierra el
+    último intervalo si hubo cambios sin movimiento (p. ej. reimportaciones)
+
+Cada entidad tiene una lista ordenada de intervalos [desde, hasta) que no se
+solapan (búsqueda binaria) y cada lugar un árbol de intervalos centrado: una
+consulta en un instante cuesta O(log n + k) y una de periodo, además, una
+búsqueda binaria en los inicios ordenados.
+
+El historial construido se guarda como JSON comprimido; los árboles se
+rehacen al cargar.
+
+USO:
+    python scripts/historial_ubicaciones.py construir --snapshot snapshot/ --salida historial.json.gz
+    python scripts/historial_ubicaciones.py donde SIM-321-001 --fecha 2026-03-14 --historial historial.json.gz
+    python scripts/historial_ubicaciones.py recorrido 8934012345678901234 --tipo autobus --historial historial.json.gz
+    python scripts/historial_ubicaciones.py bus BUS-321 --fecha 2026-03-14 --historial historial.json.gz
+    python scripts/historial_ubicaciones.py periodo BUS-321 --desde 2026-03-01 --hasta 2026-04-01 --historial historial.json.gz
+    python scripts/historial_ubicaciones.py flota --fecha 2026-03-14 --tenant ekialdebus --historial historial.json.gz
+=============================================================================
+"""
+
+import argparse
+import bisect
+import gzip
+import json
+import math
+import sys
+import time
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from snapshot import Documento, a_epoch, cargar_coleccion, documentos, listar_tenants, obtener_campo
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+VERSION = 1
+
+COLECCION_MOVIMIENTOS = 'movimientos_equipos'
+PREFIJO_INVENTARIO = 'inventario'
+
+# Campos de equipos / inventario que identifican una entidad en las consultas
+ALIAS_EQUIPO = ('codigoInterno', 'numeroSerieFabricante', 'sim.icc', 'sim.msisdn')
+ALIAS_INVENTARIO = ('numeroSerie',)
+
+ABIERTO = math.inf
+SIN_INICIO = -math.inf
+
+
+class Intervalo(NamedTuple):
+    entidad: str
+    lugar: str          # 'autobus:BUS-321', 'ubicacion:almacen', 'activo:XYZ'...
+    desde: float        # epoch (SIN_INICIO si no se conoce)
+    hasta: float        # epoch (ABIERTO si sigue ahí)
+
+
+def clave_lugar(tipo: Optional[str], lugar_id: Optional[str]) -> Optional[str]:
+    if not tipo or not lugar_id:
+        return None
+    return f"{tipo}:{lugar_id}"
+
+
+def entidad_inventario(tenant_id: str, item_id: str) -> str:
+    return f"{PREFIJO_INVENTARIO}/{tenant_id}/{item_id}"
+
+
+# =============================================================================
+# ÁRBOL DE INTERVALOS
+# =============================================================================
+
+class ArbolIntervalos:
+    """
+    Árbol de intervalos centrado, estático.
+
+    Cada nodo guarda los intervalos que contienen su centro ordenados por
+    inicio y por fin; los que quedan enteros a un lado bajan al hijo de ese
+    lado. Consultar un instante visita un nodo por nivel (O(log n)) y en cada
+    uno sólo recorre los intervalos que lo contienen (más uno).
+    """
+
+    __slots__ = ('centro', 'por_inicio', 'por_fin', 'izquierdo', 'derecho')
+
+    def __init__(self, intervalos: Sequence[Tuple[float, float, int]]):
+        # Mediana inferior de los extremos: siempre queda algún intervalo en el nodo
+        extremos = sorted(x for desde, hasta, _ in intervalos for x in (desde, hasta))
+        self.centro = extremos[(len(extremos) - 1) // 2] if extremos else 0.0
+        izquierda, derecha, aqui = [], [], []
+        for intervalo in intervalos:
+            if intervalo[1] <= self.centro:
+                izquierda.append(intervalo)
+            elif intervalo[0] > self.centro:
+                derecha.append(intervalo)
+            else:
+                aqui.append(intervalo)
+        self.por_inicio = sorted(aqui, key=lambda i: i[0])
+        self.por_fin = sorted(aqui, key=lambda i: -i[1])
+        self.izquierdo = ArbolIntervalos(izquierda) if izquierda else None
+        self.derecho = ArbolIntervalos(derecha) if derecha else None
+
+    def en(self, t: float) -> List[int]:
+        """Valores de los intervalos [desde, hasta) que contienen t."""
+        encontrados = []
+        nodo = self
+        while nodo is not None:
+            if t < nodo.centro:
+                for desde, _hasta, valor in nodo.por_inicio:
+                    if desde > t:
+                        break
+                    encontrados.append(valor)
+                nodo = nodo.izquierdo
+            else:
+                for _desde, hasta, valor in nodo.por_fin:
+                    if hasta <= t:
+                        break
+                    encontrados.append(valor)
+                nodo = nodo.derecho
+        return encontrados
+
+
+# =============================================================================
+# CONSTRUCCIÓN DE INTERVALOS
+# =============================================================================
+
+Evento = Tuple[float, Optional[str], Optional[str]]  # (fecha, lugar origen, lugar destino)
+
+
+def intervalos_entidad(
+    entidad: str,
+    eventos: List[Evento],
+    alta: float,
+    actual: Optional[str],
+    inicio_actual: float,
+) -> List[Intervalo]:
+    """
+    Intervalos de una entidad a partir de sus movimientos y su estado actual.
+
+    Antes del primer movimiento la entidad estaba en su origen (desde el
+    alta, si se conoce). Si la ubicación actual no coincide con el destino
+    del último movimiento, hubo un cambio sin movimiento: se supone en
+    inicio_actual (o en el último movimiento, si es anterior).
+    """
+    eventos = sorted((e for e in eventos if not math.isnan(e[0])), key=lambda e: e[0])
+    tramos: List[Tuple[str, float]] = []  # (lugar, desde)
+    if eventos:
+        primero = eventos[0]
+        if primero[1] is not None:
+            tramos.append((primero[1], alta if not math.isnan(alta) and alta < primero[0] else SIN_INICIO))
+        tramos.extend((destino, fecha) for fecha, _origen, destino in eventos)
+        if actual is not None and tramos[-1][0] != actual:
+            ultimo = eventos[-1][0]
+            tramos.append((actual, inicio_actual if not math.isnan(inicio_actual) and inicio_actual > ultimo else ultimo))
+    elif actual is not None:
+        inicio = inicio_actual if not math.isnan(inicio_actual) else alta
+        tramos.append((actual, SIN_INICIO if math.isnan(inicio) else inicio))
+
+    intervalos = []
+    for i, (lugar, desde) in enumerate(tramos):
+        hasta = tramos[i + 1][1] if i + 1 < len(tramos) else ABIERTO
+        if lugar is not None and hasta > desde:
+            intervalos.append(Intervalo(entidad, lugar, desde, hasta))
+    return intervalos
+
+
+def _alias(data: Dict[str, Any], campos: Sequence[str]) -> List[str]:
+    valores = (obtener_campo(data, campo) for campo in campos)
+    return [str(v).strip().lower() for v in valores if v not in (None, '')]
+
+
+# =============================================================================
+# HISTORIAL
+# =============================================================================
+
+class HistorialUbicaciones:
+    """Intervalos por entidad y por lugar, con consultas en instante y periodo."""
+
+    def __init__(
+        self,
+        intervalos: Iterable[Intervalo],
+        nombres: Dict[str, str],
+        tenants: Dict[str, str],
+        alias: Dict[str, str],
+    ):
+        self.intervalos = sorted(intervalos, key=lambda i: (i.entidad, i.desde))
+        self.nombres = nombres          # lugar -> nombre legible
+        self.tenants = tenants          # entidad -> tenant
+        self.alias = alias              # texto en minúsculas -> entidad
+
+        self.por_entidad: Dict[str, Tuple[List[float], List[int]]] = {}
+        por_lugar: Dict[str, List[int]] = defaultdict(list)
+        for i, intervalo in enumerate(self.intervalos):
+            desdes, indices = self.por_entidad.setdefault(intervalo.entidad, ([], []))
+            desdes.append(intervalo.desde)
+            indices.append(i)
+            por_lugar[intervalo.lugar].append(i)
+
+        self.por_lugar: Dict[str, Tuple[ArbolIntervalos, List[float], List[int]]] = {}
+        for lugar, indices in por_lugar.items():
+            indices.sort(key=lambda i: self.intervalos[i].desde)
+            arbol = ArbolIntervalos([(self.intervalos[i].desde, self.intervalos[i].hasta, i) for i in indices])
+            self.por_lugar[lugar] = (arbol, [self.intervalos[i].desde for i in indices], indices)
+        self._global = ArbolIntervalos([(i.desde, i.hasta, n) for n, i in enumerate(self.intervalos)])
+
+    # -- Construcción ----------------------------------------------------------
+
+    @classmethod
+    def construir(
+        cls,
+        equipos: Iterable[Documento],
+        movimientos: Iterable[Documento],
+        inventario: Iterable[Tuple[str, str, Dict[str, Any]]] = (),
+        movimientos_inventario: Iterable[Tuple[str, str, Dict[str, Any]]] = (),
+    ) -> 'HistorialUbicaciones':
+        """
+        Args:
+            equipos: documentos de `equipos`
+            movimientos: documentos de `movimientos_equipos`
+            inventario: (tenant, itemId, data) de tenants/{t}/inventario
+            movimientos_inventario: (tenant, itemId, data) de sus subcolecciones movimientos
+        """
+        nombres: Dict[str, str] = {}
+        eventos: Dict[str, List[Evento]] = defaultdict(list)
+
+        def lugar(tipo, lugar_id, nombre) -> Optional[str]:
+            clave = clave_lugar(tipo, lugar_id)
+            if clave is not None and nombre:
+                nombres.setdefault(clave, str(nombre))
+            return clave
+
+        for _doc_id, mov in movimientos:
+            origen, destino = mov.get('origen') or {}, mov.get('destino') or {}
+            eventos[mov.get('equipoId')].append((
+                a_epoch(mov.get('fecha')),
+                lugar(origen.get('tipo'), origen.get('id'), origen.get('nombre')),
+                lugar(destino.get('tipo'), destino.get('id'), destino.get('nombre')),
+            ))
+        for tenant_id, item_id, mov in movimientos_inventario:
+            eventos[entidad_inventario(tenant_id, item_id)].append((
+                a_epoch(mov.get('fecha')),
+                lugar(mov.get('origenTipo'), mov.get('origenId') or mov.get('origenDescripcion'), mov.get('origenDescripcion')),
+                lugar(mov.get('destinoTipo'), mov.get('destinoId') or mov.get('destinoDescripcion'), mov.get('destinoDescripcion')),
+            ))
+
+        intervalos: List[Intervalo] = []
+        tenants: Dict[str, str] = {}
+        alias: Dict[str, str] = {}
+        for equipo_id, data in equipos:
+            ubicacion = data.get('ubicacionActual') or {}
+            actual = lugar(ubicacion.get('tipo'), ubicacion.get('id'), ubicacion.get('nombre'))
+            alta = a_epoch(obtener_campo(data, 'fechas.alta'))
+            inicio = a_epoch(obtener_campo(data, 'fechas.instalacionActual'))
+            intervalos.extend(intervalos_entidad(equipo_id, eventos.pop(equipo_id, []), alta, actual, inicio))
+            if obtener_campo(data, 'propiedad.operadorAsignadoId'):
+                tenants[equipo_id] = obtener_campo(data, 'propiedad.operadorAsignadoId')
+            for texto in [equipo_id.lower()] + _alias(data, ALIAS_EQUIPO):
+                alias.setdefault(texto, equipo_id)
+        for tenant_id, item_id, data in inventario:
+            entidad = entidad_inventario(tenant_id, item_id)
+            ubicacion = data.get('ubicacion') or {}
+            actual = lugar(ubicacion.get('tipo'), ubicacion.get('referenciaId') or ubicacion.get('descripcion'),
+                           ubicacion.get('descripcion'))
+            alta = a_epoch(data.get('createdAt'))
+            intervalos.extend(intervalos_entidad(entidad, eventos.pop(entidad, []), alta, actual,
+                                                 a_epoch(data.get('ultimoMovimiento'))))
+            tenants[entidad] = tenant_id
+            for texto in _alias(data, ALIAS_INVENTARIO):
+                alias.setdefault(texto, entidad)
+        # Movimientos de entidades que ya no existen (dadas de baja y borradas)
+        for entidad, eventos_entidad in eventos.items():
+            if entidad:
+                intervalos.extend(intervalos_entidad(entidad, eventos_entidad, math.nan, None, math.nan))
+        return cls(intervalos, nombres, tenants, alias)
+
+    # -- Resolución de nombres -------------------------------------------------
+
+    def resolver(self, texto: str) -> Optional[str]:
+        """Entidad por ID, código interno, nº de serie, ICC o MSISDN."""
+        if texto in self.por_entidad:
+            return texto
+        return self.alias.get(texto.strip().lower())
+
+    def lugares(self, texto: str) -> List[str]:
+        """Lugares que coinciden con 'autobus:BUS-321' o sólo 'BUS-321'."""
+        if texto in self.por_lugar:
+            return [texto]
+        return [clave for clave in self.por_lugar if clave.split(':', 1)[1] == texto]
+
+    # -- Consultas por entidad -------------------------------------------------
+
+    def ubicacion_en(self, entidad: str, t: float) -> Optional[Intervalo]:
+        desdes, indices = self.por_entidad.get(entidad, ([], []))
+        i = bisect.bisect_right(desdes, t) - 1
+        if i >= 0 and t < self.intervalos[indices[i]].hasta:
+            return self.intervalos[indices[i]]
+        return None
+
+    def recorrido(
+        self,
+        entidad: str,
+        desde: float = SIN_INICIO,
+        hasta: float = ABIERTO,
+        tipo: Optional[str] = None,
+    ) -> List[Intervalo]:
+        """Intervalos de la entidad que se solapan con [desde, hasta), opcionalmente de un tipo de lugar."""
+        desdes, indices = self.por_entidad.get(entidad, ([], []))
+        primero = max(bisect.bisect_right(desdes, desde) - 1, 0)
+        ultimo = bisect.bisect_left(desdes, hasta)
+        resultado = []
+        for i in indices[primero:ultimo]:
+            intervalo = self.intervalos[i]
+            if intervalo.hasta > desde and (tipo is None or intervalo.lugar.startswith(f"{tipo}:")):
+                resultado.append(intervalo)
+        return resultado
+
+    # -- Consultas por lugar ---------------------------------------------------
+
+    def contenido_en(self, lugar: str, t: float) -> List[Intervalo]:
+        """Lo que había en un lugar en el instante t."""
+        if lugar not in self.por_lugar:
+            return []
+        arbol, _desdes, _indices = self.por_lugar[lugar]
+        return sorted((self.intervalos[i] for i in arbol.en(t)), key=lambda i: i.entidad)
+
+    def contenido_entre(self, lugar: str, desde: float, hasta: float) -> Dict[str, float]:
+        """Segundos que cada entidad estuvo en el lugar dentro de [desde, hasta)."""
+        if lugar not in self.por_lugar or hasta <= desde:
+            return {}
+        arbol, desdes, indices = self.por_lugar[lugar]
+        # Los que ya estaban al empezar más los que llegaron durante el periodo
+        solapan = set(arbol.en(desde))
+        solapan.update(indices[bisect.bisect_right(desdes, desde):bisect.bisect_left(desdes, hasta)])
+        tiempos: Dict[str, float] = defaultdict(float)
+        for i in solapan:
+            intervalo = self.intervalos[i]
+            tiempos[intervalo.entidad] += min(intervalo.hasta, hasta) - max(intervalo.desde, desde)
+        return dict(sorted(tiempos.items()))
+
+    def configuracion(self, t: float, tenant_id: Optional[str] = None, tipo: str = 'autobus') -> Dict[str, List[str]]:
+        """{lugar: [entidades]} de todos los lugares de un tipo en el instante t."""
+        flota: Dict[str, List[str]] = defaultdict(list)
+        for i in self._global.en(t):
+            intervalo = self.intervalos[i]
+            if not intervalo.lugar.startswith(f"{tipo}:"):
+                continue
+            if tenant_id is not None and self.tenants.get(intervalo.entidad) != tenant_id:
+                continue
+            flota[intervalo.lugar].append(intervalo.entidad)
+        return {lugar: sorted(entidades) for lugar, entidades in sorted(flota.items())}
+
+    # -- Persistencia ----------------------------------------------------------
+
+    def guardar(self, archivo: Path) -> None:
+        entidades = sorted(self.por_entidad)
+        numero = {entidad: n for n, entidad in enumerate(entidades)}
+        lugares = sorted(self.por_lugar)
+        numero_lugar = {lugar: n for n, lugar in enumerate(lugares)}
+        contenido = {
+            'version': VERSION,
+            'entidades': entidades,
+            'lugares': lugares,
+            'intervalos': [
+                [numero[i.entidad], numero_lugar[i.lugar], _a_json(i.desde), _a_json(i.hasta)]
+                for i in self.intervalos
+            ],
+            'nombres': self.nombres,
+            'tenants': self.tenants,
+            'alias': self.alias,
+        }
+        with gzip.open(archivo, 'wt', encoding='utf-8') as f:
+            json.dump(contenido, f, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def cargar(cls, archivo: Path) -> 'HistorialUbicaciones':
+        with gzip.open(archivo, 'rt', encoding='utf-8') as f:
+            contenido = json.load(f)
+        if contenido.get('version') != VERSION:
+            raise ValueError(f"{archivo}: versión de historial {contenido.get('version')}, se esperaba {VERSION}")
+        entidades, lugares = contenido['entidades'], contenido['lugares']
+        intervalos = [
+            Intervalo(entidades[e], lugares[l], _de_json(desde, SIN_INICIO), _de_json(hasta, ABIERTO))
+            for e, l, desde, hasta in contenido['intervalos']
+        ]
+        return cls(intervalos, contenido['nombres'], contenido['tenants'], contenido['alias'])
+
+
+def _a_json(valor: float) -> Optional[float]:
+    return valor if math.isfinite(valor) else None
+
+
+def _de_json(valor: Optional[float], infinito: float) -> float:
+    return infinito if valor is None else valor
+
+
+# =============================================================================
+# FUENTES
+# =============================================================================
+
+def _inventario_snapshot(snapshot: Path, tenants: List[str]) -> Tuple[list, list]:
+    items, movimientos = [], []
+    for tenant_id in tenants:
+        for item_id, data in cargar_coleccion(snapshot, f"tenants/{tenant_id}/inventario"):
+            items.append((tenant_id, item_id, data))
+        for archivo in (Path(snapshot) / 'tenants' / tenant_id / 'inventario').glob('*/movimientos.jsonl'):
+            item_id = archivo.parent.name
+            for _mov_id, data in cargar_coleccion(snapshot, f"tenants/{tenant_id}/inventario/{item_id}/movimientos"):
+                movimientos.append((tenant_id, item_id, data))
+    return items, movimientos
+
+
+def _inventario_vivo(db, tenants: List[str]) -> Tuple[list, list]:
+    items = [
+        (tenant_id, item_id, data)
+        for tenant_id in tenants
+        for item_id, data in documentos(f"tenants/{tenant_id}/inventario", db=db)
+    ]
+    # Una consulta de grupo para los movimientos de todos los items
+    movimientos = []
+    for snap in db.collection_group('movimientos').stream():
+        partes = snap.reference.path.split('/')
+        if len(partes) == 6 and partes[0] == 'tenants' and partes[2] == PREFIJO_INVENTARIO:
+            movimientos.append((partes[1], partes[3], snap.to_dict() or {}))
+    return items, movimientos
+
+
+def construir(snapshot: Optional[Path] = None, db=None) -> HistorialUbicaciones:
+    """Historial completo desde un snapshot o en vivo."""
+    if snapshot is None and db is None:
+        from cliente_firestore import conectar_firestore
+        db = conectar_firestore()
+    tenants = listar_tenants(snapshot, db)
+    if snapshot is not None:
+        items, movimientos_inventario = _inventario_snapshot(snapshot, tenants)
+    else:
+        items, movimientos_inventario = _inventario_vivo(db, tenants)
+    return HistorialUbicaciones.construir(
+        documentos('equipos', snapshot, db),
+        documentos(COLECCION_MOVIMIENTOS, snapshot, db),
+        items,
+        movimientos_inventario,
+    )
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def _instante(texto: str) -> float:
+    """'2026-03-14' (inicio del día, UTC) o una fecha ISO completa."""
+    if len(texto) == 10:
+        dia = date.fromisoformat(texto)
+        return datetime(dia.year, dia.month, dia.day, tzinfo=timezone.utc).timestamp()
+    return a_epoch(texto)
+
+
+def _fecha(t: float) -> str:
+    if not math.isfinite(t):
+        return '…'
+    return datetime.fromtimestamp(t, timezone.utc).strftime('%Y-%m-%d %H:%M')
+
+
+def _linea(historial: HistorialUbicaciones, intervalo: Intervalo, etiqueta: str) -> str:
+    nombre = historial.nombres.get(intervalo.lugar)
+    lugar = f"{intervalo.lugar} ({nombre})" if nombre and nombre not in intervalo.lugar else intervalo.lugar
+    return f"   {etiqueta:<28} {_fecha(intervalo.desde):>16} → {_fecha(intervalo.hasta):<16}  {lugar}"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Historial de ubicaciones de equipos.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_con = sub.add_parser('construir', help="Construir el historial desde un snapshot o en vivo")
+    p_con.add_argument('--snapshot', type=Path, help="Leer de un snapshot")
+    p_con.add_argument('--salida', type=Path, required=True, help="Archivo del historial (.json.gz)")
+
+    def consulta(nombre: str, ayuda: str, argumento: str):
+        p = sub.add_parser(nombre, help=ayuda)
+        p.add_argument(argumento)
+        p.add_argument('--historial', type=Path, required=True, help="Archivo generado con 'construir'")
+        return p
+
+    p_don = consulta('donde', "Dónde estaba un equipo en una fecha", 'equipo')
+    p_don.add_argument('--fecha', required=True)
+    p_rec = consulta('recorrido', "Todos los lugares por los que ha pasado un equipo", 'equipo')
+    p_rec.add_argument('--tipo', help="Sólo lugares de este tipo (autobus, ubicacion...)")
+    p_rec.add_argument('--desde')
+    p_rec.add_argument('--hasta')
+    p_bus = consulta('bus', "Qué había en un lugar en una fecha", 'lugar')
+    p_bus.add_argument('--fecha', required=True)
+    p_per = consulta('periodo', "Días de cada equipo en un lugar durante un periodo", 'lugar')
+    p_per.add_argument('--desde', required=True)
+    p_per.add_argument('--hasta', required=True)
+    p_flo = sub.add_parser('flota', help="Configuración de la flota en una fecha")
+    p_flo.add_argument('--fecha', required=True)
+    p_flo.add_argument('--tenant')
+    p_flo.add_argument('--historial', type=Path, required=True)
+
+    args = parser.parse_args(argv)
+    inicio = time.perf_counter()
+
+    if args.comando == 'construir':
+        print("🕒 Construyendo historial de ubicaciones...")
+        historial = construir(args.snapshot)
+        historial.guardar(args.salida)
+        print(f"✅ {len(historial.intervalos)} intervalos de {len(historial.por_entidad)} equipos en "
+              f"{len(historial.por_lugar)} lugares ({time.perf_counter() - inicio:.2f} s) -> {args.salida}")
+        return 0
+
+    historial = HistorialUbicaciones.cargar(args.historial)
+
+    if args.comando in ('donde', 'recorrido'):
+        entidad = historial.resolver(args.equipo)
+        if entidad is None:
+            print(f"⚠️  No se encuentra el equipo '{args.equipo}'")
+            return 1
+        if args.comando == 'donde':
+            intervalo = historial.ubicacion_en(entidad, _instante(args.fecha))
+            if intervalo is None:
+                print(f"   {entidad}: sin ubicación conocida el {args.fecha}")
+            else:
+                print(_linea(historial, intervalo, entidad))
+            return 0
+        tramos = historial.recorrido(
+            entidad,
+            _instante(args.desde) if args.desde else SIN_INICIO,
+            _instante(args.hasta) if args.hasta else ABIERTO,
+            args.tipo,
+        )
+        print(f"🧭 {entidad}: {len(tramos)} tramos")
+        for intervalo in tramos:
+            print(_linea(historial, intervalo, ''))
+        return 0
+
+    if args.comando == 'flota':
+        flota = historial.configuracion(_instante(args.fecha), args.tenant)
+        print(f"🚌 {len(flota)} autobuses con equipos el {args.fecha}")
+        for lugar, entidades in flota.items():
+            print(f"   {lugar:<24} {len(entidades):>3}  {', '.join(entidades)}")
+        return 0
+
+    lugares = historial.lugares(args.lugar)
+    if not lugares:
+        print(f"⚠️  No hay historial para '{args.lugar}'")
+        return 1
+    for lugar in lugares:
+        if args.comando == 'bus':
+            contenido = historial.contenido_en(lugar, _instante(args.fecha))
+            print(f"🚌 {lugar}: {len(contenido)} equipos el {args.fecha}")
+            for intervalo in contenido:
+                print(_linea(historial, intervalo, intervalo.entidad))
+        else:
+            tiempos = historial.contenido_entre(lugar, _instante(args.desde), _instante(args.hasta))
+            print(f"🧾 {lugar}: {len(tiempos)} equipos entre {args.desde} y {args.hasta}")
+            for entidad, segundos in tiempos.items():
+                print(f"   {entidad:<28} {segundos / 86400:>8.2f} días")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
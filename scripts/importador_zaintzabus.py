@@ -5,20 +5,38 @@ IMPORTADOR ZAINTZABUS - Script de importación de flota a Firestore
 Este script importa datos de vehículos y equipos desde un archivo Excel
 a la base de datos Firestore, siguiendo la estructura multi-tenant del proyecto.
 
-Para usar con otro operador, simplemente cambia las variables de configuración.
+Para usar con otro operador, pasa otro libro con --excel (el operador se
+lee del propio Excel) o fija --tenant / --nombre-operador.
+
+USO:
+    python scripts/importador_zaintzabus.py
+    python scripts/importador_zaintzabus.py --excel "Archivos_Excel/Flota Lurraldebus.xlsx"
+    python scripts/importador_zaintzabus.py --async      (ver pipeline_async.py)
+    python scripts/zaintzabus.py import-flota --excel ...     (ver zaintzabus.py)
 =============================================================================
 """
 
+import argparse
+import asyncio
 import os
-import pandas as pd
+import sys
 from datetime import datetime
 from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from auditoria_lotes import ManifiestoAuditoria
+from cliente_firestore import ModuloDiferido, conectar_firestore, conectar_firestore_async, firestore
+from contexto import Contexto
+from mapeo_columnas import COLUMNAS_EQUIPOS, FILA_CABECERA, TELEFONOS_SIM
+from pipeline_async import (
+    LIMITE_POR_COLECCION, TAM_LOTE_LECTURA, EscritorAsync, Limites, leer_por_ids_async, lotes, tuberia,
+)
+from snapshot import leer_por_ids
 
-import firebase_admin
-from firebase_admin import credentials, firestore
+pd = ModuloDiferido('pandas')
 
 # =============================================================================
-# CONFIGURACIÓN - CAMBIA SOLO EL ARCHIVO EXCEL
+# CONFIGURACIÓN - valores por defecto de --excel, --tenant y --nombre-operador
 # El operador y código se leen automáticamente del Excel (filas 5-6)
 # =============================================================================
 
@@ -35,60 +53,12 @@ OPERADOR_NOMBRE = None  # Se lee de fila 5, columna C (Operador)
 SCRIPT_DIR = Path(__file__).parent
 PROJECT_ROOT = SCRIPT_DIR.parent
 EXCEL_PATH = PROJECT_ROOT / 'Archivos_Excel' / ARCHIVO_EXCEL
-SERVICE_ACCOUNT_PATH = SCRIPT_DIR / 'serviceAccountKey.json'
-
-# =============================================================================
-# MAPEO DE COLUMNAS
-# =============================================================================
-
-# Columnas del activo (vehículo)
-COLUMNAS_ACTIVO = {
-    'COD_BUS': 'codigo',
-    'MATRICULA': 'matricula',
-    'Nº Obra / Chasis': 'chasis',
-    'MODELO AUTOBÚS': 'modelo',
-    'CARROCERIA': 'carroceria',
-    'FECHA PRE  INSTALACION': 'fechaPreInstalacion',
-    'FECHA INSTALACIÓN': 'fechaInstalacion',
-    'INSTALADOR': 'instalador',
-    'BUS MIGRADO SI/NO': 'migrado',
-    'COMENTARIOS': 'comentarios',
-}
-
-# Columnas de equipos -> (tipo_firestore, tiene_telefono_asociado)
-COLUMNAS_EQUIPOS = {
-    'N. AMPLIFICADOR': ('amplificador', False),
-    'N. CPU': ('cpu', False),
-    'LICENCIA': ('licencia_software', False),
-    'SWITCH': ('switch', False),
-    'ROUTER': ('router', False),
-    'WIFI': ('modulo_wifi', False),
-    'COMMS 1': ('comunicacion', False),
-    'COMMS 2': ('comunicacion', False),
-    'CAMARA 1': ('camara', False),
-    'CAMARA 2': ('camara', False),
-    'CAMARA 3': ('camara', False),
-    'CAMARA 4': ('camara', False),
-    'PUPITE': ('pupitre', False),
-    'VALIDADORA 1': ('validadora', False),
-    'VALIDADORA 2': ('validadora', False),
-    'VALIDADORA 3': ('validadora', False),
-    'IP SIM': ('ip_fija', False),
-    'SIM m2m': ('sim_card', True),
-    'SIM WIFI 3G': ('sim_card', True),
-}
-
-# Teléfonos asociados a SIMs
-TELEFONOS_SIM = {
-    'SIM m2m': 'TELEFONO SIM m2m',
-    'SIM WIFI 3G': 'TELEFONO SIM WIFI 3G',
-}
 
 # =============================================================================
 # FUNCIONES AUXILIARES
 # =============================================================================
 
-def leer_operador_desde_excel(excel_path: Path) -> tuple:
+def leer_operador_desde_excel(excel_path: Path, contexto: Optional[Contexto] = None) -> tuple:
     """
     Lee el nombre del operador y su código desde las filas 5-6 del Excel.
     
@@ -105,7 +75,7 @@ def leer_operador_desde_excel(excel_path: Path) -> tuple:
     """
     try:
         # Leer las primeras filas sin headers
-        df_meta = pd.read_excel(excel_path, header=None, nrows=7)
+        df_meta = (contexto or Contexto()).leer_excel(excel_path, cabecera=None, nrows=7)
         
         operador_nombre = None
         codigo_operador = None
@@ -151,17 +121,7 @@ def leer_operador_desde_excel(excel_path: Path) -> tuple:
 
 def inicializar_firebase():
     """Inicializa la conexión con Firebase Admin SDK."""
-    if not SERVICE_ACCOUNT_PATH.exists():
-        raise FileNotFoundError(
-            f"❌ No se encontró el archivo de credenciales: {SERVICE_ACCOUNT_PATH}\n"
-            "   Asegúrate de tener el archivo serviceAccountKey.json en la carpeta scripts/"
-        )
-    
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(str(SERVICE_ACCOUNT_PATH))
-        firebase_admin.initialize_app(cred)
-    
-    return firestore.client()
+    return conectar_firestore()
 
 
 def limpiar_valor(valor):
@@ -207,83 +167,42 @@ def procesar_migrado(valor):
 
 
 # =============================================================================
-# FUNCIÓN PRINCIPAL DE IMPORTACIÓN
+# SUBIDA DE FILAS
 # =============================================================================
 
-def importar_flota():
-    """Función principal que ejecuta la importación."""
-    global TENANT_ID, OPERADOR_NOMBRE
-    
-    # Verificar que existe el archivo Excel
-    if not EXCEL_PATH.exists():
-        raise FileNotFoundError(f"❌ No se encontró el archivo Excel: {EXCEL_PATH}")
-    
-    # Auto-detectar operador desde el Excel si no está configurado
-    if TENANT_ID is None or OPERADOR_NOMBRE is None:
-        print("🔍 Detectando operador desde el archivo Excel...")
-        detected_tenant, detected_nombre, detected_codigo = leer_operador_desde_excel(EXCEL_PATH)
-        
-        if TENANT_ID is None:
-            TENANT_ID = detected_tenant
-        if OPERADOR_NOMBRE is None:
-            OPERADOR_NOMBRE = detected_nombre
-        
-        print(f"   📋 Operador detectado: {OPERADOR_NOMBRE}")
-        print(f"   📋 Código de operador: {detected_codigo}")
-        print(f"   📋 Tenant ID generado: {TENANT_ID}")
-        print()
-    
-    print("=" * 70)
-    print(f"🚀 INICIANDO IMPORTACIÓN PARA {OPERADOR_NOMBRE}")
-    print("=" * 70)
-    print(f"   Archivo Excel: {EXCEL_PATH}")
-    print(f"   Tenant ID: {TENANT_ID}")
-    print()
-    
-    # Inicializar Firebase
-    print("🔥 Conectando con Firestore...")
-    db = inicializar_firebase()
-    print("   ✅ Conexión establecida")
-    print()
-    
-    # Leer Excel
-    print("📊 Leyendo archivo Excel...")
-    df = pd.read_excel(EXCEL_PATH, skiprows=7)
-    
-    # IMPORTANTE: Limpiar nombres de columnas (quitar espacios)
-    df.columns = df.columns.str.strip()
-    
-    print(f"   ✅ {len(df)} filas leídas")
-    print()
-    
-    # Contadores
-    total_buses = 0
-    total_equipos = 0
-    
-    # Iniciar batch
-    batch = db.batch()
-    operaciones_batch = 0
-    LIMITE_BATCH = 500
-    
-    # Función auxiliar para hacer commit si es necesario
-    def commit_si_necesario():
-        nonlocal batch, operaciones_batch
-        if operaciones_batch >= LIMITE_BATCH:
-            print(f"   💾 Guardando batch ({operaciones_batch} operaciones)...")
-            batch.commit()
-            batch = db.batch()
-            operaciones_batch = 0
-    
-    # Procesar cada fila (bus)
-    print("📦 Procesando vehículos y equipos...")
-    print("-" * 70)
-    
-    for idx, row in df.iterrows():
-        cod_bus = row.get('COD_BUS')
-        if pd.isna(cod_bus):
-            continue
-        
-        cod_bus_str = str(int(cod_bus) if isinstance(cod_bus, float) else cod_bus)
+def codigo_bus(cod_bus) -> Optional[str]:
+    """COD_BUS como texto ('321', no '321.0'); None si la celda está vacía."""
+    if pd.isna(cod_bus):
+        return None
+    return str(int(cod_bus) if isinstance(cod_bus, float) else cod_bus)
+
+
+class SubidaFlota:
+    """
+    Escritura de vehículos e inventario con su auditoría, fila a fila.
+    Igual con EscritorLotes que con EscritorAsync (--async).
+    """
+
+    def __init__(self, escritor, tenant_id: str, operador_nombre: Optional[str]):
+        self.escritor = escritor
+        self.tenant_id = tenant_id
+        self.operador_nombre = operador_nombre
+        self.auditoria_activos = ManifiestoAuditoria(
+            escritor.db, 'importar_flota', 'activo', tenant_id=tenant_id,
+            usuario_id='importacion_excel', escritor=escritor,
+        )
+        self.auditoria_inventario = ManifiestoAuditoria(
+            escritor.db, 'importar_flota', 'inventario', tenant_id=tenant_id,
+            usuario_id='importacion_excel', escritor=escritor,
+        )
+        self.total_buses = 0
+        self.total_equipos = 0
+
+    def fila(self, row, existentes: Dict[str, Dict[str, Any]]) -> bool:
+        """Encola el vehículo de una fila y sus equipos; False si no tiene COD_BUS."""
+        cod_bus_str = codigo_bus(row.get('COD_BUS'))
+        if cod_bus_str is None:
+            return False
         matricula = procesar_matricula(row.get('MATRICULA'))
         
         print(f"   📦 Procesando bus {cod_bus_str} ({matricula})...")
@@ -306,8 +225,8 @@ def importar_flota():
             # Campos adicionales del modelo de datos
             'tipo': 'autobus',
             'estado': 'operativo',
-            'tenantId': TENANT_ID,
-            'operadorNombre': OPERADOR_NOMBRE,
+            'tenantId': self.tenant_id,
+            'operadorNombre': self.operador_nombre,
             'createdAt': firestore.SERVER_TIMESTAMP,
             'updatedAt': firestore.SERVER_TIMESTAMP,
         }
@@ -316,12 +235,10 @@ def importar_flota():
         activo_data = {k: v for k, v in activo_data.items() if v is not None}
         
         # Referencia al documento usando COD_BUS como ID
-        activo_ref = db.collection(f'tenants/{TENANT_ID}/activos').document(cod_bus_str)
-        batch.set(activo_ref, activo_data)
-        operaciones_batch += 1
-        total_buses += 1
-        
-        commit_si_necesario()
+        activo_ref = self.escritor.db.collection(f'tenants/{self.tenant_id}/activos').document(cod_bus_str)
+        self.escritor.set(activo_ref, activo_data)
+        self.auditoria_activos.registrar(cod_bus_str, existentes.get(cod_bus_str), activo_data)
+        self.total_buses += 1
         
         # =====================================================================
         # 2. CREAR DOCUMENTOS DE EQUIPOS (INVENTARIO)
@@ -343,7 +260,7 @@ def importar_flota():
                 'activoCodigo': cod_bus_str,
                 'activoMatricula': matricula,
                 'estado': 'instalado',
-                'tenantId': TENANT_ID,
+                'tenantId': self.tenant_id,
                 'origenColumna': col_excel,  # Para trazabilidad
                 'createdAt': firestore.SERVER_TIMESTAMP,
                 'updatedAt': firestore.SERVER_TIMESTAMP,
@@ -357,17 +274,144 @@ def importar_flota():
                     equipo_data['telefono'] = str(telefono)
             
             # Crear documento con ID automático
-            equipo_ref = db.collection(f'tenants/{TENANT_ID}/inventario').document()
-            batch.set(equipo_ref, equipo_data)
-            operaciones_batch += 1
-            total_equipos += 1
-            
-            commit_si_necesario()
+            equipo_ref = self.escritor.db.collection(f'tenants/{self.tenant_id}/inventario').document()
+            self.escritor.set(equipo_ref, equipo_data)
+            self.auditoria_inventario.registrar(equipo_ref.id, None, equipo_data)
+            self.total_equipos += 1
+        
+        return True
+
+    def cerrar(self) -> tuple:
+        """Resúmenes de auditoría (activos, inventario), encolados en el escritor."""
+        return self.auditoria_activos.cerrar(), self.auditoria_inventario.cerrar()
+
+
+async def subir_flota_async(df, tenant_id: str, operador_nombre: Optional[str], concurrencia: int = LIMITE_POR_COLECCION):
+    """
+    Filas del Excel como tubería: lotes de filas -> activos existentes
+    (varios get_all en vuelo) -> SubidaFlota -> commits concurrentes.
+    """
+    cliente = conectar_firestore_async()
+    limites = Limites(concurrencia)
+    escritor = EscritorAsync(cliente, limites)
+    subida = SubidaFlota(escritor, tenant_id, operador_nombre)
+    existian = 0
+
+    async def leer(lote: list):
+        nonlocal existian
+        codigos = [c for c in (codigo_bus(row.get('COD_BUS')) for _, row in lote) if c is not None]
+        existentes = await leer_por_ids_async(cliente, f'tenants/{tenant_id}/activos', codigos, limites)
+        existian += len(existentes)
+        return lote, existentes
+
+    async def escribir(leido) -> None:
+        lote, existentes = leido
+        for _, row in lote:
+            subida.fila(row, existentes)
+        await escritor.ceder()
+
+    await tuberia(lotes(df.iterrows(), TAM_LOTE_LECTURA), [(leer, limites.por_defecto), (escribir, 1)])
+    resumenes = subida.cerrar()
+    print(f"   📋 {existian} vehículos ya existían en {tenant_id}")
+    print(f"   💾 Guardando batches ({escritor.operaciones} operaciones)...")
+    await escritor.cerrar()
+    return subida, resumenes
+
+
+# =============================================================================
+# FUNCIÓN PRINCIPAL DE IMPORTACIÓN
+# =============================================================================
+
+def importar_flota(
+    excel_path: Path = EXCEL_PATH,
+    tenant_id: Optional[str] = TENANT_ID,
+    operador_nombre: Optional[str] = OPERADOR_NOMBRE,
+    contexto: Optional[Contexto] = None,
+    asincrono: bool = False,
+    concurrencia: int = LIMITE_POR_COLECCION,
+):
+    """
+    Función principal que ejecuta la importación.
+
+    Con contexto, usa su escritor y su cache (el libro Excel se lee una vez
+    por ejecución de zaintzabus.py aunque lo usen varias etapas). Con
+    asincrono, lecturas y escrituras van por el AsyncClient (pipeline_async.py).
+    """
+    contexto = contexto or Contexto()
+    excel_path = Path(excel_path)
     
-    # Commit final de las operaciones restantes
-    if operaciones_batch > 0:
-        print(f"   💾 Guardando batch final ({operaciones_batch} operaciones)...")
-        batch.commit()
+    # Verificar que existe el archivo Excel
+    if not excel_path.exists():
+        raise FileNotFoundError(f"❌ No se encontró el archivo Excel: {excel_path}")
+    
+    # Auto-detectar operador desde el Excel si no está configurado
+    if tenant_id is None or operador_nombre is None:
+        print("🔍 Detectando operador desde el archivo Excel...")
+        detected_tenant, detected_nombre, detected_codigo = leer_operador_desde_excel(excel_path, contexto)
+        
+        if tenant_id is None:
+            tenant_id = detected_tenant
+        if operador_nombre is None:
+            operador_nombre = detected_nombre
+        
+        print(f"   📋 Operador detectado: {operador_nombre}")
+        print(f"   📋 Código de operador: {detected_codigo}")
+        print(f"   📋 Tenant ID generado: {tenant_id}")
+        print()
+    
+    print("=" * 70)
+    print(f"🚀 INICIANDO IMPORTACIÓN PARA {operador_nombre}")
+    print("=" * 70)
+    print(f"   Archivo Excel: {excel_path}")
+    print(f"   Tenant ID: {tenant_id}")
+    print()
+    
+    # Inicializar Firebase
+    print("🔥 Conectando con Firestore...")
+    db = contexto.db
+    print("   ✅ Conexión establecida")
+    print()
+    
+    # Leer Excel
+    print("📊 Leyendo archivo Excel...")
+    df = contexto.leer_excel(excel_path, cabecera=FILA_CABECERA)
+    
+    # IMPORTANTE: Limpiar nombres de columnas (quitar espacios)
+    df.columns = df.columns.str.strip()
+    
+    print(f"   ✅ {len(df)} filas leídas")
+    print()
+    
+    if asincrono:
+        print("📦 Procesando vehículos y equipos (async)...")
+        print("-" * 70)
+        subida, (resumen_activos, resumen_inventario) = asyncio.run(
+            subir_flota_async(df, tenant_id, operador_nombre, concurrencia)
+        )
+        contexto.adjuntar(subida.escritor)
+    else:
+        # Activos ya existentes, para auditar sólo los campos que cambian
+        codigos = [c for c in map(codigo_bus, df['COD_BUS']) if c is not None]
+        existentes = leer_por_ids(db, f'tenants/{tenant_id}/activos', codigos)
+        print(f"   📋 {len(existentes)} vehículos ya existían en {tenant_id}")
+        print()
+        
+        # Batches de hasta 500 operaciones; la auditoría viaja en los mismos batches
+        escritor = contexto.escritor
+        subida = SubidaFlota(escritor, tenant_id, operador_nombre)
+        
+        # Procesar cada fila (bus)
+        print("📦 Procesando vehículos y equipos...")
+        print("-" * 70)
+        
+        for _idx, row in df.iterrows():
+            subida.fila(row, existentes)
+        
+        # Commit final de las operaciones restantes (incluida la auditoría)
+        resumen_activos, resumen_inventario = subida.cerrar()
+        print(f"   💾 Guardando batches ({escritor.operaciones} operaciones)...")
+        escritor.commit()
+    total_buses, total_equipos = subida.total_buses, subida.total_equipos
     
     # Resumen final
     print()
@@ -376,9 +420,13 @@ def importar_flota():
     print("=" * 70)
     print(f"   🚌 Vehículos subidos: {total_buses}")
     print(f"   🔧 Equipos subidos: {total_equipos}")
-    print(f"   📍 Tenant: {TENANT_ID}")
+    print(f"   📍 Tenant: {tenant_id}")
+    totales = resumen_activos['totales']
+    print(f"   📝 Auditoría: {totales['crear']} vehículos nuevos, {totales['actualizar']} con cambios, "
+          f"{totales['sinCambios']} sin cambios; "
+          f"{resumen_activos['partes'] + resumen_inventario['partes']} documentos de auditoría")
     print()
-    print(f"✅ Éxito: {total_buses} vehículos y {total_equipos} equipos subidos a {TENANT_ID}.")
+    print(f"✅ Éxito: {total_buses} vehículos y {total_equipos} equipos subidos a {tenant_id}.")
     print()
 
 
@@ -386,12 +434,27 @@ def importar_flota():
 # PUNTO DE ENTRADA
 # =============================================================================
 
-if __name__ == '__main__':
+def main(argv: Optional[List[str]] = None, contexto: Optional[Contexto] = None) -> int:
+    parser = argparse.ArgumentParser(description="Importa vehículos e inventario del Excel de flota de un operador.")
+    parser.add_argument('--excel', type=Path, default=EXCEL_PATH, help=f"Libro de flota (por defecto {EXCEL_PATH.name})")
+    parser.add_argument('--tenant', default=TENANT_ID, help="Tenant ID (por defecto, detectado del Excel)")
+    parser.add_argument('--nombre-operador', default=OPERADOR_NOMBRE)
+    parser.add_argument('--async', dest='asincrono', action='store_true',
+                        help="Lecturas y commits solapados con el AsyncClient (ver pipeline_async.py)")
+    parser.add_argument('--concurrencia', type=int, default=LIMITE_POR_COLECCION,
+                        help="Peticiones simultáneas por colección con --async")
+    args = parser.parse_args(argv)
+
     try:
-        importar_flota()
+        importar_flota(args.excel, args.tenant, args.nombre_operador, contexto, args.asincrono, args.concurrencia)
     except Exception as e:
         print()
         print("❌ ERROR DURANTE LA IMPORTACIÓN:")
         print(f"   {e}")
         print()
         raise
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
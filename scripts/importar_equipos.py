@@ -17,23 +17,43 @@ CONFIGURACIÓN:
 
 USO:
     python scripts/importar_equipos.py
+    python scripts/importar_equipos.py --excel "Archivos_Excel/Flota Ekialdebus.xlsx" --hoja EKIALDEBUS --si
+    python scripts/importar_equipos.py --limpiar
+    python scripts/importar_equipos.py --excel ... --si --orden intercalado   (ver orden_escritura.py)
+    python scripts/importar_equipos.py --excel ... --si --async      (ver pipeline_async.py)
+    python scripts/zaintzabus.py import-equipos --excel ...     (ver zaintzabus.py)
 
 AUTOR: ZaintzaBus Team
 FECHA: 2026-01-23
 =============================================================================
 """
 
-import pandas as pd
-import firebase_admin
-from firebase_admin import credentials, firestore
 from datetime import datetime
 from typing import Dict, List, Any, Optional
+import argparse
+import asyncio
 import re
 import sys
 
+from auditoria_lotes import CAMPOS_IGNORADOS, ManifiestoAuditoria
+from cliente_firestore import ModuloDiferido, conectar_firestore_async
+from contexto import Contexto
+from datos_referencia import referencia
+from manifiesto_bus import CambiosManifiesto
+from mapeo_columnas import FILA_CABECERA, get_mapeo_columnas_ekialdebus
+from orden_escritura import ESQUEMAS_ID, ORDENES, id_documento, ordenar
+from pipeline_async import (
+    LIMITE_POR_COLECCION, TAM_LOTE_LECTURA, EscritorAsync, Limites, leer_por_ids_async, lotes, tuberia,
+)
+from resumen_flota import DeltaResumen
+from snapshot import leer_por_ids
+
+pd = ModuloDiferido('pandas')
+
 # =============================================================================
 # CONFIGURACIÓN DEL OPERADOR
-# Solo necesitas cambiar ARCHIVO_EXCEL - el operador se detecta automáticamente
+# Valores por defecto de los argumentos (--excel, --hoja, --operador...);
+# el operador se detecta automáticamente
 # =============================================================================
 
 # Archivo Excel con los datos
@@ -43,7 +63,7 @@ ARCHIVO_EXCEL = "Archivos_Excel/Flota Ekialdebus.xlsx"
 HOJA_EXCEL = None
 
 # Fila donde empiezan los headers (0-indexed, fila 8 del Excel = índice 7)
-HEADER_ROW = 7
+HEADER_ROW = FILA_CABECERA
 
 # Columna que contiene el número de bus
 COLUMNA_BUS = "COD_BUS"
@@ -56,12 +76,21 @@ CODIGO_OPERADOR = None
 # Prefijo para IDs de autobús (se concatena con el número de bus)
 PREFIJO_BUS = "BUS"
 
+# Orden de escritura: 'secuencial' (por bus), 'aleatorio' o 'intercalado'.
+# En importaciones grandes, --orden intercalado reparte las escrituras entre
+# rangos de claves y evita el hotspot de IDs consecutivos (ver orden_escritura.py)
+ORDEN_ESCRITURA = "secuencial"
+
+# Esquema del ID de documento: 'codigo' (codigoInterno) o 'hash' (prefijo
+# de hash + codigoInterno). ¡Cambiarlo con equipos ya importados los duplica!
+ESQUEMA_ID = "codigo"
+
 
 # =============================================================================
 # FUNCIÓN DE AUTO-DETECCIÓN DE OPERADOR
 # =============================================================================
 
-def leer_operador_desde_excel(archivo_excel: str) -> tuple:
+def leer_operador_desde_excel(archivo_excel: str, contexto: Optional[Contexto] = None) -> tuple:
     """
     Lee automáticamente el nombre del operador y su código desde el Excel.
     
@@ -78,7 +107,7 @@ def leer_operador_desde_excel(archivo_excel: str) -> tuple:
     """
     try:
         # Leer las primeras filas sin headers
-        df_meta = pd.read_excel(archivo_excel, header=None, nrows=7)
+        df_meta = (contexto or Contexto()).leer_excel(archivo_excel, cabecera=None, nrows=7)
         
         operador_nombre = None
         codigo_operador = None
@@ -127,13 +156,12 @@ def leer_operador_desde_excel(archivo_excel: str) -> tuple:
     return operador_id, operador_nombre, codigo_operador
 
 
-def obtener_hoja_excel(archivo_excel: str, operador_nombre: str) -> str:
+def obtener_hoja_excel(archivo_excel: str, operador_nombre: str, contexto: Optional[Contexto] = None) -> str:
     """
     Obtiene el nombre de la hoja a usar en el Excel.
     Si la hoja con el nombre del operador existe, la usa. Si no, usa la primera hoja.
     """
-    xl = pd.ExcelFile(archivo_excel)
-    hojas = xl.sheet_names
+    hojas = (contexto or Contexto()).libro(archivo_excel).sheet_names
     
     # Intentar encontrar hoja con nombre del operador
     if operador_nombre:
@@ -262,76 +290,6 @@ TIPOS_EQUIPO = {
     },
 }
 
-# =============================================================================
-# MAPEO DE COLUMNAS DEL EXCEL
-# =============================================================================
-# Define qué columna del Excel corresponde a cada tipo de equipo
-# El formato es: "nombre_columna_excel": ("tipo_equipo", indice_si_multiple)
-# Si hay múltiples equipos del mismo tipo, usar índice (1, 2, 3...)
-
-def get_mapeo_columnas_ekialdebus() -> Dict[str, tuple]:
-    """
-    Mapeo específico para el Excel de Ekialdebus.
-    Retorna un diccionario donde:
-    - key: nombre de la columna en el Excel
-    - value: tupla (tipo_equipo, indice, campo_adicional)
-    
-    Columnas del Excel Ekialdebus:
-    - COD_BUS, MATRICULA, Nº Obra / Chasis, MODELO AUTOBÚS, CARROCERIA
-    - N. AMPLIFICADOR, N. CPU, LICENCIA, SWITCH, ROUTER
-    - IP SIM, SIM m2m, TELEFONO SIM m2m, SIM WIFI 3G, TELEFONO SIM WIFI 3G
-    - WIFI, COMMS 1, COMMS 2
-    - CAMARA 1, CAMARA 2, CAMARA 3, CAMARA 4
-    - PUPITE, VALIDADORA 1, VALIDADORA 2, VALIDADORA 3
-    """
-    return {
-        # Amplificador
-        "N. AMPLIFICADOR": ("amplificador", 1, "numeroSerie"),
-        
-        # CPU
-        "N. CPU": ("cpu", 1, "numeroSerie"),
-        
-        # Licencia
-        "LICENCIA": ("licencia_software", 1, "licencia"),
-        
-        # Switch
-        "SWITCH": ("switch", 1, "numeroSerie"),
-        
-        # Router
-        "ROUTER": ("router", 1, "numeroSerie"),
-        
-        # Módulo WiFi  
-        "WIFI": ("modulo_wifi", 1, "numeroSerie"),
-        
-        # Comunicaciones (hay 2)
-        "COMMS 1": ("comunicacion", 1, "numeroSerie"),
-        "COMMS 2": ("comunicacion", 2, "numeroSerie"),
-        
-        # Cámaras (hay 4)
-        "CAMARA 1": ("camara", 1, "mac"),
-        "CAMARA 2": ("camara", 2, "mac"),
-        "CAMARA 3": ("camara", 3, "mac"),
-        "CAMARA 4": ("camara", 4, "mac"),
-        
-        # Pupitre
-        "PUPITE": ("pupitre", 1, "numeroSerie"),
-        
-        # Validadoras (hay 3)
-        "VALIDADORA 1": ("validadora", 1, "numeroSerie"),
-        "VALIDADORA 2": ("validadora", 2, "numeroSerie"),
-        "VALIDADORA 3": ("validadora", 3, "numeroSerie"),
-        
-        # IP Fija (del SIM)
-        "IP SIM": ("ip_fija", 1, "ip"),
-        
-        # SIM Cards con teléfonos (hay 2: m2m y WiFi 3G)
-        "SIM m2m": ("sim_card", 1, "icc"),
-        "TELEFONO SIM m2m": ("sim_card", 1, "telefono"),
-        "SIM WIFI 3G": ("sim_card", 2, "icc"),
-        "TELEFONO SIM WIFI 3G": ("sim_card", 2, "telefono"),
-    }
-
-
 # =============================================================================
 # FUNCIONES AUXILIARES
 # =============================================================================
@@ -461,62 +419,146 @@ def agregar_datos_especificos(
     return equipo
 
 
+# =============================================================================
+# SUBIDA DE EQUIPOS (paso 4)
+# =============================================================================
+
+class SubidaEquipos:
+    """
+    Escritura de los equipos con su auditoría, resúmenes de flota y
+    manifiestos de autobús, en los mismos batches. Igual con EscritorLotes
+    que con EscritorAsync.
+    """
+
+    def __init__(self, escritor, operador_id: str):
+        self.escritor = escritor
+        self.manifiesto = ManifiestoAuditoria(
+            escritor.db,
+            script="importar_equipos",
+            entidad="inventario",
+            tenant_id=operador_id,
+            usuario_id="importacion_excel",
+            escritor=escritor,
+            ignorar=CAMPOS_IGNORADOS | {"fechas"},  # fechas se regeneran en cada importación
+        )
+        self.delta_resumen = DeltaResumen()
+        self.cambios_manifiesto = CambiosManifiesto()
+        self.existentes = 0
+
+    def equipo(self, doc_id: str, equipo: Dict[str, Any], existente: Optional[Dict[str, Any]]) -> None:
+        self.escritor.set(f"equipos/{doc_id}", equipo)
+        self.manifiesto.registrar(doc_id, existente, equipo)
+        self.delta_resumen.equipo(existente, equipo)
+        self.cambios_manifiesto.registrar(doc_id, existente, equipo)
+        self.existentes += existente is not None
+
+    def cerrar(self) -> tuple:
+        """(resumen de auditoría, resúmenes de flota, manifiestos de autobús) encolados."""
+        auditoria = self.manifiesto.cerrar()
+        resumenes = self.delta_resumen.escribir(self.escritor)
+        manifiestos_bus = self.cambios_manifiesto.escribir(self.escritor)
+        return auditoria, resumenes, manifiestos_bus
+
+
+async def subir_equipos_async(pendientes: List[tuple], operador_id: str, concurrencia: int = LIMITE_POR_COLECCION):
+    """
+    Paso 4 como tubería: lotes de IDs -> equipos existentes (varios get_all
+    en vuelo) -> SubidaEquipos -> commits concurrentes.
+    Devuelve (subida, resultado de subida.cerrar()).
+    """
+    cliente = conectar_firestore_async()
+    limites = Limites(concurrencia)
+    escritor = EscritorAsync(cliente, limites)
+    subida = SubidaEquipos(escritor, operador_id)
+
+    async def leer(lote: List[tuple]):
+        return lote, await leer_por_ids_async(cliente, "equipos", [doc_id for doc_id, _ in lote], limites)
+
+    async def escribir(leido) -> None:
+        lote, existentes = leido
+        for doc_id, equipo in lote:
+            subida.equipo(doc_id, equipo, existentes.get(doc_id))
+        await escritor.ceder()
+
+    await tuberia(lotes(pendientes, TAM_LOTE_LECTURA), [(leer, limites.por_defecto), (escribir, 1)])
+    resultado = subida.cerrar()
+    await escritor.cerrar()
+    print(f"      {escritor.operaciones} escrituras en {escritor.commits} commits (async)")
+    return subida, resultado
+
+
 # =============================================================================
 # FUNCIÓN PRINCIPAL DE IMPORTACIÓN
 # =============================================================================
 
-def importar_equipos():
-    """Función principal que ejecuta la importación."""
-    global OPERADOR_ID, OPERADOR_NOMBRE, CODIGO_OPERADOR, HOJA_EXCEL
+def importar_equipos(
+    archivo_excel: str = ARCHIVO_EXCEL,
+    hoja_excel: Optional[str] = HOJA_EXCEL,
+    header_row: int = HEADER_ROW,
+    operador_id: Optional[str] = OPERADOR_ID,
+    operador_nombre: Optional[str] = OPERADOR_NOMBRE,
+    codigo_operador: Optional[str] = CODIGO_OPERADOR,
+    orden_escritura: str = ORDEN_ESCRITURA,
+    esquema_id: str = ESQUEMA_ID,
+    confirmar: bool = True,
+    contexto: Optional[Contexto] = None,
+    asincrono: bool = False,
+    concurrencia: int = LIMITE_POR_COLECCION,
+) -> int:
+    """
+    Función principal que ejecuta la importación. Devuelve el código de salida.
+
+    Con contexto, usa su escritor y su cache (el libro Excel se lee una vez
+    por ejecución de zaintzabus.py aunque lo usen varias etapas). Con
+    asincrono, el paso 4 lee y escribe con el AsyncClient (pipeline_async.py).
+    """
+    contexto = contexto or Contexto(verbose=True)
     
     print("=" * 70)
     print("IMPORTADOR DE EQUIPOS A FIRESTORE - ZaintzaBus")
     print("=" * 70)
     
     # Auto-detectar operador si no está configurado
-    if OPERADOR_ID is None or OPERADOR_NOMBRE is None:
+    if operador_id is None or operador_nombre is None:
         print("\n🔍 Detectando operador desde el archivo Excel...")
-        detected_id, detected_nombre, detected_codigo = leer_operador_desde_excel(ARCHIVO_EXCEL)
+        detected_id, detected_nombre, detected_codigo = leer_operador_desde_excel(archivo_excel, contexto)
         
-        if OPERADOR_ID is None:
-            OPERADOR_ID = detected_id
-        if OPERADOR_NOMBRE is None:
-            OPERADOR_NOMBRE = detected_nombre
-        if CODIGO_OPERADOR is None:
-            CODIGO_OPERADOR = detected_codigo
+        if operador_id is None:
+            operador_id = detected_id
+        if operador_nombre is None:
+            operador_nombre = detected_nombre
+        if codigo_operador is None:
+            codigo_operador = detected_codigo
         
-        print(f"   📋 Operador detectado: {OPERADOR_NOMBRE}")
-        print(f"   📋 Código de operador: {CODIGO_OPERADOR}")
-        print(f"   📋 Tenant ID generado: {OPERADOR_ID}")
+        print(f"   📋 Operador detectado: {operador_nombre}")
+        print(f"   📋 Código de operador: {codigo_operador}")
+        print(f"   📋 Tenant ID generado: {operador_id}")
     
     # Auto-detectar hoja si no está configurada
-    if HOJA_EXCEL is None:
-        HOJA_EXCEL = obtener_hoja_excel(ARCHIVO_EXCEL, OPERADOR_NOMBRE)
-        print(f"   📋 Hoja detectada: {HOJA_EXCEL}")
+    if hoja_excel is None:
+        hoja_excel = obtener_hoja_excel(archivo_excel, operador_nombre, contexto)
+        print(f"   📋 Hoja detectada: {hoja_excel}")
     
-    print(f"\nOperador: {OPERADOR_NOMBRE} ({OPERADOR_ID})")
-    print(f"Archivo: {ARCHIVO_EXCEL}")
-    print(f"Hoja: {HOJA_EXCEL}")
+    print(f"\nOperador: {operador_nombre} ({operador_id})")
+    print(f"Archivo: {archivo_excel}")
+    print(f"Hoja: {hoja_excel}")
     print()
     
     # Inicializar Firebase
     print("[1/5] Inicializando Firebase...")
-    if not firebase_admin._apps:
-        cred = credentials.Certificate("scripts/serviceAccountKey.json")
-        firebase_admin.initialize_app(cred)
-    db = firestore.client()
+    db = contexto.db
     print("      Firebase inicializado correctamente")
     
     # Leer Excel
     print(f"\n[2/5] Leyendo archivo Excel...")
     try:
-        df = pd.read_excel(ARCHIVO_EXCEL, sheet_name=HOJA_EXCEL, header=HEADER_ROW)
+        df = contexto.leer_excel(archivo_excel, hoja_excel, header_row)
         df.columns = df.columns.str.strip()  # Limpiar espacios en nombres de columnas
         print(f"      Filas encontradas: {len(df)}")
         print(f"      Columnas: {list(df.columns)[:10]}...")  # Mostrar primeras 10
     except Exception as e:
         print(f"      ERROR: No se pudo leer el archivo Excel: {e}")
-        sys.exit(1)
+        return 1
     
     # Obtener mapeo de columnas
     mapeo = get_mapeo_columnas_ekialdebus()
@@ -564,7 +606,7 @@ def importar_equipos():
                 tipo_key=tipo,
                 bus_id=bus_id,
                 bus_codigo=bus_codigo,
-                operador_id=OPERADOR_ID,
+                operador_id=operador_id,
             )
             
             # Agregar datos específicos
@@ -593,63 +635,67 @@ def importar_equipos():
     
     # Primero, verificar si ya existen equipos y preguntar
     existing_check = db.collection("equipos").limit(5).get()
-    if len(existing_check) > 0:
+    if len(existing_check) > 0 and confirmar:
         print(f"      AVISO: Ya existen {len(existing_check)}+ equipos en la coleccion.")
         respuesta = input("      Desea continuar y agregar los nuevos? (s/n): ")
         if respuesta.lower() != 's':
             print("      Importacion cancelada.")
-            sys.exit(0)
-    
-    # Usar batches para mejor rendimiento
-    BATCH_SIZE = 500
-    batch = db.batch()
-    batch_count = 0
-    total_subidos = 0
-    
-    for equipo in equipos_a_subir:
-        # Usar codigoInterno como ID del documento para facilitar búsquedas
-        doc_id = equipo["codigoInterno"].replace("/", "-")
-        doc_ref = db.collection("equipos").document(doc_id)
-        batch.set(doc_ref, equipo)
-        batch_count += 1
+            return 0
+    
+    # ID del documento derivado de codigoInterno (que se guarda también como campo)
+    pendientes = ordenar(
+        [(id_documento(equipo["codigoInterno"], esquema_id), equipo) for equipo in equipos_a_subir],
+        clave=lambda par: par[0],
+        modo=orden_escritura,
+    )
+    doc_ids = [doc_id for doc_id, _equipo in pendientes]
+    print(f"      Orden de escritura: {orden_escritura}, IDs: {esquema_id}")
+    
+    if asincrono:
+        subida, (auditoria, resumenes, manifiestos_bus) = asyncio.run(
+            subir_equipos_async(pendientes, operador_id, concurrencia)
+        )
+        contexto.adjuntar(subida.escritor)
+        print(f"      Equipos ya existentes: {subida.existentes}")
+    else:
+        # Leer los equipos que ya existen para auditar sólo lo que cambia
+        existentes = leer_por_ids(db, "equipos", doc_ids)
+        print(f"      Equipos ya existentes: {len(existentes)}")
         
-        if batch_count >= BATCH_SIZE:
-            print(f"      Guardando batch ({batch_count} operaciones)...")
-            batch.commit()
-            total_subidos += batch_count
-            batch = db.batch()
-            batch_count = 0
-    
-    # Guardar batch final
-    if batch_count > 0:
-        print(f"      Guardando batch final ({batch_count} operaciones)...")
-        batch.commit()
-        total_subidos += batch_count
-    
-    # Crear/actualizar tipos de equipo en el catálogo
+        # Usar batches para mejor rendimiento; la auditoría viaja en los mismos batches
+        escritor = contexto.escritor
+        subida = SubidaEquipos(escritor, operador_id)
+        for doc_id, equipo in pendientes:
+            subida.equipo(doc_id, equipo, existentes.get(doc_id))
+        auditoria, resumenes, manifiestos_bus = subida.cerrar()
+        escritor.commit()
+    manifiesto = subida.manifiesto
+    total_subidos = len(equipos_a_subir)
+    totales = auditoria["totales"]
+    print(f"      Auditoria ({manifiesto.ejecucion_id}): {totales['crear']} altas, "
+          f"{totales['actualizar']} con cambios, {totales['sinCambios']} sin cambios "
+          f"en {auditoria['partes']} documento(s)")
+    print(f"      Resumenes de flota actualizados: {resumenes}")
+    print(f"      Manifiestos de autobus actualizados: {manifiestos_bus}")
+    
+    # Crear/actualizar tipos de equipo en el catálogo: sólo los que difieren
+    # de la copia en cache (ver datos_referencia.py)
     print(f"\n[5/5] Actualizando catalogo de tipos de equipo...")
-    tipos_batch = db.batch()
-    
-    for tipo_key, tipo_config in TIPOS_EQUIPO.items():
-        if tipo_key in tipos_conteo:  # Solo tipos que se usaron
-            doc_ref = db.collection("tipos_equipo").document(tipo_key)
-            tipo_doc = {
-                "codigo": tipo_config["codigo"],
-                "nombre": tipo_config["nombre"],
-                "categoria": tipo_config["categoria"],
-                "campos": tipo_config["campos"],
-                "activo": True,
-                "auditoria": {
-                    "creadoPor": "importacion_excel",
-                    "creadoEn": datetime.utcnow(),
-                    "modificadoPor": "importacion_excel",
-                    "modificadoEn": datetime.utcnow(),
-                },
-            }
-            tipos_batch.set(doc_ref, tipo_doc, merge=True)
-    
-    tipos_batch.commit()
-    print(f"      Tipos de equipo actualizados: {len(tipos_conteo)}")
+    tipos_docs = {
+        tipo_key: {
+            "codigo": tipo_config["codigo"],
+            "nombre": tipo_config["nombre"],
+            "categoria": tipo_config["categoria"],
+            "campos": tipo_config["campos"],
+            "activo": True,
+        }
+        for tipo_key, tipo_config in TIPOS_EQUIPO.items()
+        if tipo_key in tipos_conteo  # Solo tipos que se usaron
+    }
+    escritor = contexto.escritor
+    tipos_escritos = referencia(db).escribir("tipos_equipo", tipos_docs, escritor, usuario="importacion_excel")
+    escritor.commit()
+    print(f"      Tipos de equipo actualizados: {tipos_escritos} de {len(tipos_conteo)} (el resto sin cambios)")
     
     # Resumen final
     print("\n" + "=" * 70)
@@ -663,55 +709,66 @@ def importar_equipos():
     print("  - Seccion 'Equipos' de la aplicacion")
     print("  - Vista de equipos de cada autobus en 'Flota'")
     print("=" * 70)
+    return 0
 
 
 # =============================================================================
 # SCRIPT DE LIMPIEZA (opcional)
 # =============================================================================
 
-def limpiar_equipos_existentes():
-    """Elimina todos los equipos de la colección (usar con cuidado)."""
-    
-    print("AVISO: Esta accion eliminara TODOS los equipos de Firestore.")
-    confirmacion = input("Escribe 'ELIMINAR' para confirmar: ")
-    
-    if confirmacion != "ELIMINAR":
-        print("Operacion cancelada.")
-        return
-    
-    if not firebase_admin._apps:
-        cred = credentials.Certificate("scripts/serviceAccountKey.json")
-        firebase_admin.initialize_app(cred)
-    
-    db = firestore.client()
-    
-    # Obtener todos los documentos
-    docs = db.collection("equipos").stream()
-    
-    batch = db.batch()
-    count = 0
-    
-    for doc in docs:
-        batch.delete(doc.reference)
-        count += 1
-        
-        if count % 500 == 0:
-            batch.commit()
-            print(f"Eliminados {count} documentos...")
-            batch = db.batch()
-    
-    if count % 500 != 0:
-        batch.commit()
+def limpiar_equipos_existentes(
+    archivo_excel: str = ARCHIVO_EXCEL, operador_id: Optional[str] = OPERADOR_ID, contexto: Optional[Contexto] = None
+) -> int:
+    """
+    Elimina los equipos del operador del Excel (usar con cuidado).
+
+    Sólo toca los equipos de ese operador y limpia sus resúmenes y
+    manifiestos; para otros alcances (un bus, una ejecución) ver purgar.py.
+    """
+    from purgar import main as purgar
     
-    print(f"Total eliminados: {count} equipos")
+    operador_id = operador_id or leer_operador_desde_excel(archivo_excel, contexto)[0]
+    print(f"Operador: {operador_id}")
+    return purgar(["--tenant", operador_id], contexto)
 
 
 # =============================================================================
 # PUNTO DE ENTRADA
 # =============================================================================
 
+def main(argv: Optional[List[str]] = None, contexto: Optional[Contexto] = None) -> int:
+    parser = argparse.ArgumentParser(description="Importa equipos del Excel de flota a la colección 'equipos'.")
+    parser.add_argument("--excel", default=ARCHIVO_EXCEL, help=f"Libro de flota (por defecto {ARCHIVO_EXCEL})")
+    parser.add_argument("--hoja", default=HOJA_EXCEL, help="Hoja (por defecto, la del operador o la primera)")
+    parser.add_argument("--cabecera", type=int, default=HEADER_ROW, help="Fila de cabecera, 0-indexed")
+    parser.add_argument("--operador", default=OPERADOR_ID, help="Tenant ID (por defecto, detectado del Excel)")
+    parser.add_argument("--nombre-operador", default=OPERADOR_NOMBRE)
+    parser.add_argument("--orden", choices=ORDENES, default=ORDEN_ESCRITURA, help="Orden de escritura")
+    parser.add_argument("--esquema-id", choices=ESQUEMAS_ID, default=ESQUEMA_ID, help="Esquema del ID de documento")
+    parser.add_argument("--si", action="store_true", help="No preguntar si ya hay equipos")
+    parser.add_argument("--limpiar", action="store_true", help="Eliminar los equipos del operador del Excel")
+    parser.add_argument("--async", dest="asincrono", action="store_true",
+                        help="Lecturas y commits solapados con el AsyncClient (ver pipeline_async.py)")
+    parser.add_argument("--concurrencia", type=int, default=LIMITE_POR_COLECCION,
+                        help="Peticiones simultáneas por colección con --async")
+    args = parser.parse_args(argv)
+
+    if args.limpiar:
+        return limpiar_equipos_existentes(args.excel, args.operador, contexto)
+    return importar_equipos(
+        archivo_excel=args.excel,
+        hoja_excel=args.hoja,
+        header_row=args.cabecera,
+        operador_id=args.operador,
+        operador_nombre=args.nombre_operador,
+        orden_escritura=args.orden,
+        esquema_id=args.esquema_id,
+        confirmar=not args.si,
+        contexto=contexto,
+        asincrono=args.asincrono,
+        concurrencia=args.concurrencia,
+    )
+
+
 if __name__ == "__main__":
-    if len(sys.argv) > 1 and sys.argv[1] == "--limpiar":
-        limpiar_equipos_existentes()
-    else:
-        importar_equipos()
+    sys.exit(main())
@@ -0,0 +1,420 @@
+"""
+=============================================================================
+ÍNDICE DE BÚSQUEDA PARCIAL DE EQUIPOS - ZaintzaBus
+=============================================================================
+searchTerms sólo guarda tokens enteros, así que con array-contains no se
+puede buscar "parte" de un número de serie o de una MAC. Este índice genera
+para cada campo buscable:
+
+  - prefijos de 1 a LONGITUD_PREFIJO caracteres  ('p:sn4', 'p:sn48'...)
+  - trigramas del valor (hasta LONGITUD_MAXIMA)   ('t:n48', 't:482'...)
+
+y guarda una lista de apariciones (posting list) por token: números de
+documento ordenados, codificados como deltas varint. Una búsqueda toma los
+tokens del texto, intersecta sus listas empezando por la más corta y
+confirma cada candidato contra los valores guardados (los trigramas dan
+falsos positivos).
+
+Campos: codigoInterno, tipoEquipoNombre, numeroSerieFabricante, red.ip,
+red.mac (también sin separadores) y sim.msisdn / sim.icc.
+
+Almacenamiento:
+  - archivo local (JSON comprimido) construido desde un snapshot o en vivo
+  - documentos en Firestore, repartidos por hash del token:
+        indice_busqueda/equipos                        (metadatos)
+        indice_busqueda/equipos/fragmentos/{NNN}       (tokens y postings)
+        indice_busqueda/equipos/documentos/{NNN}       (IDs y valores)
+    Los arrays de fragmentos y documentos están exentos de índices
+    (fieldOverrides en firestore.indexes.json): sólo se leen por ruta, y
+    con índice cada fragmento rozaría el límite de 40.000 entradas de índice
+    por documento y cada publicación las reescribiría todas.
+
+USO:
+    python scripts/indice_busqueda.py construir --snapshot snapshot/ --salida indice.json.gz
+    python scripts/indice_busqueda.py construir --publicar
+    python scripts/indice_busqueda.py buscar 4821 --indice indice.json.gz
+    python scripts/indice_busqueda.py buscar aa:bb --campo mac
+=============================================================================
+"""
+
+import argparse
+import base64
+import gzip
+import json
+import re
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from snapshot import Documento, obtener_campo
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+RUTA_INDICE = 'indice_busqueda/equipos'
+VERSION = 1
+
+# Campos buscables: nombre corto -> ruta en el documento
+CAMPOS = {
+    'codigo': 'codigoInterno',
+    'tipo': 'tipoEquipoNombre',
+    'serie': 'numeroSerieFabricante',
+    'ip': 'red.ip',
+    'mac': 'red.mac',
+    'msisdn': 'sim.msisdn',
+    'icc': 'sim.icc',
+}
+
+# Proyección al leer en vivo
+CAMPOS_LECTURA = list(CAMPOS.values())
+
+LONGITUD_PREFIJO = 12
+LONGITUD_MAXIMA = 40  # caracteres de cada valor que entran en los trigramas
+
+# Tamaño objetivo de cada documento de Firestore (límite: 1 MiB)
+BYTES_FRAGMENTO = 600_000
+DOCUMENTOS_POR_FRAGMENTO = 5000
+
+_SEPARADORES_MAC = re.compile(r'[:\-.]')
+
+Valor = Tuple[str, str]  # (campo, valor normalizado)
+
+
+# =============================================================================
+# TOKENS
+# =============================================================================
+
+def normalizar(texto: str) -> str:
+    return str(texto).strip().lower()
+
+
+def valores_documento(data: Dict[str, Any]) -> List[Valor]:
+    """Valores buscables (normalizados) de un equipo."""
+    valores = []
+    for campo, ruta in CAMPOS.items():
+        valor = obtener_campo(data, ruta)
+        if valor in (None, ''):
+            continue
+        valor = normalizar(valor)
+        valores.append((campo, valor))
+        if campo == 'mac':
+            compacta = _SEPARADORES_MAC.sub('', valor)
+            if compacta != valor:
+                valores.append((campo, compacta))
+    return valores
+
+
+def tokens_valor(valor: str) -> Set[str]:
+    """Prefijos y trigramas acotados de un valor."""
+    tokens = {f"p:{valor[:n]}" for n in range(1, min(len(valor), LONGITUD_PREFIJO) + 1)}
+    recorte = valor[:LONGITUD_MAXIMA]
+    tokens.update(f"t:{recorte[i:i + 3]}" for i in range(len(recorte) - 2))
+    return tokens
+
+
+def tokens_consulta(termino: str) -> List[str]:
+    """
+    Tokens que debe tener cualquier valor que contenga `termino`.
+
+    Con menos de 3 caracteres no hay trigramas: se busca por prefijo.
+    """
+    if len(termino) < 3:
+        return [f"p:{termino}"]
+    recorte = termino[:LONGITUD_MAXIMA]
+    return sorted({f"t:{recorte[i:i + 3]}" for i in range(len(recorte) - 2)})
+
+
+# =============================================================================
+# POSTINGS
+# =============================================================================
+
+def empaquetar(numeros: Sequence[int]) -> bytes:
+    """Lista ordenada de enteros -> deltas varint."""
+    salida = bytearray()
+    anterior = 0
+    for n in numeros:
+        delta = n - anterior
+        anterior = n
+        while delta >= 0x80:
+            salida.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        salida.append(delta)
+    return bytes(salida)
+
+
+def desempaquetar(datos: bytes) -> List[int]:
+    numeros = []
+    actual = desplazamiento = valor = 0
+    for byte in datos:
+        valor |= (byte & 0x7F) << desplazamiento
+        if byte & 0x80:
+            desplazamiento += 7
+            continue
+        actual += valor
+        numeros.append(actual)
+        valor = desplazamiento = 0
+    return numeros
+
+
+def _fragmento(token: str, fragmentos: int) -> int:
+    return zlib.crc32(token.encode('utf-8')) % fragmentos
+
+
+# =============================================================================
+# ÍNDICE
+# =============================================================================
+
+class IndiceBusqueda:
+    """
+    Índice en memoria: IDs, valores por documento y postings empaquetados.
+
+    Los postings se desempaquetan sólo para los tokens de cada consulta.
+    """
+
+    def __init__(self):
+        self.ids: List[str] = []
+        self.valores: List[List[Valor]] = []
+        self.postings: Dict[str, bytes] = {}
+
+    @classmethod
+    def construir(cls, docs: Iterable[Documento]) -> 'IndiceBusqueda':
+        indice = cls()
+        listas: Dict[str, List[int]] = {}
+        for numero, (doc_id, data) in enumerate(sorted(docs, key=lambda d: d[0])):
+            valores = valores_documento(data)
+            indice.ids.append(doc_id)
+            indice.valores.append(valores)
+            tokens = set()
+            for _campo, valor in valores:
+                tokens |= tokens_valor(valor)
+            for token in tokens:
+                listas.setdefault(token, []).append(numero)
+        indice.postings = {token: empaquetar(lista) for token, lista in listas.items()}
+        return indice
+
+    def _lista(self, token: str) -> Optional[bytes]:
+        return self.postings.get(token)
+
+    def candidatos(self, termino: str) -> Set[int]:
+        """Documentos que tienen todos los tokens del término."""
+        listas = [self._lista(token) for token in tokens_consulta(termino)]
+        if any(lista is None for lista in listas):
+            return set()
+        listas.sort(key=len)
+        resultado = set(desempaquetar(listas[0]))
+        for lista in listas[1:]:
+            if not resultado:
+                break
+            resultado.intersection_update(desempaquetar(lista))
+        return resultado
+
+    def buscar(self, texto: str, campo: Optional[str] = None, limite: Optional[int] = 50) -> List[str]:
+        """
+        IDs de los equipos que contienen cada palabra de `texto` en algún
+        campo buscable (o en `campo` si se indica), por orden de ID.
+
+        Las palabras de menos de 3 caracteres no tienen trigramas: si van
+        solas se buscan como prefijo y, si no, se comprueban sobre los
+        candidatos de las demás.
+        """
+        terminos = normalizar(texto).split()
+        if not terminos:
+            return []
+        if campo == 'mac':
+            terminos = [_SEPARADORES_MAC.sub('', t) or t for t in terminos]
+        terminos.sort(key=len, reverse=True)
+
+        encontrados: Optional[Set[int]] = None
+        for termino in terminos:
+            corto = len(termino) < 3
+            if encontrados is None:
+                candidatos = self.candidatos(termino)
+            elif corto:
+                candidatos = encontrados
+            else:
+                candidatos = self.candidatos(termino) & encontrados
+            prefijo = corto and encontrados is None
+            encontrados = {
+                n for n in candidatos
+                if any(
+                    valor.startswith(termino) if prefijo else termino in valor
+                    for c, valor in self.valores[n] if campo is None or c == campo
+                )
+            }
+            if not encontrados:
+                return []
+        ids = [self.ids[n] for n in sorted(encontrados)]
+        return ids[:limite] if limite else ids
+
+    # -- Archivo local ---------------------------------------------------------
+
+    def guardar(self, archivo: Path) -> None:
+        contenido = {
+            'version': VERSION,
+            'ids': self.ids,
+            'valores': [[list(v) for v in valores] for valores in self.valores],
+            'postings': {t: base64.b64encode(p).decode('ascii') for t, p in self.postings.items()},
+        }
+        with gzip.open(archivo, 'wt', encoding='utf-8') as f:
+            json.dump(contenido, f, ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def cargar(cls, archivo: Path) -> 'IndiceBusqueda':
+        with gzip.open(archivo, 'rt', encoding='utf-8') as f:
+            contenido = json.load(f)
+        if contenido.get('version') != VERSION:
+            raise ValueError(f"{archivo}: versión de índice {contenido.get('version')}, se esperaba {VERSION}")
+        indice = cls()
+        indice.ids = contenido['ids']
+        indice.valores = [[tuple(v) for v in valores] for valores in contenido['valores']]
+        indice.postings = {t: base64.b64decode(p) for t, p in contenido['postings'].items()}
+        return indice
+
+    # -- Firestore -------------------------------------------------------------
+
+    def publicar(self, db) -> Dict[str, int]:
+        """
+        Reescribe el índice en Firestore (fragmentos por hash de token).
+        Requiere las exenciones de índice de firestore.indexes.json
+        (firebase deploy --only firestore:indexes).
+        """
+        from firebase_admin import firestore
+        from escritor import EscritorLotes
+
+        volumen = sum(len(t) + len(p) + 16 for t, p in self.postings.items())
+        fragmentos = volumen // BYTES_FRAGMENTO + 1
+        por_fragmento: List[Dict[str, list]] = [{'tokens': [], 'postings': []} for _ in range(fragmentos)]
+        for token in sorted(self.postings):
+            destino = por_fragmento[_fragmento(token, fragmentos)]
+            destino['tokens'].append(token)
+            destino['postings'].append(self.postings[token])
+
+        bloques = range(0, len(self.ids), DOCUMENTOS_POR_FRAGMENTO)
+        # Documentos de hasta ~1 MiB: pocos por batch (límite de 10 MiB por petición)
+        with EscritorLotes(db, limite=5) as escritor:
+            for coleccion in ('fragmentos', 'documentos'):
+                for ref in db.collection(f"{RUTA_INDICE}/{coleccion}").list_documents():
+                    escritor.delete(ref)
+            escritor.commit()
+            for n, contenido in enumerate(por_fragmento):
+                escritor.set(f"{RUTA_INDICE}/fragmentos/{n:03d}", contenido)
+            for n, inicio in enumerate(bloques):
+                fin = inicio + DOCUMENTOS_POR_FRAGMENTO
+                escritor.set(f"{RUTA_INDICE}/documentos/{n:03d}", {
+                    'ids': self.ids[inicio:fin],
+                    # Firestore no admite listas anidadas: 'campo\tvalor' separados por '\n'
+                    'valores': ['\n'.join(f"{c}\t{v}" for c, v in valores) for valores in self.valores[inicio:fin]],
+                })
+            escritor.set(RUTA_INDICE, {
+                'version': VERSION,
+                'documentos': len(self.ids),
+                'tokens': len(self.postings),
+                'fragmentos': fragmentos,
+                'bloquesDocumentos': len(bloques),
+                'generadoEn': firestore.SERVER_TIMESTAMP,
+            })
+        return {'fragmentos': fragmentos, 'bloques': len(bloques), 'tokens': len(self.postings)}
+
+
+class IndiceFirestore(IndiceBusqueda):
+    """
+    Índice publicado en Firestore: los fragmentos se leen según los tokens
+    que pida cada consulta y se guardan en memoria para las siguientes.
+    """
+
+    def __init__(self, db):
+        super().__init__()
+        self.db = db
+        meta = db.document(RUTA_INDICE).get()
+        if not meta.exists:
+            raise ValueError(f"No existe {RUTA_INDICE}: ejecuta 'construir --publicar' primero")
+        meta = meta.to_dict()
+        if meta.get('version') != VERSION:
+            raise ValueError(f"Versión de índice {meta.get('version')}, se esperaba {VERSION}")
+        self.fragmentos = meta['fragmentos']
+        self._leidos: Set[int] = set()
+        refs = [db.document(f"{RUTA_INDICE}/documentos/{n:03d}") for n in range(meta['bloquesDocumentos'])]
+        for snap in sorted(db.get_all(refs), key=lambda s: s.id):
+            bloque = snap.to_dict() or {}
+            self.ids.extend(bloque.get('ids', []))
+            self.valores.extend(
+                [tuple(linea.split('\t', 1)) for linea in texto.split('\n') if linea]
+                for texto in bloque.get('valores', [])
+            )
+
+    def candidatos(self, termino: str) -> Set[int]:
+        pendientes = {_fragmento(t, self.fragmentos) for t in tokens_consulta(termino)} - self._leidos
+        if pendientes:
+            refs = [self.db.document(f"{RUTA_INDICE}/fragmentos/{n:03d}") for n in sorted(pendientes)]
+            for snap in self.db.get_all(refs):
+                contenido = snap.to_dict() or {}
+                self.postings.update(zip(contenido.get('tokens', []), contenido.get('postings', [])))
+            self._leidos |= pendientes
+        return super().candidatos(termino)
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Índice de búsqueda parcial de equipos.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_con = sub.add_parser('construir', help="Construir el índice desde un snapshot o en vivo")
+    p_con.add_argument('--snapshot', type=Path, help="Leer equipos de un snapshot")
+    p_con.add_argument('--salida', type=Path, help="Guardar en un archivo local (.json.gz)")
+    p_con.add_argument('--publicar', action='store_true', help="Publicar el índice en Firestore")
+
+    p_bus = sub.add_parser('buscar', help="Buscar equipos por texto parcial")
+    p_bus.add_argument('texto')
+    p_bus.add_argument('--indice', type=Path, help="Archivo local (por defecto, el publicado en Firestore)")
+    p_bus.add_argument('--campo', choices=sorted(CAMPOS), help="Limitar a un campo")
+    p_bus.add_argument('--limite', type=int, default=50)
+
+    args = parser.parse_args(argv)
+    inicio = time.perf_counter()
+
+    db = None
+    if (args.comando == 'construir' and (args.snapshot is None or args.publicar)) or \
+            (args.comando == 'buscar' and args.indice is None):
+        from cliente_firestore import conectar_firestore
+        db = conectar_firestore()
+
+    if args.comando == 'construir':
+        if not args.salida and not args.publicar:
+            parser.error("indica --salida y/o --publicar")
+        if args.snapshot is not None:
+            from snapshot import cargar_coleccion
+            equipos = cargar_coleccion(args.snapshot, 'equipos')
+        else:
+            from snapshot import leer_coleccion
+            equipos = leer_coleccion(db, 'equipos', campos=CAMPOS_LECTURA)
+        indice = IndiceBusqueda.construir(equipos)
+        bytes_postings = sum(len(p) for p in indice.postings.values())
+        print(f"🔎 {len(indice.ids)} equipos, {len(indice.postings)} tokens, "
+              f"{bytes_postings / 1e6:.2f} MB de postings ({time.perf_counter() - inicio:.2f} s)")
+        if args.salida:
+            indice.guardar(args.salida)
+            print(f"   💾 {args.salida} ({args.salida.stat().st_size / 1e6:.2f} MB)")
+        if args.publicar:
+            stats = indice.publicar(db)
+            print(f"   ☁️  {RUTA_INDICE}: {stats['fragmentos']} fragmentos, {stats['bloques']} bloques de documentos")
+        return 0
+
+    indice = IndiceBusqueda.cargar(args.indice) if args.indice else IndiceFirestore(db)
+    carga = time.perf_counter()
+    resultados = indice.buscar(args.texto, args.campo, args.limite)
+    consulta = time.perf_counter() - carga
+    for doc_id in resultados:
+        print(f"   {doc_id}")
+    print(f"✅ {len(resultados)} resultados en {consulta * 1000:.1f} ms "
+          f"(carga del índice: {(carga - inicio) * 1000:.0f} ms)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""
+=============================================================================
+ÍNDICE DE FOTOS DE INSTALACIÓN - ZaintzaBus
+=============================================================================
+Lee el libro de asignación de fotos (`Link de Drive-Fotos Ekialdebus.xlsx`):
+una fila por foto con Nº BUS, matrícula y modelo (sólo en la primera fila
+de cada bus), un código de foto (LB-EKI324-001...), la descripción
+(Validadora 1, Camara 3, Router, Antena Wifi...) y el enlace de Drive.
+
+La lectura es una sola pasada vectorizada con pandas: se rellenan hacia
+abajo los datos del bus, la descripción se separa en tipo e índice
+("Camara 3" -> camara, 3) y se genera el codigoInterno del equipo con el
+mismo esquema que importar_equipos (CAM-324-003). Las descripciones sin
+equipo (Bornero, Guantera, Instalaciones Generales...) quedan como fotos
+del bus (DESCRIPCIONES_FOTOS en mapeo_columnas.py).
+
+El índice guarda las fotos y dos diccionarios (bus -> fotos y
+codigoInterno -> fotos) para consultas O(1):
+
+  - archivo local (JSON)
+  - en Firestore, un documento por bus que la ficha del autobús lee de una vez:
+        tenants/{tenantId}/fotos_bus/{busId}
+        {busId, total, fotos: [{codigo, descripcion, url, driveId}],
+         equipos: {<codigoInterno>: [{codigo, descripcion, url, driveId}]}}
+
+El informe cruza el índice con los equipos instalados del tenant: equipos
+sin foto (por bus), fotos cuyo equipo no existe y filas sin enlace.
+
+USO:
+    python scripts/indice_fotos.py construir --salida fotos.json
+    python scripts/indice_fotos.py construir --publicar
+    python scripts/indice_fotos.py bus 324 --indice fotos.json
+    python scripts/indice_fotos.py informe --indice fotos.json --snapshot snapshot/
+=============================================================================
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from mapeo_columnas import COLUMNAS_FOTOS, DESCRIPCIONES_FOTOS, FILA_CABECERA_FOTOS
+from snapshot import Documento, documentos, obtener_campo
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+SCRIPT_DIR = Path(__file__).parent
+ARCHIVO_FOTOS = SCRIPT_DIR.parent / 'Archivos_Excel' / 'Link de Drive-Fotos Ekialdebus.xlsx'
+
+COLECCION_FOTOS = 'fotos_bus'
+RUTA_FOTOS = 'tenants/{tenant_id}/' + COLECCION_FOTOS + '/{bus_id}'
+PREFIJO_BUS = 'BUS'
+VERSION = 1
+
+# Operadores que se reconocen en el nombre del archivo (como leer_operador_desde_excel)
+OPERADORES = ('ekialdebus', 'lurraldebus', 'dbus', 'bizkaibus')
+
+# Campos de cada foto que se guardan en el índice y en Firestore
+CAMPOS_FOTO = ('codigo', 'descripcion', 'url', 'driveId')
+
+
+# =============================================================================
+# LECTURA DEL LIBRO
+# =============================================================================
+
+def leer_fotos(archivo: Path = ARCHIVO_FOTOS):
+    """
+    DataFrame con una fila por foto: operador, bus, matricula, modelo,
+    codigo, descripcion, url, driveId, tipo, indice y codigoInterno (None
+    si la foto es del bus y no de un equipo).
+    """
+    import pandas as pd
+
+    df = pd.read_excel(archivo, header=FILA_CABECERA_FOTOS, dtype={'CODIGO': str})
+    df.columns = [str(c).strip() for c in df.columns]
+    df = df.rename(columns=COLUMNAS_FOTOS)[list(COLUMNAS_FOTOS.values())]
+
+    # Los datos del bus sólo están en su primera fila
+    datos_bus = ['operador', 'bus', 'matricula', 'modelo']
+    df[datos_bus] = df[datos_bus].ffill()
+    df = df[df['codigo'].notna()].copy()
+
+    for columna in ('operador', 'matricula', 'modelo', 'codigo', 'descripcion', 'url'):
+        df[columna] = df[columna].astype('string').str.strip().replace('', pd.NA)
+    # Nº BUS numérico ('324.0' -> '324'); si falta, el número del código de foto
+    bus = pd.to_numeric(df['bus'], errors='coerce').astype('Int64').astype('string')
+    df['bus'] = bus.fillna(df['codigo'].str.extract(r'(\d+)-\d+$', expand=False))
+
+    partes = df['descripcion'].str.extract(r'^(.*?)\s*(\d+)?$')
+    base = partes[0].str.upper().str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+    df['tipo'] = base.map({k: v[0] for k, v in DESCRIPCIONES_FOTOS.items()})
+    prefijo = base.map({k: v[1] for k, v in DESCRIPCIONES_FOTOS.items()})
+    df['indice'] = pd.to_numeric(partes[1], errors='coerce').fillna(1).astype(int)
+    df['codigoInterno'] = prefijo + '-' + df['bus'] + '-' + df['indice'].astype('string').str.zfill(3)
+
+    ids = df['url'].str.extract(r'/d/([\w-]+)|[?&]id=([\w-]+)')
+    df['driveId'] = ids[0].fillna(ids[1])
+    return df.astype(object).where(df.notna(), None).reset_index(drop=True)
+
+
+def tenant_de_archivo(archivo: Path) -> Optional[str]:
+    nombre = Path(archivo).name.lower()
+    return next((operador for operador in OPERADORES if operador in nombre), None)
+
+
+# =============================================================================
+# ÍNDICE
+# =============================================================================
+
+class IndiceFotos:
+    """Fotos con acceso O(1) por bus y por codigoInterno."""
+
+    def __init__(self, fotos: List[Dict[str, Any]], tenant_id: Optional[str] = None):
+        self.tenant_id = tenant_id
+        self.fotos = fotos
+        self.por_bus: Dict[str, List[int]] = defaultdict(list)
+        self.por_equipo: Dict[str, List[int]] = defaultdict(list)
+        for i, foto in enumerate(fotos):
+            self.por_bus[foto['bus']].append(i)
+            if foto.get('codigoInterno'):
+                self.por_equipo[foto['codigoInterno']].append(i)
+
+    @classmethod
+    def desde_excel(cls, archivo: Path = ARCHIVO_FOTOS, tenant_id: Optional[str] = None) -> 'IndiceFotos':
+        return cls(leer_fotos(archivo).to_dict('records'), tenant_id or tenant_de_archivo(archivo))
+
+    def de_bus(self, bus: str) -> List[Dict[str, Any]]:
+        """Todas las fotos de un bus ('324' o 'BUS-324')."""
+        bus = bus[len(PREFIJO_BUS) + 1:] if bus.upper().startswith(f"{PREFIJO_BUS}-") else bus
+        return [self.fotos[i] for i in self.por_bus.get(bus, [])]
+
+    def de_equipo(self, codigo_interno: str) -> List[Dict[str, Any]]:
+        return [self.fotos[i] for i in self.por_equipo.get(codigo_interno, [])]
+
+    # -- Persistencia ----------------------------------------------------------
+
+    def guardar(self, archivo: Path) -> None:
+        contenido = {'version': VERSION, 'tenantId': self.tenant_id, 'fotos': self.fotos}
+        Path(archivo).write_text(json.dumps(contenido, ensure_ascii=False, indent=1), encoding='utf-8')
+
+    @classmethod
+    def cargar(cls, archivo: Path) -> 'IndiceFotos':
+        contenido = json.loads(Path(archivo).read_text(encoding='utf-8'))
+        if contenido.get('version') != VERSION:
+            raise ValueError(f"{archivo}: versión de índice {contenido.get('version')}, se esperaba {VERSION}")
+        return cls(contenido['fotos'], contenido.get('tenantId'))
+
+    # -- Firestore -------------------------------------------------------------
+
+    def documento_bus(self, bus: str) -> Dict[str, Any]:
+        fotos = self.de_bus(bus)
+        equipos: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        del_bus = []
+        for foto in fotos:
+            resumen = {campo: foto.get(campo) for campo in CAMPOS_FOTO if foto.get(campo) is not None}
+            if foto.get('codigoInterno'):
+                equipos[foto['codigoInterno']].append(resumen)
+            else:
+                del_bus.append(resumen)
+        return {
+            'busId': f"{PREFIJO_BUS}-{bus}",
+            'total': len(fotos),
+            'fotos': del_bus,
+            'equipos': dict(equipos),
+        }
+
+    def publicar(self, db) -> int:
+        """Un documento por bus (sobrescrito). Devuelve cuántos."""
+        from firebase_admin import firestore
+        from escritor import EscritorLotes
+
+        if not self.tenant_id:
+            raise ValueError("El índice no tiene tenant: indícalo con --tenant")
+        with EscritorLotes(db) as escritor:
+            for bus in self.por_bus:
+                escritor.set(
+                    RUTA_FOTOS.format(tenant_id=self.tenant_id, bus_id=f"{PREFIJO_BUS}-{bus}"),
+                    {**self.documento_bus(bus), 'actualizadoEn': firestore.SERVER_TIMESTAMP},
+                )
+        return len(self.por_bus)
+
+
+# =============================================================================
+# INFORME
+# =============================================================================
+
+def equipos_instalados(tenant_id: str, snapshot: Optional[Path] = None, db=None) -> Iterable[Documento]:
+    """Equipos del tenant instalados en un autobús (lectura filtrada en servidor en vivo)."""
+    if snapshot is not None:
+        return (
+            (d, data) for d, data in documentos('equipos', snapshot)
+            if obtener_campo(data, 'propiedad.operadorAsignadoId') == tenant_id
+            and obtener_campo(data, 'ubicacionActual.tipo') == 'autobus'
+        )
+    from snapshot import leer_paginado
+    return leer_paginado(
+        db.collection('equipos')
+        .where('propiedad.operadorAsignadoId', '==', tenant_id)
+        .where('ubicacionActual.tipo', '==', 'autobus')
+        .select(['codigoInterno', 'tipoEquipoId', 'ubicacionActual'])
+        .order_by('__name__')
+    )
+
+
+def informe(indice: IndiceFotos, equipos: Iterable[Documento]) -> Dict[str, Any]:
+    """
+    Cruce del índice con los equipos instalados:
+      sin_foto:   {busId: [codigoInterno]}
+      huerfanas:  fotos de equipo cuyo codigoInterno no está instalado
+      sin_enlace: fotos sin URL de Drive
+    """
+    instalados = set()
+    sin_foto: Dict[str, List[str]] = defaultdict(list)
+    for _doc_id, data in equipos:
+        codigo = data.get('codigoInterno')
+        instalados.add(codigo)
+        if codigo not in indice.por_equipo:
+            sin_foto[obtener_campo(data, 'ubicacionActual.id') or '?'].append(codigo)
+    return {
+        'instalados': len(instalados),
+        'con_foto': len(instalados & indice.por_equipo.keys()),
+        'sin_foto': {bus: sorted(codigos) for bus, codigos in sorted(sin_foto.items())},
+        'huerfanas': [f for f in indice.fotos if f.get('codigoInterno') and f['codigoInterno'] not in instalados],
+        'sin_enlace': [f for f in indice.fotos if not f.get('url')],
+    }
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Índice de fotos de instalación por bus y equipo.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_con = sub.add_parser('construir', help="Leer el libro de fotos y guardar/publicar el índice")
+    p_con.add_argument('--excel', type=Path, default=ARCHIVO_FOTOS)
+    p_con.add_argument('--tenant', help="Operador (por defecto, el del nombre del archivo)")
+    p_con.add_argument('--salida', type=Path, help="Guardar en un archivo local (.json)")
+    p_con.add_argument('--publicar', action='store_true', help="Escribir tenants/{t}/fotos_bus en Firestore")
+
+    p_bus = sub.add_parser('bus', help="Fotos de un bus")
+    p_bus.add_argument('bus', help="Nº de bus (324 o BUS-324)")
+    p_bus.add_argument('--indice', type=Path, help="Archivo local (por defecto, leer el Excel)")
+
+    p_inf = sub.add_parser('informe', help="Equipos instalados sin foto, fotos huérfanas y filas sin enlace")
+    p_inf.add_argument('--indice', type=Path, help="Archivo local (por defecto, leer el Excel)")
+    p_inf.add_argument('--tenant', help="Operador (por defecto, el del índice)")
+    p_inf.add_argument('--snapshot', type=Path, help="Leer equipos de un snapshot (por defecto, en vivo)")
+
+    args = parser.parse_args(argv)
+    inicio = time.perf_counter()
+
+    if args.comando == 'construir':
+        indice = IndiceFotos.desde_excel(args.excel, args.tenant)
+        print(f"📷 {len(indice.fotos)} fotos de {len(indice.por_bus)} buses, "
+              f"{len(indice.por_equipo)} equipos con foto ({time.perf_counter() - inicio:.2f} s)")
+        if args.salida:
+            indice.guardar(args.salida)
+            print(f"   💾 {args.salida}")
+        if args.publicar:
+            from cliente_firestore import conectar_firestore
+            print(f"   ☁️  {indice.publicar(conectar_firestore())} documentos en {COLECCION_FOTOS} ({indice.tenant_id})")
+        return 0
+
+    indice = IndiceFotos.cargar(args.indice) if args.indice else IndiceFotos.desde_excel()
+
+    if args.comando == 'bus':
+        fotos = indice.de_bus(args.bus)
+        if not fotos:
+            print(f"⚠️  No hay fotos del bus {args.bus}")
+            return 1
+        print(f"📷 Bus {args.bus}: {len(fotos)} fotos")
+        for foto in fotos:
+            print(f"   {foto['codigo']:<16} {foto.get('descripcion') or '':<26} "
+                  f"{foto.get('codigoInterno') or '(bus)':<14} {foto.get('url') or '⚠️  sin enlace'}")
+        return 0
+
+    tenant_id = args.tenant or indice.tenant_id
+    if not tenant_id:
+        print("❌ Indica el operador con --tenant")
+        return 1
+    db = None
+    if args.snapshot is None:
+        from cliente_firestore import conectar_firestore
+        db = conectar_firestore()
+    resultado = informe(indice, equipos_instalados(tenant_id, args.snapshot, db))
+
+    sin_foto = sum(len(codigos) for codigos in resultado['sin_foto'].values())
+    print(f"📷 {tenant_id}: {resultado['con_foto']} de {resultado['instalados']} equipos instalados con foto")
+    if sin_foto:
+        print(f"\n⚠️  {sin_foto} equipos sin foto en {len(resultado['sin_foto'])} buses:")
+        for bus, codigos in resultado['sin_foto'].items():
+            print(f"   {bus:<12} {len(codigos):>3}  {', '.join(codigos)}")
+    if resultado['huerfanas']:
+        print(f"\n⚠️  {len(resultado['huerfanas'])} fotos de equipos que no están instalados:")
+        for foto in resultado['huerfanas']:
+            print(f"   {foto['codigo']:<16} {foto['codigoInterno']:<14} {foto.get('descripcion') or ''}")
+    if resultado['sin_enlace']:
+        print(f"\n⚠️  {len(resultado['sin_enlace'])} filas sin enlace de Drive:")
+        for foto in resultado['sin_enlace']:
+            print(f"   {foto['codigo']:<16} bus {foto['bus']:<6} {foto.get('descripcion') or ''}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,636 @@
+"""
+=============================================================================
+INGESTA DE FORMULARIOS DE INSTALACIÓN / DESMONTAJE / TRASPASO - ZaintzaBus
+=============================================================================
+Lee el libro de formularios de Lurraldebus
+(`Nueva Insta, Desmontajes y Traspaso- Lurraldebus.xlsx`) y convierte cada
+formulario relleno en movimientos de equipos, sin recargar la flota:
+
+    NUEVA INSTALACION   BUS, MATRICULA, BASTIDOR, MODELO, PREINSTALACION,
+                        INSTALACION -> datos e `instalacion` del autobús
+    DESMONTAJES         BUS DESMONTAJE + cantidades por componente
+                        -> los equipos pasan del bus al almacén
+    TRASPASO            BUS DESMONTAJE, BUS TRASPASO + cantidades
+                        -> los equipos pasan de un bus a otro
+
+Los formularios se localizan por sus etiquetas (no por celdas fijas): cada
+cabecera de bloque abre un formulario en su columna y el valor de cada
+etiqueta es la celda de su derecha, así que se pueden apilar varios
+formularios en una hoja o rellenar copias del libro.
+
+Los formularios sólo dan cantidades por componente (COMPONENTES_FORMULARIO
+en mapeo_columnas.py); los equipos concretos se eligen en el manifiesto del
+bus de origen, empezando por el código interno más alto. Por cada equipo
+movido se escribe:
+
+  - un documento en `movimientos_equipos` (forma MovimientoEquipo)
+  - la actualización del equipo: ubicacionActual, estado,
+    estadisticas.totalMovimientos y fechas.instalacionActual, como
+    registrarMovimientoEquipo en src/lib/firebase/equipos.ts
+
+y una vez por ejecución, agrupado por autobús: contadores.totalEquipos de
+los buses afectados, sus manifiestos, los resúmenes de flota, el progreso
+de instalación (resumen/instalacion) y el manifiesto de auditoría. Un
+traspaso de 5 equipos son unas 20 escrituras.
+
+Cada formulario tiene un ID derivado de su contenido (`formularioId` en los
+movimientos); volver a ingerir el mismo libro no repite movimientos.
+
+USO:
+    python scripts/ingerir_movimientos.py --simular
+    python scripts/ingerir_movimientos.py formularios/*.xlsx --tenant lurraldebus
+    python scripts/ingerir_movimientos.py --almacen almacen-lasarte
+=============================================================================
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import sys
+import time
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from auditoria_lotes import ManifiestoAuditoria, diferencias
+from escritor import EscritorLotes
+from manifiesto_bus import CAMPOS_EQUIPO, RUTA_MANIFIESTO, CambiosManifiesto
+from mapeo_columnas import COMPONENTES_FORMULARIO
+from progreso_instalacion import DeltaInstalacion
+from resumen_flota import DeltaResumen
+from snapshot import leer_paginado, leer_por_ids, obtener_campo
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+SCRIPT_DIR = Path(__file__).parent
+ARCHIVO_FORMULARIOS = SCRIPT_DIR.parent / 'Archivos_Excel' / 'Nueva Insta, Desmontajes y Traspaso- Lurraldebus.xlsx'
+
+COLECCION_EQUIPOS = 'equipos'
+COLECCION_MOVIMIENTOS = 'movimientos_equipos'
+RUTA_AUTOBUS = 'tenants/{tenant_id}/autobuses/{codigo}'
+PREFIJO_BUS = 'BUS'
+USUARIO = 'ingesta_formularios'
+
+# Destino de los desmontajes si no se indica --almacen
+ALMACEN = 'almacen'
+
+# Cabecera de bloque -> tipo de formulario
+BLOQUES = {
+    'NUEVA INSTALACION': 'instalacion',
+    'DESMONTAJES': 'desmontaje',
+    'TRASPASO': 'traspaso',
+}
+
+# Etiqueta -> campo. Tras BUS TRASPASO, MATRICULA y MODELO son del bus destino
+CAMPOS = {
+    'FECHA': 'fecha',
+    'OPERADOR': 'operador',
+    'BUS': 'bus',
+    'BUS DESMONTAJE': 'bus',
+    'BUS TRASPASO': 'bus_destino',
+    'MATRICULA': 'matricula',
+    'BASTIDOR': 'bastidor',
+    'MODELO': 'modelo',
+    'PREINSTALACION': 'fecha_preinstalacion',
+    'INSTALACION': 'fecha_instalacion',
+}
+CAMPOS_FECHA = ('fecha', 'fecha_preinstalacion', 'fecha_instalacion')
+
+TIPO_MOVIMIENTO = {'desmontaje': 'reubicacion', 'traspaso': 'reubicacion'}
+MOTIVO = {'desmontaje': 'Desmontaje', 'traspaso': 'Traspaso'}
+
+# Igual que determinarEstadoPorUbicacion (src/lib/firebase/equipos.ts)
+ESTADO_POR_UBICACION = {'autobus': 'en_servicio', 'ubicacion': 'en_almacen', 'laboratorio': 'en_laboratorio'}
+
+# Igual que FASES_INSTALACION (src/types/index.ts)
+FASE_PREINSTALACION = 'pre_instalacion'
+FASE_COMPLETA = 'completa'
+
+FORMATOS_FECHA = ('%d/%m/%Y', '%d-%m-%Y', '%Y-%m-%d', '%d/%m/%y')
+
+
+def _normalizar(texto: Any) -> str:
+    """'BUS DESMONTAJE :' -> 'BUS DESMONTAJE', 'Cámaras VV' -> 'CAMARAS VV'."""
+    texto = unicodedata.normalize('NFKD', str(texto)).encode('ascii', 'ignore').decode()
+    return ' '.join(texto.replace(':', ' ').split()).upper()
+
+
+_COMPONENTES = {_normalizar(etiqueta): etiqueta for etiqueta in COMPONENTES_FORMULARIO}
+
+
+# =============================================================================
+# LECTURA DE FORMULARIOS
+# =============================================================================
+
+@dataclass
+class Formulario:
+    tipo: str                                   # instalacion | desmontaje | traspaso
+    ubicacion: str                              # 'Hoja!A2' (para los mensajes)
+    campos: Dict[str, Any] = field(default_factory=dict)
+    componentes: Dict[str, int] = field(default_factory=dict)
+    avisos: List[str] = field(default_factory=list)
+
+    @property
+    def id(self) -> str:
+        """ID estable derivado del contenido (no de la posición en el libro)."""
+        contenido = json.dumps([self.tipo, self.campos, self.componentes], sort_keys=True, default=str)
+        return hashlib.sha1(contenido.encode('utf-8')).hexdigest()[:16]
+
+    @property
+    def vacio(self) -> bool:
+        return not self.campos.get('bus')
+
+
+def codigo_bus(valor: Any) -> Optional[str]:
+    """321, 321.0, '321 ', 'BUS-321' -> '321'."""
+    if valor is None:
+        return None
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    codigo = str(valor).strip()
+    if codigo.upper().startswith(f"{PREFIJO_BUS}-"):
+        codigo = codigo[len(PREFIJO_BUS) + 1:]
+    return codigo or None
+
+
+def convertir_fecha(valor: Any) -> Optional[datetime]:
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    if isinstance(valor, date):
+        return datetime(valor.year, valor.month, valor.day)
+    for formato in FORMATOS_FECHA:
+        try:
+            return datetime.strptime(str(valor).strip(), formato)
+        except ValueError:
+            continue
+    return None
+
+
+def _cantidad(valor: Any) -> Optional[int]:
+    try:
+        cantidad = float(str(valor).strip().replace(',', '.'))
+    except ValueError:
+        return None
+    return int(cantidad) if cantidad.is_integer() and cantidad >= 0 else None
+
+
+def _valor(celdas: Dict[Tuple[int, int], Any], fila: int, col: int, limite: int) -> Any:
+    """Primera celda con valor a la derecha de una etiqueta, sin pasar de `limite`."""
+    for c in range(col + 1, limite):
+        valor = celdas.get((fila, c))
+        if valor is not None:
+            return valor
+    return None
+
+
+def leer_hoja(celdas: Dict[Tuple[int, int], Any], hoja: str) -> List[Formulario]:
+    """Formularios de una hoja dada como {(fila, columna): valor} (1-indexed)."""
+    cabeceras = sorted(
+        (col, fila, BLOQUES[_normalizar(valor)])
+        for (fila, col), valor in celdas.items()
+        if isinstance(valor, str) and _normalizar(valor) in BLOQUES
+    )
+    columnas = sorted({col for col, _fila, _tipo in cabeceras})
+    formularios = []
+    for i, (col, fila, tipo) in enumerate(cabeceras):
+        siguiente = next((f for c, f, _t in cabeceras[i + 1:] if c == col), None)
+        limite = next((c for c in columnas if c > col), col + 3)
+        formulario = Formulario(tipo, f"{hoja}!{_letra(col)}{fila}")
+        destino = False
+        filas = sorted(f for (f, c) in celdas if c == col and f > fila and (siguiente is None or f < siguiente))
+        for f in filas:
+            etiqueta = _normalizar(celdas[(f, col)])
+            valor = _valor(celdas, f, col, limite)
+            if etiqueta in CAMPOS:
+                campo = CAMPOS[etiqueta]
+                destino = destino or campo == 'bus_destino'
+                if destino and campo in ('matricula', 'modelo'):
+                    campo = f"{campo}_destino"
+                if valor is not None:
+                    formulario.campos[campo] = valor
+            elif etiqueta in _COMPONENTES and valor is not None:
+                cantidad = _cantidad(valor)
+                if cantidad is None:
+                    formulario.avisos.append(f"cantidad no válida para '{_COMPONENTES[etiqueta]}': {valor!r}")
+                elif cantidad:
+                    formulario.componentes[_COMPONENTES[etiqueta]] = cantidad
+
+        for campo in ('bus', 'bus_destino'):
+            if campo in formulario.campos:
+                formulario.campos[campo] = codigo_bus(formulario.campos[campo])
+        for campo in CAMPOS_FECHA:
+            if campo in formulario.campos:
+                fecha = convertir_fecha(formulario.campos[campo])
+                if fecha is None:
+                    formulario.avisos.append(f"fecha no válida en '{campo}': {formulario.campos[campo]!r}")
+                    del formulario.campos[campo]
+                else:
+                    formulario.campos[campo] = fecha
+        for campo in ('operador', 'matricula', 'matricula_destino', 'bastidor', 'modelo', 'modelo_destino'):
+            if campo in formulario.campos:
+                formulario.campos[campo] = str(formulario.campos[campo]).strip()
+        formularios.append(formulario)
+    return formularios
+
+
+def _letra(col: int) -> str:
+    letras = ''
+    while col:
+        col, resto = divmod(col - 1, 26)
+        letras = chr(ord('A') + resto) + letras
+    return letras
+
+
+def leer_formularios(archivo: Path) -> List[Formulario]:
+    """Formularios rellenos (con bus) de todas las hojas del libro."""
+    import openpyxl
+
+    libro = openpyxl.load_workbook(archivo, data_only=True)
+    formularios = []
+    for hoja in libro.worksheets:
+        celdas = {
+            (celda.row, celda.column): celda.value
+            for fila in hoja.iter_rows()
+            for celda in fila
+            if celda.value is not None and str(celda.value).strip() != ''
+        }
+        formularios.extend(f for f in leer_hoja(celdas, hoja.title) if not f.vacio)
+    return formularios
+
+
+def tenant_de(operador: Optional[str]) -> Optional[str]:
+    """ID de tenant a partir del nombre de operador (como leer_operador_desde_excel)."""
+    if not operador:
+        return None
+    tenant_id = operador.lower().replace(' ', '-').replace('_', '-')
+    return ''.join(c for c in tenant_id if c.isalnum() or c == '-') or None
+
+
+def validar(formulario: Formulario) -> List[str]:
+    """Errores que impiden aplicar el formulario."""
+    errores = []
+    if 'fecha' not in formulario.campos:
+        errores.append("falta la FECHA")
+    if formulario.tipo == 'traspaso':
+        if not formulario.campos.get('bus_destino'):
+            errores.append("falta el BUS TRASPASO")
+        elif formulario.campos['bus_destino'] == formulario.campos['bus']:
+            errores.append("el bus de traspaso es el mismo que el de desmontaje")
+    return errores
+
+
+# =============================================================================
+# APLICACIÓN
+# =============================================================================
+
+def bus_id(codigo: str) -> str:
+    return f"{PREFIJO_BUS}-{codigo}"
+
+
+class Ingesta:
+    """
+    Aplica formularios de un tenant leyendo sólo los buses afectados.
+
+    El contenido de cada bus (manifiesto o, si no lo hay, consulta por
+    ubicacionActual.id) se lee una vez y se mantiene al día en memoria, así
+    que varios formularios sobre el mismo bus ven los movimientos anteriores.
+    Con escritor=None no se escribe nada (simulación).
+    """
+
+    def __init__(self, db, tenant_id: str, escritor: Optional[EscritorLotes] = None, almacen: str = ALMACEN):
+        self.db = db
+        self.tenant_id = tenant_id
+        self.escritor = escritor
+        self.almacen = {'tipo': 'ubicacion', 'id': almacen, 'nombre': almacen}
+        self.en_bus: Dict[str, Dict[str, Dict[str, Any]]] = {}   # busId -> {equipoId: entrada de manifiesto}
+        self.equipos: Dict[str, Dict[str, Any]] = {}             # equipoId -> documento (proyectado)
+        self.delta = DeltaResumen()
+        self.progreso = DeltaInstalacion()
+        self.manifiestos = CambiosManifiesto()
+        self.contadores: Counter = Counter()                      # codigo de bus -> delta de totalEquipos
+        self.auditoria_equipos: List[Tuple[str, Dict[str, Any], Dict[str, Any]]] = []
+        self.auditoria_buses: List[Tuple[str, Dict[str, Any], Dict[str, Any]]] = []
+        self.stats = Counter()
+
+    # -------------------------------------------------------------------------
+    # Lecturas
+    # -------------------------------------------------------------------------
+
+    def ya_ingerido(self, formulario: Formulario) -> bool:
+        consulta = self.db.collection(COLECCION_MOVIMIENTOS).where('formularioId', '==', formulario.id).limit(1)
+        return any(True for _ in consulta.stream())
+
+    def _contenido_bus(self, bus: str) -> Dict[str, Dict[str, Any]]:
+        if bus in self.en_bus:
+            return self.en_bus[bus]
+        snap = self.db.document(RUTA_MANIFIESTO.format(tenant_id=self.tenant_id, bus_id=bus)).get()
+        if snap.exists:
+            contenido = dict((snap.to_dict() or {}).get('equipos') or {})
+        else:
+            consulta = (
+                self.db.collection(COLECCION_EQUIPOS)
+                .where('ubicacionActual.id', '==', bus)
+                .where('propiedad.operadorAsignadoId', '==', self.tenant_id)
+                .select(CAMPOS_EQUIPO)
+                .order_by('__name__')
+            )
+            contenido = {}
+            for equipo_id, data in leer_paginado(consulta):
+                self.equipos[equipo_id] = data
+                contenido[equipo_id] = {'tipo': data.get('tipoEquipoId'), 'codigoInterno': data.get('codigoInterno')}
+        self.en_bus[bus] = contenido
+        return contenido
+
+    def elegir(self, bus: str, tipo: str, cantidad: int) -> List[str]:
+        """
+        `cantidad` equipos de un tipo instalados en el bus, del código interno
+        más alto al más bajo. Los que el manifiesto da por instalados pero ya
+        no están en el bus se descartan.
+        """
+        contenido = self._contenido_bus(bus)
+        candidatos = sorted(
+            (equipo_id for equipo_id, entrada in contenido.items() if entrada.get('tipo') == tipo),
+            key=lambda equipo_id: contenido[equipo_id].get('codigoInterno') or equipo_id,
+            reverse=True,
+        )
+        faltan = [equipo_id for equipo_id in candidatos if equipo_id not in self.equipos]
+        if faltan:
+            self.equipos.update(leer_por_ids(self.db, COLECCION_EQUIPOS, faltan, campos=CAMPOS_EQUIPO))
+        elegidos = []
+        for equipo_id in candidatos:
+            data = self.equipos.get(equipo_id)
+            if data is None or obtener_campo(data, 'ubicacionActual.id') != bus:
+                contenido.pop(equipo_id, None)
+                continue
+            elegidos.append(equipo_id)
+            if len(elegidos) == cantidad:
+                break
+        return elegidos
+
+    # -------------------------------------------------------------------------
+    # Movimientos
+    # -------------------------------------------------------------------------
+
+    def mover(self, equipo_id: str, destino: Dict[str, Any], formulario: Formulario, comentarios: Optional[str]) -> None:
+        anterior = self.equipos[equipo_id]
+        origen = dict(anterior.get('ubicacionActual') or {})
+        nuevo = copy.deepcopy(anterior)
+        nuevo['ubicacionActual'] = destino
+        nuevo['estado'] = ESTADO_POR_UBICACION[destino['tipo']]
+        fecha = formulario.campos['fecha']
+
+        self.equipos[equipo_id] = nuevo
+        self.delta.equipo(anterior, nuevo)
+        self.manifiestos.registrar(equipo_id, anterior, nuevo)
+        self.auditoria_equipos.append((equipo_id, anterior, nuevo))
+        for ubicacion, signo in ((origen, -1), (destino, +1)):
+            if ubicacion.get('tipo') == 'autobus':
+                self.contadores[codigo_bus(ubicacion['id'])] += signo
+                # El destino se carga antes de añadir: un formulario posterior
+                # que saque equipos de ese bus tiene que ver los recién llegados
+                contenido = self._contenido_bus(ubicacion['id'])
+                if signo < 0:
+                    contenido.pop(equipo_id, None)
+                else:
+                    contenido[equipo_id] = {'tipo': anterior.get('tipoEquipoId'), 'codigoInterno': anterior.get('codigoInterno')}
+        self.stats['movidos'] += 1
+
+        if self.escritor is None:
+            return
+        from firebase_admin import firestore
+
+        movimiento = {
+            'equipoId': equipo_id,
+            'equipoCodigoInterno': anterior.get('codigoInterno'),
+            'fecha': fecha,
+            'origen': origen,
+            'destino': destino,
+            'tipoMovimiento': TIPO_MOVIMIENTO[formulario.tipo],
+            'motivo': f"{MOTIVO[formulario.tipo]} (formulario {formulario.ubicacion})",
+            'formularioId': formulario.id,
+            'auditoria': {
+                'creadoPor': USUARIO,
+                'createdAt': firestore.SERVER_TIMESTAMP,
+                'updatedAt': firestore.SERVER_TIMESTAMP,
+            },
+        }
+        if comentarios:
+            movimiento['comentarios'] = comentarios
+        self.escritor.set(f"{COLECCION_MOVIMIENTOS}/{formulario.id}-{equipo_id}", movimiento)
+
+        cambios = {
+            'ubicacionActual': destino,
+            'estado': nuevo['estado'],
+            'estadisticas.totalMovimientos': firestore.Increment(1),
+            'auditoria.modificadoPor': USUARIO,
+            'auditoria.modificadoEn': firestore.SERVER_TIMESTAMP,
+        }
+        if destino['tipo'] == 'autobus':
+            cambios['fechas.instalacionActual'] = fecha
+        self.escritor.update(f"{COLECCION_EQUIPOS}/{equipo_id}", cambios)
+
+    def aplicar_movimiento(self, formulario: Formulario) -> List[str]:
+        """Desmontaje o traspaso: mueve las cantidades de cada componente. Devuelve los avisos."""
+        campos = formulario.campos
+        origen = bus_id(campos['bus'])
+        if formulario.tipo == 'traspaso':
+            # Como importar_equipos: id y nombre son 'BUS-322' (lo que consultan los verificadores)
+            bus_destino = bus_id(campos['bus_destino'])
+            destino_base = {'tipo': 'autobus', 'id': bus_destino, 'nombre': bus_destino}
+            if campos.get('matricula_destino'):
+                destino_base['matricula'] = campos['matricula_destino']
+        else:
+            destino_base = self.almacen
+
+        por_tipo: Counter = Counter()
+        sin_inventariar = []
+        for etiqueta, cantidad in formulario.componentes.items():
+            tipo = COMPONENTES_FORMULARIO[etiqueta]
+            if tipo is None:
+                sin_inventariar.append(f"{etiqueta} x{cantidad}")
+            else:
+                por_tipo[tipo] += cantidad
+        comentarios = f"Material sin inventariar: {', '.join(sin_inventariar)}" if sin_inventariar else None
+        self.stats['sin_inventariar'] += len(sin_inventariar)
+
+        avisos = []
+        for tipo, cantidad in por_tipo.items():
+            elegidos = self.elegir(origen, tipo, cantidad)
+            if len(elegidos) < cantidad:
+                avisos.append(f"{origen} sólo tiene {len(elegidos)} de {cantidad} '{tipo}'")
+                self.stats['faltantes'] += cantidad - len(elegidos)
+            for equipo_id in elegidos:
+                destino = dict(destino_base)
+                if destino['tipo'] == 'autobus':
+                    posicion = obtener_campo(self.equipos[equipo_id], 'ubicacionActual.posicionEnBus')
+                    if posicion:
+                        destino['posicionEnBus'] = posicion
+                self.mover(equipo_id, destino, formulario, comentarios)
+        return avisos
+
+    def aplicar_instalacion(self, formulario: Formulario) -> List[str]:
+        """Nueva instalación: datos del vehículo y fase/fechas de instalación del autobús."""
+        campos = formulario.campos
+        ruta = RUTA_AUTOBUS.format(tenant_id=self.tenant_id, codigo=campos['bus'])
+        snap = self.db.document(ruta).get()
+        anterior = snap.to_dict() if snap.exists else None
+
+        cambios: Dict[str, Any] = {'codigo': campos['bus'], 'operadorId': self.tenant_id}
+        for campo, destino in (('matricula', 'matricula'), ('bastidor', 'numeroChasis'), ('modelo', 'modelo')):
+            if campos.get(campo):
+                cambios[destino] = campos[campo]
+        instalacion = {}
+        if 'fecha_preinstalacion' in campos:
+            instalacion['fechaPreInstalacion'] = campos['fecha_preinstalacion']
+            instalacion['fase'] = FASE_PREINSTALACION
+        if 'fecha_instalacion' in campos:
+            instalacion['fechaInstalacion'] = campos['fecha_instalacion']
+            instalacion['fase'] = FASE_COMPLETA
+        if instalacion:
+            cambios['instalacion'] = instalacion
+        if anterior is None:
+            cambios.setdefault('estado', 'operativo')
+
+        nuevo = copy.deepcopy(anterior or {})
+        for clave, valor in cambios.items():
+            if isinstance(valor, dict):
+                nuevo.setdefault(clave, {}).update(valor)
+            else:
+                nuevo[clave] = valor
+        if anterior is not None and not diferencias(anterior, nuevo):
+            return []
+        self.delta.autobus(self.tenant_id, anterior, nuevo)
+        self.progreso.autobus(self.tenant_id, anterior, nuevo)
+        self.auditoria_buses.append((campos['bus'], anterior, nuevo))
+        self.stats['autobuses'] += 1
+
+        if self.escritor is not None:
+            from firebase_admin import firestore
+            cambios['auditoria'] = {'modificadoPor': USUARIO, 'modificadoEn': firestore.SERVER_TIMESTAMP}
+            self.escritor.set(ruta, cambios, merge=True)
+        return []
+
+    def aplicar(self, formulario: Formulario) -> List[str]:
+        """Aplica un formulario válido; devuelve los avisos."""
+        self.stats['formularios'] += 1
+        if formulario.tipo == 'instalacion':
+            return self.aplicar_instalacion(formulario)
+        return self.aplicar_movimiento(formulario)
+
+    # -------------------------------------------------------------------------
+    # Cierre
+    # -------------------------------------------------------------------------
+
+    def cerrar(self) -> Dict[str, int]:
+        """Encola contadores de bus, manifiestos, resúmenes y auditoría."""
+        contadores = {codigo: n for codigo, n in self.contadores.items() if n}
+        self.stats['buses_contadores'] = len(contadores)
+        if self.escritor is None:
+            return dict(self.stats)
+        from firebase_admin import firestore
+
+        for codigo, n in contadores.items():
+            self.escritor.set(
+                RUTA_AUTOBUS.format(tenant_id=self.tenant_id, codigo=codigo),
+                {'contadores': {'totalEquipos': firestore.Increment(n)}},
+                merge=True,
+            )
+        self.stats['manifiestos'] = self.manifiestos.escribir(self.escritor)
+        self.stats['resumenes'] = self.delta.escribir(self.escritor)
+        self.stats['progreso'] = self.progreso.escribir(self.escritor)
+        for entidad, entradas in (('inventario', self.auditoria_equipos), ('autobus', self.auditoria_buses)):
+            if not entradas:
+                continue
+            manifiesto = ManifiestoAuditoria(
+                self.db, 'ingerir_movimientos', entidad, tenant_id=self.tenant_id, usuario_id=USUARIO,
+                motivo="Ingesta de formularios de instalación, desmontaje y traspaso", escritor=self.escritor,
+            )
+            for entidad_id, anterior, nuevo in entradas:
+                manifiesto.registrar(entidad_id, anterior, nuevo)
+            manifiesto.cerrar()
+        return dict(self.stats)
+
+
+def ingerir(
+    db,
+    formularios: List[Formulario],
+    tenant_id: str,
+    almacen: str = ALMACEN,
+    simular: bool = False,
+) -> Dict[str, int]:
+    """Valida y aplica los formularios de un tenant; devuelve las estadísticas."""
+    escritor = None if simular else EscritorLotes(db)
+    ingesta = Ingesta(db, tenant_id, escritor, almacen)
+    for formulario in formularios:
+        errores = validar(formulario)
+        if errores:
+            print(f"   ❌ {formulario.ubicacion} ({formulario.tipo}): {'; '.join(errores)}")
+            ingesta.stats['invalidos'] += 1
+            continue
+        if formulario.tipo != 'instalacion' and ingesta.ya_ingerido(formulario):
+            print(f"   ⏭️  {formulario.ubicacion} ({formulario.tipo}): ya ingerido")
+            ingesta.stats['ya_ingeridos'] += 1
+            continue
+        for aviso in formulario.avisos + ingesta.aplicar(formulario):
+            print(f"   ⚠️  {formulario.ubicacion}: {aviso}")
+    stats = ingesta.cerrar()
+    if escritor is not None:
+        escritor.commit()
+        stats['escrituras'] = escritor.operaciones
+    return stats
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Ingesta de formularios de instalación, desmontaje y traspaso.")
+    parser.add_argument('archivos', nargs='*', type=Path, default=[ARCHIVO_FORMULARIOS],
+                        help="Libros de formularios (por defecto, el de Archivos_Excel)")
+    parser.add_argument('--tenant', help="Operador (por defecto, el campo OPERADOR de los formularios)")
+    parser.add_argument('--almacen', default=ALMACEN, help="ID de la ubicación a la que van los desmontajes")
+    parser.add_argument('--simular', action='store_true', help="Sólo mostrar lo que se movería")
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    formularios = []
+    for archivo in args.archivos:
+        leidos = leer_formularios(archivo)
+        print(f"📄 {archivo.name}: {len(leidos)} formularios rellenos")
+        formularios.extend(leidos)
+    if not formularios:
+        print("   No hay formularios que ingerir")
+        return 0
+
+    tenant_id = args.tenant
+    if tenant_id is None:
+        tenants = {tenant_de(f.campos.get('operador')) for f in formularios} - {None}
+        if len(tenants) != 1:
+            print(f"❌ No se puede deducir el tenant de los formularios ({sorted(tenants) or 'sin OPERADOR'}); usa --tenant")
+            return 1
+        tenant_id = tenants.pop()
+
+    from cliente_firestore import conectar_firestore
+    db = conectar_firestore()
+
+    print(f"🚚 Aplicando formularios en {tenant_id}{' (simulación)' if args.simular else ''}...")
+    stats = ingerir(db, formularios, tenant_id, args.almacen, simular=args.simular)
+    print(f"✅ {stats.get('formularios', 0)} formularios, {stats.get('movidos', 0)} equipos movidos, "
+          f"{stats.get('autobuses', 0)} autobuses actualizados, {stats.get('ya_ingeridos', 0)} ya ingeridos, "
+          f"{stats.get('invalidos', 0)} inválidos")
+    if stats.get('faltantes'):
+        print(f"   ⚠️  {stats['faltantes']} equipos pedidos que no estaban en su bus de origen")
+    if 'escrituras' in stats:
+        print(f"   {stats['escrituras']} escrituras ({time.perf_counter() - inicio:.2f} s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
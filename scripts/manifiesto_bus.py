@@ -0,0 +1,259 @@
+"""
+=============================================================================
+MANIFIESTOS DE EQUIPOS POR AUTOBÚS - ZaintzaBus
+=============================================================================
+Un documento por autobús con la lista desnormalizada de sus equipos, para
+que la ficha del bus (y autobuses/[id]/equipos) cueste una lectura en vez de
+una consulta sobre `equipos` que lee un documento por equipo:
+
+    tenants/{tenantId}/manifiestos_bus/{busId}      (busId = ubicacionActual.id)
+    {
+      busId, tenantId, total,
+      equipos: {<equipoId>: {tipo, tipoNombre, codigoInterno, numeroSerie,
+                             ip, mac, estado, posicion}},
+      actualizadoEn
+    }
+
+Los importadores registran cada equipo escrito (anterior y nuevo) y los
+manifiestos afectados se actualizan con merge en los mismos batches: una
+escritura por autobús tocado, no por equipo. La pasada de reparación
+recalcula todos los manifiestos desde `equipos` y corrige los que difieren.
+
+USO:
+    python scripts/manifiesto_bus.py reparar --simular
+    python scripts/manifiesto_bus.py reparar --tenant ekialdebus
+    python scripts/manifiesto_bus.py mostrar --tenant ekialdebus --bus BUS-321
+=============================================================================
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from escritor import EscritorLotes
+from snapshot import documentos, leer_coleccion, listar_tenants, obtener_campo, serializar_valor
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+COLECCION_MANIFIESTOS = 'manifiestos_bus'
+RUTA_MANIFIESTO = 'tenants/{tenant_id}/' + COLECCION_MANIFIESTOS + '/{bus_id}'
+
+# Campos de `equipos` que necesita un manifiesto (proyección al reparar)
+CAMPOS_EQUIPO = [
+    'tipoEquipoId', 'tipoEquipoNombre', 'codigoInterno', 'numeroSerieFabricante', 'red', 'estado',
+    'ubicacionActual', 'propiedad.operadorAsignadoId',
+]
+
+# Claves de cada entrada de `equipos` en el manifiesto
+CAMPOS_ENTRADA = ('tipo', 'tipoNombre', 'codigoInterno', 'numeroSerie', 'ip', 'mac', 'estado', 'posicion')
+
+Bus = Tuple[str, str]  # (tenantId, busId)
+
+
+# =============================================================================
+# ENTRADAS
+# =============================================================================
+
+def bus_de(data: Optional[Dict[str, Any]]) -> Optional[Bus]:
+    """(tenant, busId) donde está instalado un equipo, o None si no está en un bus."""
+    if not data or obtener_campo(data, 'ubicacionActual.tipo') != 'autobus':
+        return None
+    bus_id = obtener_campo(data, 'ubicacionActual.id')
+    tenant_id = obtener_campo(data, 'propiedad.operadorAsignadoId')
+    if not bus_id or not tenant_id:
+        return None
+    return tenant_id, bus_id
+
+
+def entrada_equipo(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Lo que la ficha del bus muestra de cada equipo."""
+    valores = (
+        data.get('tipoEquipoId'),
+        data.get('tipoEquipoNombre'),
+        data.get('codigoInterno'),
+        data.get('numeroSerieFabricante'),
+        obtener_campo(data, 'red.ip'),
+        obtener_campo(data, 'red.mac'),
+        data.get('estado'),
+        obtener_campo(data, 'ubicacionActual.posicionEnBus'),
+    )
+    return {k: v for k, v in zip(CAMPOS_ENTRADA, valores) if v is not None}
+
+
+def _entrada_merge(entrada: Dict[str, Any], borrar: Any) -> Dict[str, Any]:
+    """
+    La entrada para un set(merge=True): el merge fusiona el mapa del equipo
+    con el guardado, así que las claves que ya no tiene (p. ej. un equipo que
+    pierde la IP) se borran explícitamente en vez de quedarse con el valor viejo.
+    """
+    return {**{k: borrar for k in CAMPOS_ENTRADA if k not in entrada}, **entrada}
+
+
+# =============================================================================
+# ACTUALIZACIÓN EN LOS BATCHES DE IMPORTACIÓN
+# =============================================================================
+
+class CambiosManifiesto:
+    """
+    Cambios de manifiesto acumulados durante una importación.
+
+    `escribir()` genera un set(merge=True) por autobús con las entradas
+    nuevas o modificadas (DELETE_FIELD en las claves que ya no tienen),
+    DELETE_FIELD para los equipos que se han ido y un Increment del total.
+    """
+
+    def __init__(self):
+        self.por_bus: Dict[Bus, Dict[str, Optional[Dict[str, Any]]]] = {}
+        self.totales: Dict[Bus, int] = {}
+
+    def registrar(self, equipo_id: str, anterior: Optional[Dict[str, Any]], nuevo: Optional[Dict[str, Any]]) -> None:
+        bus_anterior, bus_nuevo = bus_de(anterior), bus_de(nuevo)
+        if bus_anterior is not None and bus_anterior != bus_nuevo:
+            self.por_bus.setdefault(bus_anterior, {})[equipo_id] = None
+            self.totales[bus_anterior] = self.totales.get(bus_anterior, 0) - 1
+        if bus_nuevo is None:
+            return
+        entrada = entrada_equipo(nuevo)
+        if bus_anterior == bus_nuevo and entrada == entrada_equipo(anterior):
+            return
+        self.por_bus.setdefault(bus_nuevo, {})[equipo_id] = entrada
+        if bus_anterior != bus_nuevo:
+            self.totales[bus_nuevo] = self.totales.get(bus_nuevo, 0) + 1
+
+    def escribir(self, escritor: EscritorLotes) -> int:
+        """Encola las actualizaciones; devuelve cuántos manifiestos se tocan."""
+        from firebase_admin import firestore
+
+        for (tenant_id, bus_id), equipos in self.por_bus.items():
+            doc = {
+                'busId': bus_id,
+                'tenantId': tenant_id,
+                'equipos': {
+                    equipo_id: firestore.DELETE_FIELD if entrada is None
+                    else _entrada_merge(entrada, firestore.DELETE_FIELD)
+                    for equipo_id, entrada in equipos.items()
+                },
+                'actualizadoEn': firestore.SERVER_TIMESTAMP,
+            }
+            if self.totales.get((tenant_id, bus_id)):
+                doc['total'] = firestore.Increment(self.totales[(tenant_id, bus_id)])
+            escritor.set(RUTA_MANIFIESTO.format(tenant_id=tenant_id, bus_id=bus_id), doc, merge=True)
+        return len(self.por_bus)
+
+
+# =============================================================================
+# REPARACIÓN
+# =============================================================================
+
+def calcular_manifiestos(equipos: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[Bus, Dict[str, Any]]:
+    """Manifiestos completos a partir de todos los equipos."""
+    manifiestos: Dict[Bus, Dict[str, Any]] = {}
+    for equipo_id, data in equipos:
+        bus = bus_de(data)
+        if bus is None:
+            continue
+        manifiesto = manifiestos.setdefault(bus, {'busId': bus[1], 'tenantId': bus[0], 'total': 0, 'equipos': {}})
+        manifiesto['equipos'][equipo_id] = entrada_equipo(data)
+        manifiesto['total'] += 1
+    return manifiestos
+
+
+def _contenido(manifiesto: Optional[Dict[str, Any]]) -> Any:
+    if manifiesto is None:
+        return None
+    return {k: manifiesto.get(k) for k in ('busId', 'tenantId', 'total', 'equipos')}
+
+
+def reparar(
+    db=None,
+    snapshot: Optional[Path] = None,
+    tenants: Optional[List[str]] = None,
+    aplicar: bool = True,
+) -> Dict[str, int]:
+    """
+    Recalcula los manifiestos desde `equipos`, los compara con los guardados
+    y reescribe sólo los que difieren (y borra los de buses ya sin equipos).
+    """
+    if snapshot is not None:
+        equipos = documentos('equipos', snapshot)
+    else:
+        equipos = leer_coleccion(db, 'equipos', campos=CAMPOS_EQUIPO)
+    esperados = calcular_manifiestos(equipos)
+    tenants = tenants or listar_tenants(snapshot, db)
+
+    stats = {'correctos': 0, 'corregidos': 0, 'borrados': 0}
+    escritor = EscritorLotes(db) if aplicar and db is not None else None
+    for tenant_id in tenants:
+        guardados = {
+            bus_id: data
+            for bus_id, data in documentos(f"tenants/{tenant_id}/{COLECCION_MANIFIESTOS}", snapshot, db)
+        }
+        del_tenant = {bus_id: m for (t, bus_id), m in esperados.items() if t == tenant_id}
+        for bus_id, manifiesto in del_tenant.items():
+            if _contenido(guardados.get(bus_id)) == _contenido(manifiesto):
+                stats['correctos'] += 1
+                continue
+            stats['corregidos'] += 1
+            if escritor is not None:
+                from firebase_admin import firestore
+                escritor.set(
+                    RUTA_MANIFIESTO.format(tenant_id=tenant_id, bus_id=bus_id),
+                    {**manifiesto, 'actualizadoEn': firestore.SERVER_TIMESTAMP},
+                )
+        for bus_id in guardados.keys() - del_tenant.keys():
+            stats['borrados'] += 1
+            if escritor is not None:
+                escritor.delete(RUTA_MANIFIESTO.format(tenant_id=tenant_id, bus_id=bus_id))
+    if escritor is not None:
+        escritor.commit()
+    return stats
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Manifiestos de equipos por autobús.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_rep = sub.add_parser('reparar', help="Recalcular y corregir manifiestos inconsistentes")
+    p_rep.add_argument('--tenant', action='append', dest='tenants', help="Tenant a revisar (repetible)")
+    p_rep.add_argument('--snapshot', type=Path, help="Comprobar contra un snapshot (sin escribir)")
+    p_rep.add_argument('--simular', action='store_true', help="Sólo informar, sin escribir")
+
+    p_mos = sub.add_parser('mostrar', help="Mostrar el manifiesto de un autobús")
+    p_mos.add_argument('--tenant', required=True)
+    p_mos.add_argument('--bus', required=True, help="ID del bus tal como aparece en ubicacionActual.id (BUS-321)")
+
+    args = parser.parse_args(argv)
+    inicio = time.perf_counter()
+
+    db = None
+    if getattr(args, 'snapshot', None) is None:
+        from cliente_firestore import conectar_firestore
+        db = conectar_firestore()
+
+    if args.comando == 'mostrar':
+        snap = db.document(RUTA_MANIFIESTO.format(tenant_id=args.tenant, bus_id=args.bus)).get()
+        if not snap.exists:
+            print(f"⚠️  No hay manifiesto para {args.bus} en {args.tenant}")
+            return 1
+        print(json.dumps(serializar_valor(snap.to_dict()), ensure_ascii=False, indent=2))
+        return 0
+
+    print("🔧 Revisando manifiestos de equipos por autobús...")
+    stats = reparar(db, args.snapshot, args.tenants, aplicar=not args.simular)
+    accion = "a corregir" if args.simular or args.snapshot else "corregidos"
+    print(f"✅ {stats['correctos']} correctos, {stats['corregidos']} {accion}, "
+          f"{stats['borrados']} obsoletos ({time.perf_counter() - inicio:.2f} s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+=============================================================================
+MAPEO DE COLUMNAS DEL EXCEL DE FLOTA - ZaintzaBus
+=============================================================================
+Definiciones compartidas entre los importadores (importar_equipos.py,
+importador_zaintzabus.py, ingerir_movimientos.py, indice_fotos.py) y las
+herramientas de análisis (perfilar_excel.py).
+
+Este módulo no depende de pandas ni de firebase_admin, así que cualquier
+script puede importarlo sin coste.
+=============================================================================
+"""
+
+from typing import Dict
+
+# Fila donde empiezan los headers (0-indexed, fila 8 del Excel = índice 7)
+FILA_CABECERA = 7
+
+# Columnas del activo (vehículo)
+COLUMNAS_ACTIVO = {
+    'COD_BUS': 'codigo',
+    'MATRICULA': 'matricula',
+    'Nº Obra / Chasis': 'chasis',
+    'MODELO AUTOBÚS': 'modelo',
+    'CARROCERIA': 'carroceria',
+    'FECHA PRE  INSTALACION': 'fechaPreInstalacion',
+    'FECHA INSTALACIÓN': 'fechaInstalacion',
+    'INSTALADOR': 'instalador',
+    'BUS MIGRADO SI/NO': 'migrado',
+    'COMENTARIOS': 'comentarios',
+}
+
+# Columnas de equipos -> (tipo_firestore, tiene_telefono_asociado)
+COLUMNAS_EQUIPOS = {
+    'N. AMPLIFICADOR': ('amplificador', False),
+    'N. CPU': ('cpu', False),
+    'LICENCIA': ('licencia_software', False),
+    'SWITCH': ('switch', False),
+    'ROUTER': ('router', False),
+    'WIFI': ('modulo_wifi', False),
+    'COMMS 1': ('comunicacion', False),
+    'COMMS 2': ('comunicacion', False),
+    'CAMARA 1': ('camara', False),
+    'CAMARA 2': ('camara', False),
+    'CAMARA 3': ('camara', False),
+    'CAMARA 4': ('camara', False),
+    'PUPITE': ('pupitre', False),
+    'VALIDADORA 1': ('validadora', False),
+    'VALIDADORA 2': ('validadora', False),
+    'VALIDADORA 3': ('validadora', False),
+    'IP SIM': ('ip_fija', False),
+    'SIM m2m': ('sim_card', True),
+    'SIM WIFI 3G': ('sim_card', True),
+}
+
+# Componentes de los formularios de Lurraldebus (Nueva Insta, Desmontajes y
+# Traspaso) -> tipo_firestore. None = material que no se inventaría como
+# equipo: se anota en el movimiento pero no mueve ningún documento.
+COMPONENTES_FORMULARIO = {
+    'Antenas WIFI': 'modulo_wifi',
+    'Antenas GPS-4G': None,
+    'Validadoras': 'validadora',
+    'Pupitre': 'pupitre',
+    'PC SAE': 'cpu',
+    'Router': 'router',
+    'Switch': 'switch',
+    'Amplificador': 'amplificador',
+    'Elevadores 12v-24v': None,
+    'SIM M2M': 'sim_card',
+    'SIM 3G': 'sim_card',
+    'Monitores TFT': 'pantalla',
+    'Splitter VGA': None,
+    'Relé Finder Audio interior': None,
+    'Microfono M.L.': None,
+    'Altavoz M.L.': None,
+    'Altavoz exterior': None,
+    'Tecla SOS': None,
+    'Cámaras VV': 'camara',
+}
+
+# Libro de fotos (Link de Drive-Fotos): fila de cabecera (0-indexed) y
+# columnas -> campo
+FILA_CABECERA_FOTOS = 4
+COLUMNAS_FOTOS = {
+    'OPERADOR': 'operador',
+    'Nº BUS': 'bus',
+    'MATRICULA': 'matricula',
+    'MODELO': 'modelo',
+    'CODIGO': 'codigo',
+    'DESCRIPCIÓN': 'descripcion',
+    'LOCALIZACION DRIVE': 'url',
+}
+
+# Descripción de la foto sin número ("Camara 3" -> "CAMARA") -> (tipo_firestore,
+# prefijo de codigoInterno). El número es el índice del equipo en el bus, como
+# en get_mapeo_columnas_ekialdebus ("CAMARA 3" -> CAM-324-003). Las que no
+# están aquí (Bornero, Guantera, Instalaciones Generales...) son fotos del bus.
+DESCRIPCIONES_FOTOS = {
+    'VALIDADORA': ('validadora', 'VAL'),
+    'CAMARA': ('camara', 'CAM'),
+    'PUPITRE': ('pupitre', 'PUP'),
+    'ANTENA WIFI': ('modulo_wifi', 'WIF'),
+    'PC': ('cpu', 'CPU'),
+    'AMPLIFICADOR': ('amplificador', 'AMP'),
+    'ROUTER': ('router', 'RTR'),
+    'SWITCH': ('switch', 'SWT'),
+    'MONITOR': ('pantalla', 'PAN'),
+}
+
+# Teléfonos asociados a SIMs
+TELEFONOS_SIM = {
+    'SIM m2m': 'TELEFONO SIM m2m',
+    'SIM WIFI 3G': 'TELEFONO SIM WIFI 3G',
+}
+
+
+def get_mapeo_columnas_ekialdebus() -> Dict[str, tuple]:
+    """
+    Mapeo específico para el Excel de Ekialdebus.
+    Retorna un diccionario donde:
+    - key: nombre de la columna en el Excel
+    - value: tupla (tipo_equipo, indice, campo_adicional)
+
+    Columnas del Excel Ekialdebus:
+    - COD_BUS, MATRICULA, Nº Obra / Chasis, MODELO AUTOBÚS, CARROCERIA
+    - N. AMPLIFICADOR, N. CPU, LICENCIA, SWITCH, ROUTER
+    - IP SIM, SIM m2m, TELEFONO SIM m2m, SIM WIFI 3G, TELEFONO SIM WIFI 3G
+    - WIFI, COMMS 1, COMMS 2
+    - CAMARA 1, CAMARA 2, CAMARA 3, CAMARA 4
+    - PUPITE, VALIDADORA 1, VALIDADORA 2, VALIDADORA 3
+    """
+    return {
+        # Amplificador
+        "N. AMPLIFICADOR": ("amplificador", 1, "numeroSerie"),
+
+        # CPU
+        "N. CPU": ("cpu", 1, "numeroSerie"),
+
+        # Licencia
+        "LICENCIA": ("licencia_software", 1, "licencia"),
+
+        # Switch
+        "SWITCH": ("switch", 1, "numeroSerie"),
+
+        # Router
+        "ROUTER": ("router", 1, "numeroSerie"),
+
+        # Módulo WiFi
+        "WIFI": ("modulo_wifi", 1, "numeroSerie"),
+
+        # Comunicaciones (hay 2)
+        "COMMS 1": ("comunicacion", 1, "numeroSerie"),
+        "COMMS 2": ("comunicacion", 2, "numeroSerie"),
+
+        # Cámaras (hay 4)
+        "CAMARA 1": ("camara", 1, "mac"),
+        "CAMARA 2": ("camara", 2, "mac"),
+        "CAMARA 3": ("camara", 3, "mac"),
+        "CAMARA 4": ("camara", 4, "mac"),
+
+        # Pupitre
+        "PUPITE": ("pupitre", 1, "numeroSerie"),
+
+        # Validadoras (hay 3)
+        "VALIDADORA 1": ("validadora", 1, "numeroSerie"),
+        "VALIDADORA 2": ("validadora", 2, "numeroSerie"),
+        "VALIDADORA 3": ("validadora", 3, "numeroSerie"),
+
+        # IP Fija (del SIM)
+        "IP SIM": ("ip_fija", 1, "ip"),
+
+        # SIM Cards con teléfonos (hay 2: m2m y WiFi 3G)
+        "SIM m2m": ("sim_card", 1, "icc"),
+        "TELEFONO SIM m2m": ("sim_card", 1, "telefono"),
+        "SIM WIFI 3G": ("sim_card", 2, "icc"),
+        "TELEFONO SIM WIFI 3G": ("sim_card", 2, "telefono"),
+    }
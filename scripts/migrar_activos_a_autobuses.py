@@ -10,24 +10,101 @@ Mapeo de campos:
   - carroceria → modelo (es el modelo real: CITARO, etc.)
   - chasis → numeroChasis
   - (nuevo) → anio (se intenta extraer o se deja vacío)
+
+USO:
+    python scripts/migrar_activos_a_autobuses.py
+    python scripts/migrar_activos_a_autobuses.py --tenant ekialdebus --tenant dbus
+    python scripts/migrar_activos_a_autobuses.py --async       (ver pipeline_async.py)
+    python scripts/zaintzabus.py migrate --tenant ekialdebus     (ver zaintzabus.py)
 =============================================================================
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
+import argparse
+import asyncio
+import sys
 from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from auditoria_lotes import ManifiestoAuditoria
+from cliente_firestore import conectar_firestore, conectar_firestore_async
+from contexto import Contexto
+from escritor import EscritorLotes
+from pipeline_async import (
+    TAM_LOTE_LECTURA, EscritorAsync, Limites, leer_coleccion_async, leer_por_ids_async, lotes, tuberia,
+)
+from progreso_instalacion import RUTA_PROGRESO, DeltaInstalacion
+from resumen_flota import DeltaResumen
+from snapshot import leer_por_ids
 
-# Configuración
+# Configuración (valor por defecto de --tenant)
 TENANTS_A_MIGRAR = ['ekialdebus', 'lurraldebus-gipuzkoa']
 
 def inicializar_firebase():
-    if not firebase_admin._apps:
-        cred = credentials.Certificate("scripts/serviceAccountKey.json")
-        firebase_admin.initialize_app(cred)
-    return firestore.client()
+    return conectar_firestore()
+
+
+def autobus_desde_activo(data: Dict[str, Any], tenant_id: str) -> Dict[str, Any]:
+    """Documento de tenants/{t}/autobuses a partir de un activo."""
+    # Mapear campos
+    # El campo 'modelo' del Excel contiene la MARCA (MERCEDES, MAN, etc.)
+    # El campo 'carroceria' contiene el MODELO real (CITARO, LION'S, etc.)
+    marca = data.get('modelo', '')  # modelo actual es realmente la marca
+    modelo = data.get('carroceria', '')  # carroceria es el modelo real
+
+    autobus_data = {
+        # Campos identificadores
+        'codigo': data.get('codigo'),
+        'matricula': data.get('matricula'),
+        
+        # Campos del vehículo (mapeados correctamente)
+        'marca': marca,
+        'modelo': modelo,
+        'carroceria': data.get('carroceria'),  # Mantener también carroceria
+        'numeroChasis': data.get('chasis'),
+        'anio': data.get('anio'),  # Puede no existir
+        
+        # Operador
+        'operadorId': tenant_id,
+        'operadorNombre': data.get('operadorNombre'),
+        
+        # Estado
+        'estado': data.get('estado', 'operativo'),
+        
+        # Instalación
+        'instalacion': {
+            'fase': 'completada' if data.get('migrado') else 'pendiente',
+            'fechaPreInstalacion': data.get('fechaPreInstalacion'),
+            'fechaInstalacion': data.get('fechaInstalacion'),
+            'instalador': data.get('instalador'),
+            'migrado': data.get('migrado', False),
+        },
+        
+        # Contadores (iniciales)
+        'contadores': {
+            'totalEquipos': 0,  # Se actualizará después
+            'totalIncidencias': 0,
+            'incidenciasAbiertas': 0,
+        },
+        
+        # Auditoría
+        'auditoria': {
+            'creadoPor': 'migracion_activos',
+            'creadoEn': data.get('createdAt', datetime.utcnow()),
+            'modificadoPor': 'migracion_activos',
+            'modificadoEn': datetime.utcnow(),
+        },
+        
+        # Comentarios originales
+        'comentarios': data.get('comentarios'),
+    }
+
+    # Limpiar campos None
+    autobus_data = {k: v for k, v in autobus_data.items() if v is not None}
+    autobus_data['instalacion'] = {k: v for k, v in autobus_data.get('instalacion', {}).items() if v is not None}
+    return autobus_data
 
 
-def migrar_activos_a_autobuses(db, tenant_id: str):
+def migrar_activos_a_autobuses(db, tenant_id: str, escritor: Optional[EscritorLotes] = None):
     """Migra activos de un tenant a la colección autobuses."""
     
     print(f"\n{'='*60}")
@@ -45,152 +122,251 @@ def migrar_activos_a_autobuses(db, tenant_id: str):
         print("  No hay activos para migrar")
         return 0
     
-    batch = db.batch()
+    # Autobuses ya migrados, para auditar sólo los campos que cambian
+    existentes = leer_por_ids(db, f"tenants/{tenant_id}/autobuses", [doc.id for doc in activos])
+    
+    propio = escritor is None
+    escritor = escritor or EscritorLotes(db)
+    manifiesto = ManifiestoAuditoria(
+        db, 'migrar_activos_a_autobuses', 'activo', tenant_id=tenant_id,
+        usuario_id='migracion_activos', escritor=escritor,
+    )
+    delta_resumen = DeltaResumen()
+    delta_progreso = DeltaInstalacion()
     count = 0
     
     for doc in activos:
-        data = doc.to_dict()
         doc_id = doc.id
-        
-        # Mapear campos
-        # El campo 'modelo' del Excel contiene la MARCA (MERCEDES, MAN, etc.)
-        # El campo 'carroceria' contiene el MODELO real (CITARO, LION'S, etc.)
-        marca = data.get('modelo', '')  # modelo actual es realmente la marca
-        modelo = data.get('carroceria', '')  # carroceria es el modelo real
-        
-        autobus_data = {
-            # Campos identificadores
-            'codigo': data.get('codigo'),
-            'matricula': data.get('matricula'),
-            
-            # Campos del vehículo (mapeados correctamente)
-            'marca': marca,
-            'modelo': modelo,
-            'carroceria': data.get('carroceria'),  # Mantener también carroceria
-            'numeroChasis': data.get('chasis'),
-            'anio': data.get('anio'),  # Puede no existir
-            
-            # Operador
-            'operadorId': tenant_id,
-            'operadorNombre': data.get('operadorNombre'),
-            
-            # Estado
-            'estado': data.get('estado', 'operativo'),
-            
-            # Instalación
-            'instalacion': {
-                'fase': 'completada' if data.get('migrado') else 'pendiente',
-                'fechaPreInstalacion': data.get('fechaPreInstalacion'),
-                'fechaInstalacion': data.get('fechaInstalacion'),
-                'instalador': data.get('instalador'),
-                'migrado': data.get('migrado', False),
-            },
-            
-            # Contadores (iniciales)
-            'contadores': {
-                'totalEquipos': 0,  # Se actualizará después
-                'totalIncidencias': 0,
-                'incidenciasAbiertas': 0,
-            },
-            
-            # Auditoría
-            'auditoria': {
-                'creadoPor': 'migracion_activos',
-                'creadoEn': data.get('createdAt', datetime.utcnow()),
-                'modificadoPor': 'migracion_activos',
-                'modificadoEn': datetime.utcnow(),
-            },
-            
-            # Comentarios originales
-            'comentarios': data.get('comentarios'),
-        }
-        
-        # Limpiar campos None
-        autobus_data = {k: v for k, v in autobus_data.items() if v is not None}
-        autobus_data['instalacion'] = {k: v for k, v in autobus_data.get('instalacion', {}).items() if v is not None}
+        autobus_data = autobus_desde_activo(doc.to_dict(), tenant_id)
         
         # Guardar en autobuses con el mismo ID
         autobus_ref = autobuses_ref.document(doc_id)
-        batch.set(autobus_ref, autobus_data)
+        escritor.set(autobus_ref, autobus_data)
+        manifiesto.registrar(doc_id, existentes.get(doc_id), autobus_data)
+        delta_resumen.autobus(tenant_id, existentes.get(doc_id), autobus_data)
+        delta_progreso.autobus(tenant_id, existentes.get(doc_id), autobus_data)
         count += 1
         
         if count % 100 == 0:
             print(f"  Procesados {count}...")
-            batch.commit()
-            batch = db.batch()
     
-    # Commit final
-    if count % 100 != 0:
-        batch.commit()
+    # Auditoría y resúmenes en los mismos batches. Con un escritor compartido
+    # el commit lo hace quien lo creó: así el update de contadores posterior
+    # se fusiona con el set de cada autobús en una sola escritura
+    resumen = manifiesto.cerrar()
+    delta_resumen.escribir(escritor)
+    delta_progreso.escribir(escritor)
+    if propio:
+        escritor.commit()
     
+    totales = resumen['totales']
     print(f"  ✅ Migrados {count} autobuses")
+    print(f"  📝 Auditoría: {totales['crear']} nuevos, {totales['actualizar']} con cambios, "
+          f"{totales['sinCambios']} sin cambios ({resumen['partes']} documento/s)")
     return count
 
 
-def actualizar_contadores_equipos(db, tenant_id: str):
-    """Actualiza los contadores de equipos para cada autobús."""
+def codigo_bus_equipo(data: Dict[str, Any]) -> Optional[str]:
+    """Código del autobús en el que está instalado un equipo (None si no está en un autobús)."""
+    ubicacion = data.get('ubicacionActual') or {}
+    if ubicacion.get('tipo') != 'autobus':
+        return None
+    bus_nombre = ubicacion.get('nombre', '')
+    # Extraer código del bus (ej: "BUS-321" -> "321")
+    return bus_nombre.replace('BUS-', '') if bus_nombre.startswith('BUS-') else bus_nombre
+
+
+def contar_equipos_por_bus(equipos: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """Equipos instalados en cada autobús, por código de bus."""
+    equipos_por_bus = {}
+    for data in equipos:
+        bus_codigo = codigo_bus_equipo(data)
+        if bus_codigo is not None:
+            equipos_por_bus[bus_codigo] = equipos_por_bus.get(bus_codigo, 0) + 1
+    return equipos_por_bus
+
+
+def actualizar_contadores_equipos(db, tenant_id: str, escritor: Optional[EscritorLotes] = None):
+    """
+    Actualiza los contadores de equipos para cada autobús. Tiene en cuenta
+    los autobuses escritos en el mismo escritor y aún sin confirmar.
+    """
     
     print(f"\nActualizando contadores de equipos para {tenant_id}...")
     
-    autobuses_ref = db.collection(f"tenants/{tenant_id}/autobuses")
+    ruta_autobuses = f"tenants/{tenant_id}/autobuses"
+    autobuses_ref = db.collection(ruta_autobuses)
     equipos_ref = db.collection("equipos")
     
     # Contar equipos por bus
-    equipos_por_bus = {}
-    for eq in equipos_ref.stream():
-        data = eq.to_dict()
-        ubicacion = data.get('ubicacionActual', {})
-        if ubicacion.get('tipo') == 'autobus':
-            bus_nombre = ubicacion.get('nombre', '')
-            # Extraer código del bus (ej: "BUS-321" -> "321")
-            bus_codigo = bus_nombre.replace('BUS-', '') if bus_nombre.startswith('BUS-') else bus_nombre
-            equipos_por_bus[bus_codigo] = equipos_por_bus.get(bus_codigo, 0) + 1
+    equipos_por_bus = contar_equipos_por_bus(eq.to_dict() for eq in equipos_ref.stream())
+    
+    codigos = {doc.id: doc.to_dict().get('codigo') for doc in autobuses_ref.stream()}
+    propio = escritor is None
+    escritor = escritor or EscritorLotes(db)
+    for doc_id, (tipo, datos, _merge) in escritor.pendientes(ruta_autobuses):
+        if tipo == 'delete':
+            codigos.pop(doc_id, None)
+        elif tipo == 'set' and 'codigo' in datos:
+            codigos[doc_id] = datos['codigo']
     
     # Actualizar autobuses
-    batch = db.batch()
     count = 0
-    
-    for doc in autobuses_ref.stream():
-        codigo = doc.to_dict().get('codigo')
+    for doc_id, codigo in codigos.items():
         total_equipos = equipos_por_bus.get(codigo, 0)
         
         if total_equipos > 0:
-            batch.update(doc.reference, {'contadores.totalEquipos': total_equipos})
+            escritor.update(autobuses_ref.document(doc_id), {'contadores.totalEquipos': total_equipos})
             count += 1
-            
-            if count % 100 == 0:
-                batch.commit()
-                batch = db.batch()
     
-    if count > 0:
-        batch.commit()
+    if propio:
+        escritor.commit()
     
     print(f"  ✅ Actualizados contadores de {count} autobuses")
 
 
-def main():
+# =============================================================================
+# MODO ASÍNCRONO (--async)
+# =============================================================================
+
+async def migrar_tenant_async(cliente, tenant_id: str, escritor, limites) -> int:
+    """
+    migrar_activos_a_autobuses() como tubería: páginas de activos ->
+    autobuses existentes (varias lecturas en vuelo) -> transformación ->
+    commits concurrentes del EscritorAsync.
+    """
+    ruta_autobuses = f"tenants/{tenant_id}/autobuses"
+    manifiesto = ManifiestoAuditoria(
+        escritor.db, 'migrar_activos_a_autobuses', 'activo', tenant_id=tenant_id,
+        usuario_id='migracion_activos', escritor=escritor,
+    )
+    delta_resumen = DeltaResumen()
+    delta_progreso = DeltaInstalacion()
+    count = 0
+
+    async def leer_existentes(lote: List[Tuple[str, Dict[str, Any]]]):
+        ids = [doc_id for doc_id, _ in lote]
+        return lote, await leer_por_ids_async(cliente, ruta_autobuses, ids, limites)
+
+    async def migrar(leido) -> None:
+        nonlocal count
+        lote, existentes = leido
+        for doc_id, data in lote:
+            autobus_data = autobus_desde_activo(data, tenant_id)
+            escritor.set(f"{ruta_autobuses}/{doc_id}", autobus_data)
+            manifiesto.registrar(doc_id, existentes.get(doc_id), autobus_data)
+            delta_resumen.autobus(tenant_id, existentes.get(doc_id), autobus_data)
+            delta_progreso.autobus(tenant_id, existentes.get(doc_id), autobus_data)
+            count += 1
+        await escritor.ceder()
+
+    activos = leer_coleccion_async(cliente, f"tenants/{tenant_id}/activos", limites)
+    await tuberia(lotes(activos, TAM_LOTE_LECTURA), [(leer_existentes, limites.por_defecto), (migrar, 1)])
+    if not count:
+        print(f"\n⚠️  Tenant '{tenant_id}' no tiene activos")
+        return 0
+
+    resumen = manifiesto.cerrar()
+    delta_resumen.escribir(escritor)
+    # El documento de progreso se lee con el AsyncClient: un get() síncrono
+    # bloquearía el bucle de eventos (y los commits en vuelo)
+    coleccion_progreso, id_progreso = RUTA_PROGRESO.format(tenant_id=tenant_id).rsplit('/', 1)
+    progreso = await leer_por_ids_async(cliente, coleccion_progreso, [id_progreso], limites)
+    delta_progreso.escribir(escritor, {tenant_id: progreso.get(id_progreso)})
+    await escritor.ceder()
+
+    totales = resumen['totales']
+    print(f"  ✅ {tenant_id}: migrados {count} autobuses")
+    print(f"  📝 {tenant_id}: auditoría: {totales['crear']} nuevos, {totales['actualizar']} con cambios, "
+          f"{totales['sinCambios']} sin cambios ({resumen['partes']} documento/s)")
+    return count
+
+
+async def actualizar_contadores_async(cliente, tenant_id: str, equipos_por_bus: Dict[str, int], escritor, limites) -> int:
+    """actualizar_contadores_equipos() leyendo sólo el código de cada autobús."""
+    ruta = f"tenants/{tenant_id}/autobuses"
+    count = 0
+    async for doc_id, data in leer_coleccion_async(cliente, ruta, limites, campos=['codigo']):
+        total_equipos = equipos_por_bus.get(data.get('codigo'), 0)
+        if total_equipos > 0:
+            escritor.update(f"{ruta}/{doc_id}", {'contadores.totalEquipos': total_equipos})
+            count += 1
+            await escritor.ceder()
+    print(f"  ✅ {tenant_id}: actualizados contadores de {count} autobuses")
+    return count
+
+
+async def migrar_async(tenants: List[str], concurrencia: int, contexto: Optional[Contexto] = None) -> int:
+    """
+    Todos los tenants a la vez. La colección global 'equipos' se lee una
+    sola vez (proyectada a ubicacionActual) mientras se migra, en lugar de
+    una vez por tenant al final.
+    """
+    cliente = conectar_firestore_async()
+    limites = Limites(concurrencia)
+    escritor = EscritorAsync(cliente, limites)
+    if contexto is not None:
+        contexto.adjuntar(escritor)
+
+    async def contar() -> Dict[str, int]:
+        equipos = [data async for _, data in leer_coleccion_async(cliente, 'equipos', limites, campos=['ubicacionActual'])]
+        return contar_equipos_por_bus(equipos)
+
+    conteo = asyncio.ensure_future(contar())
+    migrados = await asyncio.gather(*(migrar_tenant_async(cliente, t, escritor, limites) for t in tenants))
+    equipos_por_bus = await conteo
+
+    # Los contadores se leen de los autobuses ya confirmados
+    await escritor.esperar()
+    print("\nActualizando contadores de equipos...")
+    await asyncio.gather(*(
+        actualizar_contadores_async(cliente, t, equipos_por_bus, escritor, limites)
+        for t, n in zip(tenants, migrados) if n
+    ))
+    await escritor.cerrar()
+    print(f"  💾 {escritor.operaciones} escrituras en {escritor.commits} commits")
+    return sum(migrados)
+
+
+def main(argv: Optional[List[str]] = None, contexto: Optional[Contexto] = None) -> int:
+    parser = argparse.ArgumentParser(description="Migra tenants/{t}/activos a tenants/{t}/autobuses.")
+    parser.add_argument('--tenant', action='append', help=f"Tenant a migrar, repetible (por defecto {TENANTS_A_MIGRAR})")
+    parser.add_argument('--async', dest='asincrono', action='store_true',
+                        help="Tenants en paralelo, con lecturas y commits solapados (AsyncClient)")
+    parser.add_argument('--concurrencia', type=int, default=8, help="Peticiones simultáneas por colección con --async")
+    args = parser.parse_args(argv)
+    contexto = contexto or Contexto()
+
     print("=" * 60)
     print("MIGRADOR DE ACTIVOS A AUTOBUSES")
     print("=" * 60)
     
-    db = inicializar_firebase()
+    db = contexto.db
     print("Firebase inicializado")
     
     total = 0
-    for tenant_id in TENANTS_A_MIGRAR:
+    tenants = args.tenant or TENANTS_A_MIGRAR
+    if args.asincrono:
+        total = asyncio.run(migrar_async(tenants, args.concurrencia, contexto))
+    for tenant_id in [] if args.asincrono else tenants:
         # Verificar si el tenant tiene activos
         activos = list(db.collection(f"tenants/{tenant_id}/activos").limit(1).stream())
         if activos:
-            count = migrar_activos_a_autobuses(db, tenant_id)
+            count = migrar_activos_a_autobuses(db, tenant_id, contexto.escritor)
             total += count
-            actualizar_contadores_equipos(db, tenant_id)
+            actualizar_contadores_equipos(db, tenant_id, contexto.escritor)
         else:
             print(f"\n⚠️  Tenant '{tenant_id}' no tiene activos")
     
+    # Cada autobús (set de la migración + update de contadores) en una escritura
+    if not args.asincrono:
+        contexto.escritor.commit()
+    
     print(f"\n{'='*60}")
     print(f"MIGRACIÓN COMPLETADA: {total} autobuses migrados")
     print(f"{'='*60}")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+=============================================================================
+ORDEN DE ESCRITURA E IDS SIN HOTSPOTS - ZaintzaBus
+=============================================================================
+Firestore reparte cada colección en rangos de claves contiguas. Escribir en
+orden de bus con IDs como AMP-321-001, AMP-321-002, CAM-321-001... concentra
+todas las escrituras de un momento en el mismo rango (hotspot) y limita el
+ritmo sostenido de una importación grande.
+
+Dos remedios independientes:
+
+  - Orden de escritura (`ordenar`):
+      secuencial   el orden original (por bus)
+      aleatorio    barajado con semilla fija (reproducible)
+      intercalado  las claves ordenadas se cortan en N tramos contiguos y se
+                   toma una de cada tramo por turnos: escrituras consecutivas
+                   caen en rangos alejados
+
+  - Esquema de ID (`id_documento`):
+      codigo       codigoInterno tal cual (con '/' -> '-')
+      hash         8 hex de SHA-1 + codigoInterno ('3f9a1c0b-AMP-321-001'):
+                   determinista (una reimportación pisa el mismo documento) y
+                   repartido por todo el espacio de claves. codigoInterno
+                   sigue siendo un campo indexado para las búsquedas.
+
+Cambiar de esquema en una colección ya poblada crea documentos nuevos: hay
+que purgar antes o migrar los IDs.
+=============================================================================
+"""
+
+import bisect
+import hashlib
+import random
+from typing import Callable, Dict, List, Sequence, TypeVar
+
+T = TypeVar('T')
+
+ORDENES = ('secuencial', 'aleatorio', 'intercalado')
+ESQUEMAS_ID = ('codigo', 'hash')
+
+# Tramos de clave para el orden intercalado
+TRAMOS_INTERCALADO = 32
+
+SEMILLA = 20260123
+
+
+# =============================================================================
+# IDS
+# =============================================================================
+
+def id_documento(codigo_interno: str, esquema: str = 'codigo') -> str:
+    """ID del documento de `equipos` para un codigoInterno según el esquema."""
+    saneado = codigo_interno.replace('/', '-')
+    if esquema == 'codigo':
+        return saneado
+    if esquema == 'hash':
+        return f"{hashlib.sha1(codigo_interno.encode('utf-8')).hexdigest()[:8]}-{saneado}"
+    raise ValueError(f"Esquema de ID desconocido: {esquema} (usa {', '.join(ESQUEMAS_ID)})")
+
+
+# =============================================================================
+# ORDEN
+# =============================================================================
+
+def _por_turnos(grupos: Sequence[List[T]]) -> List[T]:
+    """Toma un elemento de cada grupo por turnos hasta agotarlos."""
+    resultado: List[T] = []
+    for i in range(max((len(g) for g in grupos), default=0)):
+        resultado.extend(g[i] for g in grupos if i < len(g))
+    return resultado
+
+
+def ordenar(
+    elementos: Sequence[T],
+    clave: Callable[[T], str],
+    modo: str = 'intercalado',
+    tramos: int = TRAMOS_INTERCALADO,
+    semilla: int = SEMILLA,
+) -> List[T]:
+    """
+    Reordena los elementos a escribir según `modo` (ver ORDENES).
+
+    Args:
+        clave: ID de documento de cada elemento (el que decide el rango).
+    """
+    elementos = list(elementos)
+    if modo == 'secuencial':
+        return elementos
+    if modo == 'aleatorio':
+        random.Random(semilla).shuffle(elementos)
+        return elementos
+    if modo == 'intercalado':
+        ordenados = sorted(elementos, key=clave)
+        n = max(1, min(tramos, len(ordenados)))
+        tamano = -(-len(ordenados) // n)
+        return _por_turnos([ordenados[i:i + tamano] for i in range(0, len(ordenados), tamano)])
+    raise ValueError(f"Orden desconocido: {modo} (usa {', '.join(ORDENES)})")
+
+
+# =============================================================================
+# MEDIDA (sin Firestore)
+# =============================================================================
+
+def concentracion(ids_en_orden: Sequence[str], ventana: int = 500, rangos: int = 64) -> float:
+    """
+    Indicador de hotspot: fracción media de cada ventana de escrituras que cae
+    en el rango de claves más cargado (1.0 = todas en el mismo rango).
+
+    Los rangos son cuantiles del conjunto de IDs, como los divide Firestore
+    cuando una colección ya tiene datos.
+    """
+    if not ids_en_orden:
+        return 0.0
+    ordenados = sorted(ids_en_orden)
+    cortes = [ordenados[(i * len(ordenados)) // rangos] for i in range(1, rangos)]
+    rango = [bisect.bisect_right(cortes, doc_id) for doc_id in ids_en_orden]
+    fracciones = []
+    for i in range(0, len(rango), ventana):
+        trozo = rango[i:i + ventana]
+        conteo: Dict[int, int] = {}
+        for r in trozo:
+            conteo[r] = conteo.get(r, 0) + 1
+        fracciones.append(max(conteo.values()) / len(trozo))
+    return sum(fracciones) / len(fracciones)
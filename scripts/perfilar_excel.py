@@ -0,0 +1,309 @@
+"""
+=============================================================================
+PERFILADOR DE COLUMNAS DEL EXCEL DE FLOTA - ZaintzaBus
+=============================================================================
+Sustituye a analyze_excel.py, analyze_excel_v2.py y analyze_excel_complete.py.
+
+Lee el libro una sola vez y, para cada columna, calcula en una pasada:
+  - tasa de relleno y número de valores distintos
+  - frecuencia de valores centinela ('-', '¿¿??', 'nan', ...)
+  - histograma de patrones de formato (A = letra, 9 = dígito) con ejemplos
+  - tipo inferido (fecha, ip, mac, icc, telefono, entero, ...)
+
+Después contrasta el resultado con los mapeos de columnas de los importadores
+(mapeo_columnas.py) y avisa de columnas que faltan, que sólo coinciden tras
+quitar espacios, o cuyo contenido no encaja con el campo al que se importan.
+
+USO:
+    python scripts/perfilar_excel.py "Archivos_Excel/Flota Ekialdebus.xlsx"
+    python scripts/perfilar_excel.py libro.xlsx --hoja EKIALDEBUS --salida perfil.json
+    python scripts/perfilar_excel.py libro.xlsx --resumen
+    python scripts/zaintzabus.py analyze libro.xlsx --resumen     (ver zaintzabus.py)
+=============================================================================
+"""
+
+import argparse
+import json
+import re
+import string
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from cliente_firestore import ModuloDiferido
+from contexto import Contexto
+from mapeo_columnas import (
+    COLUMNAS_ACTIVO,
+    FILA_CABECERA,
+    get_mapeo_columnas_ekialdebus,
+)
+
+pd = ModuloDiferido('pandas')
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+# Valores que los importadores tratan como "sin dato" (comparados en minúsculas)
+SENTINELAS = ('-', '¿¿??', '??', 'nan', 'none', 'n/a')
+
+# Número de patrones y ejemplos que se guardan por columna
+MAX_PATRONES = 10
+MAX_EJEMPLOS = 3
+
+# Traducción carácter -> clase para construir el patrón de formato
+_TABLA_PATRON = str.maketrans(
+    string.digits + string.ascii_uppercase + string.ascii_lowercase,
+    '9' * 10 + 'A' * 26 + 'a' * 26,
+)
+
+# Clasificación de patrones (se evalúa sobre patrones distintos, no por valor)
+_REGLAS_TIPO = [
+    ('fecha', re.compile(r'^9{4}-99-99( 99:99:99)?$|^99?/99?/9{2,4}$')),
+    ('ip', re.compile(r'^9{1,3}(\.9{1,3}){3}$')),
+    ('mac', re.compile(r'^([9Aa]{2}[:-]){5}[9Aa]{2}$|^[9Aa]{4}\.[9Aa]{4}\.[9Aa]{4}$')),
+    ('icc', re.compile(r'^9{18,20}-?$')),
+    ('telefono', re.compile(r'^(\+9{2})?9{9}$')),
+    ('entero', re.compile(r'^-?9+$')),
+    ('decimal', re.compile(r'^-?9+[.,]9+$')),
+    ('codigo', re.compile(r'^[9Aa]+([-/_.][9Aa]+)*$')),
+]
+
+_BOOLEANOS = {'si', 'sí', 'no', 'true', 'false'}
+
+# Tipo esperado según el campo destino del importador
+TIPO_ESPERADO_POR_CAMPO = {
+    'ip': 'ip',
+    'mac': 'mac',
+    'icc': 'icc',
+    'telefono': 'telefono',
+    'fechaPreInstalacion': 'fecha',
+    'fechaInstalacion': 'fecha',
+    'migrado': 'booleano',
+}
+
+
+# =============================================================================
+# PERFILADO
+# =============================================================================
+
+def clasificar_patron(patron: str) -> str:
+    """Devuelve el tipo asociado a un patrón de formato."""
+    for tipo, regla in _REGLAS_TIPO:
+        if regla.match(patron):
+            return tipo
+    return 'texto'
+
+
+def perfilar_columna(serie: 'pd.Series') -> Dict[str, Any]:
+    """
+    Perfila una columna en una sola pasada.
+
+    El texto normalizado se calcula una vez y todas las métricas se derivan de
+    máscaras sobre ese mismo array; la clasificación de tipos trabaja sobre los
+    patrones distintos, que son muchos menos que los valores.
+    """
+    total = len(serie)
+    nulos = serie.isna().to_numpy()
+    texto = serie.astype(str).str.strip()
+    minusculas = texto.str.lower()
+
+    vacios = nulos | (texto == '').to_numpy()
+    centinela = ~nulos & minusculas.isin(SENTINELAS).to_numpy()
+    validos = ~(vacios | centinela)
+
+    valores = texto[validos]
+    patrones = valores.str.translate(_TABLA_PATRON)
+
+    conteo_centinelas = Counter(minusculas[centinela].tolist())
+    histograma = patrones.value_counts()
+    distintos = valores.drop_duplicates()
+
+    # Tipo inferido: se ponderan los tipos de cada patrón distinto
+    tipos: Counter = Counter()
+    for patron, cuenta in histograma.items():
+        tipos[clasificar_patron(patron)] += int(cuenta)
+    if len(distintos) and set(distintos.str.lower()) <= _BOOLEANOS:
+        tipos = Counter({'booleano': int(validos.sum())})
+
+    ejemplos_por_patron: Dict[str, List[str]] = {}
+    for patron in histograma.index[:MAX_PATRONES]:
+        ejemplos_por_patron[patron] = (
+            valores[patrones == patron].drop_duplicates().head(MAX_EJEMPLOS).tolist()
+        )
+
+    n_validos = int(validos.sum())
+    return {
+        'filas': total,
+        'validos': n_validos,
+        'vacios': int(vacios.sum()),
+        'tasaRelleno': round(n_validos / total, 4) if total else 0.0,
+        'distintos': int(len(distintos)),
+        'centinelas': dict(conteo_centinelas),
+        'tipoInferido': tipos.most_common(1)[0][0] if tipos else 'vacio',
+        'tipos': dict(tipos),
+        'patrones': [
+            {'patron': p, 'cuenta': int(c), 'ejemplos': ejemplos_por_patron[p]}
+            for p, c in histograma.head(MAX_PATRONES).items()
+        ],
+        'ejemplos': distintos.head(MAX_EJEMPLOS).tolist(),
+    }
+
+
+def contrastar_mapeos(columnas_crudas: List[str], perfiles: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Compara las columnas del libro con los mapeos de los importadores.
+
+    Returns:
+        dict con columnas faltantes, columnas que sólo casan tras strip(),
+        columnas sin mapear y avisos de tipo.
+    """
+    esperadas: Dict[str, str] = dict(COLUMNAS_ACTIVO)
+    for columna, (_tipo, _indice, campo) in get_mapeo_columnas_ekialdebus().items():
+        esperadas[columna] = campo
+
+    crudas = set(columnas_crudas)
+    limpias = {c.strip(): c for c in columnas_crudas}
+
+    faltantes = sorted(c for c in esperadas if c not in limpias)
+    requieren_strip = sorted(
+        limpias[c] for c in esperadas if c in limpias and c not in crudas
+    )
+    sin_mapear = sorted(c for c in limpias if c not in esperadas)
+
+    avisos = []
+    for columna, campo in esperadas.items():
+        perfil = perfiles.get(columna)
+        esperado = TIPO_ESPERADO_POR_CAMPO.get(campo)
+        if perfil is None or esperado is None or perfil['validos'] == 0:
+            continue
+        if perfil['tipoInferido'] != esperado:
+            avisos.append({
+                'columna': columna,
+                'campo': campo,
+                'tipoEsperado': esperado,
+                'tipoInferido': perfil['tipoInferido'],
+            })
+
+    return {
+        'faltantes': faltantes,
+        'requierenStrip': requieren_strip,
+        'sinMapear': sin_mapear,
+        'avisosTipo': avisos,
+    }
+
+
+def perfilar_hoja(df: 'pd.DataFrame') -> Dict[str, Any]:
+    """Perfila todas las columnas de una hoja y contrasta con los mapeos."""
+    columnas_crudas = [str(c) for c in df.columns]
+    df.columns = [c.strip() for c in columnas_crudas]
+
+    perfiles = {columna: perfilar_columna(df[columna]) for columna in df.columns}
+    return {
+        'filas': len(df),
+        'columnas': perfiles,
+        'mapeo': contrastar_mapeos(columnas_crudas, perfiles),
+    }
+
+
+def perfilar_libro(
+    archivo: Path,
+    hoja: Optional[str] = None,
+    cabecera: int = FILA_CABECERA,
+    todas: bool = False,
+    contexto: Optional[Contexto] = None,
+) -> Dict[str, Any]:
+    """
+    Lee el libro una sola vez y perfila la hoja indicada (o todas).
+
+    Con dtype=object se conservan los valores tal y como vienen del Excel,
+    sin conversiones de pandas que oculten centinelas o ceros a la izquierda.
+    """
+    inicio = time.perf_counter()
+    contexto = contexto or Contexto()
+    sheet_name = None if todas else (hoja if hoja is not None else 0)
+    leidas = contexto.leer_excel(archivo, sheet_name, cabecera, dtype=object)
+    if not isinstance(leidas, dict):
+        leidas = {hoja if hoja is not None else contexto.libro(archivo).sheet_names[0]: leidas}
+    lectura_ms = (time.perf_counter() - inicio) * 1000
+
+    hojas = {nombre: perfilar_hoja(df) for nombre, df in leidas.items()}
+    total_ms = (time.perf_counter() - inicio) * 1000
+
+    return {
+        'archivo': str(archivo),
+        'cabecera': cabecera,
+        'hojas': hojas,
+        'duracionMs': {
+            'lectura': round(lectura_ms, 1),
+            'perfilado': round(total_ms - lectura_ms, 1),
+            'total': round(total_ms, 1),
+        },
+    }
+
+
+# =============================================================================
+# SALIDA
+# =============================================================================
+
+def imprimir_resumen(resultado: Dict[str, Any]) -> None:
+    """Imprime un resumen legible en stderr (el JSON va a stdout)."""
+    out = sys.stderr
+    for nombre, hoja in resultado['hojas'].items():
+        print("=" * 80, file=out)
+        print(f"HOJA: {nombre}  ({hoja['filas']} filas)", file=out)
+        print("=" * 80, file=out)
+        for columna, p in hoja['columnas'].items():
+            centinelas = ', '.join(f"'{k}'x{v}" for k, v in p['centinelas'].items())
+            print(
+                f"  {columna[:28]:28} {p['tasaRelleno']:6.1%}  "
+                f"{p['distintos']:4} dist.  {p['tipoInferido']:9} {centinelas}",
+                file=out,
+            )
+        mapeo = hoja['mapeo']
+        if mapeo['faltantes']:
+            print(f"\n  ❌ Faltan columnas mapeadas: {mapeo['faltantes']}", file=out)
+        if mapeo['requierenStrip']:
+            print(f"  ⚠️  Sólo casan tras strip(): {mapeo['requierenStrip']}", file=out)
+        for aviso in mapeo['avisosTipo']:
+            print(
+                f"  ⚠️  '{aviso['columna']}' → {aviso['campo']}: se esperaba "
+                f"{aviso['tipoEsperado']}, parece {aviso['tipoInferido']}",
+                file=out,
+            )
+    d = resultado['duracionMs']
+    print(f"\n  ⏱  lectura {d['lectura']} ms, perfilado {d['perfilado']} ms", file=out)
+
+
+def main(argv: Optional[List[str]] = None, contexto: Optional[Contexto] = None) -> int:
+    parser = argparse.ArgumentParser(description="Perfila las columnas de un Excel de flota.")
+    parser.add_argument('archivo', type=Path, help="Ruta al libro .xlsx")
+    parser.add_argument('--hoja', help="Hoja a perfilar (por defecto, la primera)")
+    parser.add_argument('--todas', action='store_true', help="Perfilar todas las hojas")
+    parser.add_argument('--cabecera', type=int, default=FILA_CABECERA,
+                        help=f"Fila de cabecera, 0-indexed (por defecto {FILA_CABECERA})")
+    parser.add_argument('--salida', type=Path, help="Escribir el JSON en este archivo")
+    parser.add_argument('--resumen', action='store_true', help="Mostrar resumen legible en stderr")
+    args = parser.parse_args(argv)
+
+    if not args.archivo.exists():
+        print(f"❌ No se encontró el archivo Excel: {args.archivo}", file=sys.stderr)
+        return 1
+
+    resultado = perfilar_libro(args.archivo, args.hoja, args.cabecera, args.todas, contexto)
+
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2, default=str)
+    if args.salida:
+        args.salida.write_text(texto, encoding='utf-8')
+    else:
+        print(texto)
+
+    if args.resumen:
+        imprimir_resumen(resultado)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,380 @@
+"""
+=============================================================================
+PIPELINE ASÍNCRONO PARA FIRESTORE - ZaintzaBus
+=============================================================================
+Modo de ejecución asyncio (AsyncClient) para importadores y migraciones.
+En enlaces con mucha latencia (las oficinas de cocheras) el modo síncrono
+espera un viaje de ida y vuelta por cada get_all, página o commit; aquí
+lecturas, transformación y escrituras son etapas que se solapan:
+
+    fuente --cola--> lectura (N tareas) --cola--> transformación --> EscritorAsync
+                                                                     (N commits en vuelo)
+
+  - tuberia(): etapas conectadas por asyncio.Queue acotadas; una etapa
+    lenta frena a la anterior en vez de acumular memoria. Cada etapa
+    entrega sus resultados en el orden de la fuente, aunque tenga varias
+    tareas (la última fila de un código repetido sigue ganando)
+  - Limites: un semáforo por colección ('activos', 'equipos'...) que acota
+    las peticiones simultáneas contra ella, lecturas y commits
+  - EscritorAsync: misma interfaz y mismo buffer de operaciones fusionadas
+    que EscritorLotes (set/update/delete síncronos, así que
+    ManifiestoAuditoria, DeltaResumen y compañía funcionan sin cambios);
+    los batches llenos se confirman en segundo plano. La etapa que escribe
+    llama a `await escritor.ceder()` para entregarlos (y esperar si ya hay
+    demasiados en vuelo). Un batch que toca un documento de otro anterior
+    aún en vuelo espera a que ese se confirme: el orden por documento es el
+    de las llamadas
+  - leer_por_ids_async / leer_coleccion_async: equivalentes de
+    leer_por_ids y leer_paginado (snapshot.py)
+
+Los scripts lo activan con --async (importar_equipos.py,
+importador_zaintzabus.py, migrar_activos_a_autobuses.py).
+
+USO:
+    async def importar():
+        cliente = conectar_firestore_async()
+        limites = Limites(8, equipos=16)
+        escritor = EscritorAsync(cliente, limites)
+        await tuberia(lotes(ids, 300), [(leer, 8), (transformar, 1)])
+        await escritor.cerrar()
+=============================================================================
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from cliente_firestore import conectar_firestore
+from escritor import LIMITE_BATCH, BufferEscrituras, aplicar
+from snapshot import TAM_PAGINA
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+# Peticiones simultáneas por colección (lecturas y commits)
+LIMITE_POR_COLECCION = 8
+
+# Elementos en espera entre dos etapas / batches llenos esperando commit
+CAPACIDAD_COLA = 8
+
+TAM_LOTE_LECTURA = 300
+
+# Buffer de fusión más corto que el de EscritorLotes: aquí importa que los
+# commits empiecen pronto y se solapen con las lecturas
+BATCHES_EN_BUFFER_ASYNC = 2
+
+_FIN = object()
+
+
+def coleccion_de(ruta: str) -> str:
+    """Colección de una ruta de documento o colección: 'tenants/x/activos/321' -> 'activos'."""
+    partes = ruta.strip('/').split('/')
+    return partes[-1] if len(partes) % 2 else partes[-2]
+
+
+class Limites:
+    """Semáforos por colección, con un límite por defecto y excepciones."""
+
+    def __init__(self, por_defecto: int = LIMITE_POR_COLECCION, **por_coleccion: int):
+        self.por_defecto = por_defecto
+        self.por_coleccion = por_coleccion
+        self._semaforos: Dict[str, asyncio.Semaphore] = {}
+
+    def __call__(self, ruta: str) -> asyncio.Semaphore:
+        coleccion = coleccion_de(ruta)
+        if coleccion not in self._semaforos:
+            self._semaforos[coleccion] = asyncio.Semaphore(self.por_coleccion.get(coleccion, self.por_defecto))
+        return self._semaforos[coleccion]
+
+
+# =============================================================================
+# TUBERÍA
+# =============================================================================
+
+async def lotes(fuente: Union[Iterable[Any], AsyncIterator[Any]], tamano: int) -> AsyncIterator[List[Any]]:
+    """Agrupa una fuente (síncrona o asíncrona) en listas de `tamano`."""
+    lote: List[Any] = []
+    if hasattr(fuente, '__aiter__'):
+        async for elemento in fuente:
+            lote.append(elemento)
+            if len(lote) >= tamano:
+                yield lote
+                lote = []
+    else:
+        for elemento in fuente:
+            lote.append(elemento)
+            if len(lote) >= tamano:
+                yield lote
+                lote = []
+    if lote:
+        yield lote
+
+
+async def tuberia(
+    fuente: Union[Iterable[Any], AsyncIterator[Any]],
+    etapas: Sequence[Tuple[Callable[[Any], Awaitable[Any]], int]],
+    capacidad: int = CAPACIDAD_COLA,
+) -> None:
+    """
+    Pasa cada elemento de la fuente por las etapas (función asíncrona, nº de
+    tareas). Lo que devuelve una etapa entra en la siguiente; None se
+    descarta. Las tareas de una etapa procesan a la vez, pero entregan sus
+    resultados en el orden en que llegaron los elementos.
+    Si una etapa falla se cancela el resto y se propaga el error.
+    """
+    colas = [asyncio.Queue(capacidad) for _ in etapas]
+    turnos = [asyncio.Condition() for _ in etapas]
+    entregados = [0] * len(etapas)      # elementos ya entregados por cada etapa
+    recibidos = [0] * len(etapas)       # elementos numerados en la cola de cada etapa
+
+    async def poner(i: int, elemento: Any) -> None:
+        await colas[i].put((recibidos[i], elemento))
+        recibidos[i] += 1
+
+    async def alimentar() -> None:
+        if hasattr(fuente, '__aiter__'):
+            async for elemento in fuente:
+                await poner(0, elemento)
+        else:
+            for elemento in fuente:
+                await poner(0, elemento)
+        for _ in range(etapas[0][1]):
+            await colas[0].put(_FIN)
+
+    async def trabajar(i: int) -> None:
+        funcion = etapas[i][0]
+        while True:
+            elemento = await colas[i].get()
+            if elemento is _FIN:
+                return
+            orden, valor = elemento
+            resultado = await funcion(valor)
+            # El elemento anterior ya está en otra tarea: esperar su turno
+            # no bloquea la tubería
+            async with turnos[i]:
+                await turnos[i].wait_for(lambda: entregados[i] == orden)
+                if resultado is not None and i + 1 < len(etapas):
+                    await poner(i + 1, resultado)
+                entregados[i] += 1
+                turnos[i].notify_all()
+
+    async def etapa(i: int) -> None:
+        await asyncio.gather(*(trabajar(i) for _ in range(etapas[i][1])))
+        if i + 1 < len(etapas):
+            for _ in range(etapas[i + 1][1]):
+                await colas[i + 1].put(_FIN)
+
+    tareas = [asyncio.ensure_future(alimentar())] + [asyncio.ensure_future(etapa(i)) for i in range(len(etapas))]
+    try:
+        await asyncio.gather(*tareas)
+    except BaseException:
+        for tarea in tareas:
+            tarea.cancel()
+        raise
+
+
+# =============================================================================
+# LECTURA
+# =============================================================================
+
+async def leer_por_ids_async(
+    cliente,
+    ruta: str,
+    ids: Iterable[str],
+    limites: Limites,
+    tam_lote: int = TAM_LOTE_LECTURA,
+    campos: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Documentos existentes por ID: get_all por lotes, varios lotes en vuelo a la vez."""
+    coleccion = cliente.collection(ruta)
+    ids = list(ids)
+
+    async def leer_lote(parte: List[str]) -> Dict[str, Dict[str, Any]]:
+        encontrados = {}
+        async with limites(ruta):
+            async for snap in cliente.get_all([coleccion.document(doc_id) for doc_id in parte], field_paths=campos):
+                if snap.exists:
+                    encontrados[snap.id] = snap.to_dict() or {}
+        return encontrados
+
+    existentes: Dict[str, Dict[str, Any]] = {}
+    for parte in await asyncio.gather(*(leer_lote(ids[i:i + tam_lote]) for i in range(0, len(ids), tam_lote))):
+        existentes.update(parte)
+    return existentes
+
+
+async def leer_coleccion_async(
+    cliente,
+    ruta: str,
+    limites: Limites,
+    campos: Optional[List[str]] = None,
+    tam_pagina: int = TAM_PAGINA,
+) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+    """
+    (id, datos) de una colección, por páginas como snapshot.leer_paginado.
+    El semáforo se toma por página y no mientras el consumidor procesa:
+    si no, quien lee y escribe en la misma colección podría bloquear a las
+    tareas de commit que esperan ese mismo semáforo.
+    """
+    consulta = cliente.collection(ruta)
+    if campos:
+        consulta = consulta.select(campos)
+    consulta = consulta.order_by('__name__').limit(tam_pagina)
+    ultimo = None
+    while True:
+        pagina = consulta.start_after(ultimo) if ultimo is not None else consulta
+        async with limites(ruta):
+            docs = [doc async for doc in pagina.stream()]
+        for doc in docs:
+            yield doc.id, doc.to_dict() or {}
+        if len(docs) < tam_pagina:
+            return
+        ultimo = docs[-1]
+
+
+# =============================================================================
+# ESCRITURA
+# =============================================================================
+
+class EscritorAsync:
+    """
+    Escritor por batches con commits concurrentes.
+
+    set/update/delete son síncronos y aceptan rutas o referencias (también
+    del cliente síncrono: se traducen por su ruta). `db` es el cliente
+    síncrono, para construir referencias (ManifiestoAuditoria); las
+    lecturas del modo asíncrono van por el AsyncClient.
+    """
+
+    def __init__(
+        self,
+        cliente,
+        limites: Limites,
+        limite: int = LIMITE_BATCH,
+        capacidad: int = CAPACIDAD_COLA,
+        batches_en_buffer: int = BATCHES_EN_BUFFER_ASYNC,
+    ):
+        self.cliente = cliente
+        self.db = conectar_firestore()
+        self.limites = limites
+        self.limite = limite
+        self.capacidad_buffer = limite * batches_en_buffer
+        self._cola: Optional[asyncio.Queue] = None
+        self._capacidad = capacidad
+        self._trabajadores: List[asyncio.Future] = []
+        self._listos: List[Tuple[str, Any, List[str], List[asyncio.Event], asyncio.Event]] = []
+        self._en_vuelo: Dict[str, asyncio.Event] = {}     # ruta -> commit del último batch que la toca
+        self._buffer = BufferEscrituras()
+        self._error: Optional[Exception] = None
+        self.operaciones = 0
+        self.commits = 0
+
+    @property
+    def ahorradas(self) -> int:
+        return self._buffer.ahorradas
+
+    # -------------------------------------------------------------------------
+    # Operaciones (fusionadas en el buffer, como EscritorLotes)
+    # -------------------------------------------------------------------------
+
+    def _agregar(self, ref, operacion) -> None:
+        ref = self.cliente.document(ref if isinstance(ref, str) else ref.path)
+        self._buffer.agregar(ref.path, ref, operacion)
+        self.operaciones += 1
+        if len(self._buffer) >= self.capacidad_buffer:
+            self._cerrar_batch()
+
+    def set(self, ref, data: Dict[str, Any], merge: bool = False) -> None:
+        self._agregar(ref, ('set', data, merge))
+
+    def update(self, ref, data: Dict[str, Any]) -> None:
+        self._agregar(ref, ('update', data, None))
+
+    def delete(self, ref) -> None:
+        self._agregar(ref, ('delete', None, None))
+
+    def pendientes(self, coleccion: str):
+        return self._buffer.ultimas(coleccion)
+
+    def _cerrar_batch(self) -> None:
+        operaciones = self._buffer.extraer(self.limite)
+        batch = self.cliente.batch()
+        confirmado = asyncio.Event()
+        previos = []
+        for ref, operacion in operaciones:
+            aplicar(batch, ref, operacion)
+            previo = self._en_vuelo.get(ref.path)
+            if previo is not None and previo not in previos:
+                previos.append(previo)
+            self._en_vuelo[ref.path] = confirmado
+        rutas = [ref.path for ref, _ in operaciones]
+        self._listos.append((coleccion_de(rutas[0]), batch, rutas, previos, confirmado))
+
+    def commit(self) -> None:
+        """Cierra en batches todo lo pendiente; se confirman en el siguiente ceder()."""
+        while len(self._buffer):
+            self._cerrar_batch()
+
+    # -------------------------------------------------------------------------
+    # Commits en segundo plano
+    # -------------------------------------------------------------------------
+
+    async def _trabajar(self) -> None:
+        while True:
+            elemento = await self._cola.get()
+            try:
+                if elemento is _FIN:
+                    return
+                # Tras un fallo se sigue vaciando la cola (sin confirmar nada)
+                # para que ceder() y esperar() no se queden bloqueados
+                coleccion, batch, rutas, previos, confirmado = elemento
+                # Los batches anteriores con documentos en común ya salieron
+                # de la cola (es FIFO): esperarlos no puede bloquearse
+                for previo in previos:
+                    await previo.wait()
+                if self._error is None:
+                    async with self.limites(coleccion):
+                        await batch.commit()
+                    self.commits += 1
+            except Exception as e:
+                self._error = e
+            finally:
+                if elemento is not _FIN:
+                    confirmado.set()
+                    for ruta in rutas:
+                        if self._en_vuelo.get(ruta) is confirmado:
+                            del self._en_vuelo[ruta]
+                self._cola.task_done()
+
+    def _arrancar(self) -> None:
+        if self._cola is None:
+            self._cola = asyncio.Queue(self._capacidad)
+            self._trabajadores = [asyncio.ensure_future(self._trabajar()) for _ in range(self.limites.por_defecto)]
+
+    def _comprobar(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    async def ceder(self) -> None:
+        """Entrega los batches llenos; espera si la cola de commits está llena."""
+        self._arrancar()
+        self._comprobar()
+        while self._listos:
+            await self._cola.put(self._listos.pop(0))
+
+    async def esperar(self) -> None:
+        """Confirma todo lo escrito hasta ahora (incluido el batch en curso)."""
+        self.commit()
+        await self.ceder()
+        await self._cola.join()
+        self._comprobar()
+
+    async def cerrar(self) -> None:
+        """Confirma lo pendiente y termina las tareas de commit."""
+        await self.esperar()
+        for _ in self._trabajadores:
+            await self._cola.put(_FIN)
+        await asyncio.gather(*self._trabajadores)
+
+    def estadisticas(self) -> Dict[str, int]:
+        return {'operaciones': self.operaciones, 'commits': self.commits, 'ahorradas': self.ahorradas}
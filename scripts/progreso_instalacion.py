@@ -0,0 +1,396 @@
+"""
+=============================================================================
+PROGRESO DE INSTALACIÓN - ZaintzaBus
+=============================================================================
+Rollup del despliegue de equipos en la flota a partir del campo `instalacion`
+de cada autobús (fechaPreInstalacion, fechaInstalacion, instalador, migrado,
+fase). Mantiene un documento pequeño por tenant para que el seguimiento no
+tenga que recorrer todos los autobuses:
+
+    tenants/{tenantId}/resumen/instalacion
+
+Contadores (base sumable, se actualiza por deltas):
+    total, migrados, porFase{}
+    porDia{YYYY-MM-DD: {preinstalados, instalados}}
+    porInstalador{nombre: {preinstalados, instalados, porSemana{2026-W05}}}
+
+Derivados (se recalculan del propio documento en cada escritura):
+    serie{desde, hasta, preinstalados[], instalados[], pendientes[]}
+        acumulados diarios (burn-down) desde el primer día con actividad
+    porSemana{2026-W05: {preinstalados, instalados}}
+    ritmo{nombre: {semanasActivas, mediaSemanal, mejorSemana, primera, ultima}}
+    avance{preinstalados, instalados, pendientes, porcentaje}
+
+La reconstrucción hace una sola pasada vectorizada (numpy) sobre los
+autobuses de un snapshot o en vivo. Los scripts que escriben `instalacion`
+acumulan la contribución nueva menos la anterior de cada autobús
+(DeltaInstalacion) y, al cerrar, aplican la diferencia sobre el documento
+guardado sin volver a leer la flota.
+
+USO:
+    python scripts/progreso_instalacion.py reconstruir --snapshot snapshot/
+    python scripts/progreso_instalacion.py reconstruir --tenant ekialdebus --salida progreso.json
+    python scripts/progreso_instalacion.py mostrar --tenant ekialdebus
+=============================================================================
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from cliente_firestore import ModuloDiferido
+from escritor import EscritorLotes
+from resumen_flota import SIN_VALOR, anidar, aplanar
+from snapshot import a_epoch, documentos, listar_tenants, obtener_campo, serializar_valor
+
+np = ModuloDiferido('numpy')
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+RUTA_PROGRESO = 'tenants/{tenant_id}/resumen/instalacion'
+
+# Claves del documento que son contadores sumables (el resto se deriva)
+CLAVES_BASE = ('total', 'migrados', 'porFase', 'porDia', 'porInstalador')
+
+# Campos que se leen al reconstruir (proyección)
+CAMPOS_AUTOBUS = [
+    'instalacion.fase', 'instalacion.fechaPreInstalacion', 'instalacion.fechaInstalacion',
+    'instalacion.instalador', 'instalacion.migrado',
+]
+
+SEGUNDOS_DIA = 86400
+EPOCH = date(1970, 1, 1)
+
+
+# =============================================================================
+# CONTRIBUCIONES
+# =============================================================================
+
+def _instalacion(data: Dict[str, Any], campo: str) -> Any:
+    """Campo de `instalacion`; los activos sin migrar lo tienen en la raíz."""
+    valor = obtener_campo(data, f"instalacion.{campo}")
+    return data.get(campo) if valor is None else valor
+
+
+def _dia(numero: int) -> str:
+    """Días desde epoch (UTC) -> 'YYYY-MM-DD'."""
+    return (EPOCH + timedelta(days=int(numero))).isoformat()
+
+
+def _semana(dia: str) -> str:
+    anio, semana, _ = date.fromisoformat(dia).isocalendar()
+    return f"{anio}-W{semana:02d}"
+
+
+def _numero_dia(valor: Any) -> Optional[int]:
+    epoch = a_epoch(valor)
+    return None if np.isnan(epoch) else int(epoch // SEGUNDOS_DIA)
+
+
+def contribucion_autobus(data: Optional[Dict[str, Any]]) -> Counter:
+    """Contadores base que aporta un autobús (misma forma que calcular)."""
+    if not data:
+        return Counter()
+    aporte = Counter({
+        ('total',): 1,
+        ('porFase', _instalacion(data, 'fase') or SIN_VALOR): 1,
+    })
+    if _instalacion(data, 'migrado'):
+        aporte[('migrados',)] = 1
+    instalador = _instalacion(data, 'instalador') or SIN_VALOR
+    for campo, origen in (('preinstalados', 'fechaPreInstalacion'), ('instalados', 'fechaInstalacion')):
+        numero = _numero_dia(_instalacion(data, origen))
+        if numero is None:
+            continue
+        dia = _dia(numero)
+        aporte[('porDia', dia, campo)] += 1
+        aporte[('porInstalador', instalador, campo)] += 1
+        if campo == 'instalados':
+            aporte[('porInstalador', instalador, 'porSemana', _semana(dia))] += 1
+    return aporte
+
+
+# =============================================================================
+# CÁLCULO VECTORIZADO
+# =============================================================================
+
+def columnas(autobuses: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[str, 'np.ndarray']:
+    """Una pasada sobre los documentos: arrays paralelos, un elemento por autobús."""
+    pre, inst, instaladores, fases, migrados = [], [], [], [], []
+    for _doc_id, data in autobuses:
+        pre.append(a_epoch(_instalacion(data, 'fechaPreInstalacion')))
+        inst.append(a_epoch(_instalacion(data, 'fechaInstalacion')))
+        instaladores.append(_instalacion(data, 'instalador') or SIN_VALOR)
+        fases.append(_instalacion(data, 'fase') or SIN_VALOR)
+        migrados.append(bool(_instalacion(data, 'migrado')))
+    return {
+        'pre': np.array(pre, dtype=float),
+        'inst': np.array(inst, dtype=float),
+        'instalador': np.array(instaladores, dtype=object),
+        'fase': np.array(fases, dtype=object),
+        'migrado': np.array(migrados, dtype=bool),
+    }
+
+
+def calcular(autobuses: Iterable[Tuple[str, Dict[str, Any]]]) -> Counter:
+    """Contadores base de un tenant desde cero."""
+    c = columnas(autobuses)
+    contadores = Counter({('total',): len(c['fase']), ('migrados',): int(c['migrado'].sum())})
+    for fase, n in zip(*np.unique(c['fase'].astype(str), return_counts=True)):
+        contadores[('porFase', str(fase))] = int(n)
+
+    for campo, fechas in (('preinstalados', c['pre']), ('instalados', c['inst'])):
+        con_fecha = ~np.isnan(fechas)
+        if not con_fecha.any():
+            continue
+        numeros = (fechas[con_fecha] // SEGUNDOS_DIA).astype(np.int64)
+        dias, idx_dia, por_dia = np.unique(numeros, return_inverse=True, return_counts=True)
+        etiquetas = [_dia(d) for d in dias]
+        for dia, n in zip(etiquetas, por_dia):
+            contadores[('porDia', dia, campo)] = int(n)
+
+        instaladores, idx_inst, por_inst = np.unique(
+            c['instalador'][con_fecha].astype(str), return_inverse=True, return_counts=True
+        )
+        for nombre, n in zip(instaladores, por_inst):
+            contadores[('porInstalador', str(nombre), campo)] = int(n)
+        if campo != 'instalados':
+            continue
+
+        # Instalador x semana: código combinado y un único np.unique
+        semanas, idx_semana = np.unique([_semana(d) for d in etiquetas], return_inverse=True)
+        combinado = idx_inst * len(semanas) + idx_semana[idx_dia]
+        pares, n_pares = np.unique(combinado, return_counts=True)
+        for par, n in zip(pares, n_pares):
+            i, s = divmod(int(par), len(semanas))
+            contadores[('porInstalador', str(instaladores[i]), 'porSemana', str(semanas[s]))] = int(n)
+    return contadores
+
+
+def derivar(contadores: Counter) -> Dict[str, Any]:
+    """Documento completo: contadores base anidados más serie, semanas y ritmo."""
+    contadores = Counter({k: n for k, n in contadores.items() if n})
+    contadores.setdefault(('total',), 0)
+    contadores.setdefault(('migrados',), 0)
+    doc = anidar(contadores)
+    total = contadores[('total',)]
+
+    por_dia = doc.get('porDia', {})
+    dias = sorted(por_dia)
+    serie: Dict[str, Any] = {'desde': None, 'hasta': None, 'preinstalados': [], 'instalados': [], 'pendientes': []}
+    por_semana: Dict[str, Dict[str, int]] = {}
+    if dias:
+        numeros = np.array([(date.fromisoformat(d) - EPOCH).days for d in dias])
+        posiciones = numeros - numeros[0]
+        longitud = int(posiciones[-1]) + 1
+        for campo in ('preinstalados', 'instalados'):
+            altas = np.array([por_dia[d].get(campo, 0) for d in dias], dtype=np.int64)
+            serie[campo] = np.cumsum(np.bincount(posiciones, weights=altas, minlength=longitud)).astype(int).tolist()
+            for dia, n in zip(dias, altas):
+                if n:
+                    semana = por_semana.setdefault(_semana(dia), {'preinstalados': 0, 'instalados': 0})
+                    semana[campo] += int(n)
+        serie['pendientes'] = [total - n for n in serie['instalados']]
+        serie['desde'], serie['hasta'] = dias[0], dias[-1]
+
+    ritmo = {}
+    for nombre, datos in doc.get('porInstalador', {}).items():
+        semanas = datos.get('porSemana', {})
+        if not semanas:
+            continue
+        ordenadas = sorted(semanas)
+        ritmo[nombre] = {
+            'semanasActivas': len(semanas),
+            'mediaSemanal': round(sum(semanas.values()) / len(semanas), 2),
+            'mejorSemana': max(semanas.values()),
+            'primera': ordenadas[0],
+            'ultima': ordenadas[-1],
+        }
+
+    preinstalados = serie['preinstalados'][-1] if dias else 0
+    instalados = serie['instalados'][-1] if dias else 0
+    doc.update({
+        'serie': serie,
+        'porSemana': dict(sorted(por_semana.items())),
+        'ritmo': ritmo,
+        'avance': {
+            'preinstalados': preinstalados,
+            'instalados': instalados,
+            'pendientes': total - instalados,
+            'porcentaje': round(100 * instalados / total, 1) if total else 0.0,
+        },
+    })
+    return doc
+
+
+def contadores_guardados(doc: Dict[str, Any]) -> Counter:
+    """Contadores base de un documento de progreso ya guardado."""
+    return aplanar({clave: doc[clave] for clave in CLAVES_BASE if clave in doc})
+
+
+# =============================================================================
+# ACTUALIZACIÓN INCREMENTAL
+# =============================================================================
+
+class DeltaInstalacion:
+    """
+    Cambios pendientes de aplicar a los documentos de progreso, por tenant.
+
+    Igual que DeltaResumen, cada escritura de autobús registra el documento
+    anterior y el nuevo. Como la serie acumulada no se puede mantener con
+    Increment, al escribir se lee el documento de progreso (una lectura por
+    tenant), se suma el delta a sus contadores base y se vuelve a derivar.
+    """
+
+    def __init__(self):
+        self.por_tenant: Dict[str, Counter] = {}
+
+    def autobus(self, tenant_id: str, anterior: Optional[Dict[str, Any]], nuevo: Optional[Dict[str, Any]]) -> None:
+        destino = self.por_tenant.setdefault(tenant_id, Counter())
+        for clave, n in contribucion_autobus(anterior).items():
+            destino[clave] -= n
+        for clave, n in contribucion_autobus(nuevo).items():
+            destino[clave] += n
+
+    def limpio(self) -> Dict[str, Counter]:
+        """Deltas distintos de cero, por tenant."""
+        return {
+            t: Counter({k: n for k, n in c.items() if n})
+            for t, c in self.por_tenant.items()
+            if any(c.values())
+        }
+
+    def escribir(self, escritor: EscritorLotes, guardados: Optional[Dict[str, Optional[Dict[str, Any]]]] = None) -> int:
+        """
+        Encola el documento actualizado de cada tenant con cambios. Los
+        tenants sin documento se saltan: necesitan una reconstrucción, porque
+        un delta sobre cero no da los totales. Devuelve cuántos se escriben.
+
+        Args:
+            guardados: documentos de progreso ya leídos ({tenantId: datos o
+                None si no existe}). Sin ellos se leen con el cliente
+                síncrono del escritor; el modo asíncrono los lee antes con
+                el AsyncClient para no bloquear el bucle de eventos.
+        """
+        from firebase_admin import firestore
+
+        escritos = 0
+        for tenant_id, delta in self.limpio().items():
+            ruta = RUTA_PROGRESO.format(tenant_id=tenant_id)
+            if guardados is None:
+                snap = escritor.db.document(ruta).get()
+                data = snap.to_dict() if snap.exists else None
+            else:
+                data = guardados.get(tenant_id)
+            if data is None:
+                print(f"   ⚠️  {ruta} no existe: ejecuta 'progreso_instalacion.py reconstruir'")
+                continue
+            contadores = contadores_guardados(data)
+            contadores.update(delta)
+            escritor.set(ruta, {**derivar(contadores), 'actualizadoEn': firestore.SERVER_TIMESTAMP})
+            escritos += 1
+        return escritos
+
+
+# =============================================================================
+# RECONSTRUCCIÓN
+# =============================================================================
+
+def reconstruir(
+    snapshot: Optional[Path] = None, db=None, tenants: Optional[List[str]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """Documento de progreso de cada tenant, desde cero."""
+    progreso = {}
+    for tenant_id in tenants or listar_tenants(snapshot, db):
+        ruta = f"tenants/{tenant_id}/autobuses"
+        if snapshot is not None:
+            autobuses = documentos(ruta, snapshot)
+        else:
+            from snapshot import leer_coleccion
+            autobuses = leer_coleccion(db, ruta, campos=CAMPOS_AUTOBUS)
+        progreso[tenant_id] = derivar(calcular(autobuses))
+    return progreso
+
+
+def guardar_progreso(db, progreso: Dict[str, Dict[str, Any]]) -> None:
+    """Sobrescribe los documentos (sin merge: desaparecen días e instaladores obsoletos)."""
+    from firebase_admin import firestore
+
+    with EscritorLotes(db) as escritor:
+        for tenant_id, doc in progreso.items():
+            escritor.set(
+                RUTA_PROGRESO.format(tenant_id=tenant_id),
+                {**doc, 'actualizadoEn': firestore.SERVER_TIMESTAMP, 'reconstruidoEn': firestore.SERVER_TIMESTAMP},
+            )
+
+
+def imprimir(tenant_id: str, doc: Dict[str, Any]) -> None:
+    avance = doc['avance']
+    print(f"\n🚌 {tenant_id}: {avance['instalados']}/{doc['total']} instalados ({avance['porcentaje']}%), "
+          f"{avance['preinstalados']} preinstalados, {doc['migrados']} migrados")
+    for semana, n in list(doc['porSemana'].items())[-6:]:
+        print(f"   {semana}: +{n['preinstalados']} pre, +{n['instalados']} inst")
+    for nombre, r in sorted(doc['ritmo'].items(), key=lambda x: -x[1]['mediaSemanal']):
+        print(f"   👷 {nombre}: {r['mediaSemanal']}/semana en {r['semanasActivas']} semanas "
+              f"(máx {r['mejorSemana']}, {r['primera']} a {r['ultima']})")
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Progreso de instalación por tenant (burn-down y ritmo por instalador).")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_rec = sub.add_parser('reconstruir', help="Recalcular los documentos desde los autobuses")
+    p_rec.add_argument('--snapshot', type=Path, help="Leer de un snapshot (por defecto, en vivo)")
+    p_rec.add_argument('--tenant', action='append', help="Sólo estos tenants (repetible)")
+    p_rec.add_argument('--salida', type=Path, help="Guardar en un JSON en lugar de Firestore")
+
+    p_mos = sub.add_parser('mostrar', help="Mostrar el progreso guardado de un tenant")
+    p_mos.add_argument('--tenant', required=True)
+    p_mos.add_argument('--json', action='store_true', help="Documento completo en JSON")
+
+    args = parser.parse_args(argv)
+    inicio = time.perf_counter()
+
+    db = None
+    if getattr(args, 'snapshot', None) is None or getattr(args, 'salida', None) is None:
+        from cliente_firestore import conectar_firestore
+        db = conectar_firestore()
+
+    if args.comando == 'mostrar':
+        ruta = RUTA_PROGRESO.format(tenant_id=args.tenant)
+        snap = db.document(ruta).get()
+        if not snap.exists:
+            print(f"⚠️  No existe {ruta}: ejecuta 'reconstruir' primero")
+            return 1
+        if args.json:
+            print(json.dumps(serializar_valor(snap.to_dict()), ensure_ascii=False, indent=2))
+        else:
+            imprimir(args.tenant, snap.to_dict())
+        return 0
+
+    print("🔄 Calculando progreso de instalación...")
+    progreso = reconstruir(args.snapshot, db, args.tenant)
+    for tenant_id, doc in progreso.items():
+        imprimir(tenant_id, doc)
+    if args.salida:
+        args.salida.write_text(json.dumps(progreso, ensure_ascii=False, indent=2), encoding='utf-8')
+    else:
+        guardar_progreso(db, progreso)
+
+    print(f"\n✅ {len(progreso)} documentos de progreso ({time.perf_counter() - inicio:.2f} s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
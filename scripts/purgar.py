@@ -0,0 +1,265 @@
+"""
+=============================================================================
+PURGA ACOTADA DE EQUIPOS - ZaintzaBus
+=============================================================================
+Borra equipos de la colección global `equipos` para una selección concreta,
+sin tocar a los demás operadores:
+
+    --tenant T              todos los equipos de un operador
+                            (propiedad.operadorAsignadoId == T)
+    --bus BUS-321           los equipos instalados en un autobús
+    --ejecucion ID          los equipos creados por una ejecución de
+                            importar_equipos (según su manifiesto de auditoría)
+
+Los IDs se leen con proyección sólo de clave, se ordenan y se reparten en
+rangos contiguos que se borran en paralelo con un EscritorLotes por hilo y
+un LimitadorRitmo compartido (el ritmo es global, no por hilo).
+
+Después se limpian los datos que dependen de los equipos:
+
+  - resúmenes de flota (tenant y global DFG): con --tenant se restan los
+    contadores 'equipos' guardados del propio resumen del tenant; en los
+    demás casos, la contribución de cada equipo (lectura proyectada)
+  - manifiestos de autobús: con --tenant se borran todos los del tenant, con
+    --bus el del autobús; con --ejecucion se quitan los equipos borrados de
+    su manifiesto
+  - una entrada de auditoría en lote ('eliminar') con los IDs borrados
+
+USO:
+    python scripts/purgar.py --tenant ekialdebus --simular
+    python scripts/purgar.py --tenant ekialdebus --hilos 16 --ritmo 1000
+    python scripts/purgar.py --bus BUS-321 --tenant ekialdebus
+    python scripts/purgar.py --ejecucion importar_equipos-inventario-20260123T101500
+=============================================================================
+"""
+
+import argparse
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from auditoria_lotes import COLECCION as COLECCION_AUDITORIA, ManifiestoAuditoria
+from contexto import Contexto
+from escritor import EscritorLotes, LimitadorRitmo
+from manifiesto_bus import COLECCION_MANIFIESTOS, RUTA_MANIFIESTO, CambiosManifiesto, bus_de
+from resumen_flota import CAMPOS_EQUIPO, RUTA_RESUMEN_TENANT, DeltaResumen, aplanar
+from snapshot import leer_ids, leer_paginado, leer_por_ids
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+COLECCION = 'equipos'
+
+# Borrados por segundo entre todos los hilos
+RITMO_BORRADO = 500
+HILOS = 8
+
+# Rangos por hilo: más rangos que hilos para repartir bien la carga
+RANGOS_POR_HILO = 4
+
+# Scripts cuyas ejecuciones se pueden deshacer (crean documentos en `equipos`)
+SCRIPTS_EQUIPOS = ('importar_equipos',)
+
+
+# =============================================================================
+# SELECCIÓN
+# =============================================================================
+
+def ids_tenant(db, tenant_id: str) -> List[str]:
+    return list(leer_ids(db.collection(COLECCION).where('propiedad.operadorAsignadoId', '==', tenant_id)))
+
+
+def ids_bus(db, bus_id: str, tenant_id: Optional[str] = None) -> List[str]:
+    consulta = db.collection(COLECCION).where('ubicacionActual.id', '==', bus_id)
+    if tenant_id:
+        consulta = consulta.where('propiedad.operadorAsignadoId', '==', tenant_id)
+    return list(leer_ids(consulta))
+
+
+def ids_ejecucion(db, ejecucion_id: str) -> List[str]:
+    """IDs con accion 'crear' en las partes del manifiesto de auditoría de una ejecución."""
+    resumen = db.document(f"{COLECCION_AUDITORIA}/{ejecucion_id}").get()
+    if not resumen.exists:
+        raise ValueError(f"No hay manifiesto de auditoría para la ejecución {ejecucion_id}")
+    script = (resumen.to_dict().get('lote') or {}).get('script')
+    if script not in SCRIPTS_EQUIPOS:
+        raise ValueError(f"La ejecución {ejecucion_id} es de '{script}', que no escribe en '{COLECCION}'")
+
+    partes = leer_paginado(
+        db.collection(COLECCION_AUDITORIA).where('lote.ejecucionId', '==', ejecucion_id).order_by('__name__')
+    )
+    creados = set()
+    for _doc_id, parte in partes:
+        for entrada in (parte.get('lote') or {}).get('entradas', []):
+            if entrada.get('accion') == 'crear':
+                creados.add(entrada['entidadId'])
+    return sorted(creados)
+
+
+# =============================================================================
+# BORRADO EN PARALELO
+# =============================================================================
+
+def rangos(ids: Sequence[str], n: int) -> List[List[str]]:
+    """IDs ordenados en n rangos contiguos de tamaño parecido."""
+    ordenados = sorted(ids)
+    if not ordenados:
+        return []
+    tamano = -(-len(ordenados) // max(1, n))
+    return [ordenados[i:i + tamano] for i in range(0, len(ordenados), tamano)]
+
+
+def borrar_en_paralelo(db, ruta: str, ids: Sequence[str], hilos: int = HILOS, ritmo: float = RITMO_BORRADO) -> int:
+    """Borra los documentos por rangos en `hilos` hilos. Devuelve cuántos."""
+    limitador = LimitadorRitmo(ritmo) if ritmo else None
+
+    def borrar_rango(rango: List[str]) -> int:
+        escritor = EscritorLotes(db, limitador=limitador)
+        coleccion = db.collection(ruta)
+        for doc_id in rango:
+            escritor.delete(coleccion.document(doc_id))
+        escritor.commit()
+        return escritor.operaciones
+
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        return sum(pool.map(borrar_rango, rangos(ids, hilos * RANGOS_POR_HILO)))
+
+
+# =============================================================================
+# DEPENDIENTES
+# =============================================================================
+
+def limpiar_tenant(db, tenant_id: str, escritor: EscritorLotes) -> Dict[str, int]:
+    """Resta los contadores de equipos del tenant y borra todos sus manifiestos."""
+    resumen = db.document(RUTA_RESUMEN_TENANT.format(tenant_id=tenant_id)).get()
+    contadores = aplanar({'equipos': (resumen.to_dict() or {}).get('equipos', {})}) if resumen.exists else Counter()
+    delta = DeltaResumen()
+    delta.por_tenant[tenant_id] = Counter({clave: -n for clave, n in contadores.items()})
+    resumenes = delta.escribir(escritor)
+
+    manifiestos = 0
+    for ref in db.collection(f"tenants/{tenant_id}/{COLECCION_MANIFIESTOS}").list_documents():
+        escritor.delete(ref)
+        manifiestos += 1
+    return {'resumenes': resumenes, 'manifiestos': manifiestos}
+
+
+def limpiar_equipos(anteriores: Dict[str, Dict[str, Any]], escritor: EscritorLotes) -> Dict[str, int]:
+    """Resta la contribución de cada equipo borrado y lo quita de su manifiesto."""
+    delta = DeltaResumen()
+    cambios = CambiosManifiesto()
+    for doc_id, data in anteriores.items():
+        delta.equipo(data, None)
+        cambios.registrar(doc_id, data, None)
+    return {'resumenes': delta.escribir(escritor), 'manifiestos': cambios.escribir(escritor)}
+
+
+# =============================================================================
+# PURGA
+# =============================================================================
+
+def purgar(
+    db,
+    tenant_id: Optional[str] = None,
+    bus_id: Optional[str] = None,
+    ejecucion_id: Optional[str] = None,
+    hilos: int = HILOS,
+    ritmo: float = RITMO_BORRADO,
+    simular: bool = False,
+    confirmar=None,
+    escritor: Optional[EscritorLotes] = None,
+) -> Dict[str, int]:
+    """
+    Selecciona, borra y limpia dependientes.
+
+    Args:
+        confirmar: función (total) -> bool llamada antes de borrar; None = sin preguntar.
+        escritor: escritor para la limpieza y la auditoría (por defecto, uno nuevo).
+    """
+    if ejecucion_id:
+        ids, alcance = ids_ejecucion(db, ejecucion_id), f"ejecución {ejecucion_id}"
+    elif bus_id:
+        ids, alcance = ids_bus(db, bus_id, tenant_id), f"autobús {bus_id}"
+    elif tenant_id:
+        ids, alcance = ids_tenant(db, tenant_id), f"tenant {tenant_id}"
+    else:
+        raise ValueError("Indica un tenant, un autobús o una ejecución")
+
+    stats = {'seleccionados': len(ids), 'borrados': 0, 'resumenes': 0, 'manifiestos': 0}
+    if not ids or simular or (confirmar is not None and not confirmar(len(ids))):
+        return stats
+
+    # Fuera del alcance de tenant, la limpieza necesita la contribución de cada
+    # equipo: se lee (proyectada) antes de borrar
+    anteriores = {}
+    if bus_id is not None or ejecucion_id is not None:
+        anteriores = leer_por_ids(db, COLECCION, ids, campos=CAMPOS_EQUIPO)
+        ids = [doc_id for doc_id in ids if doc_id in anteriores]
+
+    stats['borrados'] = borrar_en_paralelo(db, COLECCION, ids, hilos, ritmo)
+
+    with (escritor or EscritorLotes(db)) as escritor:
+        if bus_id is None and ejecucion_id is None:
+            stats.update(limpiar_tenant(db, tenant_id, escritor))
+        else:
+            stats.update(limpiar_equipos(anteriores, escritor))
+            if bus_id is not None:
+                # El bus se queda sin equipos: su manifiesto sobra
+                for tenant_bus, bus in {bus_de(data) for data in anteriores.values()} - {None}:
+                    escritor.delete(RUTA_MANIFIESTO.format(tenant_id=tenant_bus, bus_id=bus))
+        manifiesto = ManifiestoAuditoria(
+            db, 'purgar', 'inventario', tenant_id=tenant_id, usuario_id='purga',
+            motivo=f"Purga de equipos: {alcance}", escritor=escritor,
+        )
+        for doc_id in ids:
+            manifiesto.registrar(doc_id, anteriores.get(doc_id, {}), None)
+        manifiesto.cerrar()
+    return stats
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None, contexto: Optional[Contexto] = None) -> int:
+    parser = argparse.ArgumentParser(description="Borrado acotado y en paralelo de equipos.")
+    parser.add_argument('--tenant', help="Operador (propiedad.operadorAsignadoId); con --bus, filtra además por él")
+    parser.add_argument('--bus', help="ID de autobús tal como aparece en ubicacionActual.id (BUS-321)")
+    parser.add_argument('--ejecucion', help="ID de ejecución de importar_equipos (auditoria/{ID})")
+    parser.add_argument('--hilos', type=int, default=HILOS)
+    parser.add_argument('--ritmo', type=float, default=RITMO_BORRADO, help="Borrados por segundo (todos los hilos)")
+    parser.add_argument('--simular', action='store_true', help="Sólo contar lo que se borraría")
+    parser.add_argument('--si', action='store_true', help="No pedir confirmación")
+    args = parser.parse_args(argv)
+
+    if not (args.tenant or args.bus or args.ejecucion):
+        parser.error("indica --tenant, --bus o --ejecucion")
+    if args.bus and args.ejecucion:
+        parser.error("--bus y --ejecucion son excluyentes")
+
+    def confirmar(total: int) -> bool:
+        print(f"AVISO: Se eliminarán {total} equipos.")
+        return input("Escribe 'ELIMINAR' para confirmar: ") == "ELIMINAR"
+
+    contexto = contexto or Contexto()
+    db = contexto.db
+
+    inicio = time.perf_counter()
+    print("🧹 Seleccionando equipos...")
+    stats = purgar(
+        db, args.tenant, args.bus, args.ejecucion, args.hilos, args.ritmo,
+        simular=args.simular, confirmar=None if args.si else confirmar, escritor=contexto.escritor,
+    )
+    if args.simular or not stats['borrados']:
+        print(f"   {stats['seleccionados']} equipos seleccionados; no se ha borrado nada")
+        return 0
+    print(f"✅ {stats['borrados']} equipos borrados, {stats['resumenes']} resúmenes y "
+          f"{stats['manifiestos']} manifiestos actualizados ({time.perf_counter() - inicio:.2f} s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""
+=============================================================================
+RESÚMENES MATERIALIZADOS DE FLOTA - ZaintzaBus
+=============================================================================
+Mantiene un documento pequeño con los agregados que necesitan los dashboards
+(dfg, jefe-mantenimiento, operador), para que cargar uno cueste una lectura
+en vez de recorrer `equipos`:
+
+    tenants/{tenantId}/resumen/flota
+    resumen/dfg                         (global: todos los operadores)
+
+Contenido:
+    equipos.total, equipos.porTipo{}, equipos.porEstado{}, equipos.porBus{}
+    autobuses.total, autobuses.porEstado{}, autobuses.porFaseInstalacion{}
+    porOperador{tenantId: totalEquipos}  (sólo en el global)
+
+Los importadores acumulan deltas (contribución nueva menos la anterior de
+cada documento escrito) y los aplican con Increment en los mismos batches.
+El modo reconstrucción recalcula todo desde cero con lecturas proyectadas.
+
+USO:
+    python scripts/resumen_flota.py reconstruir
+    python scripts/resumen_flota.py reconstruir --snapshot snapshot/ --salida resumenes.json
+    python scripts/resumen_flota.py mostrar --tenant ekialdebus
+=============================================================================
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from escritor import EscritorLotes
+from snapshot import documentos, listar_tenants, obtener_campo, serializar_valor
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+RUTA_RESUMEN_TENANT = 'tenants/{tenant_id}/resumen/flota'
+RUTA_RESUMEN_GLOBAL = 'resumen/dfg'
+
+# Equipos sin operador asignado sólo cuentan en el resumen global
+SIN_OPERADOR = '_sin_operador'
+SIN_VALOR = 'sin_definir'
+
+# Campos que se leen al reconstruir (proyección)
+CAMPOS_EQUIPO = [
+    'tipoEquipoId', 'estado', 'ubicacionActual.tipo', 'ubicacionActual.id', 'propiedad.operadorAsignadoId',
+]
+CAMPOS_AUTOBUS = ['estado', 'instalacion.fase']
+
+Clave = Tuple[str, ...]
+
+
+# =============================================================================
+# CONTRIBUCIONES
+# =============================================================================
+
+def contribucion_equipo(data: Optional[Dict[str, Any]]) -> Tuple[Optional[str], Counter]:
+    """(tenant, contadores) que aporta un documento de `equipos`."""
+    if not data:
+        return None, Counter()
+    tenant_id = obtener_campo(data, 'propiedad.operadorAsignadoId') or SIN_OPERADOR
+    aporte = Counter({
+        ('equipos', 'total'): 1,
+        ('equipos', 'porTipo', data.get('tipoEquipoId') or SIN_VALOR): 1,
+        ('equipos', 'porEstado', data.get('estado') or SIN_VALOR): 1,
+    })
+    if obtener_campo(data, 'ubicacionActual.tipo') == 'autobus' and obtener_campo(data, 'ubicacionActual.id'):
+        aporte[('equipos', 'porBus', obtener_campo(data, 'ubicacionActual.id'))] = 1
+    return tenant_id, aporte
+
+
+def contribucion_autobus(data: Optional[Dict[str, Any]]) -> Counter:
+    """Contadores que aporta un documento de tenants/{t}/autobuses."""
+    if not data:
+        return Counter()
+    return Counter({
+        ('autobuses', 'total'): 1,
+        ('autobuses', 'porEstado', data.get('estado') or SIN_VALOR): 1,
+        ('autobuses', 'porFaseInstalacion', obtener_campo(data, 'instalacion.fase') or SIN_VALOR): 1,
+    })
+
+
+class DeltaResumen:
+    """
+    Cambios pendientes de aplicar a los resúmenes, por tenant.
+
+    Cada escritura registra el documento anterior y el nuevo; la diferencia
+    de sus contribuciones es lo que hay que sumar (los ceros se descartan).
+    """
+
+    def __init__(self):
+        self.por_tenant: Dict[str, Counter] = {}
+
+    def _sumar(self, tenant_id: str, aporte: Counter, signo: int) -> None:
+        destino = self.por_tenant.setdefault(tenant_id, Counter())
+        for clave, n in aporte.items():
+            destino[clave] += signo * n
+
+    def equipo(self, anterior: Optional[Dict[str, Any]], nuevo: Optional[Dict[str, Any]]) -> None:
+        tenant_anterior, aporte_anterior = contribucion_equipo(anterior)
+        tenant_nuevo, aporte_nuevo = contribucion_equipo(nuevo)
+        if tenant_anterior is not None:
+            self._sumar(tenant_anterior, aporte_anterior, -1)
+        if tenant_nuevo is not None:
+            self._sumar(tenant_nuevo, aporte_nuevo, +1)
+
+    def autobus(self, tenant_id: str, anterior: Optional[Dict[str, Any]], nuevo: Optional[Dict[str, Any]]) -> None:
+        self._sumar(tenant_id, contribucion_autobus(anterior), -1)
+        self._sumar(tenant_id, contribucion_autobus(nuevo), +1)
+
+    def limpio(self) -> Dict[str, Counter]:
+        """Deltas distintos de cero, por tenant."""
+        return {
+            t: Counter({k: n for k, n in c.items() if n})
+            for t, c in self.por_tenant.items()
+            if any(c.values())
+        }
+
+    def global_(self) -> Counter:
+        """Delta del resumen global: suma de tenants más porOperador."""
+        total = Counter()
+        for tenant_id, contadores in self.limpio().items():
+            for clave, n in contadores.items():
+                total[clave] += n
+            if contadores.get(('equipos', 'total')):
+                total[('porOperador', tenant_id)] += contadores[('equipos', 'total')]
+        return total
+
+    def escribir(self, escritor: EscritorLotes) -> int:
+        """
+        Encola los Increment en el escritor (los mismos batches que la
+        importación). Devuelve cuántos resúmenes se actualizan.
+        """
+        from firebase_admin import firestore
+
+        def documento(contadores: Counter) -> Dict[str, Any]:
+            doc = anidar({k: firestore.Increment(n) for k, n in contadores.items()})
+            doc['actualizadoEn'] = firestore.SERVER_TIMESTAMP
+            return doc
+
+        escritos = 0
+        for tenant_id, contadores in self.limpio().items():
+            if tenant_id == SIN_OPERADOR:
+                continue
+            escritor.set(RUTA_RESUMEN_TENANT.format(tenant_id=tenant_id), documento(contadores), merge=True)
+            escritos += 1
+        total = self.global_()
+        if total:
+            escritor.set(RUTA_RESUMEN_GLOBAL, documento(total), merge=True)
+            escritos += 1
+        return escritos
+
+
+# =============================================================================
+# RECONSTRUCCIÓN
+# =============================================================================
+
+def anidar(contadores: Dict[Clave, Any]) -> Dict[str, Any]:
+    """{('equipos', 'porTipo', 'router'): 3} -> {'equipos': {'porTipo': {'router': 3}}}"""
+    doc: Dict[str, Any] = {}
+    for clave, valor in sorted(contadores.items()):
+        nodo = doc
+        for parte in clave[:-1]:
+            nodo = nodo.setdefault(parte, {})
+        nodo[clave[-1]] = valor
+    return doc
+
+
+def aplanar(doc: Dict[str, Any], prefijo: Clave = ()) -> Counter:
+    """Inversa de anidar para los contadores numéricos de un resumen guardado."""
+    contadores = Counter()
+    for clave, valor in doc.items():
+        if isinstance(valor, dict):
+            contadores.update(aplanar(valor, prefijo + (clave,)))
+        elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            contadores[prefijo + (clave,)] = valor
+    return contadores
+
+
+def calcular_resumenes(
+    equipos: Iterable[Tuple[str, Dict[str, Any]]],
+    autobuses: Dict[str, Iterable[Tuple[str, Dict[str, Any]]]],
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """
+    Resúmenes completos desde cero.
+
+    Returns:
+        ({tenantId: resumen}, resumen_global)
+    """
+    delta = DeltaResumen()
+    for _doc_id, data in equipos:
+        delta.equipo(None, data)
+    for tenant_id, docs in autobuses.items():
+        delta.por_tenant.setdefault(tenant_id, Counter())
+        for _doc_id, data in docs:
+            delta.autobus(tenant_id, None, data)
+
+    base = {('equipos', 'total'): 0, ('autobuses', 'total'): 0}
+    por_tenant = {
+        t: anidar({**base, **c}) for t, c in delta.por_tenant.items() if t != SIN_OPERADOR
+    }
+    return por_tenant, anidar({**base, **delta.global_()})
+
+
+def reconstruir(snapshot: Optional[Path] = None, db=None) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """Lee equipos y autobuses (sólo los campos necesarios en vivo) y recalcula."""
+    tenants = listar_tenants(snapshot, db)
+    if snapshot is not None:
+        equipos = documentos('equipos', snapshot)
+        autobuses = {t: documentos(f"tenants/{t}/autobuses", snapshot) for t in tenants}
+    else:
+        from snapshot import leer_coleccion
+        equipos = leer_coleccion(db, 'equipos', campos=CAMPOS_EQUIPO)
+        autobuses = {t: leer_coleccion(db, f"tenants/{t}/autobuses", campos=CAMPOS_AUTOBUS) for t in tenants}
+    return calcular_resumenes(equipos, autobuses)
+
+
+def guardar_resumenes(db, por_tenant: Dict[str, Dict[str, Any]], global_: Dict[str, Any]) -> None:
+    """Sobrescribe los resúmenes (sin merge: desaparecen las claves obsoletas)."""
+    from firebase_admin import firestore
+
+    with EscritorLotes(db) as escritor:
+        for tenant_id, resumen in por_tenant.items():
+            escritor.set(
+                RUTA_RESUMEN_TENANT.format(tenant_id=tenant_id),
+                {**resumen, 'actualizadoEn': firestore.SERVER_TIMESTAMP, 'reconstruidoEn': firestore.SERVER_TIMESTAMP},
+            )
+        escritor.set(
+            RUTA_RESUMEN_GLOBAL,
+            {**global_, 'actualizadoEn': firestore.SERVER_TIMESTAMP, 'reconstruidoEn': firestore.SERVER_TIMESTAMP},
+        )
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Resúmenes materializados de flota para los dashboards.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_rec = sub.add_parser('reconstruir', help="Recalcular todos los resúmenes desde cero")
+    p_rec.add_argument('--snapshot', type=Path, help="Leer de un snapshot (por defecto, en vivo)")
+    p_rec.add_argument('--salida', type=Path, help="Guardar en un JSON en lugar de Firestore")
+
+    p_mos = sub.add_parser('mostrar', help="Mostrar un resumen guardado")
+    p_mos.add_argument('--tenant', help="Tenant (por defecto, el global DFG)")
+
+    args = parser.parse_args(argv)
+    inicio = time.perf_counter()
+
+    db = None
+    if getattr(args, 'snapshot', None) is None or getattr(args, 'salida', None) is None:
+        from cliente_firestore import conectar_firestore
+        db = conectar_firestore()
+
+    if args.comando == 'mostrar':
+        ruta = RUTA_RESUMEN_TENANT.format(tenant_id=args.tenant) if args.tenant else RUTA_RESUMEN_GLOBAL
+        snap = db.document(ruta).get()
+        if not snap.exists:
+            print(f"⚠️  No existe {ruta}: ejecuta 'reconstruir' primero")
+            return 1
+        print(json.dumps(serializar_valor(snap.to_dict()), ensure_ascii=False, indent=2))
+        return 0
+
+    print("🔄 Reconstruyendo resúmenes de flota...")
+    por_tenant, global_ = reconstruir(args.snapshot, db)
+    if args.salida:
+        args.salida.write_text(
+            json.dumps({'tenants': por_tenant, 'global': global_}, ensure_ascii=False, indent=2), encoding='utf-8'
+        )
+    else:
+        guardar_resumenes(db, por_tenant, global_)
+
+    print(f"✅ {len(por_tenant)} resúmenes de tenant + global: "
+          f"{global_['equipos']['total']} equipos, {global_['autobuses']['total']} autobuses "
+          f"({time.perf_counter() - inicio:.2f} s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
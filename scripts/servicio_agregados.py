@@ -0,0 +1,596 @@
+"""
+=============================================================================
+SERVICIO DE AGREGADOS EN VIVO - ZaintzaBus
+=============================================================================
+Proceso de larga duración que mantiene al día, sin recorridos periódicos,
+los contadores que hoy sólo corrigen los scripts por lotes
+(actualizar_contadores_equipos, resumen_flota.py reconstruir):
+
+    tenants/{t}/autobuses/{id}   contadores.totalEquipos, .totalIncidencias,
+                                 .incidenciasAbiertas
+    tenants/{t}/resumen/flota    equipos.total, equipos.porTipo{},
+                                 incidencias.total, incidencias.abiertas
+    resumen/dfg                  lo mismo para todos los operadores, más
+                                 porOperador{tenantId: totalEquipos}
+                                 (con _sin_operador, como resumen_flota.py)
+
+Funcionamiento:
+  - listeners (on_snapshot) sobre `equipos` y sobre las incidencias y los
+    autobuses de cada tenant: el primer snapshot carga el estado completo y
+    los siguientes traen sólo los documentos que cambian
+  - cada documento recuerda su contribución anterior (como DeltaResumen en
+    resumen_flota.py): un cambio suma la diferencia en memoria y marca como
+    pendientes sólo los agregados afectados
+  - los pendientes se escriben con espera (debounce): tras --espera s sin
+    cambios o, como mucho, --espera-maxima s después del primero. Sólo los
+    valores que difieren de lo guardado (los contadores de cada autobús
+    llegan en su propio snapshot; los resúmenes se leen una vez), con set
+    merge en un EscritorLotes, que fusiona las escrituras por documento
+  - se escriben valores absolutos: convergen con los Increment que aplican
+    los importadores en sus batches
+  - no se escribe nada hasta tener el primer snapshot de todos los
+    listeners (con los agregados a medias se escribirían ceros)
+  - si un listener se cae se vuelve a suscribir; su primer snapshot
+    reconcilia el estado (se dan de baja los documentos que ya no están)
+  - los tenants se leen al arrancar: uno nuevo requiere reiniciar
+
+Con FIRESTORE_EMULATOR_HOST definido se conecta al emulador sin clave de
+servicio (ver cliente_firestore.py), para probarlo en local. --comprobar
+(sólo contra el emulador) siembra un tenant de prueba, arranca el servicio,
+hace cambios y compara lo escrito con un recálculo completo.
+
+USO:
+    python scripts/servicio_agregados.py
+    python scripts/servicio_agregados.py --tenant ekialdebus --espera 2 --espera-maxima 10
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python scripts/servicio_agregados.py --duracion 60
+    FIRESTORE_EMULATOR_HOST=localhost:8080 python scripts/servicio_agregados.py --comprobar
+    python scripts/zaintzabus.py watch --tenant ekialdebus      (ver zaintzabus.py)
+=============================================================================
+"""
+
+import argparse
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from contexto import Contexto
+from datos_referencia import ESTADOS_ABIERTOS
+from escritor import EscritorLotes
+from migrar_activos_a_autobuses import codigo_bus_equipo, contar_equipos_por_bus
+from resumen_flota import (
+    RUTA_RESUMEN_GLOBAL, RUTA_RESUMEN_TENANT, SIN_OPERADOR, DeltaResumen, anidar, aplanar, calcular_resumenes,
+)
+from snapshot import listar_tenants, obtener_campo
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+ESPERA = 2.0            # segundos sin cambios antes de escribir
+ESPERA_MAXIMA = 10.0    # segundos como mucho desde el primer cambio pendiente
+REVISION = 1.0          # cada cuánto se comprueban los listeners y la parada
+
+# Tenant que siembra --comprobar en el emulador
+TENANT_COMPROBACION = 'demo-comprobacion'
+
+RUTA_AUTOBUS = 'tenants/{tenant_id}/autobuses/{bus_id}'
+CONTADORES_AUTOBUS = ['totalEquipos', 'totalIncidencias', 'incidenciasAbiertas']
+
+# Partes de los resúmenes que mantiene el servicio (el resto, p. ej.
+# autobuses.porEstado, sigue a cargo de resumen_flota.py)
+CAMPOS_RESUMEN = [('equipos', 'total'), ('equipos', 'porTipo'), ('incidencias',), ('porOperador',)]
+
+Clave = Tuple[Any, ...]
+Fuente = Tuple[str, ...]        # ('equipos',), ('autobuses', t), ('incidencias', t)
+Destino = Tuple[Any, ...]       # ('autobus', t, busId) o ('resumen', t); t=None es el global
+Campo = Tuple[str, ...]
+
+
+# =============================================================================
+# CONTRIBUCIONES
+# =============================================================================
+
+def mantenido(campo: Campo) -> bool:
+    """Si un campo de resumen es de los que mantiene el servicio (CAMPOS_RESUMEN)."""
+    return any(campo[:len(prefijo)] == prefijo for prefijo in CAMPOS_RESUMEN)
+
+
+def contribucion_equipo(data: Optional[Dict[str, Any]]) -> Counter:
+    """
+    Contadores que aporta un documento de `equipos`. El reparto entre
+    resúmenes es el de DeltaResumen (resumen_flota.py), para que los dos
+    escritores coincidan: sin operador cuenta sólo en el global.
+    """
+    delta = DeltaResumen()
+    delta.equipo(None, data)
+    aporte = Counter()
+    for tenant_id, contadores in delta.limpio().items():
+        if tenant_id == SIN_OPERADOR:
+            continue
+        aporte.update({('resumen', tenant_id) + c: n for c, n in contadores.items() if mantenido(c)})
+        codigo = codigo_bus_equipo(data)
+        if codigo:
+            aporte[('codigo', tenant_id, codigo)] = 1
+    aporte.update({('resumen', None) + c: n for c, n in delta.global_().items() if mantenido(c)})
+    return aporte
+
+
+def contribucion_incidencia(tenant_id: str, data: Optional[Dict[str, Any]]) -> Counter:
+    """Contadores que aporta un documento de tenants/{t}/incidencias."""
+    if not data:
+        return Counter()
+    abierta = int(data.get('estado') in ESTADOS_ABIERTOS)
+    aporte = Counter()
+    for t in (tenant_id, None):
+        aporte[('resumen', t, 'incidencias', 'total')] = 1
+        aporte[('resumen', t, 'incidencias', 'abiertas')] = abierta
+    bus_id = data.get('activoPrincipalId')
+    if bus_id:
+        aporte[('autobus', tenant_id, bus_id, 'totalIncidencias')] = 1
+        aporte[('autobus', tenant_id, bus_id, 'incidenciasAbiertas')] = abierta
+    return +aporte
+
+
+def ruta_destino(destino: Destino) -> str:
+    if destino[0] == 'autobus':
+        return RUTA_AUTOBUS.format(tenant_id=destino[1], bus_id=destino[2])
+    return RUTA_RESUMEN_TENANT.format(tenant_id=destino[1]) if destino[1] else RUTA_RESUMEN_GLOBAL
+
+
+# =============================================================================
+# ESTADO EN MEMORIA
+# =============================================================================
+
+class Agregados:
+    """
+    Agregados en memoria, alimentados documento a documento.
+
+    `valores` guarda los totales por clave lógica; los pendientes son pares
+    (destino, campo) cuyo valor ha cambiado desde la última extracción, y
+    `guardado` lo que hay en Firestore para cada destino conocido.
+    """
+
+    def __init__(self):
+        self.valores: Counter = Counter()
+        self.pendientes: Set[Tuple[Destino, Campo]] = set()
+        self.guardado: Dict[Destino, Counter] = {}
+        self._aportes: Dict[Fuente, Dict[str, Counter]] = {}
+        self._buses: Dict[str, Dict[str, Optional[str]]] = {}       # tenant -> {busId: codigo}
+        self._por_codigo: Dict[str, Dict[str, Set[str]]] = {}       # tenant -> {codigo: {busId}}
+
+    # -------------------------------------------------------------------------
+    # Cambios
+    # -------------------------------------------------------------------------
+
+    def aplicar(self, fuente: Fuente, doc_id: str, data: Optional[Dict[str, Any]]) -> None:
+        """Alta, modificación (data) o baja (None) de un documento de una fuente."""
+        if fuente[0] == 'autobuses':
+            self._autobus(fuente[1], doc_id, data)
+        elif fuente[0] == 'incidencias':
+            self._aporte(fuente, doc_id, contribucion_incidencia(fuente[1], data))
+        else:
+            self._aporte(fuente, doc_id, contribucion_equipo(data))
+
+    def reconciliar(self, fuente: Fuente, vivos: Iterable[str]) -> None:
+        """Da de baja los documentos de la fuente que no están en `vivos` (snapshot completo)."""
+        vivos = set(vivos)
+        conocidos = self._buses.get(fuente[1], {}) if fuente[0] == 'autobuses' else self._aportes.get(fuente, {})
+        for doc_id in [d for d in conocidos if d not in vivos]:
+            self.aplicar(fuente, doc_id, None)
+
+    def _aporte(self, fuente: Fuente, doc_id: str, nuevo: Counter) -> None:
+        aportes = self._aportes.setdefault(fuente, {})
+        anterior = aportes.pop(doc_id, Counter())
+        if nuevo:
+            aportes[doc_id] = nuevo
+        for clave in set(anterior) | set(nuevo):
+            diferencia = nuevo[clave] - anterior[clave]
+            if diferencia:
+                self.valores[clave] += diferencia
+                self._marcar(clave)
+
+    def _marcar(self, clave: Clave) -> None:
+        if clave[0] == 'resumen':
+            self.pendientes.add((('resumen', clave[1]), clave[2:]))
+        elif clave[0] == 'codigo':
+            for bus_id in self._por_codigo.get(clave[1], {}).get(clave[2], ()):
+                self.pendientes.add((('autobus', clave[1], bus_id), ('contadores', 'totalEquipos')))
+        elif clave[2] in self._buses.get(clave[1], {}):
+            self.pendientes.add((('autobus', clave[1], clave[2]), ('contadores', clave[3])))
+
+    def _autobus(self, tenant_id: str, bus_id: str, data: Optional[Dict[str, Any]]) -> None:
+        buses = self._buses.setdefault(tenant_id, {})
+        por_codigo = self._por_codigo.setdefault(tenant_id, {})
+        destino = ('autobus', tenant_id, bus_id)
+        codigo = buses.pop(bus_id, None)
+        if codigo is not None:
+            por_codigo[codigo].discard(bus_id)
+        if data is None:
+            self.guardado.pop(destino, None)
+            self.pendientes = {p for p in self.pendientes if p[0] != destino}
+            return
+
+        buses[bus_id] = data.get('codigo')
+        if buses[bus_id] is not None:
+            por_codigo.setdefault(buses[bus_id], set()).add(bus_id)
+        # Lo guardado llega en el propio snapshot (también nuestras escrituras
+        # y las de otros scripts): lo que no coincida vuelve a pendientes
+        guardado = self.guardado[destino] = aplanar({'contadores': {
+            k: v for k, v in (data.get('contadores') or {}).items() if k in CONTADORES_AUTOBUS
+        }})
+        for campo in [('contadores', c) for c in CONTADORES_AUTOBUS]:
+            if campo not in guardado or guardado[campo] != self.valor(destino, campo):
+                self.pendientes.add((destino, campo))
+
+    # -------------------------------------------------------------------------
+    # Escritura
+    # -------------------------------------------------------------------------
+
+    def valor(self, destino: Destino, campo: Campo) -> int:
+        if destino[0] == 'resumen':
+            return self.valores[('resumen', destino[1]) + campo]
+        if campo[-1] == 'totalEquipos':
+            codigo = self._buses.get(destino[1], {}).get(destino[2])
+            return self.valores[('codigo', destino[1], codigo)] if codigo is not None else 0
+        return self.valores[destino + campo[-1:]]
+
+    def extraer(self) -> Dict[Destino, Set[Campo]]:
+        """Vacía los pendientes, agrupados por destino."""
+        grupos: Dict[Destino, Set[Campo]] = {}
+        for destino, campo in self.pendientes:
+            grupos.setdefault(destino, set()).add(campo)
+        self.pendientes = set()
+        return grupos
+
+    def sin_leer(self, grupos: Dict[Destino, Set[Campo]]) -> List[Destino]:
+        """Resúmenes de los que aún no se sabe qué hay guardado."""
+        return [d for d in grupos if d[0] == 'resumen' and d not in self.guardado]
+
+    def leido(self, destino: Destino, data: Dict[str, Any], grupos: Dict[Destino, Set[Campo]]) -> None:
+        """
+        Registra un resumen leído; sus claves obsoletas (un tipo sin equipos
+        ya) se añaden a `grupos` para dejarlas a cero.
+        """
+        guardado = self.guardado[destino] = aplanar(data)
+        for campo in guardado:
+            if mantenido(campo):
+                grupos.setdefault(destino, set()).add(campo)
+
+    def cambios(self, grupos: Dict[Destino, Set[Campo]]) -> Dict[Destino, Dict[Campo, int]]:
+        """
+        Valores que difieren de lo guardado, por destino. Se dan por
+        guardados (si la escritura falla, ver devolver()).
+        """
+        cambios: Dict[Destino, Dict[Campo, int]] = {}
+        for destino, campos in grupos.items():
+            if destino[0] == 'autobus' and destino[2] not in self._buses.get(destino[1], {}):
+                continue    # borrado entretanto: no recrearlo con sólo los contadores
+            guardado = self.guardado.setdefault(destino, Counter())
+            for campo in campos:
+                valor = self.valor(destino, campo)
+                if campo not in guardado or guardado[campo] != valor:
+                    cambios.setdefault(destino, {})[campo] = valor
+                    guardado[campo] = valor
+        return cambios
+
+    def devolver(self, grupos: Dict[Destino, Set[Campo]]) -> None:
+        """Tras una escritura fallida: vuelven a pendientes y se olvida lo guardado."""
+        for destino, campos in grupos.items():
+            if destino[0] == 'resumen':
+                self.guardado.pop(destino, None)
+            else:
+                self.guardado.get(destino, Counter()).clear()
+            self.pendientes.update((destino, campo) for campo in campos)
+
+
+# =============================================================================
+# SERVICIO
+# =============================================================================
+
+class ServicioAgregados:
+    """Listeners de Firestore + escritura con espera de los agregados que cambian."""
+
+    def __init__(self, db, tenants: List[str], escritor: Optional[EscritorLotes] = None,
+                 espera: float = ESPERA, espera_maxima: float = ESPERA_MAXIMA, verbose: bool = False):
+        self.db = db
+        self.tenants = tenants
+        self.escritor = escritor or EscritorLotes(db, verbose=verbose)
+        self.espera = espera
+        self.espera_maxima = espera_maxima
+        self.verbose = verbose
+        self.agregados = Agregados()
+        self.escrituras = 0
+        self.vaciados = 0
+        self._cerrojo = threading.Condition()
+        self._primer_cambio: Optional[float] = None
+        self._ultimo_cambio: Optional[float] = None
+        self._parar = threading.Event()
+        self._suscripciones: Dict[Fuente, Any] = {}
+        self._iniciales: Set[Fuente] = set()
+
+    # -------------------------------------------------------------------------
+    # Listeners
+    # -------------------------------------------------------------------------
+
+    def _consultas(self) -> Dict[Fuente, Any]:
+        consultas = {('equipos',): self.db.collection('equipos')}
+        for tenant_id in self.tenants:
+            consultas[('autobuses', tenant_id)] = self.db.collection(f"tenants/{tenant_id}/autobuses")
+            consultas[('incidencias', tenant_id)] = self.db.collection(f"tenants/{tenant_id}/incidencias")
+        return consultas
+
+    def suscribir(self) -> None:
+        # Autobuses antes que equipos e incidencias: así los contadores
+        # del primer snapshot ya tienen su destino
+        for fuente, consulta in sorted(self._consultas().items(), key=lambda f: f[0][0] != 'autobuses'):
+            if fuente not in self._suscripciones:
+                self._suscribir(fuente, consulta)
+
+    def _suscribir(self, fuente: Fuente, consulta) -> None:
+        with self._cerrojo:
+            self._iniciales.add(fuente)
+        self._suscripciones[fuente] = consulta.on_snapshot(
+            lambda docs, cambios, _hora, fuente=fuente: self._al_cambiar(fuente, docs, cambios)
+        )
+
+    def _al_cambiar(self, fuente: Fuente, docs, cambios) -> None:
+        """Callback de on_snapshot (en el hilo del listener)."""
+        with self._cerrojo:
+            if fuente in self._iniciales:
+                # Primer snapshot de la suscripción: es el estado completo
+                self._iniciales.discard(fuente)
+                self.agregados.reconciliar(fuente, [doc.id for doc in docs])
+            for cambio in cambios:
+                doc = cambio.document
+                data = None if cambio.type.name == 'REMOVED' else doc.to_dict()
+                self.agregados.aplicar(fuente, doc.id, data)
+            if self.agregados.pendientes:
+                ahora = time.monotonic()
+                self._primer_cambio = self._primer_cambio or ahora
+                self._ultimo_cambio = ahora
+                self._cerrojo.notify()
+
+    def _revisar(self) -> None:
+        """Vuelve a suscribir los listeners que se han cerrado (error o reconexión fallida)."""
+        consultas = self._consultas()
+        for fuente, watch in list(self._suscripciones.items()):
+            if getattr(watch, 'is_active', True):
+                continue
+            print(f"⚠️  [{datetime.now():%H:%M:%S}] Listener de {'/'.join(fuente)} cerrado; se vuelve a suscribir")
+            self._suscribir(fuente, consultas[fuente])
+
+    def cancelar(self) -> None:
+        for watch in self._suscripciones.values():
+            watch.unsubscribe()
+        self._suscripciones = {}
+
+    # -------------------------------------------------------------------------
+    # Escritura con espera
+    # -------------------------------------------------------------------------
+
+    def _plazo(self) -> Optional[float]:
+        """
+        Momento (monotonic) en que toca escribir, o None si no hay pendientes
+        o falta algún primer snapshot (los agregados aún están incompletos).
+        """
+        if self._primer_cambio is None or self._iniciales:
+            return None
+        return min(self._ultimo_cambio + self.espera, self._primer_cambio + self.espera_maxima)
+
+    def vaciar(self) -> int:
+        """Escribe los agregados pendientes que difieren de lo guardado. Devuelve cuántos valores."""
+        with self._cerrojo:
+            if self._iniciales:
+                return 0
+            grupos = self.agregados.extraer()
+            self._primer_cambio = self._ultimo_cambio = None
+            sin_leer = self.agregados.sin_leer(grupos)
+        if not grupos:
+            return 0
+
+        try:
+            if sin_leer:
+                refs = [self.db.document(ruta_destino(d)) for d in sin_leer]
+                leidos = {snap.reference.path: snap.to_dict() or {} for snap in self.db.get_all(refs)}
+                with self._cerrojo:
+                    for destino in sin_leer:
+                        self.agregados.leido(destino, leidos.get(ruta_destino(destino), {}), grupos)
+            with self._cerrojo:
+                cambios = self.agregados.cambios(grupos)
+            from cliente_firestore import firestore
+
+            for destino, campos in cambios.items():
+                doc = anidar(campos)
+                if destino[0] == 'resumen':
+                    doc['actualizadoEn'] = firestore.SERVER_TIMESTAMP
+                self.escritor.set(ruta_destino(destino), doc, merge=True)
+            self.escritor.commit()
+        except Exception as e:
+            with self._cerrojo:
+                self.agregados.devolver(grupos)
+                self._primer_cambio = self._ultimo_cambio = time.monotonic()
+            print(f"❌ [{datetime.now():%H:%M:%S}] Error al escribir agregados (se reintenta): {e}")
+            return 0
+
+        valores = sum(len(c) for c in cambios.values())
+        self.escrituras += len(cambios)
+        self.vaciados += 1
+        if valores or self.verbose:
+            print(f"💾 [{datetime.now():%H:%M:%S}] {valores} valores en {len(cambios)} documentos "
+                  f"({sum(len(c) for c in grupos.values()) - valores} sin cambios)")
+        return valores
+
+    def parar(self) -> None:
+        """Detiene ejecutar() (seguro desde un manejador de señal)."""
+        self._parar.set()
+
+    def ejecutar(self, duracion: Optional[float] = None) -> None:
+        """Suscribe los listeners y escribe con espera hasta parar() o `duracion` segundos."""
+        fin = time.monotonic() + duracion if duracion else None
+        self.suscribir()
+        try:
+            while not self._parar.is_set() and (fin is None or time.monotonic() < fin):
+                with self._cerrojo:
+                    ahora = time.monotonic()
+                    limite = min(p for p in (self._plazo(), fin, ahora + REVISION) if p is not None)
+                    if limite > ahora:
+                        self._cerrojo.wait(limite - ahora)
+                    plazo = self._plazo()
+                if plazo is not None and plazo <= time.monotonic():
+                    self.vaciar()
+                self._revisar()
+        finally:
+            self.cancelar()
+            self.vaciar()
+
+
+# =============================================================================
+# COMPROBACIÓN CONTRA EL EMULADOR
+# =============================================================================
+
+def _equipo(tipo: str, bus: Optional[str], tenant_id: Optional[str]) -> Dict[str, Any]:
+    ubicacion = {'tipo': 'autobus', 'id': bus, 'nombre': bus} if bus else {'tipo': 'almacen', 'id': 'ALM-1'}
+    return {'tipoEquipoId': tipo, 'estado': 'operativo', 'ubicacionActual': ubicacion,
+            'propiedad': {'operadorAsignadoId': tenant_id}}
+
+
+def esperados(db, tenant_id: str) -> Dict[str, Counter]:
+    """Agregados recalculados desde cero (resumen_flota.py y contadores por código de bus)."""
+    equipos = [(doc.id, doc.to_dict()) for doc in db.collection('equipos').stream()]
+    autobuses = [(doc.id, doc.to_dict()) for doc in db.collection(f"tenants/{tenant_id}/autobuses").stream()]
+    incidencias = [doc.to_dict() for doc in db.collection(f"tenants/{tenant_id}/incidencias").stream()]
+    por_tenant, global_ = calcular_resumenes(equipos, {tenant_id: autobuses})
+
+    # Las incidencias no están en resumen_flota.py; el global sólo ve las
+    # del tenant vigilado
+    resultado = {}
+    for destino, resumen in ((('resumen', None), global_), (('resumen', tenant_id), por_tenant.get(tenant_id, {}))):
+        resumen = aplanar(resumen)
+        resumen[('incidencias', 'total')] = len(incidencias)
+        resumen[('incidencias', 'abiertas')] = sum(i.get('estado') in ESTADOS_ABIERTOS for i in incidencias)
+        resultado[ruta_destino(destino)] = resumen
+
+    por_codigo = contar_equipos_por_bus(
+        data for _, data in equipos if obtener_campo(data, 'propiedad.operadorAsignadoId') == tenant_id
+    )
+    for bus_id, data in autobuses:
+        del_bus = [i for i in incidencias if i.get('activoPrincipalId') == bus_id]
+        resultado[RUTA_AUTOBUS.format(tenant_id=tenant_id, bus_id=bus_id)] = aplanar({'contadores': {
+            'totalEquipos': por_codigo.get(data.get('codigo'), 0),
+            'totalIncidencias': len(del_bus),
+            'incidenciasAbiertas': sum(i.get('estado') in ESTADOS_ABIERTOS for i in del_bus),
+        }})
+    return resultado
+
+
+def comprobar(db, espera: float = 0.5) -> int:
+    """
+    Siembra TENANT_COMPROBACION, arranca el servicio, aplica altas, bajas,
+    traslados y cambios de estado, y compara lo escrito con esperados().
+    Devuelve el número de diferencias. Sólo para el emulador: escribe en
+    `equipos` y en los resúmenes globales.
+    """
+    t = TENANT_COMPROBACION
+    equipos = db.collection('equipos')
+    autobuses = db.collection(f"tenants/{t}/autobuses")
+    incidencias = db.collection(f"tenants/{t}/incidencias")
+
+    db.document(f"tenants/{t}").set({'nombre': 'Comprobación del servicio de agregados'})
+    # Como los autobuses reales: codigo '1' para los equipos en 'BUS-1'
+    for bus_id in ('BUS-1', 'BUS-2'):
+        autobuses.document(bus_id).set({'codigo': bus_id.replace('BUS-', ''), 'estado': 'operativo'})
+    equipos.document('cmp-1').set(_equipo('AMP', 'BUS-1', t))
+    equipos.document('cmp-2').set(_equipo('CAM', 'BUS-1', t))
+    equipos.document('cmp-3').set(_equipo('ROU', None, None))
+    incidencias.document('cmp-inc-1').set({'estado': 'nueva', 'activoPrincipalId': 'BUS-1'})
+
+    servicio = ServicioAgregados(db, [t], espera=espera, espera_maxima=4 * espera)
+    hilo = threading.Thread(target=servicio.ejecutar, daemon=True)
+    hilo.start()
+    time.sleep(4 * espera + 2 * REVISION)
+
+    equipos.document('cmp-2').set(_equipo('CAM', 'BUS-2', t))      # traslado
+    equipos.document('cmp-1').delete()                              # baja
+    equipos.document('cmp-4').set(_equipo('ROU', None, None))       # alta sin operador
+    equipos.document('cmp-5').set(_equipo('VAL', 'BUS-1', t))       # tipo nuevo
+    incidencias.document('cmp-inc-1').update({'estado': 'cerrada'})
+    incidencias.document('cmp-inc-2').set({'estado': 'nueva', 'activoPrincipalId': 'BUS-2'})
+    time.sleep(4 * espera + 2 * REVISION)
+    servicio.parar()
+    hilo.join()
+
+    diferencias = 0
+    equipos_en_buses = 0
+    for ruta, esperado in esperados(db, t).items():
+        guardado = aplanar(db.document(ruta).get().to_dict() or {})
+        if ruta.startswith(f"tenants/{t}/autobuses/"):
+            campos = [('contadores', c) for c in CONTADORES_AUTOBUS]
+            equipos_en_buses += esperado.get(('contadores', 'totalEquipos'), 0)
+        else:
+            campos = sorted(c for c in set(esperado) | set(guardado) if mantenido(c))
+        for campo in campos:
+            if esperado.get(campo, 0) != guardado.get(campo, 0):
+                diferencias += 1
+                print(f"   ❌ {ruta} {'.'.join(campo)}: esperado {esperado.get(campo, 0)}, "
+                      f"guardado {guardado.get(campo, 0)}")
+    if not equipos_en_buses:
+        # Sin equipos por autobús la comparación de totalEquipos no prueba nada
+        diferencias += 1
+        print("   ❌ ningún autobús con equipos: no se ha comprobado contadores.totalEquipos")
+    return diferencias
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None, contexto: Optional[Contexto] = None) -> int:
+    parser = argparse.ArgumentParser(description="Mantiene contadores y resúmenes al día con listeners de Firestore.")
+    parser.add_argument('--tenant', action='append', help="Tenant a vigilar, repetible (por defecto, todos)")
+    parser.add_argument('--espera', type=float, default=ESPERA, help="Segundos sin cambios antes de escribir")
+    parser.add_argument('--espera-maxima', type=float, default=ESPERA_MAXIMA,
+                        help="Segundos como mucho entre un cambio y su escritura")
+    parser.add_argument('--duracion', type=float, help="Terminar tras estos segundos (por defecto, hasta Ctrl+C)")
+    parser.add_argument('--verbose', action='store_true', help="Informar también de las escrituras vacías")
+    parser.add_argument('--comprobar', action='store_true',
+                        help="Prueba de extremo a extremo contra el emulador (FIRESTORE_EMULATOR_HOST)")
+    args = parser.parse_args(argv)
+    contexto = contexto or Contexto()
+
+    if args.comprobar:
+        from cliente_firestore import emulador
+
+        if not emulador():
+            parser.error("--comprobar escribe datos de prueba: sólo con FIRESTORE_EMULATOR_HOST")
+        print(f"🧪 Comprobando el servicio contra el emulador en {emulador()}...")
+        diferencias = comprobar(contexto.db)
+        print(f"{'❌' if diferencias else '✅'} {diferencias} diferencias con el recálculo completo")
+        return 1 if diferencias else 0
+
+    db = contexto.db
+    tenants = args.tenant or listar_tenants(db=db)
+    servicio = ServicioAgregados(
+        db, tenants, contexto.escritor, espera=args.espera, espera_maxima=args.espera_maxima,
+        verbose=args.verbose or contexto.verbose,
+    )
+    print(f"👂 Vigilando equipos y {len(tenants)} tenants ({', '.join(tenants)}); "
+          f"espera {args.espera:g} s, máximo {args.espera_maxima:g} s. Ctrl+C para terminar")
+
+    anteriores = {s: signal.signal(s, lambda *_: servicio.parar()) for s in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        servicio.ejecutar(args.duracion)
+    finally:
+        for s, manejador in anteriores.items():
+            signal.signal(s, manejador)
+
+    print(f"✅ {servicio.escrituras} documentos escritos en {servicio.vaciados} vaciados "
+          f"({contexto.escritor.ahorradas} escrituras fusionadas)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
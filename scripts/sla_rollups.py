@@ -0,0 +1,629 @@
+"""
+=============================================================================
+ROLLUPS JERÁRQUICOS DE sla_metrics - ZaintzaBus
+=============================================================================
+Genera los documentos sla_metrics diarios, semanales (2024-W01) y mensuales
+(2024-01) a partir de parciales diarios combinables, sin volver a leer las
+incidencias para cada nivel.
+
+Cada parcial diario (tenants/{t}/sla_parciales/{YYYY-MM-DD}) guarda sólo
+magnitudes que se pueden sumar entre días:
+
+  - conteos: total, críticas, dentro de SLA (global y por criticidad)
+  - n, suma y suma de cuadrados de atención, resolución y fuera de servicio
+  - minutos fuera de servicio por autobús (unión de intervalos del día); los
+    de activos que no están en la flota (autobuses de baja, otros activos)
+    van aparte, en fueraDeFlota, y no cuentan en la disponibilidad
+  - minutos de la ventana del día y flota en servicio
+
+Una semana o un mes es la suma de sus días; promedios, desviaciones y
+disponibilidades se derivan al final. Cuando llega una edición tardía de una
+incidencia sólo se recalculan los días que toca (antes y después del cambio,
+ver dias_afectados) y los periodos semanales y mensuales que los contienen:
+`recalcular --incidencia ID` (con --antes si se tiene la versión anterior).
+
+USO:
+    python scripts/sla_rollups.py parciales --snapshot snapshot/ --desde 2025-01-01 --hasta 2026-01-01
+    python scripts/sla_rollups.py rollup --tenant ekialdebus --periodo 2025-W45 --periodo 2025-11
+    python scripts/sla_rollups.py recalcular --tenant ekialdebus --dia 2025-11-03 --dia 2025-11-04
+    python scripts/sla_rollups.py recalcular --incidencia INC-2025-0412 --antes inc_anterior.json
+=============================================================================
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from disponibilidad import cargar_autobuses, fusionar_intervalos, intervalos_fuera_servicio
+from escritor import EscritorLotes
+from sla_motor import (
+    ZONA_HORARIA,
+    ResultadoSLA,
+    TablaIncidencias,
+    calcular_sla,
+    cargar_configs,
+    cargar_incidencias,
+    codificar_grupos,
+    construir_tabla,
+    inicio_dia,
+    limites_periodo,
+)
+from snapshot import a_epoch, cargar_coleccion, leer_paginado, listar_tenants
+
+# =============================================================================
+# CONFIGURACIÓN
+# =============================================================================
+
+COLECCION_PARCIALES = 'sla_parciales'
+COLECCION_METRICAS = 'sla_metrics'
+
+# Duración máxima esperada de una incidencia: al recalcular un día en vivo se
+# leen las incidencias recibidas desde (día - margen) para capturar las que
+# seguían abiertas.
+MARGEN_INCIDENCIA = timedelta(days=60)
+
+_METRICAS = ('atencion', 'resolucion', 'fueraServicio')
+
+
+# =============================================================================
+# PARCIALES
+# =============================================================================
+
+def _estadistico(n: float = 0, suma: float = 0, suma_cuadrados: float = 0) -> Dict[str, float]:
+    return {'n': int(n), 'suma': float(suma), 'sumaCuadrados': float(suma_cuadrados)}
+
+
+def parcial_vacio(tenant_id: str, dia: str) -> Dict[str, Any]:
+    """Parcial de un día sin incidencias."""
+    return {
+        'dia': dia,
+        'tenantId': tenant_id,
+        'total': 0,
+        'criticas': 0,
+        'dentroSLA': 0,
+        'porCriticidad': {
+            c: {'total': 0, 'dentroSLA': 0, 'atencion': _estadistico(), 'resolucion': _estadistico()}
+            for c in ('critica', 'normal')
+        },
+        **{m: _estadistico() for m in _METRICAS},
+        'minutosVentana': 0.0,
+        'flota': {},
+        'fueraServicioPorActivo': {},
+        'fueraDeFlota': {},
+    }
+
+
+def _dias(desde: date, hasta: date) -> List[date]:
+    return [desde + timedelta(days=i) for i in range((hasta - desde).days)]
+
+
+def calcular_parciales(
+    tabla: TablaIncidencias,
+    configs: Dict[str, Dict[str, Any]],
+    autobuses: Dict[str, List[Tuple[str, Optional[str]]]],
+    desde: date,
+    hasta: date,
+    horario_servicio: bool = False,
+    ahora: Optional[float] = None,
+    resultado: Optional[ResultadoSLA] = None,
+) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Parciales diarios de cada tenant para los días [desde, hasta).
+
+    Métricas de incidencia: una sola pasada de bincount sobre el código
+    (tenant, día de finReparacion, criticidad). Fuera de servicio: los
+    intervalos fusionados por autobús se trocean por días y se acumulan.
+    Si se pasa `resultado` (alineado con `tabla`) no se recalcula el SLA.
+
+    Returns:
+        {tenantId: {'YYYY-MM-DD': parcial}}
+    """
+    dias = _dias(desde, hasta)
+    medianoches = np.asarray([inicio_dia(d) for d in dias] + [inicio_dia(hasta)])
+    n_dias = len(dias)
+    tenants = sorted(set(autobuses) | set(tabla.tenant.astype(str)))
+    indice_tenant = {t: i for i, t in enumerate(tenants)}
+
+    parciales = {t: {d.isoformat(): parcial_vacio(t, d.isoformat()) for d in dias} for t in tenants}
+
+    # --- Métricas de incidencia (por día de finReparacion) --------------------
+    if horario_servicio:
+        from calendario_servicio import duraciones_en_horario, minutos_servicio_por_tenant
+    if resultado is None and horario_servicio:
+        resultado = calcular_sla(tabla, configs, *duraciones_en_horario(tabla, configs))
+    elif resultado is None:
+        resultado = calcular_sla(tabla, configs)
+
+    dia_fin = np.searchsorted(medianoches, tabla.fin_reparacion, side='right') - 1
+    en_rango = resultado.resuelta & (dia_fin >= 0) & (dia_fin < n_dias)
+    t_idx = np.asarray([indice_tenant[t] for t in tabla.tenant.astype(str)], dtype=np.int64)
+    codigo = ((t_idx * n_dias + np.where(en_rango, dia_fin, 0)) * 2 + tabla.criticidad)[en_rango]
+    tamano = len(tenants) * n_dias * 2
+
+    def bins(valores: np.ndarray) -> np.ndarray:
+        return np.bincount(codigo, weights=valores[en_rango].astype(np.float64), minlength=tamano)
+
+    total = np.bincount(codigo, minlength=tamano)
+    dentro = bins(resultado.cumple)
+    estadisticos = {}
+    for nombre, valores in (
+        ('atencion', resultado.tiempo_atencion),
+        ('resolucion', resultado.tiempo_resolucion),
+        ('fueraServicio', resultado.fuera_de_servicio),
+    ):
+        presentes = ~np.isnan(valores)
+        limpio = np.where(presentes, valores, 0.0)
+        estadisticos[nombre] = (bins(presentes), bins(limpio), bins(limpio * limpio))
+
+    for celda in np.flatnonzero(total):
+        t, resto = divmod(int(celda), n_dias * 2)
+        d, c = divmod(resto, 2)
+        parcial = parciales[tenants[t]][dias[d].isoformat()]
+        crit = 'critica' if c == 0 else 'normal'
+        parcial['total'] += int(total[celda])
+        parcial['dentroSLA'] += int(dentro[celda])
+        parcial['criticas'] += int(total[celda]) if c == 0 else 0
+        parcial['porCriticidad'][crit]['total'] = int(total[celda])
+        parcial['porCriticidad'][crit]['dentroSLA'] = int(dentro[celda])
+        for nombre, (n, s, s2) in estadisticos.items():
+            e = _estadistico(n[celda], s[celda], s2[celda])
+            if nombre != 'fueraServicio':
+                parcial['porCriticidad'][crit][nombre] = e
+            parcial[nombre] = _sumar_estadisticos(parcial[nombre], e)
+
+    # --- Ventana y flota -------------------------------------------------------
+    for tenant_id in tenants:
+        flota = {a: c for a, c in autobuses.get(tenant_id, [])}
+        if horario_servicio:
+            ventana = minutos_servicio_por_tenant(
+                np.full(n_dias, tenant_id, dtype=object), medianoches[:-1], medianoches[1:], configs
+            )
+        else:
+            ventana = np.diff(medianoches) / 60.0
+        for d, dia in enumerate(dias):
+            parcial = parciales[tenant_id][dia.isoformat()]
+            parcial['minutosVentana'] = float(ventana[d])
+            parcial['flota'] = dict(flota)
+
+    # --- Fuera de servicio por autobús (intervalos troceados por día) ---------
+    i_tenant, i_activo, ini, fin = intervalos_fuera_servicio(tabla, medianoches[0], medianoches[-1], ahora)
+    if len(ini):
+        grupo, claves = codificar_grupos([i_tenant, i_activo])
+        g, m_ini, m_fin = fusionar_intervalos(grupo, ini, fin)
+
+        d0 = np.searchsorted(medianoches, m_ini, side='right') - 1
+        d1 = np.searchsorted(medianoches, m_fin, side='left') - 1
+        repeticiones = d1 - d0 + 1
+        pieza_g = np.repeat(g, repeticiones)
+        desplazamiento = np.arange(repeticiones.sum()) - np.repeat(np.cumsum(repeticiones) - repeticiones, repeticiones)
+        pieza_d = np.repeat(d0, repeticiones) + desplazamiento
+        pieza_ini = np.maximum(np.repeat(m_ini, repeticiones), medianoches[pieza_d])
+        pieza_fin = np.minimum(np.repeat(m_fin, repeticiones), medianoches[pieza_d + 1])
+
+        tenant_grupo = np.asarray([c[0] for c in claves], dtype=object)
+        if horario_servicio:
+            minutos = minutos_servicio_por_tenant(tenant_grupo[pieza_g], pieza_ini, pieza_fin, configs)
+        else:
+            minutos = (pieza_fin - pieza_ini) / 60.0
+
+        celda = pieza_g * n_dias + pieza_d
+        acumulado = np.bincount(celda, weights=minutos, minlength=len(claves) * n_dias)
+        for c in np.flatnonzero(acumulado):
+            gi, d = divmod(int(c), n_dias)
+            tenant_id, activo_id = claves[gi]
+            parcial = parciales[tenant_id][dias[d].isoformat()]
+            destino = 'fueraServicioPorActivo' if activo_id in parcial['flota'] else 'fueraDeFlota'
+            parcial[destino][activo_id] = float(acumulado[c])
+
+    return parciales
+
+
+# =============================================================================
+# COMBINACIÓN
+# =============================================================================
+
+def _sumar_estadisticos(a: Dict[str, float], b: Dict[str, float]) -> Dict[str, float]:
+    return _estadistico(a['n'] + b['n'], a['suma'] + b['suma'], a['sumaCuadrados'] + b['sumaCuadrados'])
+
+
+def combinar_parciales(parciales: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Suma parciales diarios (o de cualquier nivel) en uno solo."""
+    combinado: Optional[Dict[str, Any]] = None
+    for p in parciales:
+        if combinado is None:
+            combinado = parcial_vacio(p['tenantId'], p['dia'])
+            combinado['minutosVentanaFlota'] = 0.0
+            combinado['ventanaPorActivo'] = {}
+        for campo in ('total', 'criticas', 'dentroSLA', 'minutosVentana'):
+            combinado[campo] += p[campo]
+        for m in _METRICAS:
+            combinado[m] = _sumar_estadisticos(combinado[m], p[m])
+        for crit, det in p['porCriticidad'].items():
+            destino = combinado['porCriticidad'][crit]
+            destino['total'] += det['total']
+            destino['dentroSLA'] += det['dentroSLA']
+            for m in ('atencion', 'resolucion'):
+                destino[m] = _sumar_estadisticos(destino[m], det[m])
+        # La flota puede variar entre días: la ventana se acumula por autobús
+        for activo_id, codigo in p['flota'].items():
+            combinado['flota'][activo_id] = codigo
+            combinado['ventanaPorActivo'][activo_id] = combinado['ventanaPorActivo'].get(activo_id, 0.0) + p['minutosVentana']
+        combinado['minutosVentanaFlota'] += p['minutosVentana'] * len(p['flota'])
+        for campo in ('fueraServicioPorActivo', 'fueraDeFlota'):
+            for activo_id, minutos in p.get(campo, {}).items():
+                combinado[campo][activo_id] = combinado[campo].get(activo_id, 0.0) + minutos
+    return combinado
+
+
+def _promedio(e: Dict[str, float]) -> int:
+    return int(math.floor(e['suma'] / e['n'] + 0.5)) if e['n'] else 0
+
+
+def _desviacion(e: Dict[str, float]) -> float:
+    if not e['n']:
+        return 0.0
+    media = e['suma'] / e['n']
+    return round(math.sqrt(max(e['sumaCuadrados'] / e['n'] - media * media, 0.0)), 2)
+
+
+def _porcentaje(disponible: float, total: float) -> float:
+    return 100.0 if total <= 0 else round(disponible / total * 100, 2)
+
+
+def finalizar(combinado: Dict[str, Any], periodo: str, tipo: str) -> Dict[str, Any]:
+    """Convierte un parcial combinado en el documento sla_metrics/{periodo}."""
+    detalle = {}
+    for crit, clave in (('critica', 'criticas'), ('normal', 'normales')):
+        det = combinado['porCriticidad'][crit]
+        detalle[clave] = {
+            'total': det['total'],
+            'dentroSLA': det['dentroSLA'],
+            'tiempoAtencionPromedio': _promedio(det['atencion']),
+            'tiempoResolucionPromedio': _promedio(det['resolucion']),
+        }
+
+    ventana_activo = combinado.get('ventanaPorActivo') or {a: combinado['minutosVentana'] for a in combinado['flota']}
+    ventana_flota = combinado.get('minutosVentanaFlota', combinado['minutosVentana'] * len(combinado['flota']))
+    # Parciales anteriores a fueraDeFlota: lo que no es de la flota se aparta aquí
+    fuera, fuera_de_flota = {}, dict(combinado.get('fueraDeFlota', {}))
+    for activo_id, minutos in combinado['fueraServicioPorActivo'].items():
+        if activo_id in ventana_activo:
+            fuera[activo_id] = minutos
+        else:
+            fuera_de_flota[activo_id] = fuera_de_flota.get(activo_id, 0.0) + minutos
+    por_activo = []
+    for activo_id in sorted(ventana_activo):
+        ventana = ventana_activo[activo_id]
+        minutos = fuera.get(activo_id, 0.0)
+        por_activo.append({
+            'activoId': activo_id,
+            'codigo': combinado['flota'].get(activo_id),
+            'disponibilidad': _porcentaje(ventana - minutos, ventana),
+            'horasFueraServicio': round(minutos / 60.0, 2),
+        })
+    fuera_total = sum(fuera.values())
+    total = combinado['total']
+
+    return {
+        'periodo': periodo,
+        'tipo': tipo,
+        'totalIncidencias': total,
+        'incidenciasCriticas': combinado['criticas'],
+        'incidenciasNormales': total - combinado['criticas'],
+        'tiempoAtencionPromedio': _promedio(combinado['atencion']),
+        'tiempoResolucionPromedio': _promedio(combinado['resolucion']),
+        'tiempoFueraServicioPromedio': _promedio(combinado['fueraServicio']),
+        'tiempoAtencionDesviacion': _desviacion(combinado['atencion']),
+        'tiempoResolucionDesviacion': _desviacion(combinado['resolucion']),
+        'incidenciasDentroSLA': combinado['dentroSLA'],
+        'porcentajeCumplimientoSLA': (combinado['dentroSLA'] / total * 100) if total else 0.0,
+        'slaDetalle': detalle,
+        'disponibilidadGlobal': _porcentaje(ventana_flota - fuera_total, ventana_flota),
+        'disponibilidadPorActivo': por_activo,
+        'fueraDeFlota': [
+            {'activoId': activo_id, 'horasFueraServicio': round(minutos / 60.0, 2)}
+            for activo_id, minutos in sorted(fuera_de_flota.items())
+        ],
+        'tenantId': combinado['tenantId'],
+    }
+
+
+# =============================================================================
+# PERIODOS
+# =============================================================================
+
+def periodos_padre(dia: date) -> List[str]:
+    """Periodo semanal ISO y mensual que contienen un día."""
+    anio, semana, _ = dia.isocalendar()
+    return [f"{anio}-W{semana:02d}", f"{dia.year}-{dia.month:02d}"]
+
+
+def dias_de_periodo(periodo: str) -> List[date]:
+    """Días naturales de un periodo diario, semanal o mensual."""
+    desde, hasta, _tipo = limites_periodo(periodo)
+    primero = datetime.fromtimestamp(desde, ZONA_HORARIA).date()
+    ultimo = datetime.fromtimestamp(hasta, ZONA_HORARIA).date()
+    return _dias(primero, ultimo)
+
+
+def dia_local(epoch: float) -> Optional[date]:
+    return None if math.isnan(epoch) else datetime.fromtimestamp(epoch, ZONA_HORARIA).date()
+
+
+def dias_afectados(antes: Optional[Dict[str, Any]], despues: Optional[Dict[str, Any]], ahora: Optional[float] = None) -> Set[date]:
+    """
+    Días cuyo parcial cambia al editar una incidencia (antes/después del cambio).
+
+    Un parcial depende de la incidencia si su finReparacion cae en ese día
+    (métricas) o si su intervalo [T0, T4) lo solapa (fuera de servicio).
+    """
+    ahora = time.time() if ahora is None else ahora
+    dias: Set[date] = set()
+    for data in (antes, despues):
+        if not data:
+            continue
+        ts = data.get('timestamps') or {}
+        t0, t4 = a_epoch(ts.get('recepcion')), a_epoch(ts.get('finReparacion'))
+        if not math.isnan(t4):
+            dias.add(dia_local(t4))
+        if not math.isnan(t0):
+            primero = dia_local(t0)
+            ultimo = dia_local(ahora if math.isnan(t4) else t4)
+            dias.update(_dias(primero, ultimo + timedelta(days=1)))
+    return dias
+
+
+# =============================================================================
+# ALMACENES DE PARCIALES
+# =============================================================================
+
+class AlmacenLocal:
+    """Parciales y métricas en disco: <raiz>/<tenant>/<coleccion>/<id>.json"""
+
+    def __init__(self, raiz: Path):
+        self.raiz = Path(raiz)
+
+    def leer_parciales(self, tenant_id: str, dias: Sequence[date]) -> List[Dict[str, Any]]:
+        parciales = []
+        for dia in dias:
+            archivo = self.raiz / tenant_id / COLECCION_PARCIALES / f"{dia.isoformat()}.json"
+            if archivo.exists():
+                parciales.append(json.loads(archivo.read_text(encoding='utf-8')))
+        return parciales
+
+    def leer(self, tenant_id: str, coleccion: str, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        carpeta = self.raiz / tenant_id / coleccion
+        docs = {}
+        for doc_id in ids:
+            archivo = carpeta / f"{doc_id}.json"
+            if archivo.exists():
+                docs[doc_id] = json.loads(archivo.read_text(encoding='utf-8'))
+        return docs
+
+    def escribir(self, tenant_id: str, coleccion: str, documentos: Dict[str, Dict[str, Any]]) -> None:
+        carpeta = self.raiz / tenant_id / coleccion
+        carpeta.mkdir(parents=True, exist_ok=True)
+        for doc_id, data in documentos.items():
+            (carpeta / f"{doc_id}.json").write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+
+
+class AlmacenFirestore:
+    """Parciales y métricas en tenants/{t}/sla_parciales y tenants/{t}/sla_metrics."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def leer_parciales(self, tenant_id: str, dias: Sequence[date]) -> List[Dict[str, Any]]:
+        return list(self.leer(tenant_id, COLECCION_PARCIALES, [d.isoformat() for d in dias]).values())
+
+    def leer(self, tenant_id: str, coleccion: str, ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+        ref = self.db.collection(f"tenants/{tenant_id}/{coleccion}")
+        snaps = self.db.get_all([ref.document(doc_id) for doc_id in ids])
+        return {snap.id: snap.to_dict() for snap in snaps if snap.exists}
+
+    def escribir(self, tenant_id: str, coleccion: str, documentos: Dict[str, Dict[str, Any]]) -> None:
+        from firebase_admin import firestore
+
+        ref = self.db.collection(f"tenants/{tenant_id}/{coleccion}")
+        with EscritorLotes(self.db) as escritor:
+            for doc_id, data in documentos.items():
+                escritor.set(ref.document(doc_id), {**data, 'calculadoAt': firestore.SERVER_TIMESTAMP})
+
+
+# =============================================================================
+# ORQUESTACIÓN
+# =============================================================================
+
+def construir_rollups(almacen, tenant_id: str, periodos: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Documentos sla_metrics de los periodos indicados, sólo a partir de parciales."""
+    docs = {}
+    for periodo in periodos:
+        parciales = almacen.leer_parciales(tenant_id, dias_de_periodo(periodo))
+        if parciales:
+            _desde, _hasta, tipo = limites_periodo(periodo)
+            docs[periodo] = finalizar(combinar_parciales(parciales), periodo, tipo)
+    return docs
+
+
+def guardar_parciales(almacen, parciales: Dict[str, Dict[str, Dict[str, Any]]]) -> Dict[str, Set[str]]:
+    """
+    Escribe parciales y sus sla_metrics diarios; devuelve los periodos
+    semanales y mensuales a reconstruir por tenant.
+    """
+    padres: Dict[str, Set[str]] = {}
+    for tenant_id, por_dia in parciales.items():
+        almacen.escribir(tenant_id, COLECCION_PARCIALES, por_dia)
+        diarios = {dia: finalizar(p, dia, 'diario') for dia, p in por_dia.items()}
+        almacen.escribir(tenant_id, COLECCION_METRICAS, diarios)
+        for dia in por_dia:
+            padres.setdefault(tenant_id, set()).update(periodos_padre(date.fromisoformat(dia)))
+    return padres
+
+
+def cargar_incidencias_ventana(db, tenant_id: str, desde: float, hasta: float) -> TablaIncidencias:
+    """
+    Incidencias en vivo que pueden afectar a [desde, hasta): recibidas antes
+    de 'hasta' y no antes de 'desde - MARGEN_INCIDENCIA'.
+    """
+    minimo = datetime.fromtimestamp(desde, timezone.utc) - MARGEN_INCIDENCIA
+    maximo = datetime.fromtimestamp(hasta, timezone.utc)
+    consulta = (
+        db.collection(f"tenants/{tenant_id}/incidencias")
+        .where('timestamps.recepcion', '>=', minimo)
+        .where('timestamps.recepcion', '<', maximo)
+        .order_by('timestamps.recepcion')
+        .order_by('__name__')
+    )
+    return construir_tabla((tenant_id, doc_id, data) for doc_id, data in leer_paginado(consulta))
+
+
+def recalcular_dias(
+    almacen,
+    tenant_id: str,
+    dias: Iterable[date],
+    tabla: TablaIncidencias,
+    configs: Dict[str, Dict[str, Any]],
+    autobuses: Dict[str, List[Tuple[str, Optional[str]]]],
+    horario_servicio: bool = False,
+) -> Dict[str, Any]:
+    """
+    Recalcula sólo los días indicados y sus periodos padre.
+
+    Los días se agrupan en tramos contiguos para que cada tramo sea un único
+    cálculo vectorizado; después se reconstruyen semanas y meses a partir de
+    los parciales (los ya existentes más los recalculados).
+    """
+    dias = sorted(set(dias))
+    tramos: List[Tuple[date, date]] = []
+    for dia in dias:
+        if tramos and tramos[-1][1] == dia:
+            tramos[-1] = (tramos[-1][0], dia + timedelta(days=1))
+        else:
+            tramos.append((dia, dia + timedelta(days=1)))
+
+    mascara = tabla.tenant.astype(str) == tenant_id
+    tabla = tabla.filtrar(mascara)
+    flota = {tenant_id: autobuses.get(tenant_id, [])}
+    padres: Set[str] = set()
+    for desde, hasta in tramos:
+        parciales = calcular_parciales(tabla, configs, flota, desde, hasta, horario_servicio)
+        parciales.setdefault(tenant_id, {})
+        padres |= guardar_parciales(almacen, {tenant_id: parciales[tenant_id]}).get(tenant_id, set())
+
+    rollups = construir_rollups(almacen, tenant_id, sorted(padres))
+    almacen.escribir(tenant_id, COLECCION_METRICAS, rollups)
+    return {'dias': [d.isoformat() for d in dias], 'periodos': sorted(rollups)}
+
+
+def leer_incidencia(tenant_id: str, doc_id: str, snapshot: Optional[Path] = None, db=None) -> Optional[Dict[str, Any]]:
+    """Versión actual de una incidencia (None si no existe en el tenant)."""
+    ruta = f"tenants/{tenant_id}/incidencias"
+    if snapshot is not None:
+        return next((data for i, data in cargar_coleccion(snapshot, ruta) if i == doc_id), None)
+    snap = db.collection(ruta).document(doc_id).get()
+    return snap.to_dict() if snap.exists else None
+
+
+# =============================================================================
+# PUNTO DE ENTRADA
+# =============================================================================
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Parciales diarios y rollups de sla_metrics.")
+    parser.add_argument('--snapshot', type=Path, help="Leer incidencias de un snapshot (por defecto, en vivo)")
+    parser.add_argument('--salida', type=Path,
+                        help="Guardar parciales y métricas en este directorio en lugar de Firestore")
+    parser.add_argument('--tenant', action='append', dest='tenants', help="Tenant a procesar (repetible)")
+    parser.add_argument('--horario-servicio', action='store_true',
+                        help="Medir tiempos y disponibilidad en horario de servicio")
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_par = sub.add_parser('parciales', help="Calcular parciales diarios y sus rollups")
+    p_par.add_argument('--desde', required=True, type=date.fromisoformat)
+    p_par.add_argument('--hasta', required=True, type=date.fromisoformat)
+
+    p_rol = sub.add_parser('rollup', help="Construir periodos a partir de parciales existentes")
+    p_rol.add_argument('--periodo', action='append', required=True)
+
+    p_rec = sub.add_parser('recalcular', help="Recalcular días concretos tras ediciones tardías")
+    p_rec.add_argument('--dia', action='append', type=date.fromisoformat)
+    p_rec.add_argument('--incidencia', action='append',
+                       help="ID de una incidencia editada: se recalculan los días que toca (repetible)")
+    p_rec.add_argument('--antes', type=Path,
+                       help="JSON con la versión anterior de la incidencia (con un solo --incidencia); "
+                            "sin él sólo cuentan los días de la versión actual")
+
+    args = parser.parse_args(argv)
+    if args.comando == 'recalcular':
+        if not args.dia and not args.incidencia:
+            parser.error("recalcular necesita --dia o --incidencia")
+        if args.antes and len(args.incidencia or []) != 1:
+            parser.error("--antes va con un solo --incidencia")
+    inicio = time.perf_counter()
+
+    db = None
+    if args.snapshot is None or args.salida is None:
+        from cliente_firestore import conectar_firestore
+        db = conectar_firestore()
+    almacen = AlmacenLocal(args.salida) if args.salida else AlmacenFirestore(db)
+    tenants = args.tenants or listar_tenants(args.snapshot, db)
+
+    if args.comando == 'rollup':
+        resumen = {}
+        for tenant_id in tenants:
+            rollups = construir_rollups(almacen, tenant_id, args.periodo)
+            almacen.escribir(tenant_id, COLECCION_METRICAS, rollups)
+            resumen[tenant_id] = sorted(rollups)
+    else:
+        configs = cargar_configs(tenants, args.snapshot, db)
+        autobuses = cargar_autobuses(tenants, args.snapshot, db)
+        dias_por_tenant = None
+        if args.comando == 'parciales':
+            dias = _dias(args.desde, args.hasta)
+        else:
+            dias = args.dia or []
+        if args.comando == 'recalcular' and args.incidencia:
+            antes = json.loads(args.antes.read_text(encoding='utf-8')) if args.antes else None
+            dias_por_tenant = {}
+            for tenant_id in tenants:
+                afectados = set(dias)
+                for doc_id in args.incidencia:
+                    despues = leer_incidencia(tenant_id, doc_id, args.snapshot, db)
+                    # Los IDs se repiten entre tenants: --antes es del suyo
+                    # (su tenantId o, si no lo tiene, el único procesado)
+                    previa = antes
+                    if antes is not None and antes.get('tenantId', tenant_id if len(tenants) == 1 else None) != tenant_id:
+                        previa = None
+                    if despues is not None or previa is not None:
+                        afectados |= dias_afectados(previa, despues)
+                if afectados:
+                    dias_por_tenant[tenant_id] = sorted(afectados)
+            tenants = list(dias_por_tenant)
+        resumen = {}
+        for tenant_id in tenants:
+            if dias_por_tenant is not None:
+                dias = dias_por_tenant[tenant_id]
+            if not dias:
+                continue
+            if args.snapshot is not None:
+                tabla = cargar_incidencias([tenant_id], args.snapshot)
+            else:
+                tabla = cargar_incidencias_ventana(db, tenant_id, inicio_dia(min(dias)), inicio_dia(max(dias) + timedelta(days=1)))
+            resumen[tenant_id] = recalcular_dias(
+                almacen, tenant_id, dias, tabla, configs, autobuses, args.horario_servicio
+            )
+
+    print(json.dumps(resumen, ensure_ascii=False, indent=2))
+    print(f"⏱  {time.perf_counter() - inicio:.2f} s", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
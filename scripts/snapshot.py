@@ -0,0 +1,303 @@
+"""
+=============================================================================
+SNAPSHOT DE FIRESTORE - ZaintzaBus
+=============================================================================
+Lectura uniforme de colecciones desde una copia local (snapshot) o desde
+Firestore en vivo, para que los motores de cálculo (SLA, disponibilidad,
+resúmenes...) no dependan de dónde vienen los datos.
+
+Formato del snapshot: un directorio que replica las rutas de Firestore, con un
+archivo JSONL por colección:
+
+    snapshot/
+      equipos.jsonl
+      sla_config.jsonl
+      tenants.jsonl
+      tenants/ekialdebus/incidencias.jsonl
+      tenants/ekialdebus/autobuses.jsonl
+
+Cada línea es {"id": "<docId>", "data": {...}}. Las fechas se guardan como
+texto ISO 8601 en UTC.
+
+Con --compacto, `equipos` se guarda en forma compacta (sin valores por
+defecto ni campos derivables, ver codificacion_compacta.py) y el snapshot
+incluye codificacion.json; cargar_coleccion la expande al leer.
+
+USO:
+    python scripts/snapshot.py exportar snapshot/ equipos tipos_equipo tenants
+    python scripts/snapshot.py exportar snapshot/ --tenants incidencias autobuses
+    python scripts/snapshot.py exportar snapshot/ --compacto
+=============================================================================
+"""
+
+import argparse
+import json
+import sys
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from cliente_firestore import conectar_firestore
+
+# Tamaño de página para lecturas en vivo
+TAM_PAGINA = 500
+
+Documento = Tuple[str, Dict[str, Any]]
+
+
+# =============================================================================
+# CONVERSIÓN DE VALORES
+# =============================================================================
+
+def serializar_valor(valor: Any) -> Any:
+    """Convierte un valor de Firestore en algo representable en JSON."""
+    if isinstance(valor, datetime):
+        if valor.tzinfo is None:
+            valor = valor.replace(tzinfo=timezone.utc)
+        return valor.astimezone(timezone.utc).isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, dict):
+        return {k: serializar_valor(v) for k, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return [serializar_valor(v) for v in valor]
+    if hasattr(valor, 'path') and hasattr(valor, 'id'):
+        # DocumentReference
+        return valor.path
+    if hasattr(valor, 'latitude') and hasattr(valor, 'longitude'):
+        return {'latitude': valor.latitude, 'longitude': valor.longitude}
+    return valor
+
+
+def a_epoch(valor: Any) -> float:
+    """
+    Convierte un timestamp (datetime, ISO, epoch o {'_seconds': ...}) a
+    segundos desde epoch en UTC. Devuelve NaN si no hay valor.
+
+    Las fechas sin zona horaria se interpretan como UTC, igual que hace
+    firebase_admin al escribir un datetime naive.
+    """
+    if valor is None:
+        return float('nan')
+    if isinstance(valor, datetime):
+        if valor.tzinfo is None:
+            valor = valor.replace(tzinfo=timezone.utc)
+        return valor.timestamp()
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    if isinstance(valor, str):
+        if not valor:
+            return float('nan')
+        return a_epoch(datetime.fromisoformat(valor.replace('Z', '+00:00')))
+    if isinstance(valor, dict) and '_seconds' in valor:
+        return valor['_seconds'] + valor.get('_nanoseconds', 0) / 1e9
+    return float('nan')
+
+
+def obtener_campo(data: Dict[str, Any], ruta: str, defecto: Any = None) -> Any:
+    """Lee un campo anidado con notación de puntos ('timestamps.recepcion')."""
+    actual: Any = data
+    for parte in ruta.split('.'):
+        if not isinstance(actual, dict) or parte not in actual:
+            return defecto
+        actual = actual[parte]
+    return actual
+
+
+# =============================================================================
+# LECTURA
+# =============================================================================
+
+def _archivo_coleccion(raiz: Path, ruta: str) -> Path:
+    return Path(raiz) / f"{ruta.strip('/')}.jsonl"
+
+
+def cargar_coleccion(raiz: Path, ruta: str) -> Iterator[Documento]:
+    """Itera los documentos de una colección del snapshot (ya expandidos)."""
+    archivo = _archivo_coleccion(raiz, ruta)
+    if not archivo.exists():
+        return
+    from codificacion_compacta import COMPACTABLES, leer_codificacion
+    codificacion = leer_codificacion(raiz)
+    compacta = codificacion is not None and ruta.strip('/') in codificacion['colecciones']
+    with archivo.open(encoding='utf-8') as f:
+        for linea in f:
+            if linea.strip():
+                registro = json.loads(linea)
+                data = registro['data']
+                if compacta:
+                    data = COMPACTABLES[ruta.strip('/')][1](data, codificacion['catalogo'])
+                yield registro['id'], data
+
+
+def leer_coleccion(db, ruta: str, tam_pagina: int = TAM_PAGINA, campos: Optional[List[str]] = None) -> Iterator[Documento]:
+    """
+    Lee una colección en vivo por páginas ordenadas por ID de documento.
+
+    A diferencia de stream(), cada página es una consulta independiente, así
+    que una lectura larga no mantiene abierto un único stream que pueda
+    expirar a mitad de colección.
+    """
+    consulta = db.collection(ruta).order_by('__name__')
+    if campos is not None:
+        consulta = consulta.select(campos)
+    return leer_paginado(consulta, tam_pagina)
+
+
+def leer_paginado(consulta, tam_pagina: int = TAM_PAGINA) -> Iterator[Documento]:
+    """
+    Recorre por páginas una consulta ya ordenada (el último order_by debe
+    ser '__name__' para que el cursor start_after sea único).
+    """
+    consulta = consulta.limit(tam_pagina)
+    ultimo = None
+    while True:
+        pagina = consulta.start_after(ultimo) if ultimo is not None else consulta
+        docs = list(pagina.stream())
+        for doc in docs:
+            yield doc.id, doc.to_dict() or {}
+        if len(docs) < tam_pagina:
+            return
+        ultimo = docs[-1]
+
+
+def leer_ids(consulta, tam_pagina: int = TAM_PAGINA) -> Iterator[str]:
+    """
+    IDs de los documentos de una consulta (sin order_by) con proyección
+    sólo de clave: select(['__name__']); un select vacío devolvería todos
+    los campos.
+    """
+    consulta = consulta.select(['__name__']).order_by('__name__')
+    return (doc_id for doc_id, _ in leer_paginado(consulta, tam_pagina))
+
+
+def leer_por_ids(
+    db,
+    ruta: str,
+    ids: Iterable[str],
+    tam_lote: int = 300,
+    campos: Optional[List[str]] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """Documentos existentes de una colección por ID, con get_all por lotes (y proyección opcional)."""
+    coleccion = db.collection(ruta)
+    ids = list(ids)
+    existentes = {}
+    for i in range(0, len(ids), tam_lote):
+        refs = [coleccion.document(doc_id) for doc_id in ids[i:i + tam_lote]]
+        for snap in db.get_all(refs, field_paths=campos):
+            if snap.exists:
+                existentes[snap.id] = snap.to_dict() or {}
+    return existentes
+
+
+def documentos(ruta: str, snapshot: Optional[Path] = None, db=None) -> Iterator[Documento]:
+    """
+    Fuente única: snapshot si se indica, Firestore en vivo en otro caso
+    (tipos_equipo, tenants y sla_config, a través de datos_referencia.py).
+    """
+    from datos_referencia import es_referencia, referencia
+
+    if snapshot is not None:
+        return cargar_coleccion(snapshot, ruta)
+    if es_referencia(ruta):
+        return iter(referencia(db).documentos(ruta).items())
+    if db is None:
+        db = conectar_firestore()
+    return leer_coleccion(db, ruta)
+
+
+def listar_tenants(snapshot: Optional[Path] = None, db=None) -> List[str]:
+    """IDs de los tenants disponibles en el snapshot o en Firestore (con cache, ver datos_referencia.py)."""
+    from datos_referencia import referencia
+
+    if snapshot is not None:
+        ids = [doc_id for doc_id, _ in cargar_coleccion(snapshot, 'tenants')]
+        if not ids and (Path(snapshot) / 'tenants').is_dir():
+            ids = sorted(p.name for p in (Path(snapshot) / 'tenants').iterdir() if p.is_dir())
+        return ids
+    return referencia(db).tenants()
+
+
+# =============================================================================
+# EXPORTACIÓN
+# =============================================================================
+
+def escribir_coleccion(raiz: Path, ruta: str, docs: Iterable[Documento], compactar=None) -> int:
+    """
+    Escribe (sobrescribe) una colección en el snapshot. Devuelve el total.
+
+    Args:
+        compactar: función data -> data compacta (ver codificacion_compacta).
+    """
+    archivo = _archivo_coleccion(raiz, ruta)
+    archivo.parent.mkdir(parents=True, exist_ok=True)
+    total = 0
+    with archivo.open('w', encoding='utf-8') as f:
+        for doc_id, data in docs:
+            data = serializar_valor(data)
+            registro = {'id': doc_id, 'data': compactar(data) if compactar else data}
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            total += 1
+    return total
+
+
+def exportar(
+    db,
+    destino: Path,
+    colecciones: List[str],
+    subcolecciones_tenant: List[str],
+    compacto: bool = False,
+) -> Dict[str, int]:
+    """Exporta colecciones globales y subcolecciones de cada tenant."""
+    from codificacion_compacta import ARCHIVO_CODIFICACION, COMPACTABLES, catalogo_de
+
+    compactables = {}
+    (Path(destino) / ARCHIVO_CODIFICACION).unlink(missing_ok=True)
+    if compacto:
+        catalogo = catalogo_de(leer_coleccion(db, 'tipos_equipo'))
+        compactables = {
+            ruta: (lambda data, f=COMPACTABLES[ruta][0]: f(data, catalogo))
+            for ruta in colecciones if ruta in COMPACTABLES
+        }
+        Path(destino).mkdir(parents=True, exist_ok=True)
+        (Path(destino) / ARCHIVO_CODIFICACION).write_text(
+            json.dumps({'colecciones': sorted(compactables), 'catalogo': catalogo}, ensure_ascii=False, indent=2),
+            encoding='utf-8',
+        )
+
+    totales = {}
+    for ruta in colecciones:
+        totales[ruta] = escribir_coleccion(destino, ruta, leer_coleccion(db, ruta), compactables.get(ruta))
+        print(f"   ✅ {ruta}: {totales[ruta]} documentos{' (compacto)' if ruta in compactables else ''}")
+
+    if subcolecciones_tenant:
+        if 'tenants' not in totales:
+            totales['tenants'] = escribir_coleccion(destino, 'tenants', leer_coleccion(db, 'tenants'))
+        for tenant_id in listar_tenants(destino):
+            for sub in subcolecciones_tenant:
+                ruta = f"tenants/{tenant_id}/{sub}"
+                totales[ruta] = escribir_coleccion(destino, ruta, leer_coleccion(db, ruta))
+                print(f"   ✅ {ruta}: {totales[ruta]} documentos")
+    return totales
+
+
+def main(argv: Optional[List[str]] = None, contexto=None) -> int:
+    parser = argparse.ArgumentParser(description="Snapshot local de colecciones de Firestore.")
+    sub = parser.add_subparsers(dest='comando', required=True)
+    p_exp = sub.add_parser('exportar', help="Exportar colecciones a un directorio")
+    p_exp.add_argument('destino', type=Path)
+    p_exp.add_argument('colecciones', nargs='*', default=['equipos', 'tipos_equipo', 'tenants', 'sla_config'])
+    p_exp.add_argument('--tenants', nargs='*', default=[], metavar='SUBCOLECCION',
+                       help="Subcolecciones a exportar para cada tenant")
+    p_exp.add_argument('--compacto', action='store_true',
+                       help="Guardar equipos sin valores por defecto ni campos derivables")
+    args = parser.parse_args(argv)
+
+    print("📦 Exportando snapshot...")
+    totales = exportar(contexto.db if contexto else conectar_firestore(), args.destino, args.colecciones, args.tenants, args.compacto)
+    print(f"   Total: {sum(totales.values())} documentos en {args.destino}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
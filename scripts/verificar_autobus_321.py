@@ -1,12 +1,8 @@
 """Verificar datos del autobus 321 en Firestore"""
-import firebase_admin
-from firebase_admin import credentials, firestore
+from cliente_firestore import conectar_firestore
+from datos_referencia import referencia
 
-# Inicializar
-if not firebase_admin._apps:
-    cred = credentials.Certificate("scripts/serviceAccountKey.json")
-    firebase_admin.initialize_app(cred)
-db = firestore.client()
+db = conectar_firestore()
 
 print("=" * 60)
 print("VERIFICANDO AUTOBUS 321 EN FIRESTORE")
@@ -19,8 +15,8 @@ for col in db.collections():
 
 # Listar tenants
 print("\n2. Tenants disponibles:")
-for t in db.collection("tenants").stream():
-    print(f"   - {t.id}")
+for tenant_id in referencia(db).tenants():
+    print(f"   - {tenant_id}")
 
 # Buscar subcolecciones dentro de un tenant
 print("\n3. Subcolecciones en tenants/ekialdebus:")
@@ -40,13 +36,19 @@ if docs:
 else:
     print("   No encontrado en activos")
 
-# Buscar en equipos donde ubicacion sea BUS-321
-print("\n5. Equipos del bus 321 (colección global 'equipos'):")
+# Equipos del BUS-321 según su manifiesto (una sola lectura)
+print("\n5. Equipos del bus 321 (tenants/ekialdebus/manifiestos_bus/BUS-321):")
+manifiesto = db.document("tenants/ekialdebus/manifiestos_bus/BUS-321").get()
+if manifiesto.exists:
+    for equipo_id, entrada in list(manifiesto.to_dict().get("equipos", {}).items())[:3]:
+        print(f"   - {entrada.get('codigoInterno')}: {entrada.get('tipoNombre')}")
+else:
+    print("   Sin manifiesto (python scripts/manifiesto_bus.py reparar)")
+
+# Muestra de un equipo para ver cómo referencia al bus
 equipo_sample = None
-for d in db.collection("equipos").where("ubicacionActual.nombre", "==", "BUS-321").limit(3).stream():
-    data = d.to_dict()
-    equipo_sample = data
-    print(f"   - {data.get('codigoInterno')}: {data.get('tipoEquipoNombre')}")
+for d in db.collection("equipos").where("ubicacionActual.nombre", "==", "BUS-321").limit(1).stream():
+    equipo_sample = d.to_dict()
 
 # Verificar estructura del bus en equipos
 if equipo_sample:
@@ -1,67 +1,95 @@
 """
 Script para verificar los datos subidos a Firestore
+
+USO:
+    python scripts/verificar_datos.py
+    python scripts/verificar_datos.py --tenant dbus --bus BUS-501 --esperados 40 700
+    python scripts/zaintzabus.py verify --tenant ekialdebus     (ver zaintzabus.py)
 """
-import firebase_admin
-from firebase_admin import credentials, firestore
+import argparse
+import sys
+from typing import List, Optional
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate("scripts/serviceAccountKey.json")
-    firebase_admin.initialize_app(cred)
+from contexto import Contexto
 
-db = firestore.client()
 TENANT_ID = "ekialdebus"
+BUS_EJEMPLO = "BUS-321"
+# Vehiculos y equipos esperados para TENANT_ID (importacion de Ekialdebus)
+ESPERADOS = (51, 954)
+
+
+def verificar(db, tenant_id: str = TENANT_ID, bus_ejemplo: str = BUS_EJEMPLO, esperados=None) -> bool:
+    """Imprime conteos y ejemplos del tenant; False si no cuadran con `esperados`."""
+    print("=" * 60)
+    print("VERIFICACION DE DATOS EN FIRESTORE")
+    print("=" * 60)
+
+    # Contar vehiculos (activos)
+    activos_ref = db.collection("tenants").document(tenant_id).collection("activos")
+    activos = list(activos_ref.stream())
+    print(f"\nVehiculos en Firestore: {len(activos)}")
+
+    # Contar equipos (inventario)
+    inventario_ref = db.collection("tenants").document(tenant_id).collection("inventario")
+    inventario = list(inventario_ref.stream())
+    print(f"Equipos en Firestore: {len(inventario)}")
+
+    # Mostrar algunos ejemplos de vehiculos
+    print("\nPrimeros 5 vehiculos:")
+    for activo in activos[:5]:
+        data = activo.to_dict()
+        print(f"   - {data.get('codigo')}: {data.get('matricula')} ({data.get('modelo', 'N/A')})")
+
+    # Mostrar distribucion de equipos por tipo
+    tipos_equipo = {}
+    for equipo in inventario:
+        data = equipo.to_dict()
+        tipo = data.get("tipo", "desconocido")
+        tipos_equipo[tipo] = tipos_equipo.get(tipo, 0) + 1
+
+    print("\nEquipos por tipo:")
+    for tipo, count in sorted(tipos_equipo.items()):
+        print(f"   - {tipo}: {count}")
 
-print("=" * 60)
-print("VERIFICACION DE DATOS EN FIRESTORE")
-print("=" * 60)
-
-# Contar vehiculos (activos)
-activos_ref = db.collection("tenants").document(TENANT_ID).collection("activos")
-activos = list(activos_ref.stream())
-print(f"\nVehiculos en Firestore: {len(activos)}")
-
-# Contar equipos (inventario)
-inventario_ref = db.collection("tenants").document(TENANT_ID).collection("inventario")
-inventario = list(inventario_ref.stream())
-print(f"Equipos en Firestore: {len(inventario)}")
-
-# Mostrar algunos ejemplos de vehiculos
-print("\nPrimeros 5 vehiculos:")
-for activo in activos[:5]:
-    data = activo.to_dict()
-    print(f"   - {data.get('codigo')}: {data.get('matricula')} ({data.get('modelo', 'N/A')})")
-
-# Mostrar distribucion de equipos por tipo
-tipos_equipo = {}
-for equipo in inventario:
-    data = equipo.to_dict()
-    tipo = data.get("tipo", "desconocido")
-    tipos_equipo[tipo] = tipos_equipo.get(tipo, 0) + 1
-
-print("\nEquipos por tipo:")
-for tipo, count in sorted(tipos_equipo.items()):
-    print(f"   - {tipo}: {count}")
-
-# Verificar un bus especifico con sus equipos
-bus_ejemplo = "BUS-321"
-print(f"\nDetalle del bus {bus_ejemplo}:")
-bus_doc = activos_ref.document(bus_ejemplo).get()
-if bus_doc.exists:
-    bus_data = bus_doc.to_dict()
-    print(f"   Matricula: {bus_data.get('matricula')}")
-    print(f"   Modelo: {bus_data.get('modelo')}")
-    print(f"   Estado: {bus_data.get('estado')}")
-    
-    # Contar equipos de este bus
-    equipos_bus = [e for e in inventario if e.to_dict().get("activoId") == bus_ejemplo]
-    print(f"   Equipos instalados: {len(equipos_bus)}")
-
-print("\n" + "=" * 60)
-print("RESUMEN")
-print("=" * 60)
-print(f"Esperados: 51 vehiculos, 954 equipos")
-print(f"Encontrados: {len(activos)} vehiculos, {len(inventario)} equipos")
-if len(activos) == 51 and len(inventario) == 954:
-    print("\n[OK] TODOS LOS DATOS ESTAN CORRECTAMENTE SUBIDOS")
-else:
+    # Verificar un bus especifico con sus equipos
+    print(f"\nDetalle del bus {bus_ejemplo}:")
+    bus_doc = activos_ref.document(bus_ejemplo).get()
+    if bus_doc.exists:
+        bus_data = bus_doc.to_dict()
+        print(f"   Matricula: {bus_data.get('matricula')}")
+        print(f"   Modelo: {bus_data.get('modelo')}")
+        print(f"   Estado: {bus_data.get('estado')}")
+
+        # Contar equipos de este bus
+        equipos_bus = [e for e in inventario if e.to_dict().get("activoId") == bus_ejemplo]
+        print(f"   Equipos instalados: {len(equipos_bus)}")
+
+    print("\n" + "=" * 60)
+    print("RESUMEN")
+    print("=" * 60)
+    print(f"Encontrados: {len(activos)} vehiculos, {len(inventario)} equipos")
+    if esperados is None:
+        return True
+    print(f"Esperados: {esperados[0]} vehiculos, {esperados[1]} equipos")
+    if (len(activos), len(inventario)) == tuple(esperados):
+        print("\n[OK] TODOS LOS DATOS ESTAN CORRECTAMENTE SUBIDOS")
+        return True
     print("\n[ALERTA] HAY DIFERENCIAS EN LOS CONTEOS")
+    return False
+
+
+def main(argv: Optional[List[str]] = None, contexto: Optional[Contexto] = None) -> int:
+    parser = argparse.ArgumentParser(description="Conteos y ejemplos de los datos importados de un tenant.")
+    parser.add_argument("--tenant", default=TENANT_ID)
+    parser.add_argument("--bus", default=BUS_EJEMPLO, help="Vehiculo a detallar")
+    parser.add_argument("--esperados", nargs=2, type=int, metavar=("VEHICULOS", "EQUIPOS"),
+                        help=f"Conteos esperados (por defecto {ESPERADOS} para {TENANT_ID})")
+    args = parser.parse_args(argv)
+
+    esperados = args.esperados or (ESPERADOS if args.tenant == TENANT_ID else None)
+    ok = verificar((contexto or Contexto()).db, args.tenant, args.bus, esperados)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,8 @@
 """Verificar equipos importados"""
-import firebase_admin
-from firebase_admin import credentials, firestore
+from cliente_firestore import conectar_firestore
+from datos_referencia import referencia
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate("scripts/serviceAccountKey.json")
-    firebase_admin.initialize_app(cred)
-
-db = firestore.client()
+db = conectar_firestore()
 
 # Contar equipos
 all_equipos = list(db.collection("equipos").stream())
@@ -22,22 +18,20 @@ for eq in all_equipos[:3]:
     print(f"      ubicacion: {data.get('ubicacionActual', {})}")
     print()
 
-# Verificar equipos del bus 321
+# Verificar equipos del bus 321 (una lectura: manifiesto del bus)
 print("=" * 50)
 print("Equipos del BUS-321:")
-bus_equipos = db.collection("equipos").where("ubicacionActual.tipo", "==", "autobus").where("ubicacionActual.id", "==", "BUS-321").stream()
-count = 0
-for eq in bus_equipos:
-    data = eq.to_dict()
-    print(f"  - {data.get('codigoInterno')}: {data.get('tipoEquipoNombre')}")
-    count += 1
-print(f"\nTotal equipos en BUS-321: {count}")
+manifiesto = db.document("tenants/ekialdebus/manifiestos_bus/BUS-321").get()
+equipos_bus = (manifiesto.to_dict() or {}).get("equipos", {}) if manifiesto.exists else {}
+if not manifiesto.exists:
+    print("  (sin manifiesto: ejecuta 'python scripts/manifiesto_bus.py reparar')")
+for entrada in sorted(equipos_bus.values(), key=lambda e: e.get("codigoInterno", "")):
+    print(f"  - {entrada.get('codigoInterno')}: {entrada.get('tipoNombre')}")
+print(f"\nTotal equipos en BUS-321: {len(equipos_bus)}")
 
 # Verificar tipos de equipo
 print()
 print("=" * 50)
 print("Tipos de equipo en catalogo:")
-tipos = list(db.collection("tipos_equipo").stream())
-for t in tipos:
-    data = t.to_dict()
-    print(f"  - {t.id}: {data.get('nombre')}")
+for tipo_id, data in sorted(referencia(db).documentos("tipos_equipo").items()):
+    print(f"  - {tipo_id}: {data.get('nombre')}")
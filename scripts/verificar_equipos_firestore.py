@@ -7,10 +7,11 @@ para diagnosticar si los tipos de equipo están correctamente identificados.
 =============================================================================
 """
 
-import firebase_admin
-from firebase_admin import credentials, firestore
 from collections import defaultdict
 
+from cliente_firestore import conectar_firestore
+from datos_referencia import referencia
+
 def verificar_equipos():
     """Verifica el estado de los equipos en Firestore."""
     
@@ -20,10 +21,7 @@ def verificar_equipos():
     
     # Inicializar Firebase
     print("\n[1] Inicializando Firebase...")
-    if not firebase_admin._apps:
-        cred = credentials.Certificate("scripts/serviceAccountKey.json")
-        firebase_admin.initialize_app(cred)
-    db = firestore.client()
+    db = conectar_firestore()
     print("    Firebase inicializado correctamente")
     
     # Obtener equipos
@@ -134,11 +132,10 @@ def verificar_equipos():
     print("\n" + "-" * 50)
     print("CATÁLOGO DE TIPOS DE EQUIPO:")
     print("-" * 50)
-    tipos = list(db.collection("tipos_equipo").stream())
+    tipos = referencia(db).documentos("tipos_equipo")
     if tipos:
-        for t in tipos:
-            data = t.to_dict()
-            print(f"  - {t.id}: {data.get('nombre', '?')} ({data.get('categoria', '?')})")
+        for tipo_id, data in sorted(tipos.items()):
+            print(f"  - {tipo_id}: {data.get('nombre', '?')} ({data.get('categoria', '?')})")
     else:
         print("  ⚠️  No hay tipos de equipo en el catálogo")
     
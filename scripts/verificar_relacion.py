@@ -1,12 +1,7 @@
 """Verificar relación entre activos y equipos"""
-import firebase_admin
-from firebase_admin import credentials, firestore
+from cliente_firestore import conectar_firestore
 
-if not firebase_admin._apps:
-    cred = credentials.Certificate("scripts/serviceAccountKey.json")
-    firebase_admin.initialize_app(cred)
-
-db = firestore.client()
+db = conectar_firestore()
 
 # Ver activos de ekialdebus
 print("ACTIVOS en tenants/ekialdebus/activos:")
@@ -0,0 +1,123 @@
+"""
+=============================================================================
+CLI UNIFICADA - ZaintzaBus
+=============================================================================
+Un único punto de entrada para las herramientas de datos, con subcomandos
+que reciben argumentos en lugar de editar las variables de cada script:
+
+    import-equipos   importar_equipos.py
+    import-flota     importador_zaintzabus.py
+    migrate          migrar_activos_a_autobuses.py
+    verify           verificar_datos.py
+    analyze          perfilar_excel.py
+    purge            purgar.py
+    snapshot         snapshot.py
+    watch            servicio_agregados.py (servicio, hasta Ctrl+C)
+
+El módulo de cada subcomando se importa sólo cuando se invoca: --help y los
+comandos ligeros no cargan pandas, firebase_admin ni los demás scripts.
+
+Varias etapas separadas por '+' se ejecutan en el mismo proceso y comparten
+un Contexto (contexto.py): el cliente de Firestore ya conectado, un único
+escritor con el ritmo común, la cache de libros Excel leídos y la
+instrumentación por etapa. La cadena se detiene en la primera etapa que
+falla; sus escrituras pendientes se descartan.
+
+USO:
+    python scripts/zaintzabus.py --help
+    python scripts/zaintzabus.py import-equipos --help
+    python scripts/zaintzabus.py analyze "Archivos_Excel/Flota Ekialdebus.xlsx" --resumen
+    python scripts/zaintzabus.py --ritmo 500 \\
+        import-flota --excel "Archivos_Excel/Flota Ekialdebus.xlsx" \\
+        + import-equipos --excel "Archivos_Excel/Flota Ekialdebus.xlsx" --si \\
+        + migrate --tenant ekialdebus \\
+        + verify --tenant ekialdebus
+=============================================================================
+"""
+
+import argparse
+import importlib
+import json
+import sys
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# Subcomando -> (módulo, descripción). El módulo debe exponer
+# main(argv, contexto) -> int
+SUBCOMANDOS = {
+    'import-equipos': ('importar_equipos', "Equipos del Excel de flota a la colección global 'equipos'"),
+    'import-flota': ('importador_zaintzabus', "Vehículos e inventario del Excel de flota de un operador"),
+    'migrate': ('migrar_activos_a_autobuses', "tenants/{t}/activos -> tenants/{t}/autobuses"),
+    'verify': ('verificar_datos', "Conteos y ejemplos de los datos importados de un tenant"),
+    'analyze': ('perfilar_excel', "Perfil de columnas del Excel contra los mapeos de importación"),
+    'purge': ('purgar', "Borrado acotado de equipos (tenant, autobús o ejecución)"),
+    'snapshot': ('snapshot', "Exportar colecciones de Firestore a un snapshot local"),
+    'watch': ('servicio_agregados', "Contadores y resúmenes al día con listeners (hasta Ctrl+C)"),
+}
+
+SEPARADOR = '+'
+
+
+def separar_etapas(argv: List[str]) -> Tuple[List[str], List[List[str]]]:
+    """(opciones globales, [[subcomando, args...], ...])"""
+    inicio = next((i for i, arg in enumerate(argv) if arg in SUBCOMANDOS), len(argv))
+    etapas: List[List[str]] = [[]]
+    for arg in argv[inicio:]:
+        if arg == SEPARADOR:
+            etapas.append([])
+        else:
+            etapas[-1].append(arg)
+    return argv[:inicio], [etapa for etapa in etapas if etapa]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    ayuda = "\n".join(f"  {nombre:16} {descripcion}" for nombre, (_, descripcion) in SUBCOMANDOS.items())
+    parser = argparse.ArgumentParser(
+        prog='zaintzabus',
+        usage="%(prog)s [opciones] SUBCOMANDO [args] [+ SUBCOMANDO [args] ...]",
+        description="Herramientas de datos de ZaintzaBus.",
+        epilog=f"subcomandos (ayuda de cada uno con SUBCOMANDO --help):\n{ayuda}",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--ritmo', type=float, help="Escrituras por segundo, común a todas las etapas")
+    parser.add_argument('--verbose', action='store_true', help="Informar de cada batch guardado")
+    parser.add_argument('--informe', type=Path, help="Guardar la instrumentación de las etapas en un JSON")
+
+    globales, etapas = separar_etapas(argv)
+    args = parser.parse_args(globales)
+    if not etapas:
+        parser.print_help()
+        return 2
+    for etapa in etapas:
+        if etapa[0] not in SUBCOMANDOS:
+            parser.error(f"subcomando desconocido '{etapa[0]}' (tras '{SEPARADOR}' va un subcomando)")
+
+    from contexto import Contexto
+    contexto = Contexto(ritmo=args.ritmo, verbose=args.verbose)
+
+    codigo = 0
+    for nombre, *resto in etapas:
+        modulo = importlib.import_module(SUBCOMANDOS[nombre][0])
+        try:
+            with contexto.etapa(nombre) as registro:
+                codigo = registro['codigo'] = modulo.main(resto, contexto) or 0
+        except SystemExit as e:
+            # argparse del subcomando: --help (0) o argumentos inválidos (2)
+            codigo = e.code if isinstance(e.code, int) else 1
+            if codigo == 0:
+                contexto.etapas.pop()
+                continue
+        if codigo:
+            print(f"❌ La etapa '{nombre}' terminó con código {codigo}; se detiene la cadena", file=sys.stderr)
+            break
+
+    if contexto.etapas and (len(etapas) > 1 or args.informe):
+        contexto.imprimir_informe()
+    if args.informe:
+        args.informe.write_text(json.dumps(contexto.etapas, ensure_ascii=False, indent=2), encoding='utf-8')
+    return codigo
+
+
+if __name__ == '__main__':
+    sys.exit(main())